@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark das listagens: entidades ORM + to_dict versus projeção + orjson
+
+Para cada endpoint de listagem compara o caminho anterior (hidratar entidades,
+to_dict por linha, validação do response_model e JSONResponse) com o atual
+(projeção de colunas em tuplas serializada por RespostaJSONRapida), medindo o
+tempo até os bytes da resposta.
+
+Por padrão popula um SQLite temporário; com --database-url usa um banco
+existente (somente leitura).
+
+Uso:
+    python benchmark_listagens.py [--linhas 5000] [--repeticoes 5]
+    python benchmark_listagens.py --database-url postgresql://... --repeticoes 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, desc
+from sqlalchemy.orm import Session, joinedload, sessionmaker
+
+from models_final import (
+    Alias, Base, Darf, DarfResponse, Imovel, Participacao, Proprietario, Transferencia, TransferenciaResponse
+)
+from routers.darf import listar_darfs
+from routers.imoveis import listar_imoveis
+from routers.participacoes import listar_participacoes
+from routers.proprietarios import listar_proprietarios
+from routers.transferencias import listar_transferencias
+
+
+def popular(db: Session, linhas: int) -> None:
+    """Cria `linhas` registros de cada tabela listada."""
+    proprietarios = [Proprietario(nome=f"Proprietário {i}", sobrenome="Benchmark", email=f"p{i}@exemplo.com")
+                     for i in range(linhas)]
+    imoveis = [Imovel(nome=f"Imóvel {i}", endereco=f"Rua {i}", valor_mercado=100000 + i, iptu_mensal=100.5,
+                      condominio_mensal=300.25, area_total=80.5, numero_quartos=2) for i in range(linhas)]
+    alias = Alias(alias="Benchmark")
+    db.add_all([*proprietarios, *imoveis, alias])
+    db.flush()
+    data_registro = datetime(2030, 1, 1)
+    db.add_all([
+        Participacao(imovel_id=imoveis[i].id, proprietario_id=proprietarios[i].id, porcentagem=100,
+                     data_registro=data_registro) for i in range(linhas)
+    ])
+    db.add_all([
+        Darf(proprietario_id=proprietarios[i].id, data=date(2025, 1, 1) + timedelta(days=i % 365), valor_darf=123.45)
+        for i in range(linhas)
+    ])
+    db.add_all([
+        Transferencia(alias_id=alias.id, nome_transferencia=f"Transferência {i}", valor_total=50.5,
+                      id_proprietarios=f'[{{"id": {proprietarios[i].id}, "valor": 50.5}}]',
+                      origem_id_proprietario=proprietarios[i].id, data_criacao=datetime(2025, 1, 1))
+        for i in range(linhas)
+    ])
+    db.commit()
+
+
+def _resposta_anterior(conteudo) -> bytes:
+    """Serialização padrão do FastAPI: jsonable_encoder + JSONResponse."""
+    return JSONResponse(jsonable_encoder(conteudo)).body
+
+
+def caminhos(db: Session, limite_darfs: int):
+    """Pares (nome, caminho anterior, caminho atual) de cada listagem."""
+    transferencias_modelo = TypeAdapter(List[TransferenciaResponse])
+    darfs_modelo = TypeAdapter(List[DarfResponse])
+
+    def proprietarios_anterior():
+        proprietarios = db.query(Proprietario).order_by(Proprietario.nome).all()
+        return _resposta_anterior([p.to_dict() for p in proprietarios])
+
+    def imoveis_anterior():
+        imoveis = db.query(Imovel).order_by(Imovel.nome).all()
+        return _resposta_anterior({"success": True, "data": [i.to_dict() for i in imoveis]})
+
+    def participacoes_anterior():
+        subquery = db.query(Participacao.data_registro).order_by(Participacao.data_registro.desc()).limit(1).scalar_subquery()
+        participacoes = db.query(Participacao).options(
+            joinedload(Participacao.imovel), joinedload(Participacao.proprietario)
+        ).filter(Participacao.data_registro == subquery).all()
+        return _resposta_anterior({"success": True, "data": [p.to_dict() for p in participacoes]})
+
+    def transferencias_anterior():
+        transferencias = db.query(Transferencia).order_by(desc(Transferencia.id)).all()
+        dados = transferencias_modelo.validate_python([t.to_dict() for t in transferencias])
+        return _resposta_anterior(dados)
+
+    def darfs_anterior():
+        darfs = db.query(Darf).options(joinedload(Darf.proprietario)).order_by(Darf.data.desc()).limit(limite_darfs).all()
+        dados = darfs_modelo.validate_python([DarfResponse(**d.to_dict()) for d in darfs])
+        return _resposta_anterior(dados)
+
+    return [
+        ("/api/proprietarios/", proprietarios_anterior, lambda: listar_proprietarios(db=db, current_user=None).body),
+        ("/api/imoveis/", imoveis_anterior, lambda: listar_imoveis(db=db, current_user=None).body),
+        ("/api/participacoes/", participacoes_anterior,
+         lambda: listar_participacoes(data_registro=None, db=db, current_user=None).body),
+        ("/api/transferencias/", transferencias_anterior, lambda: listar_transferencias(db=db, current_user=None).body),
+        ("/api/darf/", darfs_anterior, lambda: asyncio.run(listar_darfs(
+            skip=0, limit=limite_darfs, proprietario_id=None, ano=None, mes=None, db=db, current_user=None
+        )).body),
+    ]
+
+
+def medir(funcao: Callable[[], bytes], repeticoes: int) -> float:
+    """Mediana, em segundos, de `repeticoes` execuções (após uma de aquecimento)."""
+    funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark das listagens (ORM + to_dict vs projeção + orjson)")
+    parser.add_argument("--linhas", type=int, default=5000, help="Registros por tabela no SQLite temporário")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--database-url", help="Banco existente (por padrão, SQLite temporário)")
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        arquivo = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+        engine = create_engine(f"sqlite:///{arquivo}")
+        Base.metadata.create_all(engine)
+        with sessionmaker(bind=engine)() as db:
+            popular(db, args.linhas)
+
+    with sessionmaker(bind=engine)() as db:
+        print(f"{'endpoint':<24}{'anterior (ms)':>15}{'atual (ms)':>12}{'ganho':>8}{'bytes':>12}")
+        for nome, anterior, atual in caminhos(db, limite_darfs=args.linhas):
+            tempo_anterior = medir(anterior, args.repeticoes)
+            tempo_atual = medir(atual, args.repeticoes)
+            print(f"{nome:<24}{tempo_anterior * 1000:>15.1f}{tempo_atual * 1000:>12.1f}"
+                  f"{tempo_anterior / tempo_atual:>7.1f}x{len(atual()):>12}")
+            db.expunge_all()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
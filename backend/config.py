@@ -7,10 +7,12 @@ import atexit
 import shutil
 from dotenv import load_dotenv
 load_dotenv()
+import time
 from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 # Configurações de ambiente
@@ -27,6 +29,52 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Réplica somente leitura (opcional); sem DATABASE_READ_URL as leituras usam o primário
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+REPLICA_CONFIGURADA = bool(DATABASE_READ_URL)
+read_engine = create_engine(DATABASE_READ_URL, pool_pre_ping=True) if REPLICA_CONFIGURADA else engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# Read-your-writes: após uma escrita, o mesmo cliente lê do primário por alguns segundos
+READ_YOUR_WRITES_SECONDS = int(os.getenv("DATABASE_READ_YOUR_WRITES_SECONDS", "5"))
+COOKIE_ULTIMA_ESCRITA = "ultima_escrita"
+HEADER_LER_PRIMARIO = "X-Read-Primary"
+METODOS_ESCRITA = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Validade das estatísticas em lote em cache; escritas no mesmo worker as descartam antes
+ESTATISTICAS_CACHE_TTL_SECONDS = int(os.getenv("ESTATISTICAS_CACHE_TTL_SECONDS", "60"))
+
+# Compressão de respostas: tamanho mínimo, tamanho a partir do qual comprime em thread e níveis
+COMPRESSAO_CONFIG = {
+    "tamanho_minimo": int(os.getenv("COMPRESSION_MIN_BYTES", "1024")),
+    "tamanho_minimo_thread": int(os.getenv("COMPRESSION_THREAD_MIN_BYTES", str(64 * 1024))),
+    "tamanho_maximo": int(os.getenv("COMPRESSION_MAX_BYTES", str(8 * 1024 * 1024))),
+    "nivel_gzip": int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+    "qualidade_brotli": int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4")),
+}
+
+# Rate limiting: contadores compartilhados entre os workers do host (SQLite em tmpfs)
+# ou em um servidor compatível com Redis (redis://host:6379)
+_DIRETORIO_RATE_LIMIT = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+RATE_LIMIT_STORAGE_URI = os.getenv(
+    "RATE_LIMIT_STORAGE_URI", f"sqlite:///{os.path.join(_DIRETORIO_RATE_LIMIT, 'alugueis_rate_limit.db')}"
+)
+RATE_LIMIT_STRATEGY = os.getenv("RATE_LIMIT_STRATEGY", "sliding-window-counter")
+
+# Hash de senhas: custo do bcrypt e pool dedicado (threads e fila máxima de espera)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+
+# Upload de planilhas: tamanho máximo e tamanho dos blocos gravados em disco
+MAX_UPLOAD_SIZE_MB = int(os.getenv("MAX_UPLOAD_SIZE_MB", "10"))
+UPLOAD_CHUNK_SIZE_KB = int(os.getenv("UPLOAD_CHUNK_SIZE_KB", "1024"))
+
+# Leitura das planilhas de uma pasta Excel: processos do pool compartilhado e tamanho
+# mínimo do arquivo para usá-lo (pastas menores ou com uma planilha são lidas em thread)
+IMPORT_MAX_WORKERS = int(os.getenv("IMPORT_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+IMPORT_PARALLEL_MIN_KB = int(os.getenv("IMPORT_PARALLEL_MIN_KB", "2048"))
+
 # Dependency para obter sessão do banco
 def get_db():
     db = SessionLocal()
@@ -35,6 +83,41 @@ def get_db():
     finally:
         db.close()
 
+def ler_do_primario(request: Request) -> bool:
+    """Indica se a requisição deve ler do primário (cabeçalho explícito ou escrita recente)."""
+    if request.headers.get(HEADER_LER_PRIMARIO, "").lower() in ("1", "true"):
+        return True
+    try:
+        ultima_escrita = float(request.cookies.get(COOKIE_ULTIMA_ESCRITA, "0"))
+    except ValueError:
+        return False
+    return time.time() - ultima_escrita < READ_YOUR_WRITES_SECONDS
+
+def registrar_escrita(request: Request, response: Response) -> None:
+    """Marca o cliente após uma escrita bem-sucedida para que suas próximas leituras usem o primário."""
+    if REPLICA_CONFIGURADA and request.method in METODOS_ESCRITA and response.status_code < 400:
+        response.set_cookie(
+            COOKIE_ULTIMA_ESCRITA, str(time.time()),
+            max_age=READ_YOUR_WRITES_SECONDS, httponly=True, samesite="lax"
+        )
+
+# Dependency para sessões somente leitura (réplica, com fallback para o primário)
+def get_db_read(request: Request):
+    if ler_do_primario(request):
+        db = SessionLocal()
+    else:
+        db = ReadSessionLocal()
+        try:
+            db.connection()
+        except OperationalError as e:
+            print(f"❌ Réplica de leitura indisponível ({e.orig}); usando o primário")
+            db.close()
+            db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 # Configuração da aplicação FastAPI
 APP_CONFIG = {
     "title": "Sistema de Gestão de Aluguéis V2",
@@ -79,7 +162,8 @@ CORS_CONFIG = {
     "allow_origins": ALLOW_ORIGINS,
     "allow_credentials": allow_credentials_effective,
     "allow_methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    "allow_headers": ["Authorization", "Content-Type", "Accept", "Origin", "X-Requested-With", "X-CSRF-Token"]
+    "allow_headers": ["Authorization", "Content-Type", "Accept", "Origin", "X-Requested-With", "X-CSRF-Token"],
+    "expose_headers": ["X-Uncompressed-Size", "X-Compressed-Size"]
 }
 
 # Configurações de segredo e debug
@@ -98,11 +182,13 @@ JWT_EXPIRATION_MINUTES = int(os.getenv("JWT_EXPIRATION_MINUTES", "30"))
 
 # Configurações de upload seguras com tempfile
 UPLOAD_DIR = tempfile.mkdtemp(prefix="alugueis_uploads_")
-STORAGE_DIR = tempfile.mkdtemp(prefix="alugueis_storage_")
+
+# Armazenamento permanente (informes pré-calculados): compartilhado entre workers e
+# preservado entre reinícios, para que lotes interrompidos possam ser retomados
+STORAGE_DIR = os.getenv("STORAGE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "storage"))
 
 def cleanup_temp_dirs():
     """Remove os diretórios temporários criados."""
     shutil.rmtree(UPLOAD_DIR, ignore_errors=True)
-    shutil.rmtree(STORAGE_DIR, ignore_errors=True)
 
 atexit.register(cleanup_temp_dirs)
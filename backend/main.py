@@ -15,11 +15,17 @@ import time
 from fastapi_utils.tasks import repeat_every
 from fastapi.responses import JSONResponse
 
-from config import APP_CONFIG, CORS_CONFIG, get_db, UPLOAD_DIR
+from config import APP_CONFIG, CORS_CONFIG, COMPRESSAO_CONFIG, MAX_UPLOAD_SIZE_MB, get_db, UPLOAD_DIR, METODOS_ESCRITA, registrar_escrita
 from models_final import AluguelSimples, Imovel
 from routers import alugueis, estadisticas, upload, auth
-from routers import proprietarios, imoveis, participacoes, reportes, extras, transferencias, dashboard, health, darf
+from routers import proprietarios, imoveis, participacoes, reportes, extras, transferencias, dashboard, health, darf, informes
 from routers.auth import verify_token
+from services.analise_imoveis_service import AnaliseImoveisService
+from services.imovel_service import ImovelService
+from services.participacao_service import ParticipacaoService
+from services.proprietario_service import ProprietarioService
+from utils.compressao import CompressaoMiddleware
+from utils.upload_blocos import LimiteUploadMiddleware
 from utils.error_handlers import global_exception_handler
 
 # Configuração CSRF
@@ -49,16 +55,18 @@ def get_csrf_config():
 # Configuração da aplicação
 
 app = FastAPI(**APP_CONFIG)
+# Uploads acima do limite recusados pelo Content-Length, antes de ler o corpo (dentro do CORS)
+app.add_middleware(LimiteUploadMiddleware, limite_bytes=MAX_UPLOAD_SIZE_MB * 1024 * 1024)
 app.add_middleware(CORSMiddleware, **CORS_CONFIG)
 
 
 # Configuração de Rate Limiting para prevenir ataques de força bruta
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+# (contadores compartilhados entre workers; ver utils/limite_taxa.py)
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
+from utils.limite_taxa import limiter
 
-limiter = Limiter(key_func=get_remote_address)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 app.add_middleware(SlowAPIMiddleware)
@@ -67,6 +75,27 @@ app.add_middleware(SlowAPIMiddleware)
 from fastapi import Request
 app.add_exception_handler(Exception, global_exception_handler)
 
+# Rotas cujas escritas alteram participações já gravadas (exclusões de imóveis e
+# proprietários removem as participações em cascata)
+PREFIXOS_ESCRITA_PARTICIPACOES = ("/api/participacoes", "/api/imoveis", "/api/proprietarios", "/api/upload")
+
+# Read-your-writes: após escritas, o cliente volta a ler do primário por alguns segundos
+@app.middleware("http")
+async def marcar_escritas_recentes(request: Request, call_next):
+    response = await call_next(request)
+    registrar_escrita(request, response)
+    if request.method in METODOS_ESCRITA and response.status_code < 400:
+        # Estatísticas em lote e análise de imóveis são recalculadas na próxima leitura
+        ProprietarioService.invalidar_estatisticas()
+        ImovelService.invalidar_estatisticas()
+        AnaliseImoveisService.invalidar()
+        if request.url.path.startswith(PREFIXOS_ESCRITA_PARTICIPACOES):
+            ParticipacaoService.invalidar_cache()
+    return response
+
+# Compressão brotli/gzip de respostas grandes (middleware mais externo)
+app.add_middleware(CompressaoMiddleware, **COMPRESSAO_CONFIG)
+
 # Tarefa de limpeza de arquivos de upload
 @app.on_event("startup")
 @repeat_every(seconds=6 * 60 * 60)  # Executar a cada 6 horas
@@ -99,6 +128,7 @@ app.include_router(reportes.router)
 app.include_router(extras.router)
 app.include_router(transferencias.router)
 app.include_router(darf.router)
+app.include_router(informes.router)
 app.include_router(health.router)
 
 # =====================================================
@@ -9,7 +9,7 @@ import uuid
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from pydantic import BaseModel, Field, validator
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 
 class UUID(TypeDecorator):
     """Platform-independent UUID type."""
@@ -193,6 +193,8 @@ class AluguelSimples(Base):
         CheckConstraint('mes >= 1 AND mes <= 12', name='alugueis_simples_mes_check'),
         CheckConstraint('ano >= 2020 AND ano <= 2060', name='alugueis_simples_ano_check'),
         CheckConstraint('taxa_administracao_total >= 0 AND taxa_administracao_proprietario >= 0', name='alugueis_simples_taxa_check'),
+        # No PostgreSQL a tabela pode estar particionada por ano (particionar_alugueis.py)
+        {'info': {'chave_particao': 'ano'}},
     )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -232,6 +234,30 @@ class AluguelSimples(Base):
             'valor_total_estimado': float(self.taxa_administracao_total) + float(self.valor_liquido_proprietario) if self.taxa_administracao_total and self.valor_liquido_proprietario else 0
         }
 
+class PeriodoAluguel(Base):
+    """Catálogo de períodos com aluguéis - mantido por trigger em alugueis"""
+    __tablename__ = 'periodos_alugueis'
+
+    ano = Column(Integer, primary_key=True)
+    mes = Column(Integer, primary_key=True)
+    quantidade = Column(Integer, nullable=False, default=0)
+    total_valor_liquido = Column(Numeric(14,2), nullable=False, default=0)
+    total_taxa_proprietario = Column(Numeric(14,2), nullable=False, default=0)
+    atualizado_em = Column(DateTime, default=func.current_timestamp())
+
+    def __repr__(self):
+        return f"<PeriodoAluguel(periodo='{self.mes}/{self.ano}', quantidade={self.quantidade})>"
+
+    def to_dict(self):
+        return {
+            'ano': self.ano,
+            'mes': self.mes,
+            'quantidade': self.quantidade,
+            'total_valor_liquido': float(self.total_valor_liquido or 0),
+            'total_taxa_proprietario': float(self.total_taxa_proprietario or 0),
+            'atualizado_em': self.atualizado_em.isoformat() if self.atualizado_em else None
+        }
+
 # ============================================
 # PARTICIPAÇÕES
 # ============================================
@@ -275,6 +301,33 @@ class Participacao(Base):
             'proprietario_id': self.proprietario_id
         }
 
+class VersaoParticipacao(Base):
+    """Versões do conjunto de participações - chave única por data_registro"""
+    __tablename__ = 'versoes_participacoes'
+
+    data_registro = Column(DateTime, primary_key=True)
+    usuario_id = Column(Integer, ForeignKey('usuarios.id', ondelete="SET NULL"), nullable=True)
+    criado_em = Column(DateTime, nullable=False, default=func.current_timestamp())
+
+    def __repr__(self):
+        return f"<VersaoParticipacao(data_registro={self.data_registro})>"
+
+
+class VersaoAtualParticipacao(Base):
+    """Ponteiro para a versão vigente das participações - linha única (id = 1)"""
+    __tablename__ = 'versao_atual_participacoes'
+
+    id = Column(Integer, primary_key=True, default=1)
+    data_registro = Column(DateTime, ForeignKey('versoes_participacoes.data_registro'), nullable=False)
+    atualizado_em = Column(DateTime, nullable=False, default=func.current_timestamp())
+
+    __table_args__ = (
+        CheckConstraint('id = 1', name='versao_atual_participacoes_linha_unica'),
+    )
+
+    def __repr__(self):
+        return f"<VersaoAtualParticipacao(data_registro={self.data_registro})>"
+
 # ============================================
 # HISTÓRICO DE PARTICIPAÇÕES
 # ============================================
@@ -338,6 +391,15 @@ class LogImportacao(Base):
     detalhes_erro = Column(Text, nullable=True)
     estado = Column(String(50), default='INICIADO')
     tempo_processamento = Column(Interval, nullable=True)
+    # Preenchidos nos registros por planilha: permitem pular planilhas já importadas
+    nome_planilha = Column(String(255), nullable=True)
+    tipo_dados = Column(String(50), nullable=True)
+    hash_conteudo = Column(String(64), nullable=True)
+    periodo = Column(String(20), nullable=True)
+
+    __table_args__ = (
+        Index('idx_log_importacoes_hash', 'hash_conteudo'),
+    )
     
     def __repr__(self):
         return f"<LogImportacao(arquivo='{self.nome_arquivo}', estado='{self.estado}')>"
@@ -352,7 +414,11 @@ class LogImportacao(Base):
             'registros_erro': self.registros_erro,
             'detalhes_erro': self.detalhes_erro,
             'estado': self.estado,
-            'tempo_processamento': str(self.tempo_processamento) if self.tempo_processamento else None
+            'tempo_processamento': str(self.tempo_processamento) if self.tempo_processamento else None,
+            'nome_planilha': self.nome_planilha,
+            'tipo_dados': self.tipo_dados,
+            'hash_conteudo': self.hash_conteudo,
+            'periodo': self.periodo
         }
 
 # ============================================
@@ -404,6 +470,10 @@ class AluguelSimplesSchema(BaseModel):
     class Config:
         from_attributes = True
 
+class AluguelLoteRequest(BaseModel):
+    """Lote de aluguéis para upsert; cada linha é validada individualmente no serviço"""
+    alugueis: List[Dict[str, Any]] = Field(..., description="Linhas com imovel_id, proprietario_id, mes, ano, valor_liquido_proprietario e taxa_administracao_total (opcional)")
+
 class ParticipacaoSchema(BaseModel):
     porcentagem: float = Field(..., ge=0.0, le=100.0, description="Porcentagem de participação (0.0 a 100.0)")
     imovel_id: int = Field(..., gt=0, description="ID do imóvel")
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Ferramenta de particionamento da tabela alugueis por ano (PostgreSQL)
+
+A migração é feita em etapas, cada uma em transações curtas, para que a
+aplicação continue lendo e gravando aluguéis durante todo o processo:
+
+    preparar   cria alugueis_particionada (PARTITION BY RANGE (ano)) com uma
+               partição por ano e uma partição padrão, replica índices e
+               restrições e instala um trigger que espelha na tabela nova
+               toda escrita feita em alugueis
+    copiar     copia os dados ano a ano; cada ano roda em sua própria
+               transação com alugueis em modo SHARE (leituras continuam,
+               escritas esperam apenas a cópia daquele ano)
+    trocar     confere as contagens e, numa transação curta, troca os nomes
+               das tabelas, recria os triggers e transfere a sequência de ids;
+               a tabela antiga fica como alugueis_legado para conferência
+    status     compara, por ano, o catálogo de períodos com a tabela nova
+
+Depois da troca:
+
+    criar-particao ANO          cria a partição de um ano (movendo linhas
+                                que estejam na partição padrão)
+    arquivar ANO TABLESPACE     move a partição de um ano para outro
+                                tablespace (ex.: armazenamento mais barato)
+
+Como chaves únicas de tabelas particionadas precisam conter a coluna de
+partição, a chave primária passa a ser (id, ano) e a unicidade do uuid passa
+a ser (uuid, ano). Os ids continuam vindo da mesma sequência.
+
+Uso:
+    python particionar_alugueis.py preparar
+    python particionar_alugueis.py copiar [--ano 2024]
+    python particionar_alugueis.py trocar
+"""
+import argparse
+import re
+import sys
+from datetime import datetime
+from typing import Dict, List
+
+sys.path.insert(0, '/app')
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+TABELA = "alugueis"
+TABELA_NOVA = "alugueis_particionada"
+TABELA_LEGADO = "alugueis_legado"
+PARTICAO_PADRAO = "alugueis_padrao"
+COLUNA_PARTICAO = "ano"
+FUNCAO_ESPELHO = "espelhar_alugueis_particionada"
+TRIGGER_ESPELHO = "trigger_espelhar_alugueis_particionada"
+
+# Limite de tamanho de identificadores no PostgreSQL
+LIMITE_IDENTIFICADOR = 63
+
+
+def _ident(nome: str) -> str:
+    """Identificador SQL entre aspas."""
+    return '"' + nome.replace('"', '""') + '"'
+
+
+def _nome_com_sufixo(nome: str, sufixo: str) -> str:
+    """Acrescenta um sufixo respeitando o limite de identificadores."""
+    return nome[:LIMITE_IDENTIFICADOR - len(sufixo)] + sufixo
+
+
+def _nome_particao(ano: int) -> str:
+    return f"{TABELA}_{ano}"
+
+
+def _tipo_tabela(conn: Connection, tabela: str):
+    """relkind da tabela ('r' comum, 'p' particionada) ou None se não existir."""
+    return conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:tabela)"), {"tabela": tabela}
+    ).scalar()
+
+
+def anos_com_dados(conn: Connection, tabela: str = TABELA) -> List[int]:
+    """Anos com aluguéis, pelo catálogo de períodos (migração 015) quando existir."""
+    if _tipo_tabela(conn, "periodos_alugueis"):
+        sql = "SELECT DISTINCT ano FROM periodos_alugueis ORDER BY ano"
+    else:
+        sql = f"SELECT DISTINCT {COLUNA_PARTICAO} FROM {_ident(tabela)} ORDER BY 1"
+    return [linha[0] for linha in conn.execute(text(sql))]
+
+
+def _indices(conn: Connection, tabela: str) -> List[Dict]:
+    """Índices da tabela com a restrição (p/u) que os usa, se houver."""
+    return [dict(linha._mapping) for linha in conn.execute(text("""
+        SELECT ic.relname AS nome,
+               pg_get_indexdef(i.indexrelid) AS definicao,
+               i.indisunique AS unico,
+               c.contype AS tipo_restricao,
+               ARRAY(
+                   SELECT a.attname::text
+                   FROM unnest(i.indkey) WITH ORDINALITY AS k(attnum, pos)
+                   JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+                   ORDER BY k.pos
+               ) AS colunas
+        FROM pg_index i
+        JOIN pg_class ic ON ic.oid = i.indexrelid
+        LEFT JOIN pg_constraint c ON c.conindid = i.indexrelid AND c.contype IN ('p', 'u')
+        WHERE i.indrelid = to_regclass(:tabela)
+        ORDER BY ic.relname
+    """), {"tabela": tabela})]
+
+
+def _criar_particao_ano(conn: Connection, ano: int) -> None:
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {_ident(_nome_particao(ano))} PARTITION OF {_ident(TABELA_NOVA)} "
+        f"FOR VALUES FROM ({int(ano)}) TO ({int(ano) + 1})"
+    ))
+
+
+def preparar(engine: Engine) -> None:
+    """Cria a tabela particionada vazia, suas partições e o trigger de espelhamento."""
+    with engine.begin() as conn:
+        if _tipo_tabela(conn, TABELA) == "p":
+            print("✅ alugueis já é particionada; nada a preparar")
+            return
+        if _tipo_tabela(conn, TABELA_NOVA):
+            print(f"❌ {TABELA_NOVA} já existe; use 'copiar' ou remova-a para recomeçar")
+            return
+
+        conn.execute(text(
+            f"CREATE TABLE {_ident(TABELA_NOVA)} (LIKE {_ident(TABELA)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE ({COLUNA_PARTICAO})"
+        ))
+
+        # Chaves primária/únicas precisam incluir a coluna de partição
+        for indice in _indices(conn, TABELA):
+            novo_nome = _nome_com_sufixo(indice["nome"], "_particionada")
+            colunas = list(indice["colunas"])
+            if indice["tipo_restricao"]:
+                if COLUNA_PARTICAO not in colunas:
+                    colunas.append(COLUNA_PARTICAO)
+                tipo = "PRIMARY KEY" if indice["tipo_restricao"] == "p" else "UNIQUE"
+                conn.execute(text(
+                    f"ALTER TABLE {_ident(TABELA_NOVA)} ADD CONSTRAINT {_ident(novo_nome)} "
+                    f"{tipo} ({', '.join(_ident(c) for c in colunas)})"
+                ))
+            elif indice["unico"] and COLUNA_PARTICAO not in colunas:
+                print(f"❌ Índice único {indice['nome']} não contém '{COLUNA_PARTICAO}' e não foi replicado")
+            else:
+                definicao = re.sub(
+                    r"^CREATE (UNIQUE )?INDEX \S+ ON (ONLY )?\S+ ",
+                    lambda m: f"CREATE {m.group(1) or ''}INDEX {_ident(novo_nome)} ON {_ident(TABELA_NOVA)} ",
+                    indice["definicao"]
+                )
+                conn.execute(text(definicao))
+
+        chaves_estrangeiras = conn.execute(text("""
+            SELECT conname, pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE conrelid = to_regclass(:tabela) AND contype = 'f'
+        """), {"tabela": TABELA}).all()
+        for nome, definicao in chaves_estrangeiras:
+            conn.execute(text(f"ALTER TABLE {_ident(TABELA_NOVA)} ADD CONSTRAINT {_ident(nome)} {definicao}"))
+
+        anos = anos_com_dados(conn)
+        ano_atual = datetime.now().year
+        primeiro = min(anos + [ano_atual])
+        ultimo = max(anos + [ano_atual]) + 1
+        for ano in range(primeiro, ultimo + 1):
+            _criar_particao_ano(conn, ano)
+        conn.execute(text(f"CREATE TABLE {_ident(PARTICAO_PADRAO)} PARTITION OF {_ident(TABELA_NOVA)} DEFAULT"))
+
+        # Espelha escritas feitas durante a cópia (UPDATE = remove + insere, pois o ano pode mudar)
+        conn.execute(text(f"""
+            CREATE OR REPLACE FUNCTION {FUNCAO_ESPELHO}()
+            RETURNS TRIGGER AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    DELETE FROM {_ident(TABELA_NOVA)} WHERE id = OLD.id AND {COLUNA_PARTICAO} = OLD.{COLUNA_PARTICAO};
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO {_ident(TABELA_NOVA)} SELECT (NEW).*;
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """))
+        conn.execute(text(f"""
+            CREATE TRIGGER {TRIGGER_ESPELHO}
+                AFTER INSERT OR UPDATE OR DELETE ON {_ident(TABELA)}
+                FOR EACH ROW
+                EXECUTE FUNCTION {FUNCAO_ESPELHO}()
+        """))
+    print(f"✅ {TABELA_NOVA} criada com partições de {primeiro} a {ultimo}; execute 'copiar'")
+
+
+def copiar(engine: Engine, ano: int = None) -> Dict[int, int]:
+    """
+    Copia os aluguéis para a tabela particionada, um ano por transação
+
+    Linhas já espelhadas pelo trigger são mantidas (ON CONFLICT DO NOTHING),
+    então a cópia pode ser interrompida e reexecutada.
+
+    Args:
+        engine: Engine do banco
+        ano: Copiar apenas este ano (padrão: todos)
+
+    Returns:
+        Ano -> linhas copiadas
+    """
+    with engine.connect() as conn:
+        if not _tipo_tabela(conn, TABELA_NOVA):
+            print(f"❌ {TABELA_NOVA} não existe; execute 'preparar' primeiro")
+            return {}
+        anos = [ano] if ano else anos_com_dados(conn)
+
+    copiados = {}
+    for ano_copia in anos:
+        with engine.begin() as conn:
+            conn.execute(text(f"LOCK TABLE {_ident(TABELA)} IN SHARE MODE"))
+            resultado = conn.execute(text(
+                f"INSERT INTO {_ident(TABELA_NOVA)} SELECT * FROM {_ident(TABELA)} "
+                f"WHERE {COLUNA_PARTICAO} = :ano ON CONFLICT DO NOTHING"
+            ), {"ano": ano_copia})
+            copiados[ano_copia] = resultado.rowcount
+        with engine.connect() as conn:
+            conn.execute(text(f"ANALYZE {_ident(TABELA_NOVA)}"))
+            conn.commit()
+        print(f"✅ {ano_copia}: {copiados[ano_copia]} aluguéis copiados")
+    return copiados
+
+
+def status(engine: Engine) -> Dict[int, Dict[str, int]]:
+    """Quantidade por ano no catálogo de períodos e na tabela particionada."""
+    with engine.connect() as conn:
+        tabela_nova = TABELA if _tipo_tabela(conn, TABELA) == "p" else TABELA_NOVA
+        esperado = dict(conn.execute(text(
+            "SELECT ano, SUM(quantidade) FROM periodos_alugueis GROUP BY ano"
+        )).all())
+        atual = dict(conn.execute(text(
+            f"SELECT {COLUNA_PARTICAO}, COUNT(*) FROM {_ident(tabela_nova)} GROUP BY 1"
+        )).all())
+    situacao = {}
+    for ano in sorted(set(esperado) | set(atual)):
+        situacao[ano] = {"esperado": int(esperado.get(ano, 0)), "copiado": int(atual.get(ano, 0))}
+        marca = "✅" if situacao[ano]["esperado"] == situacao[ano]["copiado"] else "❌"
+        print(f"{marca} {ano}: {situacao[ano]['copiado']}/{situacao[ano]['esperado']}")
+    return situacao
+
+
+def trocar(engine: Engine) -> bool:
+    """
+    Substitui alugueis pela tabela particionada numa única transação curta
+
+    Returns:
+        True se a troca foi feita
+    """
+    with engine.begin() as conn:
+        if _tipo_tabela(conn, TABELA) == "p":
+            print("✅ alugueis já é particionada")
+            return True
+        conn.execute(text(f"LOCK TABLE {_ident(TABELA)} IN ACCESS EXCLUSIVE MODE"))
+
+        # Com o trigger de espelho ativo, a tabela nova deve ter exatamente as mesmas linhas
+        if _tipo_tabela(conn, "periodos_alugueis"):
+            esperado = conn.execute(text("SELECT COALESCE(SUM(quantidade), 0) FROM periodos_alugueis")).scalar()
+        else:
+            esperado = conn.execute(text(f"SELECT COUNT(*) FROM {_ident(TABELA)}")).scalar()
+        copiado = conn.execute(text(f"SELECT COUNT(*) FROM {_ident(TABELA_NOVA)}")).scalar()
+        if int(esperado) != int(copiado):
+            print(f"❌ Contagens divergentes (alugueis: {esperado}, {TABELA_NOVA}: {copiado}); execute 'copiar'")
+            return False
+
+        conn.execute(text(f"DROP TRIGGER {TRIGGER_ESPELHO} ON {_ident(TABELA)}"))
+        conn.execute(text(f"DROP FUNCTION {FUNCAO_ESPELHO}()"))
+
+        triggers = conn.execute(text("""
+            SELECT tgname, pg_get_triggerdef(oid)
+            FROM pg_trigger
+            WHERE tgrelid = to_regclass(:tabela) AND NOT tgisinternal
+        """), {"tabela": TABELA}).all()
+        for nome, _ in triggers:
+            conn.execute(text(f"DROP TRIGGER {_ident(nome)} ON {_ident(TABELA)}"))
+
+        privilegios = conn.execute(text("""
+            SELECT grantee, privilege_type
+            FROM information_schema.role_table_grants
+            WHERE table_name = :tabela AND grantee <> current_user
+        """), {"tabela": TABELA}).all()
+
+        indices_antigos = [i["nome"] for i in _indices(conn, TABELA)]
+        for nome in indices_antigos:
+            conn.execute(text(f"ALTER INDEX {_ident(nome)} RENAME TO {_ident(_nome_com_sufixo(nome, '_legado'))}"))
+        conn.execute(text(f"ALTER TABLE {_ident(TABELA)} RENAME TO {_ident(TABELA_LEGADO)}"))
+        conn.execute(text(f"ALTER TABLE {_ident(TABELA_NOVA)} RENAME TO {_ident(TABELA)}"))
+        for nome in indices_antigos:
+            novo_nome = _nome_com_sufixo(nome, "_particionada")
+            if conn.execute(text("SELECT to_regclass(:nome)"), {"nome": novo_nome}).scalar():
+                conn.execute(text(f"ALTER INDEX {_ident(novo_nome)} RENAME TO {_ident(nome)}"))
+
+        # A sequência de ids passa a pertencer à tabela nova (não é removida junto com o legado)
+        sequencia = conn.execute(text("SELECT pg_get_serial_sequence(:tabela, 'id')"), {"tabela": TABELA_LEGADO}).scalar()
+        if sequencia:
+            conn.execute(text(f"ALTER SEQUENCE {sequencia} OWNED BY {_ident(TABELA)}.id"))
+
+        # As definições citam a tabela pelo nome, que agora é a particionada
+        for _, definicao in triggers:
+            conn.execute(text(definicao))
+        for grantee, privilegio in privilegios:
+            conn.execute(text(f"GRANT {privilegio} ON {_ident(TABELA)} TO {_ident(grantee)}"))
+
+    print(f"✅ alugueis agora é particionada por ano; {TABELA_LEGADO} pode ser removida após conferência")
+    return True
+
+
+def criar_particao(engine: Engine, ano: int) -> None:
+    """Cria a partição de um ano, movendo as linhas desse ano que estejam na partição padrão."""
+    nome = _nome_particao(ano)
+    with engine.begin() as conn:
+        if _tipo_tabela(conn, nome):
+            print(f"✅ Partição {nome} já existe")
+            return
+        conn.execute(text(f"LOCK TABLE {_ident(TABELA)} IN SHARE ROW EXCLUSIVE MODE"))
+        conn.execute(text(f"CREATE TABLE {_ident(nome)} (LIKE {_ident(TABELA)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        # Movimentação direta entre partições: os triggers de alugueis não disparam
+        movidos = conn.execute(text(f"""
+            WITH movidos AS (
+                DELETE FROM {_ident(PARTICAO_PADRAO)} WHERE {COLUNA_PARTICAO} = :ano RETURNING *
+            )
+            INSERT INTO {_ident(nome)} SELECT * FROM movidos
+        """), {"ano": ano}).rowcount
+        conn.execute(text(
+            f"ALTER TABLE {_ident(TABELA)} ATTACH PARTITION {_ident(nome)} "
+            f"FOR VALUES FROM ({int(ano)}) TO ({int(ano) + 1})"
+        ))
+    print(f"✅ Partição {nome} criada ({movidos} aluguéis movidos da partição padrão)")
+
+
+def arquivar(engine: Engine, ano: int, tablespace: str) -> None:
+    """Move a partição de um ano para outro tablespace (bloqueia apenas essa partição)."""
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {_ident(_nome_particao(ano))} SET TABLESPACE {_ident(tablespace)}"))
+    print(f"✅ Partição {_nome_particao(ano)} movida para o tablespace {tablespace}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Particionamento da tabela alugueis por ano")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comandos.add_parser("preparar")
+    copia = comandos.add_parser("copiar")
+    copia.add_argument("--ano", type=int)
+    comandos.add_parser("status")
+    comandos.add_parser("trocar")
+    particao = comandos.add_parser("criar-particao")
+    particao.add_argument("ano", type=int)
+    arquivo = comandos.add_parser("arquivar")
+    arquivo.add_argument("ano", type=int)
+    arquivo.add_argument("tablespace")
+    args = parser.parse_args(argv)
+
+    from config import engine
+    if engine.dialect.name != "postgresql":
+        print("❌ Particionamento disponível apenas no PostgreSQL")
+        return 1
+
+    if args.comando == "preparar":
+        preparar(engine)
+    elif args.comando == "copiar":
+        copiar(engine, args.ano)
+    elif args.comando == "status":
+        status(engine)
+    elif args.comando == "trocar":
+        return 0 if trocar(engine) else 1
+    elif args.comando == "criar-particao":
+        criar_particao(engine, args.ano)
+    elif args.comando == "arquivar":
+        arquivar(engine, args.ano, args.tablespace)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,20 @@
 # Correção: importar e definir router corretamente
 
-from config import get_db
+from config import get_db, get_db_read
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, Form
 from sqlalchemy.orm import Session
 import pandas as pd
 from typing import Optional
 from datetime import datetime
-from models_final import Imovel, Proprietario, AluguelSimples, Usuario
+from models_final import Imovel, Proprietario, AluguelSimples, Usuario, AluguelLoteRequest
 from sqlalchemy import asc, desc, func
+from sqlalchemy.exc import IntegrityError
 from .auth import verify_token_flexible
 import calendar
 # Assuming CalculoService is in this path
 from services.calculo_service import CalculoService
-from services.aluguel_service import AluguelService
+from services.aluguel_service import AluguelService, LIMITE_LOTE_ALUGUEIS
+from services.extrato_service import ExtratoService
 
 router = APIRouter(prefix="/api/alugueis", tags=["alugueis"])
 
@@ -36,7 +38,7 @@ async def listar_alugueis(
     imovel_id: Optional[int] = Query(None, description="Filtrar por ID do imóvel"),
     proprietario_id: Optional[int] = Query(None, description="Filtrar por ID do proprietário"),
     ordem: str = Query("desc", description="Ordem: 'asc' ou 'desc'"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_read),
     current_user: Usuario = Depends(verify_token_flexible)
 ):
     """Listar aluguéis com filtros e paginação"""
@@ -72,7 +74,7 @@ async def listar_alugueis(
         raise HTTPException(status_code=500, detail=f"Erro ao listar aluguéis: {str(e)}")
 
 @router.get("/obter/{aluguel_id}")
-async def obter_aluguel(aluguel_id: int, db: Session = Depends(get_db), current_user: Usuario = Depends(verify_token_flexible)):
+async def obter_aluguel(aluguel_id: int, db: Session = Depends(get_db_read), current_user: Usuario = Depends(verify_token_flexible)):
     """Obter um aluguel específico por ID"""
     try:
         aluguel = db.query(AluguelSimples).filter(AluguelSimples.id == aluguel_id).first()
@@ -102,45 +104,58 @@ async def criar_aluguel(
 ):
     """Criar um novo aluguel"""
     try:
-        # Verificar se já existe um aluguel para o mesmo imóvel/proprietário/ano/mês
-        aluguel_existente = db.query(AluguelSimples).filter(
-            AluguelSimples.ano == ano,
-            AluguelSimples.mes == mes,
-            AluguelSimples.imovel_id == imovel_id,
-            AluguelSimples.proprietario_id == proprietario_id
-        ).first()
-        
-        if aluguel_existente:
-            raise HTTPException(status_code=400, detail="Já existe um aluguel para este imóvel/proprietário neste período")
-        
         novo_aluguel = AluguelSimples(
             ano=ano,
             mes=mes,
             imovel_id=imovel_id,
             proprietario_id=proprietario_id,
-            taxa_administracao_total=taxa_administracao_total if 'taxa_administracao_total' in locals() else 0.0,
-            valor_liquido_proprietario=valor_liquido if 'valor_liquido' in locals() else 0.0
+            taxa_administracao_total=0.0,
+            valor_liquido_proprietario=valor
             # taxa_administracao_proprietario será calculado automáticamente por trigger
         )
         
+        # A restrição única do período garante a exclusividade, sem consulta prévia sujeita a corrida
         db.add(novo_aluguel)
         db.commit()
         db.refresh(novo_aluguel)
+        ExtratoService.invalidar([novo_aluguel.proprietario_id])
         
         return {"sucesso": True, "mensagem": "Aluguel criado com sucesso", "id": novo_aluguel.id}
         
+    except IntegrityError as e:
+        db.rollback()
+        status, motivo = AluguelService.motivo_violacao(db, e, {"imovel_id": imovel_id, "proprietario_id": proprietario_id})
+        raise HTTPException(status_code=status, detail=motivo)
     except HTTPException:
         raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Erro ao criar aluguel: {str(e)}")
 
+@router.post("/lote")
+async def upsert_alugueis_lote(
+    lote: AluguelLoteRequest,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(verify_token_flexible)
+):
+    """Inserir ou atualizar aluguéis em lote pela chave imóvel/proprietário/mês/ano"""
+    if len(lote.alugueis) > LIMITE_LOTE_ALUGUEIS:
+        raise HTTPException(status_code=413, detail=f"Lote excede o limite de {LIMITE_LOTE_ALUGUEIS} aluguéis")
+    try:
+        resultado = AluguelService.upsert_lote(db, lote.alugueis)
+        db.commit()
+        ExtratoService.invalidar()
+        return {"sucesso": True, **resultado}
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erro no upsert em lote de aluguéis: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao gravar lote de aluguéis: {str(e)}")
+
 @router.get("/anos-disponiveis/")
-async def obter_anos_disponiveis(db: Session = Depends(get_db), current_user: Usuario = Depends(verify_token_flexible)):
+async def obter_anos_disponiveis(db: Session = Depends(get_db_read), current_user: Usuario = Depends(verify_token_flexible)):
     """Obter lista de anos que têm dados de aluguéis"""
     try:
-        anos = db.query(AluguelSimples.ano).distinct().order_by(desc(AluguelSimples.ano)).all()
-        anos_lista = [ano[0] for ano in anos if ano[0] is not None]
+        anos_lista = AluguelService.anos_disponiveis(db)
         print(f"📅 Anos disponíveis em dados: {anos_lista}")
         return {"success": True, "data": {'anos': anos_lista, 'total': len(anos_lista)}}
     except Exception as e:
@@ -151,20 +166,14 @@ async def obter_anos_disponiveis(db: Session = Depends(get_db), current_user: Us
 async def obter_totais_por_imovel(
     ano: Optional[int] = Query(None, description="Filtrar por ano (por padrão último ano com dados)"),
     mes: Optional[int] = Query(None, ge=1, le=12, description="Filtrar por mês (por padrão último mês com dados)"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_read),
     current_user: Usuario = Depends(verify_token_flexible)
 ):
     """Obter totais de aluguéis por imóvel - OPTIMIZED"""
     try:
         # Se não se especifica ano/mês, obter o último período disponível
         if not ano or not mes:
-            ultimo_periodo = db.query(
-                AluguelSimples.ano, 
-                AluguelSimples.mes
-            ).order_by(
-                desc(AluguelSimples.ano), 
-                desc(AluguelSimples.mes)
-            ).first()
+            ultimo_periodo = AluguelService.ultimo_periodo(db)
             
             if not ultimo_periodo:
                 return {"success": True, "data": {
@@ -194,7 +203,7 @@ async def obter_totais_por_imovel(
 @router.get("/totais-por-mes/")
 async def obter_totais_por_mes(
     limite_meses: Optional[int] = Query(12, ge=1, le=24, description="Número de meses a incluir (máximo 24)"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_read),
     current_user: Usuario = Depends(verify_token_flexible)
 ):
     """Obter totais de aluguéis agrupados por mês - OPTIMIZED"""
@@ -215,7 +224,7 @@ async def obter_distribuicao_matriz(
     ano: int = Query(..., description="Ano para filtrar"),
     mes: int = Query(..., ge=1, le=12, description="Mês para filtrar"),
     proprietario_id: Optional[int] = Query(None, description="Filtrar por ID de proprietário específico"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_read),
     current_user: Usuario = Depends(verify_token_flexible)
 ):
     """Obter distribuição de aluguéis em formato matriz para um mês específico"""
@@ -306,7 +315,7 @@ async def obter_distribuicao_matriz(
         raise HTTPException(status_code=500, detail=f"Erro ao obter distribuição matriz: {str(e)}")
 
 @router.get("/aluguel/{aluguel_id}")
-async def obter_aluguel_por_id(aluguel_id: int, db: Session = Depends(get_db), current_user: Usuario = Depends(verify_token_flexible)):
+async def obter_aluguel_por_id(aluguel_id: int, db: Session = Depends(get_db_read), current_user: Usuario = Depends(verify_token_flexible)):
     """Obter um aluguel específico por ID"""
     aluguel = db.query(AluguelSimples).filter(AluguelSimples.id == aluguel_id).first()
     if not aluguel:
@@ -324,12 +333,17 @@ async def criar_aluguel_dict(aluguel_data: dict, db: Session = Depends(get_db),
         db.add(novo_aluguel)
         db.commit()
         db.refresh(novo_aluguel)
+        ExtratoService.invalidar([novo_aluguel.proprietario_id])
         
         return {
             "mensagem": "Aluguel criado com sucesso",
             "aluguel": novo_aluguel.to_dict()
         }
         
+    except IntegrityError as e:
+        db.rollback()
+        status, motivo = AluguelService.motivo_violacao(db, e, aluguel_data)
+        raise HTTPException(status_code=status, detail=motivo)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Erro ao criar aluguel: {str(e)}")
@@ -342,6 +356,8 @@ async def atualizar_aluguel(aluguel_id: int, aluguel_data: dict, db: Session = D
         if not aluguel:
             raise HTTPException(status_code=404, detail="Aluguel não encontrado")
         
+        proprietario_anterior = aluguel.proprietario_id
+        
         # Atualizar campos
         for campo, valor in aluguel_data.items():
             if hasattr(aluguel, campo):
@@ -349,6 +365,7 @@ async def atualizar_aluguel(aluguel_id: int, aluguel_data: dict, db: Session = D
         
         db.commit()
         db.refresh(aluguel)
+        ExtratoService.invalidar([proprietario_anterior, aluguel.proprietario_id])
         
         return {
             "mensagem": "Aluguel atualizado com sucesso",
@@ -369,6 +386,7 @@ async def excluir_aluguel(aluguel_id: int, db: Session = Depends(get_db), curren
         
         db.delete(aluguel)
         db.commit()
+        ExtratoService.invalidar([aluguel.proprietario_id])
         
         return {"mensagem": "Aluguel excluído com sucesso"}
         
@@ -381,6 +399,7 @@ async def recalcular_todas_as_taxas(db: Session = Depends(get_db), current_user:
     """Recalcula todas as taxas de administração por proprietário aplicando corretamente as participações"""
     try:
         resultado = CalculoService.recalcular_todas_as_taxas(db)
+        ExtratoService.invalidar()
         
         return {
             "mensagem": "Recálculo de taxas completado",
@@ -392,16 +411,10 @@ async def recalcular_todas_as_taxas(db: Session = Depends(get_db), current_user:
         raise HTTPException(status_code=500, detail=f"Erro ao recalcular taxas: {str(e)}")
 
 @router.get("/ultimo-periodo/")
-async def obter_ultimo_periodo(db: Session = Depends(get_db), current_user: Usuario = Depends(verify_token_flexible)):
+async def obter_ultimo_periodo(db: Session = Depends(get_db_read), current_user: Usuario = Depends(verify_token_flexible)):
     """Obter o último ano e mês disponível na base de dados"""
     try:
-        ultimo_periodo = db.query(
-            AluguelSimples.ano, 
-            AluguelSimples.mes
-        ).order_by(
-            desc(AluguelSimples.ano), 
-            desc(AluguelSimples.mes)
-        ).first()
+        ultimo_periodo = AluguelService.ultimo_periodo(db)
         
         if not ultimo_periodo:
             return {"success": True, "data": {"ano": None, "mes": None}}
@@ -420,7 +433,7 @@ async def obter_ultimo_periodo(db: Session = Depends(get_db), current_user: Usua
 @router.get("/distribuicao-todos-meses/")
 async def obter_distribuicao_todos_meses(
     ano: int = Query(..., description="Ano para obter soma de todos os meses"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_read),
     current_user: Usuario = Depends(verify_token_flexible)
 ):
     """Obter distribuição matriz de aluguéis com soma de todos os meses do ano especificado"""
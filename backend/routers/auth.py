@@ -11,9 +11,9 @@ from pydantic import BaseModel
 from datetime import datetime, timedelta
 from typing import Optional
 import jwt
-from passlib.context import CryptContext
 from config import get_db, SECRET_KEY, ENV, JWT_EXPIRATION_MINUTES
 from models_final import Usuario
+from utils.senhas import FilaHashCheia, gerar_hash_senha, verificar_senha
 
 router = APIRouter(prefix="/api/auth", tags=["authentication"])
 security = HTTPBearer()
@@ -21,10 +21,8 @@ security = HTTPBearer()
 # CSRF protection
 # csrf_protect = CsrfProtect()
 
-# Importar rate limiter
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-limiter = Limiter(key_func=get_remote_address)
+# Importar rate limiter (mesma instância registrada em main.py)
+from utils.limite_taxa import limiter
 
 @router.get("/setup-status")
 async def get_setup_status(db: Session = Depends(get_db)):
@@ -43,8 +41,6 @@ async def get_setup_status(db: Session = Depends(get_db)):
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = JWT_EXPIRATION_MINUTES  # Usando configuração do ambiente
 
-# Configuração Passlib
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 class LoginRequest(BaseModel):
     usuario: str
@@ -59,13 +55,20 @@ class UserResponse(BaseModel):
 class TokenData(BaseModel):
     usuario: Optional[str] = None
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifica a senha usando o contexto do passlib"""
-    return pwd_context.verify(plain_password, hashed_password)
+def _pool_senhas_ocupado() -> HTTPException:
+    """Resposta 503 quando a fila do pool de bcrypt está cheia"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Servidor ocupado, tente novamente em instantes",
+        headers={"Retry-After": "1"},
+    )
 
-def get_password_hash(password: str) -> str:
-    """Gera o hash da senha usando o contexto do passlib"""
-    return pwd_context.hash(password)
+async def hash_senha_async(password: str) -> str:
+    """Gera o hash da senha no pool de bcrypt, sem bloquear o event loop"""
+    try:
+        return await gerar_hash_senha(password)
+    except FilaHashCheia:
+        raise _pool_senhas_ocupado()
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Cria token JWT"""
@@ -179,11 +182,23 @@ async def login(request: Request, response: Response, login_data: LoginRequest,
     """
     usuario = db.query(Usuario).filter(Usuario.usuario == login_data.usuario).first()
     
-    if not usuario or not verify_password(login_data.senha, usuario.senha):
+    senha_valida, novo_hash = False, None
+    if usuario:
+        try:
+            senha_valida, novo_hash = await verificar_senha(login_data.senha, usuario.senha)
+        except FilaHashCheia:
+            raise _pool_senhas_ocupado()
+
+    if not senha_valida:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuário ou senha inválidos"
         )
+
+    # Hash gravado com outro custo do bcrypt: substitui pelo custo atual
+    if novo_hash:
+        usuario.senha = novo_hash
+        db.commit()
     
     access_token = create_access_token(
         data={"sub": usuario.usuario, "tipo": usuario.tipo_de_usuario},
@@ -261,7 +276,7 @@ async def create_initial_admin(db: Session = Depends(get_db)):
     alphabet = string.ascii_letters + string.digits + string.punctuation
     password = ''.join(secrets.choice(alphabet) for i in range(16))
     
-    hashed_password = get_password_hash(password)
+    hashed_password = await hash_senha_async(password)
     
     novo_admin = Usuario(
         usuario="admin",
@@ -319,7 +334,7 @@ async def cadastrar_usuario(
         )
     
     # Criar novo usuário com senha hasheada
-    hashed_password = get_password_hash(request.senha)
+    hashed_password = await hash_senha_async(request.senha)
     novo_usuario = Usuario(
         usuario=request.usuario,
         senha=hashed_password,
@@ -376,7 +391,7 @@ async def alterar_usuario(
     
     # Atualizar dados
     if request.nova_senha:
-        usuario.senha = get_password_hash(request.nova_senha)
+        usuario.senha = await hash_senha_async(request.nova_senha)
     
     if request.novo_tipo_usuario:
         usuario.tipo_de_usuario = request.novo_tipo_usuario
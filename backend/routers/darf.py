@@ -4,13 +4,16 @@ Router para gerenciamento de DARF
 """
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, func
+from sqlalchemy import and_, func, select
 from typing import List
 from datetime import datetime, date
 
-from config import get_db
+from config import get_db, get_db_read
 from models_final import Darf, Proprietario, DarfCreate, DarfUpdate, DarfResponse, DarfImportacao
 from routers.auth import verify_token
+from services.carne_leao_service import CarneLeaoService
+from services.extrato_service import ExtratoService
+from utils.serializacao import RespostaJSONRapida, como_float, como_texto, projetar
 
 router = APIRouter(prefix="/api/darf", tags=["darf"])
 
@@ -25,15 +28,24 @@ async def listar_darfs(
     proprietario_id: int = None,
     ano: int = None,
     mes: int = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_read),
     current_user: dict = Depends(verify_token)
 ):
     """Listar DARFs com filtros opcionais"""
-    query = db.query(Darf).options(joinedload(Darf.proprietario))
+    # Projeção com os campos de DarfResponse, sem hidratar entidades
+    query = select(
+        Darf.id,
+        como_texto(Darf.uuid),
+        Darf.proprietario_id,
+        func.trim(Proprietario.nome + ' ' + func.coalesce(Proprietario.sobrenome, '')).label("nome_proprietario"),
+        Darf.data,
+        como_float(Darf.valor_darf, padrao=0.0),
+        Darf.data_cadastro
+    ).outerjoin(Proprietario, Proprietario.id == Darf.proprietario_id)
     
     # Filtros
     if proprietario_id:
-        query = query.filter(Darf.proprietario_id == proprietario_id)
+        query = query.where(Darf.proprietario_id == proprietario_id)
     
     if ano and mes:
         data_inicio = date(ano, mes, 1)
@@ -42,20 +54,19 @@ async def listar_darfs(
             data_fim = date(ano + 1, 1, 1)
         else:
             data_fim = date(ano, mes + 1, 1)
-        query = query.filter(and_(
+        query = query.where(and_(
             Darf.data >= data_inicio,
             Darf.data < data_fim
         ))
     elif ano:
-        query = query.filter(func.extract('year', Darf.data) == ano)
+        query = query.where(func.extract('year', Darf.data) == ano)
     elif mes:
-        query = query.filter(func.extract('month', Darf.data) == mes)
+        query = query.where(func.extract('month', Darf.data) == mes)
     
     # Ordenar por data decrescente
     query = query.order_by(Darf.data.desc())
     
-    darfs = query.offset(skip).limit(limit).all()
-    return [DarfResponse(**darf.to_dict()) for darf in darfs]
+    return RespostaJSONRapida(projetar(db, query.offset(skip).limit(limit)))
 
 
 @router.get("/relatorios")
@@ -63,7 +74,7 @@ async def obter_relatorio_darfs(
     ano: int = None,
     mes: int = None,
     proprietario_id: int = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_read),
     current_user: dict = Depends(verify_token)
 ):
     """
@@ -123,7 +134,7 @@ async def obter_relatorio_darfs(
 @router.get("/{darf_id}", response_model=DarfResponse)
 async def obter_darf(
     darf_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_read),
     current_user: dict = Depends(verify_token)
 ):
     """Obter detalhes de um DARF específico"""
@@ -172,6 +183,7 @@ async def criar_darf(
     db.add(novo_darf)
     db.commit()
     db.refresh(novo_darf)
+    ExtratoService.invalidar([novo_darf.proprietario_id])
     
     return DarfResponse(**novo_darf.to_dict())
 
@@ -193,12 +205,14 @@ async def atualizar_darf(
         )
     
     # Atualizar apenas campos fornecidos
+    proprietario_anterior = darf.proprietario_id
     update_data = darf_data.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(darf, key, value)
     
     db.commit()
     db.refresh(darf)
+    ExtratoService.invalidar([proprietario_anterior, darf.proprietario_id])
     
     return DarfResponse(**darf.to_dict())
 
@@ -220,6 +234,7 @@ async def excluir_darf(
     
     db.delete(darf)
     db.commit()
+    ExtratoService.invalidar([darf.proprietario_id])
     
     return None
 
@@ -321,6 +336,7 @@ async def importar_multiplos_darfs(
             # Rollback da transação em caso de erro
             db.rollback()
     
+    ExtratoService.invalidar()
     return resultados
 
 
@@ -331,7 +347,7 @@ async def importar_multiplos_darfs(
 @router.get("/estatisticas/total-por-mes")
 async def total_darfs_por_mes(
     ano: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_read),
     current_user: dict = Depends(verify_token)
 ):
     """Obter total de DARFs por mês em um ano específico"""
@@ -351,7 +367,7 @@ async def total_darfs_por_mes(
 async def total_darfs_por_proprietario(
     ano: int = None,
     mes: int = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_read),
     current_user: dict = Depends(verify_token)
 ):
     """Obter total de DARFs por proprietário"""
@@ -390,3 +406,66 @@ async def total_darfs_por_proprietario(
         "total": float(r.total) if r.total else 0,
         "quantidade": r.quantidade
     } for r in resultados]
+
+
+# ============================================
+# CARNÊ-LEÃO
+# ============================================
+
+@router.get("/carne-leao/{ano}")
+async def calcular_carne_leao(
+    ano: int,
+    proprietario_id: int = None,
+    db: Session = Depends(get_db_read),
+    current_user: dict = Depends(verify_token)
+):
+    """
+    Estimar o carnê-leão mensal de todos os proprietários no ano
+    Retorna base de cálculo, imposto do mês e valor a recolher por mês
+    """
+    calculo = CarneLeaoService.calcular_ano(
+        db, ano, [proprietario_id] if proprietario_id else None
+    )
+    
+    return {
+        "ano": ano,
+        "versoes_tabela": calculo["versoes_tabela"],
+        "proprietarios": [{
+            "proprietario_id": int(pid),
+            "bases": calculo["bases"][i].round(2).tolist(),
+            "imposto": calculo["imposto"][i].tolist(),
+            "a_recolher": calculo["a_recolher"][i].tolist(),
+            "saldo_anterior": float(calculo["saldo_anterior"][i]),
+            "total_a_recolher": round(float(calculo["a_recolher"][i].sum()), 2)
+        } for i, pid in enumerate(calculo["proprietario_ids"])]
+    }
+
+
+@router.post("/carne-leao/{ano}/propostas")
+async def propor_darfs_carne_leao(
+    ano: int,
+    mes: int = None,
+    persistir: bool = False,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(verify_token)
+):
+    """
+    Propor DARFs a partir do carnê-leão calculado
+    Com persistir=true grava as propostas que ainda não têm DARF na mesma competência
+    """
+    if mes is not None and not 1 <= mes <= 12:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Mês deve estar entre 1 e 12"
+        )
+    
+    propostas = CarneLeaoService.propor_darfs(db, ano, mes, persistir)
+    if persistir:
+        ExtratoService.invalidar()
+    
+    return {
+        "total": len(propostas),
+        "criados": sum(1 for p in propostas if p["status"] == "criado"),
+        "existentes": sum(1 for p in propostas if p["status"] == "existente"),
+        "propostas": propostas
+    }
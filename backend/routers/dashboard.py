@@ -2,40 +2,37 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from sqlalchemy import func, extract, String
 from datetime import datetime, timedelta
-from models_final import Proprietario, Imovel, AluguelSimples, Usuario
-from config import get_db
+from models_final import Proprietario, Imovel, Usuario
+from config import get_db_read
+from services.aluguel_service import AluguelService
 from .auth import verify_token_flexible
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
 @router.get("/summary")
-def get_dashboard_summary(db: Session = Depends(get_db), current_user: Usuario = Depends(verify_token_flexible)):
+def get_dashboard_summary(db: Session = Depends(get_db_read), current_user: Usuario = Depends(verify_token_flexible)):
     """Retorna um resumo de dados agregados para o dashboard."""
     
     # 1. Contagens totais
     total_proprietarios = db.query(func.count(Proprietario.id)).scalar()
     total_imoveis = db.query(func.count(Imovel.id)).scalar()
 
-    # 2. Valor total de aluguéis no ano corrente
+    # 2. Valor total de aluguéis no ano corrente (totais vêm do catálogo de períodos)
     current_year = datetime.now().year
-    total_alugueis_ano_corrente = db.query(func.sum(AluguelSimples.valor_liquido_proprietario)) \
-        .filter(AluguelSimples.ano == current_year) \
-        .scalar() or 0
+    periodos = AluguelService.listar_periodos(db)
+    totais_periodo = {(p.ano, p.mes): p.total_valor_liquido for p in periodos}
+    total_alugueis_ano_corrente = sum(
+        (total for (ano, _), total in totais_periodo.items() if ano == current_year), 0
+    )
 
     # 3. Receitas do último mês com dados
-    last_month_data = db.query(AluguelSimples.ano, AluguelSimples.mes) \
-        .order_by(AluguelSimples.ano.desc(), AluguelSimples.mes.desc()) \
-        .first()
-    
     receitas_ultimo_mes = 0
     receitas_mes_anterior = 0
     variacao_percentual = 0
     
-    if last_month_data:
-        last_year, last_month = last_month_data
-        receitas_ultimo_mes = db.query(func.sum(AluguelSimples.valor_liquido_proprietario)) \
-            .filter(AluguelSimples.ano == last_year, AluguelSimples.mes == last_month) \
-            .scalar() or 0
+    if periodos:
+        last_year, last_month = periodos[0].ano, periodos[0].mes
+        receitas_ultimo_mes = totais_periodo[(last_year, last_month)] or 0
         
         # Calcular mês anterior
         if last_month == 1:
@@ -45,9 +42,7 @@ def get_dashboard_summary(db: Session = Depends(get_db), current_user: Usuario =
             prev_month = last_month - 1
             prev_year = last_year
         
-        receitas_mes_anterior = db.query(func.sum(AluguelSimples.valor_liquido_proprietario)) \
-            .filter(AluguelSimples.ano == prev_year, AluguelSimples.mes == prev_month) \
-            .scalar() or 0
+        receitas_mes_anterior = totais_periodo.get((prev_year, prev_month)) or 0
         
         # Calcular variação percentual
         if receitas_mes_anterior > 0:
@@ -55,13 +50,8 @@ def get_dashboard_summary(db: Session = Depends(get_db), current_user: Usuario =
         elif receitas_ultimo_mes > 0:
             variacao_percentual = 100  # 100% de aumento quando anterior era 0
 
-    # 4. Dados para o gráfico de receitas (últimos 12 meses)
-    twelve_months_ago = datetime.now() - timedelta(days=365)
-    income_data = db.query(
-            AluguelSimples.ano,
-            AluguelSimples.mes,
-            func.sum(AluguelSimples.valor_liquido_proprietario)
-        ).group_by(AluguelSimples.ano, AluguelSimples.mes).order_by(AluguelSimples.ano, AluguelSimples.mes).all()
+    # 4. Dados para o gráfico de receitas (períodos em ordem cronológica)
+    income_data = [(p.ano, p.mes, p.total_valor_liquido) for p in reversed(periodos)]
 
     chart_labels = []
     chart_values = []
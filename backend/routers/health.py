@@ -8,6 +8,7 @@ import psutil
 import time
 from datetime import datetime
 from sqlalchemy import text
+from utils.senhas import pool_senhas
 
 router = APIRouter(prefix="/api/health", tags=["health"])
 
@@ -43,6 +44,7 @@ async def detailed_health(db: Session = Depends(get_db)):
             "cpu_count": psutil.cpu_count(),
             "cpu_percent": psutil.cpu_percent(interval=1)
         },
+        "password_hash_pool": pool_senhas.metricas(),
         "timestamp": datetime.utcnow().isoformat() + "Z"
     }
 
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from sqlalchemy.orm import Session
-from typing import List, Dict
+from typing import List, Dict, Optional
 from models_final import Usuario
-from config import get_db
+from config import get_db, get_db_read
 from .auth import verify_token_flexible
 from services.imovel_service import ImovelService
+from services.analise_imoveis_service import AnaliseImoveisService, METRICAS_RANKING
+from utils.serializacao import RespostaJSONRapida
 
 router = APIRouter(prefix="/api/imoveis", tags=["imoveis"])
 
@@ -12,16 +14,58 @@ router = APIRouter(prefix="/api/imoveis", tags=["imoveis"])
 def listar_imoveis(db: Session = Depends(get_db), current_user: Usuario = Depends(verify_token_flexible)):
     """
     Lista todos os imóveis em ordem alfabética.
-    Utiliza ImovelService para centralizar lógica de negócio.
+    Utiliza ImovelService.listar_linhas() (projeção de colunas serializada com orjson).
     """
     try:
-        imoveis = ImovelService.listar_todos(db, ordenar_por="nome")
-        return {"success": True, "data": [imovel.to_dict() for imovel in imoveis]}
+        return RespostaJSONRapida({"success": True, "data": ImovelService.listar_linhas(db)})
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar imóveis: {str(e)}")
 
+@router.get("/estatisticas")
+def estatisticas_imoveis(
+    pular: int = Query(0, ge=0, description="Imóveis a pular, em ordem de nome"),
+    limite: Optional[int] = Query(None, ge=1, le=1000, description="Tamanho da página (vazio = todos)"),
+    usar_cache: bool = Query(True, description="Usar a versão em cache, descartada a cada escrita"),
+    db: Session = Depends(get_db_read),
+    current_user: Usuario = Depends(verify_token_flexible)
+):
+    """
+    Estatísticas de todos os imóveis (ou de uma página) em uma única consulta.
+    Utiliza ImovelService.estatisticas_lote() ou sua versão em cache.
+    """
+    try:
+        if usar_cache:
+            estatisticas = ImovelService.estatisticas_lote_em_cache(db, pular=pular, limite=limite)
+        else:
+            estatisticas = ImovelService.estatisticas_lote(db, pular=pular, limite=limite)
+        return {"success": True, "data": estatisticas}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao obter estatísticas dos imóveis: {str(e)}")
+
+@router.get("/ranking")
+def ranking_imoveis(
+    metrica: str = Query("rendimento_liquido", description=f"Uma de: {', '.join(METRICAS_RANKING)}"),
+    decrescente: bool = Query(True, description="Maiores valores primeiro"),
+    limite: int = Query(20, ge=1, le=1000),
+    db: Session = Depends(get_db_read),
+    current_user: Usuario = Depends(verify_token_flexible)
+):
+    """
+    Ranking de desempenho dos imóveis (rendimento, vacância, tendência, crescimento anual).
+    Lê a análise em cache de AnaliseImoveisService, recalculada após escritas.
+    """
+    try:
+        ranking = AnaliseImoveisService.ranking(db, metrica=metrica, decrescente=decrescente, limite=limite)
+        return {"success": True, "metrica": metrica, "data": ranking}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao gerar ranking de imóveis: {str(e)}")
+
 @router.get("/{imovel_id}")
 def obter_imovel(imovel_id: int, db: Session = Depends(get_db), current_user: Usuario = Depends(verify_token_flexible)):
     """
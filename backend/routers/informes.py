@@ -0,0 +1,128 @@
+"""
+Router para informes de rendimentos anuais dos proprietários
+"""
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from config import get_db
+from models_final import Usuario
+from services.informe_rendimentos_service import InformeRendimentosService, FORMATOS_SUPORTADOS, GeracaoEmAndamento
+from .auth import verify_token_flexible, is_admin
+
+router = APIRouter(prefix="/api/informes", tags=["informes"])
+
+MEDIA_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/pdf",
+}
+
+
+@router.post("/{ano}/gerar")
+def gerar_informes(
+    ano: int,
+    background_tasks: BackgroundTasks,
+    formatos: Optional[str] = None,
+    reprocessar: bool = False,
+    max_workers: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(is_admin)
+):
+    """
+    Gera em lote os informes de rendimentos de todos os proprietários.
+
+    A agregação é feita na requisição; a renderização roda em segundo plano
+    e retoma de onde parou caso uma execução anterior tenha sido interrompida.
+    Sem `formatos`, gera todos os disponíveis no servidor (pdf exige reportlab).
+    """
+    lista_formatos = [f.strip().lower() for f in (formatos or "").split(",") if f.strip()]
+    # A trava cobre a preparação e a renderização; é liberada ao fim da tarefa de fundo
+    try:
+        trava = InformeRendimentosService.travar_ano(ano)
+    except GeracaoEmAndamento:
+        raise HTTPException(status_code=409, detail=f"Geração de informes de {ano} já está em andamento")
+
+    try:
+        lote = InformeRendimentosService.preparar_lote(db, ano, lista_formatos, reprocessar)
+    except ValueError as e:
+        trava.liberar()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        trava.liberar()
+        print(f"❌ Erro ao preparar informes de {ano}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao preparar informes: {str(e)}")
+
+    pendentes = lote["pendentes"]
+    manifesto = lote["manifesto"]
+    lista_formatos = manifesto["formatos"]
+    if pendentes:
+        background_tasks.add_task(
+            InformeRendimentosService.renderizar_lote,
+            ano, pendentes, lista_formatos, max_workers, trava
+        )
+    else:
+        trava.liberar()
+
+    return {
+        "success": True,
+        "data": {
+            "ano": ano,
+            "total": manifesto["total"],
+            "ja_gerados": manifesto["total"] - len(pendentes),
+            "pendentes": len(pendentes),
+            "formatos": lista_formatos,
+        }
+    }
+
+
+@router.get("/{ano}/progresso")
+def progresso_informes(
+    ano: int,
+    current_user: Usuario = Depends(is_admin)
+):
+    """Consulta o progresso da geração de informes do ano."""
+    manifesto = InformeRendimentosService.carregar_manifesto(ano)
+    avisos = {
+        proprietario_id: concluido["avisos"]
+        for proprietario_id, concluido in manifesto.get("concluidos", {}).items()
+        if concluido.get("avisos")
+    }
+    return {
+        "success": True,
+        "data": {
+            "ano": ano,
+            "status": manifesto.get("status"),
+            "total": manifesto.get("total", 0),
+            "concluidos": len(manifesto.get("concluidos", {})),
+            "erros": manifesto.get("erros", {}),
+            "avisos": avisos,
+            "atualizado_em": manifesto.get("atualizado_em"),
+        }
+    }
+
+
+@router.get("/{ano}/{proprietario_id}")
+def baixar_informe(
+    ano: int,
+    proprietario_id: int,
+    formato: str = "xlsx",
+    current_user: Usuario = Depends(verify_token_flexible)
+):
+    """Baixa o informe pré-calculado de um proprietário."""
+    formato = formato.lower()
+    if formato not in FORMATOS_SUPORTADOS:
+        raise HTTPException(status_code=400, detail=f"Formato não suportado: {formato}")
+    if formato not in InformeRendimentosService.formatos_disponiveis():
+        raise HTTPException(status_code=400, detail=f"Formato indisponível neste servidor: {formato}")
+
+    caminho = InformeRendimentosService.caminho_informe(ano, proprietario_id, formato)
+    if not caminho:
+        raise HTTPException(status_code=404, detail="Informe não encontrado. Gere os informes do ano primeiro.")
+
+    return FileResponse(
+        caminho,
+        media_type=MEDIA_TYPES[formato],
+        filename=f"informe_rendimentos_{ano}_{proprietario_id}.{formato}"
+    )
@@ -10,6 +10,7 @@ from models_final import Participacao, Proprietario, Imovel, Usuario, HistoricoP
 from config import get_db
 from .auth import verify_token_flexible, is_admin
 from services.participacao_service import ParticipacaoService
+from utils.serializacao import RespostaJSONRapida
 
 router = APIRouter(prefix="/api/participacoes", tags=["participacoes"])
 
@@ -27,19 +28,11 @@ def listar_datas_participacoes(db: Session = Depends(get_db), current_user: Usua
 def listar_participacoes(data_registro: str = None, db: Session = Depends(get_db), current_user: Usuario = Depends(verify_token_flexible)):
     """Lista participações do conjunto mais recente ou de uma data específica - OPTIMIZED"""
     try:
-        # Se data_registro é "ativo" ou vazio, buscar a versão mais recente
+        # Se data_registro é "ativo" ou vazio, usar a versão vigente (ponteiro)
         if not data_registro or data_registro == "ativo":
-            # Buscar conjunto mais recente com eager loading
-            subquery = db.query(Participacao.data_registro).order_by(
-                Participacao.data_registro.desc()
-            ).limit(1).subquery()
-            
-            query = db.query(Participacao).options(
-                joinedload(Participacao.imovel),
-                joinedload(Participacao.proprietario)
-            ).filter(
-                Participacao.data_registro == subquery
-            )
+            dt = ParticipacaoService.versao_atual(db)
+            if dt is None:
+                return RespostaJSONRapida({"success": True, "data": []})
         else:
             # Filtrar por timestamp EXACTO
             from dateutil import parser
@@ -47,16 +40,8 @@ def listar_participacoes(data_registro: str = None, db: Session = Depends(get_db
                 dt = parser.isoparse(data_registro)
             except Exception:
                 raise HTTPException(status_code=400, detail=f"Formato de data_registro inválido: {data_registro}")
-            
-            query = db.query(Participacao).options(
-                joinedload(Participacao.imovel),
-                joinedload(Participacao.proprietario)
-            ).filter(
-                Participacao.data_registro == dt
-            )
         
-        participacoes = query.all()
-        return {"success": True, "data": [p.to_dict() for p in participacoes]}
+        return RespostaJSONRapida({"success": True, "data": ParticipacaoService.listar_versao(db, dt)})
         
     except HTTPException:
         raise
@@ -82,11 +67,11 @@ def criar_participacao(dados: Dict, db: Session = Depends(get_db), current_user:
             raise HTTPException(status_code=404, detail="Proprietário não encontrado.")
 
         # Obter o conjunto mais recente de participações global
-        subquery = db.query(Participacao.data_registro).order_by(Participacao.data_registro.desc()).limit(1).subquery()
-        participacoes_atuais = db.query(Participacao).filter(Participacao.data_registro == subquery).all()
+        versao_atual = ParticipacaoService.versao_atual(db)
+        participacoes_atuais = db.query(Participacao).filter(Participacao.data_registro == versao_atual).all()
 
         # Criar novo conjunto, copiando todas as participações atuais, substituindo/adicionando a nova
-        data_registro_novo = datetime.now()
+        data_registro_novo = ParticipacaoService.reservar_versao(db, getattr(current_user, "id", None))
         novas_participacoes = []
         
         for p in participacoes_atuais:
@@ -153,11 +138,11 @@ def atualizar_participacao(participacao_id: int, dados: Dict, db: Session = Depe
             raise HTTPException(status_code=404, detail="Participação não encontrada")
 
         # Obter o conjunto mais recente de participações global
-        subquery = db.query(Participacao.data_registro).order_by(Participacao.data_registro.desc()).limit(1).subquery()
-        participacoes_atuais = db.query(Participacao).filter(Participacao.data_registro == subquery).all()
+        versao_atual = ParticipacaoService.versao_atual(db)
+        participacoes_atuais = db.query(Participacao).filter(Participacao.data_registro == versao_atual).all()
 
         # Criar novo conjunto, copiando todas as participações atuais, substituindo a editada
-        data_registro_novo = datetime.now()
+        data_registro_novo = ParticipacaoService.reservar_versao(db, getattr(current_user, "id", None))
         novas_participacoes = []
         participacao_editada_ref = None
         
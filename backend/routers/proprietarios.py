@@ -1,14 +1,16 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import pandas as pd
 import traceback
 import io
 from models_final import Proprietario, Usuario, ProprietarioUpdateSchema, ProprietarioCreateSchema
-from config import get_db
+from config import get_db, get_db_read
 from .auth import verify_token_flexible, is_admin
 from services.proprietario_service import ProprietarioService
+from services.extrato_service import ExtratoService, LIMITE_PADRAO_EXTRATO, LIMITE_MAXIMO_EXTRATO
+from utils.serializacao import RespostaJSONRapida
 
 router = APIRouter(prefix="/api/proprietarios", tags=["proprietarios"])
 
@@ -23,8 +25,7 @@ MAX_FILE_SIZE = 10 * 1024 * 1024
 def listar_proprietarios(db: Session = Depends(get_db), current_user: Usuario = Depends(verify_token_flexible)):
     """Lista todos os proprietários em ordem alfabética - OPTIMIZED"""
     try:
-        proprietarios = ProprietarioService.listar_todos(db=db, ordem="nome")
-        return [p.to_dict() for p in proprietarios]
+        return RespostaJSONRapida(ProprietarioService.listar_linhas(db=db))
     except Exception as e:
         print(f"❌ Erro ao listar proprietários: {str(e)}")
         traceback.print_exc()
@@ -55,6 +56,23 @@ def criar_proprietario(dados: ProprietarioCreateSchema, db: Session = Depends(ge
         db.rollback()
         raise HTTPException(status_code=500, detail="Erro interno ao criar proprietário")
 
+@router.get("/estatisticas", response_model=List[Dict])
+def estatisticas_proprietarios(
+    pular: int = Query(0, ge=0, description="Proprietários a pular, em ordem de nome"),
+    limite: Optional[int] = Query(None, ge=1, le=1000, description="Tamanho da página (vazio = todos)"),
+    usar_cache: bool = Query(True, description="Usar a versão em cache, descartada a cada escrita"),
+    db: Session = Depends(get_db_read),
+    current_user: Usuario = Depends(verify_token_flexible)
+):
+    """Estatísticas de todos os proprietários (ou de uma página) em uma única consulta"""
+    try:
+        if usar_cache:
+            return ProprietarioService.estatisticas_lote_em_cache(db=db, pular=pular, limite=limite)
+        return ProprietarioService.estatisticas_lote(db=db, pular=pular, limite=limite)
+    except Exception as e:
+        print(f"❌ Erro ao obter estatísticas dos proprietários: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erro ao obter estatísticas dos proprietários")
+
 @router.get("/{proprietario_id}", response_model=Dict)
 def obter_proprietario(proprietario_id: int, db: Session = Depends(get_db), current_user: Usuario = Depends(verify_token_flexible)):
     """Obtém um proprietário específico pelo seu ID - OPTIMIZED"""
@@ -76,6 +94,27 @@ def obter_proprietario(proprietario_id: int, db: Session = Depends(get_db), curr
         print(f"❌ Erro ao obter proprietário: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao obter proprietário")
 
+@router.get("/{proprietario_id}/extrato", response_model=Dict)
+def obter_extrato_proprietario(
+    proprietario_id: int,
+    apos: Optional[str] = Query(None, description="Cursor AAAA-MM: retorna os meses posteriores"),
+    limite: int = Query(LIMITE_PADRAO_EXTRATO, ge=1, le=LIMITE_MAXIMO_EXTRATO, description="Meses por página"),
+    db: Session = Depends(get_db_read),
+    current_user: Usuario = Depends(verify_token_flexible)
+):
+    """Extrato mensal do proprietário: aluguel, taxa, DARF, transferências e saldos"""
+    try:
+        if not db.get(Proprietario, proprietario_id):
+            raise HTTPException(status_code=404, detail="Proprietário não encontrado")
+        return ExtratoService.gerar_extrato(db=db, proprietario_id=proprietario_id, apos=apos, limite=limite)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"❌ Erro ao gerar extrato do proprietário: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erro ao gerar extrato do proprietário")
+
 @router.put("/{proprietario_id}", response_model=Dict)
 def atualizar_proprietario(
     proprietario_id: int,
@@ -129,6 +168,7 @@ def excluir_proprietario(
                 raise HTTPException(status_code=400, detail=erro)
             raise HTTPException(status_code=400, detail=erro)
         
+        ExtratoService.invalidar([proprietario_id])
         return {"success": True, "mensagem": "Proprietário excluído com sucesso"}
         
     except HTTPException:
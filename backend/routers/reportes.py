@@ -7,8 +7,9 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func
 from pydantic import BaseModel
 
-from config import get_db
+from config import get_db_read
 from models_final import *
+from services.aluguel_service import AluguelService
 from .auth import verify_token_flexible
 
 router = APIRouter(prefix="/api/reportes", tags=["reportes"])
@@ -40,17 +41,14 @@ async def get_reportes_info():
 
 @router.get("/anos-disponiveis")
 async def get_anos_disponiveis(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_read),
     current_user: Usuario = Depends(verify_token_flexible)
 ):
     """
     Obtém lista de anos disponíveis nos dados
     """
     try:
-        anos = db.query(func.distinct(AluguelSimples.ano))\
-                .order_by(AluguelSimples.ano.desc()).all()
-        
-        return [ano[0] for ano in anos if ano[0] is not None]
+        return AluguelService.anos_disponiveis(db)
 
     except Exception as e:
         print(f"Erro ao obter anos disponíveis: {str(e)}")
@@ -58,21 +56,15 @@ async def get_anos_disponiveis(
 
 @router.get("/ultimo-periodo")
 async def get_ultimo_periodo(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_read),
     current_user: Usuario = Depends(verify_token_flexible)
 ):
     """
     Obtém o último ano e mês disponível nos dados
     """
     try:
-        # Obter o último ano e mês disponível
-        result = db.query(
-            AluguelSimples.ano,
-            AluguelSimples.mes
-        ).order_by(
-            AluguelSimples.ano.desc(),
-            AluguelSimples.mes.desc()
-        ).first()
+        # Obter o último ano e mês disponível (catálogo de períodos)
+        result = AluguelService.ultimo_periodo(db)
         
         if result:
             return {
@@ -98,7 +90,7 @@ async def get_resumen_mensual(
     ano: Optional[int] = None,
     proprietario_id: Optional[int] = None,
     nome_proprietario: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_read),
     current_user: Usuario = Depends(verify_token_flexible)
 ):
     """
@@ -5,13 +5,15 @@ import json
 from datetime import datetime
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import desc, select
 
 from config import get_db
-from models_final import Transferencia, TransferenciaCreate, TransferenciaUpdate, TransferenciaResponse, Alias
+from models_final import Transferencia, TransferenciaCreate, TransferenciaUpdate, TransferenciaResponse, Alias, Proprietario
 from routers.auth import is_admin, is_user_or_admin
 from utils.transfer_validation import TransferenciaValidator, TransferValidationError
+from services.extrato_service import ExtratoService
+from utils.serializacao import RespostaJSONRapida, como_float, como_texto, projetar
 
 router = APIRouter(
     prefix="/api/transferencias",
@@ -19,14 +21,41 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+
+def _listar_transferencias(db: Session) -> List[dict]:
+    """Transferências mais recentes primeiro, projetadas nas chaves de Transferencia.to_dict"""
+    origem = aliased(Proprietario)
+    destino = aliased(Proprietario)
+    consulta = select(
+        Transferencia.id,
+        como_texto(Transferencia.uuid),
+        Transferencia.alias_id,
+        Alias.alias,
+        Transferencia.nome_transferencia,
+        como_float(Transferencia.valor_total, padrao=0.0),
+        Transferencia.id_proprietarios,
+        Transferencia.origem_id_proprietario,
+        Transferencia.destino_id_proprietario,
+        origem.nome.label("proprietario_origem"),
+        destino.nome.label("proprietario_destino"),
+        Transferencia.data_criacao,
+        Transferencia.data_fim
+    ).outerjoin(
+        Alias, Alias.id == Transferencia.alias_id
+    ).outerjoin(
+        origem, origem.id == Transferencia.origem_id_proprietario
+    ).outerjoin(
+        destino, destino.id == Transferencia.destino_id_proprietario
+    ).order_by(desc(Transferencia.id))
+    return projetar(db, consulta)
+
 @router.get("/", response_model=List[TransferenciaResponse])
 def listar_transferencias(db: Session = Depends(get_db), current_user = Depends(is_admin)):
     """
     Listar todas as transferências ativas (apenas administradores)
     """
     try:
-        transferencias = db.query(Transferencia).order_by(desc(Transferencia.id)).all()
-        return [transferencia.to_dict() for transferencia in transferencias]
+        return RespostaJSONRapida(_listar_transferencias(db))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -39,8 +68,7 @@ def consultar_transferencias(db: Session = Depends(get_db), current_user = Depen
     Consultar transferências para relatórios (usuários e administradores)
     """
     try:
-        transferencias = db.query(Transferencia).order_by(desc(Transferencia.id)).all()
-        return [transferencia.to_dict() for transferencia in transferencias]
+        return RespostaJSONRapida(_listar_transferencias(db))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -54,8 +82,7 @@ def transferencias_para_relatorios(db: Session = Depends(get_db)):
     Não requer autenticação para facilitar integração com relatórios
     """
     try:
-        transferencias = db.query(Transferencia).order_by(desc(Transferencia.id)).all()
-        return [transferencia.to_dict() for transferencia in transferencias]
+        return RespostaJSONRapida(_listar_transferencias(db))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -149,6 +176,7 @@ def criar_transferencia(transferencia_data: TransferenciaCreate, db: Session = D
         db.add(nova_transferencia)
         db.commit()
         db.refresh(nova_transferencia)
+        ExtratoService.invalidar()
         
         return nova_transferencia.to_dict()
         
@@ -246,6 +274,7 @@ def atualizar_transferencia(transferencia_id: int, transferencia_data: Transfere
         
         db.commit()
         db.refresh(transferencia)
+        ExtratoService.invalidar()
         
         return transferencia.to_dict()
         
@@ -277,6 +306,7 @@ def excluir_transferencia(transferencia_id: int, db: Session = Depends(get_db),
         # Delete real
         db.delete(transferencia)
         db.commit()
+        ExtratoService.invalidar()
         
         return {"message": "Transferência excluída com sucesso"}
         
@@ -7,21 +7,34 @@ import pandas as pd
 import json
 import tempfile
 import re
+import hashlib
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from fastapi import APIRouter, HTTPException, UploadFile, File, Query, Depends, Response
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, text, desc, tuple_
+from sqlalchemy import and_, text, desc, tuple_, insert
 
-from config import get_db, UPLOAD_DIR
+from config import get_db, UPLOAD_DIR, MAX_UPLOAD_SIZE_MB, UPLOAD_CHUNK_SIZE_KB
 from models_final import AluguelSimples, Proprietario as Propietario, Imovel as Inmueble, Participacao as Participacion, Usuario, LogImportacao as LogImportacaoSimple, HistoricoParticipacao
 from routers.auth import is_admin, verify_token
+from utils.bulk_upsert import (
+    resolver_colunas, coluna_texto, coluna_numerica, buscar_chaves_existentes,
+    upsert_em_lote, calcular_diff, em_blocos, ValidacaoColunar,
+    consultar_linhas, verificacao_linhas, linhas_alteradas
+)
+from utils.leitura_planilhas import ler_planilhas_excel
+from utils.upload_blocos import ArquivoMuitoGrande, salvar_em_blocos
+from utils.aho_corasick import AutomatoNomes
+from services.aluguel_service import AluguelService, CHAVE_ALUGUEL
+from services.extrato_service import ExtratoService
+from services.participacao_service import ParticipacaoService
 
 router = APIRouter(prefix="/api/upload", tags=["upload"])
 
 # Constantes de segurança
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_FILE_SIZE = MAX_UPLOAD_SIZE_MB * 1024 * 1024  # padrão 10MB
+UPLOAD_CHUNK_SIZE = UPLOAD_CHUNK_SIZE_KB * 1024
 ALLOWED_MIME_TYPES = [
     'application/vnd.ms-excel',
     'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
@@ -228,8 +241,20 @@ class FileProcessor:
         self.sheets_data = {}
         self.validation_errors = []
         self.processed_data = {}
+        self._matcher = None
+
+    @property
+    def matcher(self) -> AutomatoNomes:
+        """Autômato de nomes de proprietários, montado uma vez por arquivo"""
+        if self._matcher is None:
+            self._matcher = matcher_proprietarios(self.db)
+        return self._matcher
+
+    def recarregar_matcher(self) -> None:
+        """Descarta o autômato para que o próximo uso veja os proprietários atuais da sessão"""
+        self._matcher = None
     
-    def read_excel_file(self) -> Dict[str, Any]:
+    async def read_excel_file(self) -> Dict[str, Any]:
         """Leer archivo Excel, CSV o TSV y detectar hojas"""
         try:
             sheets_info = []
@@ -265,12 +290,13 @@ class FileProcessor:
                 self.sheets_data["Sheet1"] = df
                 
             else:
-                # Procesar archivo Excel
-                excel_file = pd.ExcelFile(self.file_path)
+                # Procesar archivo Excel fora do event loop (em paralelo se a pasta for grande)
+                with pd.ExcelFile(self.file_path) as excel_file:
+                    sheet_names = excel_file.sheet_names
+                planilhas = await ler_planilhas_excel(self.file_path, sheet_names)
                 
-                for sheet_name in excel_file.sheet_names:
-                    df = pd.read_excel(self.file_path, sheet_name=sheet_name)
-
+                # Validação e detecção de tipo seguem a ordem das planilhas
+                for sheet_name, df in planilhas.items():
                     # Validar conteúdo antes de processar
                     validate_excel_content(df)
 
@@ -324,10 +350,7 @@ class FileProcessor:
         columns_text = ' '.join(columns)
         
         # Verificar se tem nomes de proprietários conhecidos (indica aluguéis matriciais)
-        # Carregar proprietários ativos da base de dados
-        proprietarios_db = self.db.query(Propietario).filter(Propietario.ativo == True).all()
-        proprietario_nomes_conhecidos = [prop.nome for prop in proprietarios_db]
-        proprietario_columns_reais = [col for col in df.columns if any(str(nome) in str(col) for nome in proprietario_nomes_conhecidos)]
+        proprietario_columns_reais = list(self.matcher.mapear(df.columns))
         
         # Verificar se tem colunas que parecem valores (float64)
         valor_columns = [col for col in df.columns if df[col].dtype == 'float64']
@@ -634,10 +657,7 @@ class FileProcessor:
         
         # Verificar se há colunas de proprietário (Nnnn* ou nomes reais)
         nnnn_columns = [col for col in df.columns if str(col).startswith('Nnnn')]
-        # Carregar proprietários ativos da base de dados
-        proprietarios_db = self.db.query(Propietario).filter(Propietario.ativo == True).all()
-        proprietario_nomes_conhecidos = [prop.nome for prop in proprietarios_db]
-        proprietario_columns_reais = [col for col in df.columns if any(str(nome) in str(col) for nome in proprietario_nomes_conhecidos)]
+        proprietario_columns_reais = list(self.matcher.mapear(c for c in df.columns if c not in COLUNAS_FIXAS_PARTICIPACOES))
         
         if len(nnnn_columns) == 0 and len(proprietario_columns_reais) == 0:
             errors.append("Nenhuma coluna de proprietário encontrada (Nnnn* ou nomes reais)")
@@ -684,17 +704,14 @@ async def upload_file(file: UploadFile = File(...), admin_user: Usuario = Depend
         saved_filename = f"{file_id}{file_extension}"
         file_path = os.path.join(UPLOAD_DIR, saved_filename)
         
-        # Escribir archivo
-        content = await file.read()
-        # Límite de tamanho (por defecto 10MB)
+        # Escribir archivo en bloques: límite de tamaño y SHA-256 a medida que llegan los bytes
         try:
-            max_mb = int(os.getenv("MAX_UPLOAD_SIZE_MB", "10"))
-        except Exception:
-            max_mb = 10
-        if len(content) > max_mb * 1024 * 1024:
-            raise HTTPException(status_code=413, detail=f"Archivo demasiado grande (máx {max_mb}MB)")
-        with open(file_path, "wb") as f:
-            f.write(content)
+            file_size, sha256 = await salvar_em_blocos(file, file_path, MAX_FILE_SIZE, UPLOAD_CHUNK_SIZE)
+        except ArquivoMuitoGrande:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Archivo demasiado grande (máx {MAX_FILE_SIZE // (1024 * 1024)}MB)"
+            )
         
         # Validar segurança do arquivo
         if not validate_file_security(file_path):
@@ -706,7 +723,8 @@ async def upload_file(file: UploadFile = File(...), admin_user: Usuario = Depend
             "original_name": file.filename,
             "saved_path": file_path,
             "upload_time": datetime.now().isoformat(),
-            "file_size": len(content),
+            "file_size": file_size,
+            "sha256": sha256,
             "processed": False
         }
         
@@ -715,7 +733,8 @@ async def upload_file(file: UploadFile = File(...), admin_user: Usuario = Depend
             "file_id": file_id,
             "message": "Archivo subido exitosamente",
             "filename": file.filename,
-            "size": len(content)
+            "size": file_size,
+            "sha256": sha256
         }
         
     except HTTPException:
@@ -727,8 +746,24 @@ async def upload_file(file: UploadFile = File(...), admin_user: Usuario = Depend
         raise HTTPException(status_code=500, detail="Erro interno ao fazer upload do arquivo. Tente novamente.")
 
 @router.post("/process/{file_id}")
-async def process_file(file_id: str, db: Session = Depends(get_db)):
-    """Procesar archivo subido"""
+async def process_file(
+    file_id: str,
+    reimportar: bool = Query(False, description="Planejar também planilhas idênticas a importações anteriores"),
+    db: Session = Depends(get_db)
+):
+    """
+    Procesar archivo subido
+
+    Além da validação, calcula para cada planilha o plano de importação (diff
+    contra o banco: inserções, atualizações, inalterados e conflitos). Os planos
+    ficam guardados junto ao upload e são aplicados por /import.
+    Planilhas cujo conteúdo já foi importado sem conflitos são puladas.
+
+    As planilhas são planejadas em ordem de dependência (proprietários, imóveis,
+    participações, aluguéis) e cada plano é aplicado num SAVEPOINT, desfeito no
+    fim, para que as seguintes vejam os proprietários e imóveis novos do mesmo
+    arquivo (inclusive na detecção do tipo pelos nomes dos proprietários).
+    """
     print(f"🔍 Iniciando processamento do arquivo: {file_id}")
     try:
         # Verificar que el archivo existe
@@ -746,10 +781,16 @@ async def process_file(file_id: str, db: Session = Depends(get_db)):
         processor = FileProcessor(file_path, db)
         
         # Leer archivo Excel
-        read_result = processor.read_excel_file()
+        read_result = await processor.read_excel_file()
         if not read_result["success"]:
             raise HTTPException(status_code=400, detail=read_result["error"])
         
+        planos, planilhas_ignoradas = await planejar_arquivo(processor, db, reimportar)
+
+        # Tipos finais: planilhas matriciais só são reconhecidas depois dos proprietários do arquivo
+        for sheet in read_result["sheets_processed"]:
+            sheet["data_type"] = processor.detect_data_type(processor.sheets_data[sheet["name"]], sheet["name"])
+
         # Validar dados
         validation_results = processor.validate_data()
         
@@ -776,6 +817,13 @@ async def process_file(file_id: str, db: Session = Depends(get_db)):
         uploaded_files[file_id]["process_time"] = datetime.now().isoformat()
         uploaded_files[file_id]["validation_results"] = validation_results
         uploaded_files[file_id]["detected_types"] = detected_types
+        uploaded_files[file_id]["planos"] = planos
+        # Planilhas que dependem das anteriores são replanejadas em /import
+        uploaded_files[file_id]["dados_planilhas"] = {
+            sheet_name: processor.sheets_data[sheet_name]
+            for sheet_name, plano in planos.items() if plano["depende"]
+        }
+        uploaded_files[file_id]["planilhas_ignoradas"] = planilhas_ignoradas
         
         return {
             "success": True,
@@ -785,15 +833,23 @@ async def process_file(file_id: str, db: Session = Depends(get_db)):
             "validation_warnings": all_validation_warnings,
             "total_sheets": read_result["total_sheets"],
             "detected_types": detected_types,
+            "diff": {sheet_name: resumo_plano(plano) for sheet_name, plano in planos.items()},
+            "skipped_sheets": planilhas_ignoradas,
             "message": "Archivo procesado exitosamente"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al procesar archivo: {str(e)}")
 
 @router.post("/import/{file_id}")
 async def import_data(file_id: str, db: Session = Depends(get_db)):
-    """Importar datos procesados a la base de datos"""
+    """
+    Importar datos procesados a la base de datos
+
+    Aplica exatamente os planos calculados em /process; o arquivo não é relido.
+    """
     try:
         # Verificar que el archivo existe y está procesado
         if file_id not in uploaded_files:
@@ -801,10 +857,24 @@ async def import_data(file_id: str, db: Session = Depends(get_db)):
         
         file_info = uploaded_files[file_id]
         
-        if not file_info.get("processed", False):
+        if not file_info.get("processed", False) or "planos" not in file_info:
             raise HTTPException(status_code=400, detail="Archivo no ha sido procesado")
-        
-        file_path = file_info["saved_path"]
+
+        # Os planos independentes são conferidos antes de aplicar o primeiro: uma
+        # planilha aplicada altera linhas que as seguintes podem ter lido. Os que
+        # dependem das anteriores são recalculados e conferidos pelo resumo
+        planos = file_info["planos"]
+        desatualizadas = [
+            nome for nome, plano in planos.items()
+            if not plano["depende"] and plano_desatualizado(plano, db)
+        ]
+        if desatualizadas:
+            file_info.pop("planos", None)
+            file_info["processed"] = False
+            raise HTTPException(
+                status_code=409,
+                detail=f"Os dados mudaram desde o processamento ({', '.join(desatualizadas)}); processe o arquivo novamente"
+            )
         
         # Crear log de importación
         log_import = LogImportacaoSimple(
@@ -817,74 +887,76 @@ async def import_data(file_id: str, db: Session = Depends(get_db)):
         
         inicio_tiempo = datetime.now()
         records_imported = {}
-        
-        # Processar cada planilha do Excel
-        processor = FileProcessor(file_path, db)
-        processor.read_excel_file()
-        
-        print(f"🔄 Iniciando processamento de {len(processor.sheets_data)} planilhas")
-        
-        for sheet_name, df in processor.sheets_data.items():
-            print(f"🔄 Procesando hoja: {sheet_name}")
-            data_type = processor.detect_data_type(df, sheet_name)
-            print(f"  Data type detectado: {data_type}")
-            
-            if data_type == "proprietarios":
-                count = await import_propietarios(df, db)
-                records_imported["proprietarios"] = count
-            elif data_type == "imoveis":
-                count = await import_inmuebles(df, db)
-                records_imported["imoveis"] = count
-            elif data_type == "participacoes_matricial":
-                count = await import_participacoes_matricial(df, db)
-                records_imported["participacoes"] = count
-            elif data_type == "participacoes":
-                count = await import_participacoes(df, db)
-                records_imported["participacoes"] = count
-            elif data_type == "alugueis":
-                # Verificar se é formato matricial ou tabular
-                # Carregar proprietários ativos da base de dados
-                proprietarios_db = db.query(Propietario).filter(Propietario.ativo == True).all()
-                proprietario_nomes_conhecidos = [prop.nome for prop in proprietarios_db]
-                proprietario_columns_reais = [col for col in df.columns if any(str(nome) in str(col) for nome in proprietario_nomes_conhecidos)]
-                
-                print(f"🔄 Procesando hoja: {sheet_name}, data_type: {data_type}")
-                
-                if len(proprietario_columns_reais) >= 3:  # Formato matricial
-                    print(f"  📊 Importando em formato matricial")
-                    # Adicionar nome da planilha aos atributos do DataFrame
-                    df.attrs['sheet_name'] = sheet_name
-                    count = await import_alquileres_matricial(df, db)
-                else:  # Formato tabular
-                    print(f"  📋 Importando em formato tabular")
-                    count = await import_alquileres(df, db)
-                records_imported["alugueis"] = records_imported.get("alugueis", 0) + count
+        import_details = {}
+        
+        print(f"🔄 Aplicando planos de {len(planos)} planilhas")
+        
+        for sheet_name, plano in planos.items():
+            print(f"🔄 Aplicando plano da planilha: {sheet_name} ({plano['data_type']})")
+            if plano["depende"]:
+                plano = replanejar_plano(plano, sheet_name, file_info["dados_planilhas"][sheet_name], db)
+            resultado = await aplicar_plano(plano, db)
+            chave = CHAVES_CONTAGEM[plano["data_type"]]
+            records_imported[chave] = records_imported.get(chave, 0) + resultado["total"]
+            import_details[sheet_name] = resultado
+
+            # Registro por planilha; só importações sem conflitos permitem pular a planilha depois
+            db.add(LogImportacaoSimple(
+                nome_arquivo=file_info["original_name"],
+                nome_planilha=sheet_name,
+                tipo_dados=plano["data_type"],
+                hash_conteudo=plano["hash"],
+                periodo=plano["periodo"],
+                estado="COMPLETADO" if resultado["rejeitados"] == 0 else "COMPLETADO_COM_ERROS",
+                registros_processados=resultado["total"] + resultado["inalterados"] + resultado["rejeitados"],
+                registros_sucesso=resultado["total"] + resultado["inalterados"],
+                registros_erro=resultado["rejeitados"]
+            ))
         
         # Commit final
         db.commit()
+        ExtratoService.invalidar()
+        
+        # O plano só pode ser aplicado uma vez; nova importação exige reprocessar
+        file_info.pop("planos", None)
+        file_info.pop("dados_planilhas", None)
+        file_info["processed"] = False
         
         # Actualizar log
         tiempo_total = datetime.now() - inicio_tiempo
         log_import.estado = "COMPLETADO"
         log_import.registros_processados = sum(records_imported.values())
         log_import.registros_sucesso = sum(records_imported.values())
-        log_import.tempo_processamento = str(tiempo_total)
+        log_import.tempo_processamento = tiempo_total
         db.commit()
         
         return {
             "success": True,
             "message": "Datos importados exitosamente",
             "records_imported": records_imported,
+            "import_details": import_details,
+            "skipped_sheets": file_info.get("planilhas_ignoradas", []),
             "total_records": sum(records_imported.values()),
             "processing_time": str(tiempo_total)
         }
         
+    except HTTPException as e:
+        # Plano divergente no meio da aplicação: nada do arquivo é gravado
+        if 'log_import' in locals():
+            db.rollback()
+            file_info.pop("planos", None)
+            file_info.pop("dados_planilhas", None)
+            file_info["processed"] = False
+            log_import.estado = "ERRO"
+            log_import.detalhes_erro = str(e.detail)
+            db.commit()
+        raise
     except Exception as e:
         db.rollback()
         # Actualizar log con error
         if 'log_import' in locals():
             log_import.estado = "ERRO"
-            log_import.detalhes_erros = str(e)
+            log_import.detalhes_erro = str(e)
             db.commit()
         
         # Log do erro interno para debugging
@@ -930,580 +1002,892 @@ async def salvar_historico_participacoes(db: Session) -> str:
     # Inserir em lote no banco de dados
     if historico_records:
         db.bulk_save_objects(historico_records)
-        db.commit()
+        db.flush()
     
     return new_version_id
 
-async def import_propietarios(df: pd.DataFrame, db: Session) -> int:
-    """Importar e atualizar proprietários desde DataFrame com sanitização."""
-    # Sanitizar DataFrame
-    df = sanitize_dataframe(df)
-    
-    new_proprietarios = []
-    updated_proprietarios = []
-    count = 0
-
-    # Mapeamento de colunas para maior flexibilidade
-    column_mapping = {
-        'nome': ['nome', 'Nome', 'NOME', 'nombre', 'Nombre', 'NOMBRE'],
-        'sobrenome': ['sobrenome', 'Sobrenome', 'SOBRENOME', 'apellido', 'Apellido', 'APELLIDO'],
-        'documento': ['documento', 'Documento', 'DOCUMENTO'],
-        'tipo_documento': ['tipo_documento', 'Tipo Documento', 'TIPO_DOCUMENTO', 'tipo documento', 'Tipo de Documento'],
-        'endereco': ['endereco', 'Endereço', 'ENDERECO', 'direccion', 'Dirección', 'DIRECCION'],
-        'telefone': ['telefone', 'Telefone', 'TELEFONE', 'teléfono', 'Teléfono', 'TELEFONO'],
-        'email': ['email', 'Email', 'E-mail', 'EMAIL', 'correo', 'Correo'],
-        'banco': ['banco', 'Banco', 'BANCO'],
-        'agencia': ['agencia', 'Agencia', 'Agência', 'AGENCIA'],
-        'conta': ['conta', 'Conta', 'CONTA', 'cuenta', 'Cuenta', 'CUENTA'],
-        'tipo_conta': ['tipo_conta', 'Tipo Conta', 'TIPO_CONTA', 'tipo conta', 'tipo_cuenta', 'Tipo Cuenta'],
-        'ativo': ['ativo', 'Ativo', 'ATIVO', 'activo', 'Activo', 'ACTIVO']
+# ============================================
+# PLANOS DE IMPORTAÇÃO
+# ============================================
+# Cada tipo de planilha tem uma função planejar_* (somente leitura) que compara
+# a planilha com o banco e devolve um plano serializável com o diff, e uma
+# função aplicar_* que grava exatamente as operações do plano. /process guarda
+# os planos junto ao upload e /import os aplica numa única transação, na ordem
+# de dependência (ver planejar_arquivo). Cada plano leva a impressão das linhas
+# do banco em que se baseou (verificacoes); se alguma mudou entre /process e
+# /import, o plano é recusado. Planos que dependem de planilhas anteriores do
+# mesmo arquivo são recalculados em /import e precisam manter o mesmo resumo.
+
+# Quantidade máxima de alterações/conflitos retornados na prévia de /process
+LIMITE_PREVIA = 100
+
+
+def _montar_plano(
+    data_type: str,
+    novos: List[Dict[str, Any]],
+    alterados: List[Dict[str, Any]],
+    inalterados: int,
+    conflitos: List[Dict[str, Any]],
+    operacoes: Dict[str, Any],
+    rotulo,
+    verificacoes: Optional[List[Optional[Dict[str, Any]]]] = None
+) -> Dict[str, Any]:
+    """Monta o plano de uma planilha no formato comum a todos os tipos."""
+    return {
+        "data_type": data_type,
+        "resumo": {
+            "inserir": len(novos),
+            "atualizar": len(alterados),
+            "inalterados": inalterados,
+            "conflitos": len(conflitos)
+        },
+        "alteracoes": [
+            {"registro": rotulo(item["registro"]), "alteracoes": item["alteracoes"]}
+            for item in alterados
+        ],
+        "conflitos": conflitos,
+        "operacoes": operacoes,
+        "verificacoes": [v for v in verificacoes or [] if v is not None]
     }
-    
-    # Normalizar nomes de colunas
-    def get_column_value(row, field_name):
-        possible_names = column_mapping.get(field_name, [field_name])
-        for name in possible_names:
-            if name in row.index:
-                return row.get(name)
-        return None
 
-    # Bulk Fetching: Coletar todos os documentos e nomes+sobrenomes para verificar existência
-    documentos_to_check = df.apply(lambda row: str(get_column_value(row, 'documento') or '').strip(), axis=1).tolist()
-    nomes_sobrenomes_to_check = df.apply(lambda row: (str(get_column_value(row, 'nome') or '').strip(), str(get_column_value(row, 'sobrenome') or '').strip()), axis=1).tolist()
 
-    existing_proprietarios_by_doc = {p.documento: p for p in db.query(Propietario).filter(Propietario.documento.in_(documentos_to_check)).all() if p.documento}
-    existing_proprietarios_by_nome_sobrenome = {
-        (p.nome, p.sobrenome): p for p in db.query(Propietario).filter(
-            tuple_(Propietario.nome, Propietario.sobrenome).in_(nomes_sobrenomes_to_check)
-        ).all()
+def resumo_plano(plano: Dict[str, Any]) -> Dict[str, Any]:
+    """Versão do plano para resposta da API: sem operações e com listas limitadas."""
+    return {
+        "data_type": plano["data_type"],
+        "resumo": plano["resumo"],
+        "alteracoes": plano["alteracoes"][:LIMITE_PREVIA],
+        "conflitos": plano["conflitos"][:LIMITE_PREVIA]
     }
-    
-    for index, row in df.iterrows():
-        try:
-            nome = str(get_column_value(row, 'nome') or '').strip()
-            sobrenome = str(get_column_value(row, 'sobrenome') or '').strip()
-            
-            doc_val = get_column_value(row, 'documento')
-            documento = str(doc_val).strip() if doc_val is not None and pd.notna(doc_val) else ""
-            if isinstance(documento, str) and documento.lower() == 'nan':
-                documento = ""
 
-            if not nome or not sobrenome:
-                continue
-            
-            propietario_data = {
-                "nome": nome,
-                "sobrenome": sobrenome,
-                "nombre_completo": f"{nome} {sobrenome}".strip(),
-                "tipo_documento": str(get_column_value(row, 'tipo_documento') or 'CPF'),
-                "documento": documento if documento else None,
-                "email": str(get_column_value(row, 'email') or '').strip() if pd.notna(get_column_value(row, 'email')) else None,
-                "telefono": str(get_column_value(row, 'telefone') or '').strip() if pd.notna(get_column_value(row, 'telefone')) else None,
-                "endereco": str(get_column_value(row, 'banco') or '').strip() if pd.notna(get_column_value(row, 'banco')) else None,
-                "banco": str(get_column_value(row, 'agencia') or '').strip() if pd.notna(get_column_value(row, 'agencia')) else None,
-                "agencia": str(get_column_value(row, 'conta') or '').strip() if pd.notna(get_column_value(row, 'conta')) else None,
-                "cuenta": str(get_column_value(row, 'tipo_conta') or '').strip() if pd.notna(get_column_value(row, 'tipo_conta')) else None,
-                "tipo_cuenta": str(get_column_value(row, 'ativo') or '').strip() if pd.notna(get_column_value(row, 'ativo')) else None,
-                "ativo": bool(get_column_value(row, 'ativo') or True)
-            }
 
-            existing_proprietario = None
-            if documento and documento in existing_proprietarios_by_doc:
-                existing_proprietario = existing_proprietarios_by_doc[documento]
-            elif (nome, sobrenome) in existing_proprietarios_by_nome_sobrenome:
-                existing_proprietario = existing_proprietarios_by_nome_sobrenome[(nome, sobrenome)]
+def _resultado_aplicacao(plano: Dict[str, Any]) -> Dict[str, Any]:
+    """Resultado padronizado da aplicação de um plano."""
+    resumo = plano["resumo"]
+    return {
+        "total": resumo["inserir"] + resumo["atualizar"],
+        "criados": resumo["inserir"],
+        "atualizados": resumo["atualizar"],
+        "inalterados": resumo["inalterados"],
+        "rejeitados": resumo["conflitos"],
+        "erros": plano["conflitos"]
+    }
 
-            if existing_proprietario:
-                proprietario_data["id"] = existing_proprietario.id
-                updated_proprietarios.append(propietario_data)
-            else:
-                new_proprietarios.append(propietario_data)
-            
-        except Exception as e:
-            print(f"Erro processando proprietário na linha {index}: {e}")
-            continue
-    
-    if new_proprietarios:
-        db.bulk_insert_mappings(Propietario, new_proprietores)
-        count += len(new_proprietarios)
 
-    if updated_proprietarios:
-        db.bulk_update_mappings(Propietario, updated_proprietores)
-        count += len(updated_proprietarios)
-    
-    return count
+def _registros(dados: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Converte um DataFrame em dicionários com tipos nativos e None para vazios."""
+    return dados.astype(object).where(dados.notna(), None).to_dict('records')
 
-async def import_inmuebles(df: pd.DataFrame, db: Session) -> int:
-    """Importar e atualizar inmuebles desde DataFrame com sanitização."""
-    # Sanitizar DataFrame
-    df = sanitize_dataframe(df)
-    
-    new_inmuebles_data = []
-    updated_inmuebles_data = []
-    count = 0
-
-    # Mapeamento de colunas para maior flexibilidade
-    column_mapping = {
-        'nome': ['nome', 'Nome', 'NOME', 'nombre', 'Nombre', 'NOMBRE'],
-        'tipo': ['tipo', 'Tipo', 'TIPO'],
-        'endereco_completo': ['endereco_completo', 'endereço', 'Endereço', 'ENDERECO', 'direccion_completa', 'Dirección Completa', 'DIRECCION_COMPLETA'],
-        'rua': ['rua', 'Rua', 'RUA', 'calle', 'Calle', 'CALLE'],
-        'numero': ['numero', 'Número', 'NUMERO', 'numero', 'Numero', 'NUMERO'],
-        'apartamento': ['apartamento', 'Apartamento', 'APARTAMENTO', 'apartamento', 'Apartamento', 'APARTAMENTO'],
-        'bairro': ['bairro', 'Bairro', 'BAIRRO', 'barrio', 'Barrio', 'BARRIO'],
-        'ciudad': ['ciudad', 'Cidade', 'CIDADE', 'ciudad', 'Ciudad', 'CIUDAD'],
-        'estado': ['estado', 'Estado', 'ESTADO', 'estado', 'Estado', 'ESTADO'],
-        'cep': ['cep', 'CEP', 'Cep', 'codigo_postal', 'Código Postal', 'CODIGO_POSTAL'],
-        'quartos': ['quartos', 'Quartos', 'QUARTOS', 'dormitorios', 'Dormitorios', 'DORMITORIOS'],
-        'banheiros': ['banheiros', 'Banheiros', 'BANHEIROS', 'baños', 'Baños', 'BANOS'],
-        'garagens': ['garagens', 'Garagens', 'GARAGENS', 'cocheras', 'Cocheras', 'COCHERAS'],
-        'area_total': ['area_total', 'Área Total', 'AREA_TOTAL', 'area total', 'Area Total'],
-        'area_construida': ['area_construida', 'Área Construida', 'AREA_CONSTRUIDA', 'area construida', 'Area Construida'],
-        'valor_cadastral': ['valor_cadastral', 'Valor Catastral', 'VALOR_CADASTRAL', 'valor catastral', 'Valor Cadastral'],
-        'valor_mercado': ['valor_mercado', 'Valor Mercado', 'VALOR_MERCADO', 'valor mercado', 'Valor de Mercado'],
-        'iptu_anual': ['iptu_anual', 'IPTU Anual', 'IPTU_ANUAL', 'iptu anual', 'IPTU Anual'],
-        'condominio_mensal': ['condominio_mensal', 'Condominio', 'CONDOMINIO', 'condominio mensal', 'Condomínio Mensal'],
-        'activo': ['activo', 'Ativo', 'ATIVO', 'activo', 'Activo', 'ACTIVO']
-    }
-    
-    # Normalizar nomes de colunas
-    def get_column_value(row, field_name):
-        possible_names = column_mapping.get(field_name, [field_name])
-        for name in possible_names:
-            if name in row.index:
-                return row.get(name)
+
+def hash_planilha(df: pd.DataFrame, data_type: str, periodo: Optional[str]) -> str:
+    """
+    Hash SHA-256 do conteúdo normalizado de uma planilha.
+
+    Linhas e colunas totalmente vazias, espaços nas pontas e a forma como o pandas
+    leu cada célula (1 ou 1.0) não alteram o hash; tipo de dados e período entram
+    na assinatura porque a mesma grade pode representar meses diferentes.
+    """
+    dados = df.dropna(how='all').dropna(axis=1, how='all')
+    texto = dados.astype("string").apply(
+        lambda coluna: coluna.str.strip().str.replace(r"\.0+$", "", regex=True)
+    ).fillna("")
+    digest = hashlib.sha256(f"{data_type}|{periodo or ''}|".encode())
+    digest.update("\x1f".join(str(col).strip() for col in texto.columns).encode())
+    digest.update(pd.util.hash_pandas_object(texto, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def periodo_planilha(df: pd.DataFrame, sheet_name: str, data_type: str, matcher: AutomatoNomes) -> Optional[str]:
+    """
+    Período coberto por uma planilha de aluguéis ('2025-03' ou '2024-01/2024-12').
+
+    Planilhas matriciais usam o nome da aba; tabulares, as colunas mês/ano.
+    Demais tipos não têm período.
+    """
+    if data_type != "alugueis":
         return None
+    if e_alugueis_matricial(df, matcher):
+        periodo = periodo_da_planilha(sheet_name)
+        return f"{periodo[1]}-{periodo[0]:02d}" if periodo else None
 
-    # Bulk Fetching: Coletar todos os nomes de imóveis para verificar existência
-    nomes_to_check = df.apply(lambda row: str(get_column_value(row, 'nome') or '').strip(), axis=1).tolist()
-    existing_inmuebles_by_nome = {i.nome: i for i in db.query(Inmueble).filter(Inmueble.nome.in_(nomes_to_check)).all()}
-    
-    for _, row in df.iterrows():
-        try:
-            nome = str(get_column_value(row, 'nome') or '').strip()
-            
-            if not nome:
-                continue # Pular linhas sem nome
+    colunas = resolver_colunas(df, COLUMN_MAPPING_ALUGUEIS)
+    if 'mes' not in colunas or 'ano' not in colunas:
+        return None
+    periodos = (coluna_numerica(df, colunas, 'ano') * 100 + coluna_numerica(df, colunas, 'mes')).dropna()
+    if periodos.empty:
+        return None
+    inicio, fim = [f"{int(p) // 100}-{int(p) % 100:02d}" for p in (periodos.min(), periodos.max())]
+    return inicio if inicio == fim else f"{inicio}/{fim}"
+
+
+def planilhas_ja_importadas(db: Session, hashes: List[str]) -> Dict[str, Any]:
+    """Retorna, por hash, o último registro de importação concluída sem conflitos."""
+    importadas = {}
+    for log in db.query(LogImportacaoSimple).filter(
+        LogImportacaoSimple.hash_conteudo.in_(hashes),
+        LogImportacaoSimple.estado == "COMPLETADO"
+    ).order_by(LogImportacaoSimple.data_importacao).all():
+        importadas[log.hash_conteudo] = log
+    return importadas
+
+
+# --------------------------------------------
+# Proprietários
+# --------------------------------------------
+
+# Mapeamento de colunas da planilha de proprietários
+COLUMN_MAPPING_PROPRIETARIOS = {
+    'nome': ['nome', 'nombre'],
+    'sobrenome': ['sobrenome', 'apellido'],
+    'documento': ['documento', 'cpf', 'cnpj', 'cpf/cnpj'],
+    'tipo_documento': ['tipo_documento', 'tipo documento', 'tipo de documento'],
+    'endereco': ['endereco', 'endereço', 'direccion', 'dirección'],
+    'telefone': ['telefone', 'teléfono', 'telefono'],
+    'email': ['email', 'e-mail', 'correo'],
+    'banco': ['banco'],
+    'agencia': ['agencia', 'agência'],
+    'conta': ['conta', 'cuenta'],
+    'tipo_conta': ['tipo_conta', 'tipo conta', 'tipo_cuenta', 'tipo cuenta'],
+    'ativo': ['ativo', 'activo']
+}
+
+VALORES_FALSOS = {'false', '0', 'nao', 'não', 'no', 'n', 'inativo', 'inactivo'}
+
+
+def normalizar_documentos(documentos: pd.Series, tipos: pd.Series) -> pd.Series:
+    """
+    Normaliza CPF/CNPJ de forma vetorizada: mantém só dígitos e recompõe
+    zeros à esquerda perdidos quando o Excel armazena o documento como número.
+    """
+    digitos = documentos.astype("string").str.strip().str.replace(r"\.0+$", "", regex=True)
+    digitos = digitos.str.replace(r"\D", "", regex=True)
+    tipos = tipos.astype("string").str.upper().fillna("CPF")
+    digitos = digitos.mask((tipos == "CPF") & (digitos.str.len() < 11), digitos.str.zfill(11))
+    digitos = digitos.mask((tipos == "CNPJ") & (digitos.str.len() < 14), digitos.str.zfill(14))
+    digitos = digitos.mask(digitos == "")
+    return digitos.astype(object).where(digitos.notna(), None)
 
-            endereco_completo = str(get_column_value(row, 'endereco_completo') or '').strip()
-            
-            if not endereco_completo:
-                continue # Pular linhas sem endereço
-
-            inmueble_data = {
-                "nome": nome,
-                "endereco": endereco_completo,
-                "tipo_imovel": str(get_column_value(row, 'tipo') or '').strip() if get_column_value(row, 'tipo') is not None else None,
-                "numero_quartos": int(get_column_value(row, 'quartos') or 0) if get_column_value(row, 'quartos') is not None else None,
-                "numero_banheiros": int(get_column_value(row, 'banheiros') or 0) if get_column_value(row, 'banheiros') is not None else None,
-                "numero_vagas_garagem": int(get_column_value(row, 'garagens') or 0) if get_column_value(row, 'garagens') is not None else None,
-                "area_total": float(get_column_value(row, 'area_total') or 0) if get_column_value(row, 'area_total') is not None else None,
-                "area_construida": float(get_column_value(row, 'area_construida') or 0) if get_column_value(row, 'area_construida') is not None else None,
-                "valor_cadastral": float(get_column_value(row, 'valor_cadastral') or 0) if get_column_value(row, 'valor_cadastral') is not None else None,
-                "valor_mercado": float(get_column_value(row, 'valor_mercado') or 0) if get_column_value(row, 'valor_mercado') is not None else None,
-                "iptu_mensal": float(get_column_value(row, 'iptu_anual') or 0) if get_column_value(row, 'iptu_anual') is not None else None,
-                "condominio_mensal": float(get_column_value(row, 'condominio_mensal') or 0) if get_column_value(row, 'condominio_mensal') is not None else None,
-                "alugado": bool(get_column_value(row, 'activo') or False) if get_column_value(row, 'activo') is not None else None,
-                "ativo": bool(get_column_value(row, 'activo') or True) if get_column_value(row, 'activo') is not None else None
-            }
 
-            existing_inmueble = None
-            if nome in existing_inmuebles_by_nome:
-                existing_inmueble = existing_inmuebles_by_nome[nome]
+def normalizar_booleanos(valores: pd.Series, padrao: bool = True) -> pd.Series:
+    """Converte textos como 'sim'/'não'/'0'/'1' em booleanos, vazios viram o padrão."""
+    texto = valores.astype("string").str.strip().str.lower()
+    return (~texto.isin(VALORES_FALSOS)).where(texto.notna(), padrao).astype(bool)
 
-            if existing_inmueble:
-                inmueble_data["id"] = existing_inmueble.id
-                updated_inmuebles_data.append(inmueble_data)
-            else:
-                new_inmuebles_data.append(inmueble_data)
-            
-        except Exception as e:
-            print(f"Erro processando imóvel na linha {index}: {e}")
-            continue
-    
-    if new_inmuebles_data:
-        db.bulk_insert_mappings(Inmueble, new_inmuebles_data)
-        count += len(new_inmuebles_data)
 
-    if updated_inmuebles_data:
-        db.bulk_update_mappings(Inmueble, updated_inmuebles_data)
-        count += len(updated_inmuebles_data)
-    
-    return count
+def planejar_proprietarios(df: pd.DataFrame, db: Session) -> Dict[str, Any]:
+    """
+    Calcula o plano de importação de proprietários.
 
-async def import_participacoes_matricial(df: pd.DataFrame, db: Session) -> int:
-    """Importar participações desde DataFrame matricial (formato especial do Excel)"""
-    # Salvar versão histórica antes de qualquer alteração
-    versao_id = await salvar_historico_participacoes(db)
-    
-    # Sanitizar DataFrame
+    As colunas são resolvidas uma única vez e os documentos normalizados de forma
+    vetorizada. Linhas com documento são casadas pela chave 'documento'; linhas sem
+    documento (ou cujo proprietário no banco ainda não tem documento) por nome +
+    sobrenome. Só as colunas presentes na planilha entram no diff.
+    """
     df = sanitize_dataframe(df)
+    colunas = resolver_colunas(df, COLUMN_MAPPING_PROPRIETARIOS)
+
+    dados = pd.DataFrame(index=df.index)
+    for campo in COLUMN_MAPPING_PROPRIETARIOS:
+        if campo in ('nome', 'sobrenome', 'documento') or (campo in colunas and campo != 'ativo'):
+            dados[campo] = coluna_texto(df, colunas, campo)
+    tipos = dados['tipo_documento'] if 'tipo_documento' in dados else pd.Series('CPF', index=df.index)
+    dados['documento'] = normalizar_documentos(dados['documento'], tipos)
+    if 'ativo' in colunas:
+        dados['ativo'] = normalizar_booleanos(df[colunas['ativo']])
+
+    validacao = ValidacaoColunar(dados)
+    validacao.rejeitar(dados['nome'].isna(), 'nome', "Nome obrigatório")
+    validacao.rejeitar(dados['sobrenome'].isna(), 'sobrenome', "Sobrenome obrigatório")
+    duplicados = dados['documento'].notna() & dados.duplicated(subset=['documento'], keep='last')
+    validacao.rejeitar(duplicados, 'documento', "Documento repetido na planilha (prevalece a última linha)")
+    registros = _registros(dados[validacao.validos])
+
+    com_documento = [r for r in registros if r['documento']]
+    sem_documento = [r for r in registros if not r['documento']]
+
+    documentos_existentes = buscar_chaves_existentes(
+        db, [Propietario.documento], [r['documento'] for r in com_documento]
+    )
+
+    # Proprietários sem documento (na planilha ou no banco) são associados por nome
+    candidatos = sem_documento + [r for r in com_documento if r['documento'] not in documentos_existentes]
+    por_nome = {}
+    nomes = list({(r['nome'], r['sobrenome']) for r in candidatos})
+    linhas_nome = consultar_linhas(db, Propietario, ['nome', 'sobrenome'], ['id', 'documento'], nomes)
+    for p in linhas_nome:
+        por_nome.setdefault((p.nome, p.sobrenome), p)
+
+    por_documento, por_id, inserir_sem_documento = [], [], []
+    for registro in sem_documento:
+        existente = por_nome.get((registro['nome'], registro['sobrenome']))
+        if existente:
+            por_id.append({**{k: v for k, v in registro.items() if k != 'documento'}, 'id': existente.id})
+        else:
+            inserir_sem_documento.append(registro)
+    for registro in com_documento:
+        existente = por_nome.get((registro['nome'], registro['sobrenome']))
+        if registro['documento'] not in documentos_existentes and existente and not existente.documento:
+            por_id.append({**registro, 'id': existente.id})
+        else:
+            por_documento.append(registro)
+
+    diff_documento = calcular_diff(db, Propietario, por_documento, chave=['documento'])
+    diff_id = calcular_diff(db, Propietario, por_id, chave=['id'])
+
+    operacoes = {
+        "upsert": diff_documento["novos"] + [item["registro"] for item in diff_documento["alterados"]],
+        "atualizar_por_id": [item["registro"] for item in diff_id["alterados"]],
+        "inserir": inserir_sem_documento
+    }
+    return _montar_plano(
+        "proprietarios",
+        novos=diff_documento["novos"] + inserir_sem_documento,
+        alterados=diff_documento["alterados"] + diff_id["alterados"],
+        inalterados=len(diff_documento["inalterados"]) + len(diff_id["inalterados"]),
+        conflitos=validacao.tabela_erros(),
+        operacoes=operacoes,
+        rotulo=lambda r: f"{r['nome']} {r['sobrenome']}".strip(),
+        verificacoes=[
+            verificacao_linhas(Propietario, ['nome', 'sobrenome'], ['id', 'documento'], nomes, linhas_nome),
+            diff_documento["verificacao"],
+            diff_id["verificacao"]
+        ]
+    )
 
-    new_participacoes = []
-    count = 0
 
-    # PASSO 1: Desativar participações existentes para o imóvel
-    # (O histórico já foi criado acima)
-    for idx, row in df.iterrows():
-        try:
-            nome_imovel = str(row.get('Nome', '')).strip()
-            imovel = db.query(Inmueble).filter(Inmueble.nome == nome_imovel).first()
-            
-            if not imovel:
-                print(f"Imóvel não encontrado: {nome_imovel}")
-                continue
-            
-            # Desativar participações existentes para este imóvel
-            db.query(Participacion).filter(Participacion.imovel_id == imovel.id, Participacion.ativo == True).update({"ativo": False}, synchronize_session=False)
-            db.commit()
-            print(f"Desativadas participações existentes para o imóvel: {nome_imovel}")
-        
-        except Exception as e:
-            print(f"Erro desativando participações na linha {idx}: {e}")
-            continue
-    
-    # PASSO 2: Validar e processar novas participações
-    # Obter imóveis existentes por nome
-    nomes_imoveis = df['Nome'].dropna().unique().tolist()
-    existing_imoveis = {i.nome: i for i in db.query(Inmueble).filter(Inmueble.nome.in_(nomes_imoveis)).all()}
-    
-    # Detectar formato: Nnnn* ou nomes reais
-    nnnn_columns = [col for col in df.columns if str(col).startswith('Nnnn')]
-    # Carregar proprietários ativos da base de dados
-    proprietarios_db = db.query(Propietario).filter(Propietario.ativo == True).all()
-    proprietario_nomes_conhecidos = [prop.nome for prop in proprietarios_db]
-    proprietario_columns_reais = [col for col in df.columns if any(str(nome) in str(col) for nome in proprietario_nomes_conhecidos)]
-    
-    if len(nnnn_columns) > 0:
-        # Formato Nnnn*: usar mapeamento ordinal
-        proprietarios_ordenados = db.query(Propietario).order_by(Propietario.nome, Propietario.sobrenome).all()
-        proprietario_mapping = {}
-        for i, col in enumerate(nnnn_columns):
-            if i < len(proprietarios_ordenados):
-                proprietario_mapping[col] = proprietarios_ordenados[i]
-    elif len(proprietario_columns_reais) > 0:
-        # Formato com nomes reais: mapear pelo nome
-        proprietario_nomes = {p.nome + ' ' + (p.sobrenome or ''): p for p in db.query(Propietario).all()}
-        proprietario_nomes.update({p.nome: p for p in db.query(Propietario).all()})  # também sem sobrenome
-        
-        proprietario_mapping = {}
-        for col in proprietario_columns_reais:
-            # Tentar encontrar proprietário pelo nome da coluna
-            proprietario = proprietario_nomes.get(col.strip())
-            if proprietario:
-                proprietario_mapping[col] = proprietario
-            else:
-                print(f"Proprietário não encontrado para coluna: {col}")
-    else:
-        print("Nenhuma coluna de proprietário válida encontrada")
-        return 0
-    
-    # Processar cada linha do DataFrame
-    current_timestamp = datetime.utcnow()
-    for _, row in df.iterrows():
-        try:
-            nome_imovel = str(row.get('Nome', '')).strip()
-            imovel = existing_imoveis.get(nome_imovel)
-            
-            if not imovel:
-                print(f"Imóvel não encontrado: {nome_imovel}")
-                continue
-            
-            # Processar cada coluna de proprietário
-            for col, proprietario in proprietario_mapping.items():
-                porcentagem = row.get(col, 0)
-                
-                if pd.isna(porcentagem) or porcentagem <= 0:
-                    continue
-                
-                # Sempre criar nova participação (histórico)
-                new_participacoes.append({
-                    "imovel_id": imovel.id,
-                    "proprietario_id": proprietario.id,
-                    "porcentagem": round(float(porcentagem), 8),
-                    "ativo": True,
-                    "data_registro": current_timestamp
-                })
-                    
-        except Exception as e:
-            print(f"Erro processando participação: {e}")
-            continue
-    
-    # Executar operações em lote
-    if new_participacoes:
-        db.bulk_insert_mappings(Participacion, new_participacoes)
-        count += len(new_participacoes)
-        print(f"Inseridas {len(new_participacoes)} novas participações")
-    
-    return count
+def aplicar_proprietarios(plano: Dict[str, Any], db: Session) -> Dict[str, Any]:
+    """Grava o plano de proprietários com upsert em lote pela chave 'documento'."""
+    operacoes = plano["operacoes"]
+    upsert_em_lote(db, Propietario, operacoes["upsert"], chave=['documento'])
+    if operacoes["atualizar_por_id"]:
+        db.bulk_update_mappings(Propietario, operacoes["atualizar_por_id"])
+    if operacoes["inserir"]:
+        db.execute(insert(Propietario), operacoes["inserir"])
 
-async def import_participacoes(df: pd.DataFrame, db: Session) -> int:
-    """Importar e atualizar participações desde DataFrame com validação em lote."""
-    # Salvar versão histórica antes de qualquer alteração
-    versao_id = await salvar_historico_participacoes(db)
-    print(f"Criada versão histórica: {versao_id}")
-    
+    resultado = _resultado_aplicacao(plano)
+    print(f"✅ Proprietários: {resultado['criados']} criados, {resultado['atualizados']} atualizados, "
+          f"{resultado['inalterados']} inalterados, {resultado['rejeitados']} rejeitados")
+    return resultado
+
+
+async def import_propietarios(df: pd.DataFrame, db: Session) -> Dict[str, Any]:
+    """Importar e atualizar proprietários desde DataFrame com sanitização."""
+    return aplicar_proprietarios(planejar_proprietarios(df, db), db)
+
+
+# --------------------------------------------
+# Imóveis
+# --------------------------------------------
+
+# Mapeamento de colunas da planilha de imóveis
+COLUMN_MAPPING_IMOVEIS = {
+    'nome': ['nome', 'nombre'],
+    'endereco': ['endereco_completo', 'endereço', 'endereco', 'direccion_completa', 'dirección completa'],
+    'tipo_imovel': ['tipo', 'tipo_imovel'],
+    'numero_quartos': ['quartos', 'dormitorios'],
+    'numero_banheiros': ['banheiros', 'baños', 'banos'],
+    'numero_vagas_garagem': ['garagens', 'cocheras', 'vagas'],
+    'area_total': ['area_total', 'área total', 'area total'],
+    'area_construida': ['area_construida', 'área construida', 'área construída', 'area construida'],
+    'valor_cadastral': ['valor_cadastral', 'valor catastral', 'valor cadastral'],
+    'valor_mercado': ['valor_mercado', 'valor mercado', 'valor de mercado'],
+    'iptu_mensal': ['iptu_mensal', 'iptu mensal'],
+    # IPTU anual é gravado como iptu_mensal (valor / 12) quando não há coluna mensal
+    'iptu_anual': ['iptu_anual', 'iptu anual', 'iptu'],
+    'condominio_mensal': ['condominio_mensal', 'condominio', 'condomínio', 'condominio mensal', 'condomínio mensal'],
+    'alugado': ['alugado', 'alquilado']
+}
+
+CAMPOS_INTEIROS_IMOVEIS = ['numero_quartos', 'numero_banheiros', 'numero_vagas_garagem']
+CAMPOS_DECIMAIS_IMOVEIS = ['area_total', 'area_construida', 'valor_cadastral', 'valor_mercado', 'iptu_mensal', 'condominio_mensal']
+
+
+def planejar_imoveis(df: pd.DataFrame, db: Session) -> Dict[str, Any]:
+    """
+    Calcula o plano de importação de imóveis pela chave única 'nome'.
+
+    Os campos numéricos são convertidos com pandas de forma vetorizada e apenas
+    as colunas presentes na planilha entram no diff.
+    """
     df = sanitize_dataframe(df)
-    new_participacoes = []
-    count = 0
-
-    # Mapeamento de colunas
-    column_mapping = {
-        'imovel_id': ['imovel_id', 'Imovel ID', 'IMOVEL_ID', 'inmueble_id', 'Inmueble ID', 'INMUEBLE_ID'],
-        'proprietario_id': ['proprietario_id', 'Proprietario ID', 'PROPRIETARIO_ID', 'propietario_id', 'Propietario ID', 'PROPIETARIO_ID'],
-        'porcentagem': ['porcentagem', 'Porcentagem', 'PORCENTAGEM', 'participacao', 'Participacao', 'PARTICIPACION']
-    }
+    colunas = resolver_colunas(df, COLUMN_MAPPING_IMOVEIS)
+
+    dados = pd.DataFrame(index=df.index)
+    dados['nome'] = coluna_texto(df, colunas, 'nome')
+    dados['endereco'] = coluna_texto(df, colunas, 'endereco')
+    if 'tipo_imovel' in colunas:
+        dados['tipo_imovel'] = coluna_texto(df, colunas, 'tipo_imovel')
+    for campo in CAMPOS_INTEIROS_IMOVEIS:
+        if campo in colunas:
+            dados[campo] = coluna_numerica(df, colunas, campo).round().astype('Int64')
+    for campo in CAMPOS_DECIMAIS_IMOVEIS:
+        if campo in colunas:
+            dados[campo] = coluna_numerica(df, colunas, campo).round(2)
+    if 'iptu_mensal' not in colunas and 'iptu_anual' in colunas:
+        dados['iptu_mensal'] = (coluna_numerica(df, colunas, 'iptu_anual') / 12).round(2)
+    if 'alugado' in colunas:
+        dados['alugado'] = normalizar_booleanos(df[colunas['alugado']], padrao=False)
+
+    validacao = ValidacaoColunar(dados)
+    validacao.rejeitar(dados['nome'].isna(), 'nome', "Nome do imóvel obrigatório")
+    validacao.rejeitar(dados['endereco'].isna(), 'endereco', "Endereço obrigatório")
+    validacao.rejeitar(dados.duplicated(subset=['nome'], keep='last'), 'nome', "Imóvel repetido na planilha (prevalece a última linha)")
+
+    diff = calcular_diff(db, Inmueble, _registros(dados[validacao.validos]), chave=['nome'])
+    return _montar_plano(
+        "imoveis",
+        novos=diff["novos"],
+        alterados=diff["alterados"],
+        inalterados=len(diff["inalterados"]),
+        conflitos=validacao.tabela_erros(),
+        operacoes={"upsert": diff["novos"] + [item["registro"] for item in diff["alterados"]]},
+        rotulo=lambda r: r['nome'],
+        verificacoes=[diff["verificacao"]]
+    )
+
+
+def aplicar_imoveis(plano: Dict[str, Any], db: Session) -> Dict[str, Any]:
+    """Grava o plano de imóveis num upsert em lote pela chave 'nome'."""
+    upsert_em_lote(db, Inmueble, plano["operacoes"]["upsert"], chave=['nome'])
+
+    resultado = _resultado_aplicacao(plano)
+    print(f"✅ Imóveis: {resultado['criados']} criados, {resultado['atualizados']} atualizados, "
+          f"{resultado['inalterados']} inalterados, {resultado['rejeitados']} rejeitados")
+    return resultado
+
+
+async def import_inmuebles(df: pd.DataFrame, db: Session) -> Dict[str, Any]:
+    """Importar e atualizar imóveis desde DataFrame com sanitização."""
+    return aplicar_imoveis(planejar_imoveis(df, db), db)
+
+
+# --------------------------------------------
+# Participações
+# --------------------------------------------
+
+# Mapeamento de colunas das planilhas tabulares de participações e aluguéis
+COLUMN_MAPPING_PARTICIPACOES = {
+    'imovel_id': ['imovel_id', 'imovel id', 'inmueble_id', 'inmueble id'],
+    'proprietario_id': ['proprietario_id', 'proprietario id', 'propietario_id', 'propietario id'],
+    'porcentagem': ['porcentagem', 'participacao', 'participação', 'participacion']
+}
+
+COLUMN_MAPPING_ALUGUEIS = {
+    'mes': ['mes', 'mês', 'meses'],
+    'ano': ['ano', 'anos'],
+    'valor_liquido_proprietario': ['valor_aluguel_propietario', 'valor_aluguel_proprietario', 'valor_aluguel', 'valor aluguel', 'valor_liquido_proprietario'],
+    'imovel_id': ['inmueble_id', 'imovel_id', 'imovel id'],
+    'proprietario_id': ['proprietario_id', 'proprietario id', 'propietario_id', 'propietario id']
+}
+
+
+def _validar_colunas_obrigatorias(validacao: ValidacaoColunar, df: pd.DataFrame, colunas: Dict[str, str], campos: List[str]) -> bool:
+    """Rejeita a planilha inteira se faltar alguma coluna obrigatória."""
+    faltantes = [campo for campo in campos if campo not in colunas]
+    for campo in faltantes:
+        validacao.erros.append({"linha": 1, "coluna": campo, "motivo": "Coluna obrigatória não encontrada"})
+    if faltantes:
+        validacao.invalido[:] = True
+    return not faltantes
+
+
+def _plano_participacoes(
+    db: Session,
+    data_type: str,
+    registros: List[Dict[str, Any]],
+    conflitos: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Compara as participações da planilha com as ativas dos mesmos imóveis.
 
-    def get_column_value(row, field_name):
-        possible_names = column_mapping.get(field_name, [field_name])
-        for name in possible_names:
-            if name in row.index and pd.notna(row[name]):
-                return row[name]
-        return None
+    A gravação cria uma nova versão para os imóveis da planilha; se nada mudou
+    (nenhuma inclusão, alteração ou remoção), o plano não tem operações.
+    """
+    imovel_ids = sorted({r['imovel_id'] for r in registros})
+    consulta = (Participacion, ['imovel_id'], ['proprietario_id', 'porcentagem'], imovel_ids)
+    linhas = consultar_linhas(db, *consulta, filtros={'ativo': True})
+    atuais = {(p.imovel_id, p.proprietario_id): float(p.porcentagem) for p in linhas}
+
+    novos, alterados, inalterados = [], [], 0
+    for registro in registros:
+        atual = atuais.get((registro['imovel_id'], registro['proprietario_id']))
+        if atual is None:
+            novos.append(registro)
+        elif abs(atual - registro['porcentagem']) > 1e-6:
+            alterados.append({
+                "registro": registro,
+                "alteracoes": {"porcentagem": {"atual": atual, "novo": registro['porcentagem']}}
+            })
+        else:
+            inalterados += 1
+
+    chaves_planilha = {(r['imovel_id'], r['proprietario_id']) for r in registros}
+    removidas = [chave for chave in atuais if chave not in chaves_planilha]
+    houve_mudanca = bool(novos or alterados or removidas)
+
+    plano = _montar_plano(
+        data_type,
+        novos=novos,
+        alterados=alterados,
+        inalterados=inalterados,
+        conflitos=conflitos,
+        operacoes={
+            "imovel_ids": imovel_ids if houve_mudanca else [],
+            "registros": registros if houve_mudanca else []
+        },
+        rotulo=lambda r: f"imóvel {r['imovel_id']} / proprietário {r['proprietario_id']}",
+        verificacoes=[verificacao_linhas(*consulta, linhas, filtros={'ativo': True})]
+    )
+    plano["resumo"]["desativar"] = len(removidas)
+    return plano
+
+
+async def aplicar_participacoes(plano: Dict[str, Any], db: Session) -> Dict[str, Any]:
+    """Grava uma nova versão das participações dos imóveis do plano."""
+    operacoes = plano["operacoes"]
+    if operacoes["registros"]:
+        # Salvar versão histórica antes de qualquer alteração
+        versao_id = await salvar_historico_participacoes(db)
+        print(f"Criada versão histórica: {versao_id}")
 
-    # Desativar todas as participações existentes que serão atualizadas
-    imovel_ids_in_df = pd.to_numeric(df.apply(lambda row: get_column_value(row, 'imovel_id'), axis=1), errors='coerce').dropna().unique().tolist()
-    if imovel_ids_in_df:
         db.query(Participacion).filter(
-            Participacion.imovel_id.in_(imovel_ids_in_df),
+            Participacion.imovel_id.in_(operacoes["imovel_ids"]),
             Participacion.ativo == True
         ).update({"ativo": False}, synchronize_session=False)
-        db.commit()
-        print(f"Desativadas participações existentes para {len(imovel_ids_in_df)} imóveis.")
 
-    current_timestamp = datetime.utcnow()
-    for index, row in df.iterrows():
-        try:
-            imovel_id = get_column_value(row, 'imovel_id')
-            proprietario_id = get_column_value(row, 'proprietario_id')
-            porcentagem = get_column_value(row, 'porcentagem')
+        data_registro = ParticipacaoService.reservar_versao(db)
+        db.bulk_insert_mappings(Participacion, [
+            {**registro, "ativo": True, "data_registro": data_registro}
+            for registro in operacoes["registros"]
+        ])
+        print(f"Inseridas {len(operacoes['registros'])} participações na nova versão.")
+    return _resultado_aplicacao(plano)
 
-            if not all([imovel_id, proprietario_id, porcentagem]):
-                print(f"Linha {index+2}: Dados incompletos, pulando.")
-                continue
 
-            # Validações (poderiam ser mais robustas)
-            imovel_id = int(imovel_id)
-            proprietario_id = int(proprietario_id)
-            porcentagem = float(porcentagem)
+def planejar_participacoes(df: pd.DataFrame, db: Session) -> Dict[str, Any]:
+    """
+    Calcula o plano de importação de participações em formato tabular.
+
+    A validação é feita por colunas (tipos, faixas e chaves estrangeiras em lote)
+    e as linhas rejeitadas vão para a tabela de conflitos (linha, coluna, motivo).
+    """
+    df = sanitize_dataframe(df)
+    colunas = resolver_colunas(df, COLUMN_MAPPING_PARTICIPACOES)
+    validacao = ValidacaoColunar(df)
+
+    if not _validar_colunas_obrigatorias(validacao, df, colunas, list(COLUMN_MAPPING_PARTICIPACOES)):
+        return _plano_participacoes(db, "participacoes", [], validacao.tabela_erros())
+
+    dados = pd.DataFrame({campo: coluna_numerica(df, colunas, campo) for campo in COLUMN_MAPPING_PARTICIPACOES})
+    validacao.rejeitar_nao_inteiros(dados['imovel_id'], 'imovel_id')
+    validacao.rejeitar_nao_inteiros(dados['proprietario_id'], 'proprietario_id')
+    validacao.rejeitar(dados['porcentagem'].isna(), 'porcentagem', "Porcentagem ausente ou não numérica")
+    validacao.rejeitar(~dados['porcentagem'].between(0, 100, inclusive='right'), 'porcentagem', "Porcentagem deve estar entre 0 e 100")
+    validacao.rejeitar_inexistentes(db, dados['imovel_id'], Inmueble.id, 'imovel_id', "Imóvel")
+    validacao.rejeitar_inexistentes(db, dados['proprietario_id'], Propietario.id, 'proprietario_id', "Proprietário")
+    validacao.rejeitar_duplicados(dados, ['imovel_id', 'proprietario_id'], 'proprietario_id', "Participação repetida na planilha (prevalece a última linha)")
 
-            if not (0 < porcentagem <= 100):
-                 print(f"Linha {index+2}: Porcentagem inválida ({porcentagem}), pulando.")
-                 continue
+    validos = dados[validacao.validos].astype({'imovel_id': 'int64', 'proprietario_id': 'int64'})
+    return _plano_participacoes(db, "participacoes", _registros(validos), validacao.tabela_erros())
 
-            new_participacoes.append({
-                "imovel_id": imovel_id,
+
+async def import_participacoes(df: pd.DataFrame, db: Session) -> Dict[str, Any]:
+    """Importar e atualizar participações desde DataFrame tabular."""
+    return await aplicar_participacoes(planejar_participacoes(df, db), db)
+
+
+# Colunas da planilha matricial de participações que não são de proprietários
+COLUNAS_FIXAS_PARTICIPACOES = {'Nome', 'Endereço', 'VALOR'}
+
+
+def matcher_proprietarios(db: Session) -> AutomatoNomes:
+    """
+    Autômato com os nomes dos proprietários ativos, montado uma vez por importação.
+
+    Cada proprietário entra pelo nome completo e pelo primeiro nome; cabeçalhos
+    são associados ao nome mais longo que contêm. Nomes iguais ficam com o
+    proprietário de menor id.
+    """
+    proprietarios = db.query(Propietario.id, Propietario.nome, Propietario.sobrenome).filter(
+        Propietario.ativo == True
+    ).order_by(Propietario.id).all()
+    nomes = [(f"{p.nome} {p.sobrenome or ''}", p.id) for p in proprietarios]
+    nomes += [(p.nome, p.id) for p in proprietarios]
+    return AutomatoNomes(nomes)
+
+
+def planejar_participacoes_matricial(df: pd.DataFrame, db: Session, matcher: Optional[AutomatoNomes] = None) -> Dict[str, Any]:
+    """Calcula o plano de participações desde DataFrame matricial (imóveis x proprietários)."""
+    df = sanitize_dataframe(df)
+    conflitos = []
+    linhas_planilha = pd.Series(range(2, len(df) + 2), index=df.index)
+
+    nomes_imoveis = df['Nome'].astype("string").str.strip() if 'Nome' in df.columns else pd.Series(dtype="string")
+    existing_imoveis = {}
+    for bloco in em_blocos(nomes_imoveis.dropna().unique().tolist()):
+        existing_imoveis.update({i.nome: i.id for i in db.query(Inmueble.id, Inmueble.nome).filter(Inmueble.nome.in_(list(bloco))).all()})
+
+    # Detectar formato: Nnnn* (ordinal) ou nomes reais de proprietários
+    nnnn_columns = [col for col in df.columns if str(col).startswith('Nnnn')]
+    if nnnn_columns:
+        proprietarios_ordenados = db.query(Propietario.id).order_by(Propietario.nome, Propietario.sobrenome).all()
+        proprietario_mapping = {
+            col: proprietarios_ordenados[i].id
+            for i, col in enumerate(nnnn_columns) if i < len(proprietarios_ordenados)
+        }
+    else:
+        matcher = matcher or matcher_proprietarios(db)
+        proprietario_mapping = matcher.mapear(c for c in df.columns if c not in COLUNAS_FIXAS_PARTICIPACOES)
+
+    if not proprietario_mapping:
+        conflitos.append({"linha": 1, "coluna": "", "motivo": "Nenhuma coluna de proprietário válida encontrada"})
+        return _plano_participacoes(db, "participacoes_matricial", [], conflitos)
+
+    imovel_ids = nomes_imoveis.map(existing_imoveis)
+    sem_imovel = imovel_ids.isna() & nomes_imoveis.notna()
+    conflitos.extend(
+        {"linha": int(linha), "coluna": "Nome", "motivo": "Imóvel não encontrado"}
+        for linha in linhas_planilha[sem_imovel]
+    )
+
+    registros = {}
+    for col, proprietario_id in proprietario_mapping.items():
+        porcentagens = pd.to_numeric(df[col], errors='coerce')
+        validos = imovel_ids.notna() & (porcentagens > 0)
+        for imovel_id, porcentagem in zip(imovel_ids[validos], porcentagens[validos]):
+            registros[(int(imovel_id), proprietario_id)] = {
+                "imovel_id": int(imovel_id),
                 "proprietario_id": proprietario_id,
-                "porcentagem": porcentagem,
-                "ativo": True,
-                "data_registro": current_timestamp
-            })
-        except (ValueError, TypeError) as e:
-            print(f"Erro processando linha {index+2}: {e}")
-            continue
-
-    if new_participacoes:
-        db.bulk_insert_mappings(Participacion, new_participacoes)
-        count = len(new_participacoes)
-        print(f"Inseridas {count} novas participações.")
-    
-    return count
+                "porcentagem": round(float(porcentagem), 8)
+            }
 
-async def import_alquileres(df: pd.DataFrame, db: Session) -> int:
-    """Importar dados de aluguel"""
-    errors = []
-    new_alugueis = []
-    count = 0
-    
-    # Mapeamento de colunas para maior flexibilidade
-    column_mapping = {
-        'mes': ['mes', 'Mes', 'MES', 'meses', 'Meses', 'MESES'],
-        'ano': ['ano', 'Ano', 'ANO', 'ano', 'Ano', 'ANOS'],
-        'valor_aluguel_propietario': ['valor_aluguel_propietario', 'valor_aluguel', 'Valor Aluguel', 'VALOR_ALUGUEL'],
-        'inmueble_id': ['inmueble_id', 'imovel_id', 'Imovel ID', 'IMOVEL_ID'],
-        'proprietario_id': ['proprietario_id', 'Proprietario ID', 'PROPRIETARIO_ID', 'propietario_id', 'Propietario ID', 'PROPIETARIO_ID']
-    }
-    
-    # Normalizar nomes de colunas
-    def get_column_value(row, field_name):
-        possible_names = column_mapping.get(field_name, [field_name])
-        for name in possible_names:
-            if name in row.index:
-                return row.get(name)
-        return None
+    return _plano_participacoes(
+        db, "participacoes_matricial", list(registros.values()),
+        sorted(conflitos, key=lambda e: e["linha"])
+    )
 
-    for idx, row in df.iterrows():
-        try:
-            mes = row['mes']
-            ano = row['ano']
-            valor_aluguel_propietario = row['valor_aluguel_propietario']
-            inmueble_id = row['inmueble_id']
-            proprietario_id = row['proprietario_id']
-
-            # Validar e converter tipos
-            if pd.isna(mes) or pd.isna(ano) or pd.isna(valor_aluguel_propietario) or pd.isna(inmueble_id) or pd.isna(proprietario_id):
-                errors.append(f"Linha {idx + 2}: Dados faltantes")
-                continue
-            
-            if not isinstance(mes, int) or not isinstance(ano, int):
-                errors.append(f"Linha {idx + 2}: Mês e ano devem ser inteiros")
-                continue
-            
-            if not (1 <= mes <= 12):
-                errors.append(f"Linha {idx + 2}: Mês inválido")
-                continue
-            
-            # Adicionar novo aluguel
-            new_alugueis.append({
+
+async def import_participacoes_matricial(df: pd.DataFrame, db: Session, matcher: Optional[AutomatoNomes] = None) -> Dict[str, Any]:
+    """Importar participações desde DataFrame matricial (formato especial do Excel)"""
+    return await aplicar_participacoes(planejar_participacoes_matricial(df, db, matcher), db)
+
+
+# --------------------------------------------
+# Aluguéis
+# --------------------------------------------
+
+def _plano_alugueis(db: Session, registros: List[Dict[str, Any]], conflitos: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Compara os aluguéis da planilha com o banco pela chave imóvel/proprietário/mês/ano."""
+    diff = AluguelService.classificar_lote(db, registros)
+    return _montar_plano(
+        "alugueis",
+        novos=diff["novos"],
+        alterados=diff["alterados"],
+        inalterados=len(diff["inalterados"]),
+        conflitos=conflitos,
+        operacoes={"upsert": diff["novos"] + [item["registro"] for item in diff["alterados"]]},
+        rotulo=lambda r: f"imóvel {r['imovel_id']} / proprietário {r['proprietario_id']} - {r['mes']:02d}/{r['ano']}",
+        verificacoes=[diff["verificacao"]]
+    )
+
+
+def aplicar_alugueis(plano: Dict[str, Any], db: Session) -> Dict[str, Any]:
+    """Grava o plano de aluguéis pelo mesmo upsert em lote da API /api/alugueis/lote."""
+    AluguelService.gravar_lote(db, plano["operacoes"]["upsert"])
+    return _resultado_aplicacao(plano)
+
+
+def planejar_alugueis(df: pd.DataFrame, db: Session) -> Dict[str, Any]:
+    """
+    Calcula o plano de importação de aluguéis em formato tabular.
+
+    A validação é a mesma do upsert em lote da API (AluguelService.validar_lote):
+    mês/ano inteiros independentemente do dtype do pandas, faixas e chaves
+    estrangeiras verificadas em lote.
+    """
+    colunas = resolver_colunas(df, COLUMN_MAPPING_ALUGUEIS)
+    validacao = ValidacaoColunar(df)
+
+    if not _validar_colunas_obrigatorias(validacao, df, colunas, list(COLUMN_MAPPING_ALUGUEIS)):
+        return _plano_alugueis(db, [], validacao.tabela_erros())
+
+    dados = pd.DataFrame({campo: coluna_numerica(df, colunas, campo) for campo in COLUMN_MAPPING_ALUGUEIS})
+    AluguelService.validar_lote(db, dados, validacao)
+
+    validos = dados[validacao.validos].astype({c: 'int64' for c in CHAVE_ALUGUEL})
+    return _plano_alugueis(db, _registros(validos), validacao.tabela_erros())
+
+
+async def import_alquileres(df: pd.DataFrame, db: Session) -> Dict[str, Any]:
+    """Importar dados de aluguel em formato tabular."""
+    return aplicar_alugueis(planejar_alugueis(df, db), db)
+
+
+MESES_PLANILHA = {
+    'Jan': 1, 'Feb': 2, 'Fev': 2, 'Mar': 3, 'Apr': 4, 'Abr': 4, 'May': 5, 'Mai': 5,
+    'Jun': 6, 'Jul': 7, 'Aug': 8, 'Ago': 8, 'Sep': 9, 'Set': 9, 'Oct': 10, 'Out': 10,
+    'Nov': 11, 'Dec': 12, 'Dez': 12
+}
+
+
+def periodo_da_planilha(sheet_name: str) -> Optional[tuple]:
+    """Extrai (mês, ano) do nome da planilha, ex.: 'Jan2025' ou 'Set 24'."""
+    for abreviacao, mes in MESES_PLANILHA.items():
+        if abreviacao in sheet_name:
+            resto = re.sub(r'\D', '', sheet_name.replace(abreviacao, ''))
+            if not resto:
+                return None
+            ano = int(resto)
+            return mes, ano + 2000 if ano < 100 else ano
+    return None
+
+
+def _localizar_imoveis(enderecos: pd.Series, imoveis) -> pd.Series:
+    """
+    Associa cada endereço da planilha a um imóvel, procurando o texto primeiro
+    no endereço e depois no nome (sem distinguir maiúsculas), como um ILIKE '%x%'.
+    """
+    candidatos = [(i.id, (i.endereco or '').lower(), (i.nome or '').lower()) for i in imoveis]
+    encontrados = {}
+    for endereco in enderecos.dropna().unique():
+        termo = endereco.lower()
+        encontrado = next((id_ for id_, end, _ in candidatos if termo in end), None)
+        if encontrado is None:
+            encontrado = next((id_ for id_, _, nome in candidatos if termo in nome), None)
+        encontrados[endereco] = encontrado
+    return enderecos.map(encontrados)
+
+
+def planejar_alugueis_matricial(df: pd.DataFrame, db: Session, matcher: Optional[AutomatoNomes] = None) -> Dict[str, Any]:
+    """
+    Calcula o plano de aluguéis no formato matricial (endereço x proprietários).
+
+    O período vem do nome da planilha (df.attrs['sheet_name']). Imóveis e
+    proprietários são carregados uma única vez e o diff com o banco é set-based.
+    """
+    sheet_name = df.attrs.get('sheet_name', '')
+    periodo = periodo_da_planilha(sheet_name)
+    if not periodo or not 2020 <= periodo[1] <= 2060:
+        conflito = {"linha": 1, "coluna": "", "motivo": f"Período não identificado no nome da planilha '{sheet_name}'"}
+        return _plano_alugueis(db, [], [conflito])
+    mes, ano = periodo
+
+    conflitos = []
+    linhas_planilha = pd.Series(range(2, len(df) + 2), index=df.index)
+    endereco_col = df.columns[0]
+    enderecos = df[endereco_col].astype("string").str.strip().replace("", pd.NA)
+
+    imovel_ids = _localizar_imoveis(enderecos, db.query(Inmueble.id, Inmueble.nome, Inmueble.endereco).order_by(Inmueble.id).all())
+    sem_imovel = enderecos.notna() & imovel_ids.isna()
+    conflitos.extend(
+        {"linha": int(linha), "coluna": str(endereco_col), "motivo": "Imóvel não encontrado para o endereço"}
+        for linha in linhas_planilha[sem_imovel]
+    )
+
+    mapeamento = (matcher or matcher_proprietarios(db)).mapear(df.columns[1:])
+
+    registros = {}
+    for col, proprietario_id in mapeamento.items():
+        valores = pd.to_numeric(df[col], errors='coerce')
+        nao_numericos = df[col].notna() & valores.isna() & imovel_ids.notna()
+        conflitos.extend(
+            {"linha": int(linha), "coluna": str(col), "motivo": "Valor não numérico"}
+            for linha in linhas_planilha[nao_numericos]
+        )
+        validos = imovel_ids.notna() & valores.notna()
+        for imovel_id, valor in zip(imovel_ids[validos], valores[validos]):
+            registros[(int(imovel_id), proprietario_id)] = {
+                "imovel_id": int(imovel_id),
+                "proprietario_id": proprietario_id,
                 "mes": mes,
                 "ano": ano,
-                "valor_liquido_proprietario": valor_aluguel_propietario,
-                "imovel_id": inmueble_id,
-                "proprietario_id": proprietario_id
-            })
-        
-        except Exception as e:
-            print(f"Erro processando aluguel na linha {idx}: {e}")
-            continue
-    
-    if new_alugueis:
-        db.bulk_insert_mappings(AluguelSimples, new_alugueis)
-        count += len(new_alugueis)
-    
-    return count
+                "valor_liquido_proprietario": float(valor)
+            }
+
+    return _plano_alugueis(db, list(registros.values()), sorted(conflitos, key=lambda e: e["linha"]))
 
 
-async def import_alquileres_matricial(df: pd.DataFrame, db: Session) -> int:
+async def import_alquileres_matricial(df: pd.DataFrame, db: Session, matcher: Optional[AutomatoNomes] = None) -> Dict[str, Any]:
     """Importar dados de aluguéis no formato matricial (endereço x proprietários)"""
-    count = 0
-    
-    # Extrair mês e ano do nome da planilha (ex: "Jan2025" -> mes=1, ano=2025)
-    sheet_name = df.attrs.get('sheet_name', '')
-    print(f"Processando planilha: {sheet_name}")
-    
-    if 'Jan' in sheet_name:
-        mes, ano = 1, int(sheet_name.replace('Jan', ''))
-    elif 'Feb' in sheet_name:
-        mes, ano = 2, int(sheet_name.replace('Feb', ''))
-    elif 'Mar' in sheet_name:
-        mes, ano = 3, int(sheet_name.replace('Mar', ''))
-    elif 'Apr' in sheet_name:
-        mes, ano = 4, int(sheet_name.replace('Apr', ''))
-    elif 'May' in sheet_name:
-        mes, ano = 5, int(sheet_name.replace('May', ''))
-    elif 'Jun' in sheet_name:
-        mes, ano = 6, int(sheet_name.replace('Jun', ''))
-    elif 'Jul' in sheet_name:
-        mes, ano = 7, int(sheet_name.replace('Jul', ''))
-    elif 'Ago' in sheet_name:
-        mes, ano = 8, int(sheet_name.replace('Ago', ''))
-    elif 'Set' in sheet_name:
-        mes, ano = 9, int(sheet_name.replace('Set', ''))
-    elif 'Oct' in sheet_name:
-        mes, ano = 10, int(sheet_name.replace('Oct', ''))
-    elif 'Out' in sheet_name:
-        mes, ano = 10, int(sheet_name.replace('Out', ''))
-    elif 'Nov' in sheet_name:
-        mes, ano = 11, int(sheet_name.replace('Nov', ''))
-    elif 'Dec' in sheet_name:
-        mes, ano = 12, int(sheet_name.replace('Dec', ''))
-    
-    # Ajustar ano se for abreviado (ex: 25 -> 2025)
-    if ano < 100:
-        ano += 2000
-    
-    print(f"Mês: {mes}, Ano: {ano}")
-    
-    # Carregar todos os proprietários ativos da base de dados
-    proprietarios_db = db.query(Propietario).filter(Propietario.ativo == True).all()
-    proprietario_nomes = [prop.nome for prop in proprietarios_db]
-    
-    print(f"Proprietários carregados da BD: {len(proprietario_nomes)} - {proprietario_nomes}")
-    
-    # Mapear nomes de proprietários para IDs
-    proprietario_map = {prop.nome: prop.id for prop in proprietarios_db}
-    
-    new_alugueis = []
-    
-    for idx, row in df.iterrows():
-        try:
-            # A primeira coluna é o endereço do imóvel
-            endereco_col = df.columns[0]
-            endereco = str(row[endereco_col]).strip() if not pd.isna(row[endereco_col]) else ""
-            
-            if not endereco:
+    return aplicar_alugueis(planejar_alugueis_matricial(df, db, matcher), db)
+
+
+# --------------------------------------------
+# Despacho por tipo de planilha
+# --------------------------------------------
+
+# Chave usada em records_imported para cada tipo de plano
+CHAVES_CONTAGEM = {
+    "proprietarios": "proprietarios",
+    "imoveis": "imoveis",
+    "participacoes": "participacoes",
+    "participacoes_matricial": "participacoes",
+    "alugueis": "alugueis"
+}
+
+
+def e_alugueis_matricial(df: pd.DataFrame, matcher: AutomatoNomes) -> bool:
+    """Planilhas de aluguéis com 3+ colunas de proprietários estão no formato matricial."""
+    return len(matcher.mapear(df.columns)) >= 3
+
+
+def planejar_planilha(
+    df: pd.DataFrame,
+    sheet_name: str,
+    data_type: str,
+    db: Session,
+    matcher: Optional[AutomatoNomes] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Calcula o plano de importação de uma planilha conforme o tipo detectado.
+
+    O autômato de proprietários deve ser o mesmo para todas as planilhas do
+    arquivo; se não for informado, é montado aqui.
+
+    Returns:
+        Plano da planilha ou None para tipos desconhecidos
+    """
+    if data_type == "proprietarios":
+        return planejar_proprietarios(df, db)
+    if data_type == "imoveis":
+        return planejar_imoveis(df, db)
+    if data_type == "participacoes":
+        return planejar_participacoes(df, db)
+    matcher = matcher or matcher_proprietarios(db)
+    if data_type == "participacoes_matricial":
+        return planejar_participacoes_matricial(df, db, matcher)
+    if data_type == "alugueis":
+        if e_alugueis_matricial(df, matcher):
+            df.attrs['sheet_name'] = sheet_name
+            return planejar_alugueis_matricial(df, db, matcher)
+        return planejar_alugueis(df, db)
+    return None
+
+
+# Ordem em que as planilhas de um arquivo são planejadas e aplicadas:
+# cada tipo pode referenciar registros criados pelos anteriores
+ORDEM_DEPENDENCIAS = {
+    "proprietarios": 0,
+    "imoveis": 1,
+    "participacoes": 2,
+    "participacoes_matricial": 2,
+    "alugueis": 3
+}
+
+
+def _tem_operacoes(plano: Dict[str, Any]) -> bool:
+    """Indica se aplicar o plano grava alguma coisa."""
+    return any(bool(valor) for valor in plano["operacoes"].values())
+
+
+async def planejar_arquivo(
+    processor: "FileProcessor",
+    db: Session,
+    reimportar: bool = False
+) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Planeja todas as planilhas do arquivo em ordem de dependência, sem gravar.
+
+    Cada plano é aplicado num SAVEPOINT antes de planejar a próxima planilha,
+    para que ela veja os proprietários e imóveis novos do arquivo; o tipo das
+    planilhas restantes é detectado de novo a cada passo, pois planilhas
+    matriciais são reconhecidas pelos nomes dos proprietários. No fim o
+    SAVEPOINT é desfeito. Planos calculados depois de alguma gravação simulada
+    são marcados com 'depende' e recalculados por /import.
+
+    Returns:
+        (planos por planilha, na ordem de aplicação; planilhas já importadas)
+    """
+    planos: Dict[str, Dict[str, Any]] = {}
+    planilhas_ignoradas = []
+    pendentes = list(processor.sheets_data)
+    houve_escrita = False
+
+    simulacao = db.begin_nested()
+    try:
+        while pendentes:
+            tipos = {nome: processor.detect_data_type(processor.sheets_data[nome], nome) for nome in pendentes}
+            conhecidas = [nome for nome in pendentes if tipos[nome] in ORDEM_DEPENDENCIAS]
+            if not conhecidas:
+                break
+            # min mantém a ordem do arquivo entre planilhas do mesmo tipo
+            sheet_name = min(conhecidas, key=lambda nome: ORDEM_DEPENDENCIAS[tipos[nome]])
+            pendentes.remove(sheet_name)
+            data_type = tipos[sheet_name]
+            df = processor.sheets_data[sheet_name]
+
+            periodo = periodo_planilha(df, sheet_name, data_type, processor.matcher)
+            assinatura = {"hash": hash_planilha(df, data_type, periodo), "periodo": periodo}
+            anterior = None if reimportar else planilhas_ja_importadas(db, [assinatura["hash"]]).get(assinatura["hash"])
+            if anterior is not None:
+                planilhas_ignoradas.append({
+                    "sheet_name": sheet_name,
+                    "data_type": data_type,
+                    "periodo": periodo,
+                    "importado_em": anterior.data_importacao.isoformat() if anterior.data_importacao else None,
+                    "arquivo_original": anterior.nome_arquivo
+                })
                 continue
-            
-            print(f"Processando linha {idx+1}: endereço '{endereco}'")
-            
-            # Encontrar o imóvel pelo endereço
-            imovel = db.query(Inmueble).filter(
-                Inmueble.endereco.ilike(f'%{endereco}%')
-            ).first()
-            
-            if not imovel:
-                # Tentar sem "Rua " no início
-                imovel = db.query(Inmueble).filter(
-                    Inmueble.endereco.ilike(f'%{endereco}%') |
-                    Inmueble.nome.ilike(f'%{endereco}%')
-                ).first()
-            
-            if not imovel:
-                print(f"Imóvel não encontrado para endereço: '{endereco}'")
+
+            plano = planejar_planilha(df, sheet_name, data_type, db, processor.matcher)
+            if plano is None:
                 continue
-            
-            print(f"Imóvel encontrado: {imovel.nome} (ID: {imovel.id}) para endereço: '{endereco}'")
-            
-            # Para cada coluna de proprietário, criar um registro de aluguel
-            for col_name in df.columns[1:]:  # Pular a primeira coluna (endereço)
-                # Verificar se é uma coluna de proprietário
-                proprietario_nome = None
-                for nome in proprietario_nomes:
-                    if nome in str(col_name):
-                        proprietario_nome = nome
-                        break
-                
-                if proprietario_nome and proprietario_nome in proprietario_map:
-                    valor = row[col_name]
-                    print(f"  Raw valor de {col_name}: '{valor}' (tipo: {type(valor)}, pd.notna: {pd.notna(valor)})")
-                    if pd.notna(valor):
-                        es_negativo = isinstance(valor, (int, float)) and float(valor) < 0
-                        if es_negativo:
-                            print(f"  🔴 VALOR NEGATIVO DETECTADO: {proprietario_nome} = {valor}")
-                        # Verificar se já existe um registro para esta combinação
-                        existing = db.query(AluguelSimples).filter(
-                            AluguelSimples.imovel_id == imovel.id,
-                            AluguelSimples.proprietario_id == proprietario_map[proprietario_nome],
-                            AluguelSimples.mes == mes,
-                            AluguelSimples.ano == ano
-                        ).first()
-                        
-                        if not existing:
-                            try:
-                                valor_float = float(valor)
-                                new_alugueis.append({
-                                    "mes": mes,
-                                    "ano": ano,
-                                    "valor_liquido_proprietario": valor_float,
-                                    "imovel_id": imovel.id,
-                                    "proprietario_id": proprietario_map[proprietario_nome]
-                                })
-                                print(f"  ✅ Aluguel criado: {proprietario_nome} - R$ {valor_float}")
-                            except ValueError as e:
-                                print(f"  ❌ Erro convertendo valor '{valor}' para float: {e}")
-                        else:
-                            print(f"  Aluguel já existe: {proprietario_nome} - ignorando")
-                else:
-                    print(f"  Proprietário não encontrado para coluna: {col_name}")
-        
-        except Exception as e:
-            print(f"Erro processando linha {idx} da planilha {sheet_name}: {e}")
-            continue
-    
-    if new_alugueis:
-        db.bulk_insert_mappings(AluguelSimples, new_alugueis)
-        count += len(new_alugueis)
-        print(f"Importados {count} registros de aluguel da planilha {sheet_name}")
+            plano.update(assinatura)
+            plano["depende"] = houve_escrita
+            planos[sheet_name] = plano
 
-    
-    return count
+            if _tem_operacoes(plano):
+                await aplicar_plano(plano, db)
+                houve_escrita = True
+                if data_type == "proprietarios":
+                    processor.recarregar_matcher()
+    finally:
+        simulacao.rollback()
+    return planos, planilhas_ignoradas
+
+
+def replanejar_plano(plano: Dict[str, Any], sheet_name: str, df: pd.DataFrame, db: Session) -> Dict[str, Any]:
+    """
+    Recalcula, na transação de /import, o plano de uma planilha que depende das anteriores.
+
+    Os ids dos proprietários e imóveis criados pelas planilhas anteriores do
+    arquivo só existem depois que elas são aplicadas. O novo plano precisa ter
+    o mesmo resumo que /process mostrou; se não tiver, os dados mudaram.
+
+    Raises:
+        HTTPException: 409 se o resumo divergir do mostrado em /process
+    """
+    novo = planejar_planilha(df, sheet_name, plano["data_type"], db, matcher_proprietarios(db))
+    if novo is None or novo["resumo"] != plano["resumo"]:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Os dados mudaram desde o processamento ({sheet_name}); processe o arquivo novamente"
+        )
+    novo.update(hash=plano["hash"], periodo=plano["periodo"], depende=True)
+    return novo
+
+
+# Modelos que aparecem nas verificações dos planos, pelo nome da tabela
+MODELOS_VERIFICADOS = {m.__tablename__: m for m in (Propietario, Inmueble, Participacion, AluguelSimples)}
+
+
+def plano_desatualizado(plano: Dict[str, Any], db: Session) -> bool:
+    """Indica se alguma linha em que o plano se baseou mudou no banco depois de /process."""
+    return any(
+        linhas_alteradas(db, MODELOS_VERIFICADOS[verificacao["tabela"]], verificacao)
+        for verificacao in plano.get("verificacoes", [])
+    )
+
+
+async def aplicar_plano(plano: Dict[str, Any], db: Session) -> Dict[str, Any]:
+    """Aplica o plano de uma planilha conforme o tipo."""
+    data_type = plano["data_type"]
+    if data_type == "proprietarios":
+        return aplicar_proprietarios(plano, db)
+    if data_type == "imoveis":
+        return aplicar_imoveis(plano, db)
+    if data_type in ("participacoes", "participacoes_matricial"):
+        return await aplicar_participacoes(plano, db)
+    if data_type == "alugueis":
+        return aplicar_alugueis(plano, db)
+    raise ValueError(f"Tipo de plano desconhecido: {data_type}")
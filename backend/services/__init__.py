@@ -4,10 +4,18 @@ from .aluguel_service import AluguelService
 from .participacao_service import ParticipacaoService
 from .proprietario_service import ProprietarioService
 from .imovel_service import ImovelService
+from .informe_rendimentos_service import InformeRendimentosService
+from .carne_leao_service import CarneLeaoService
+from .extrato_service import ExtratoService
+from .analise_imoveis_service import AnaliseImoveisService
 
 __all__ = [
     "AluguelService",
     "ParticipacaoService", 
     "ProprietarioService",
-    "ImovelService"
+    "ImovelService",
+    "InformeRendimentosService",
+    "CarneLeaoService",
+    "ExtratoService",
+    "AnaliseImoveisService"
 ]
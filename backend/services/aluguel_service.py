@@ -3,12 +3,39 @@ Serviço de Alugueis - Camada de Lógica de Negócio
 Centraliza toda a lógica relacionada a alugueis
 """
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, and_, extract
-from typing import List, Dict, Optional, Any
+from sqlalchemy import func, and_, extract, tuple_
+from sqlalchemy.exc import IntegrityError
+from typing import List, Dict, Optional, Any, Tuple
 from datetime import datetime, date
 from decimal import Decimal
 
-from models_final import AluguelSimples, Proprietario, Imovel
+import numpy as np
+import pandas as pd
+
+from models_final import AluguelSimples, PeriodoAluguel, Proprietario, Imovel
+from utils.bulk_upsert import ValidacaoColunar, calcular_diff, upsert_em_lote, em_blocos, filtro_chave_em
+from .carne_leao_service import CarneLeaoService
+
+# Chave natural de um aluguel (restrição única uq_aluguel_simples_periodo)
+CHAVE_ALUGUEL = ['imovel_id', 'proprietario_id', 'mes', 'ano']
+
+# Colunas de valor aceitas no upsert em lote (a taxa é opcional por linha)
+COLUNAS_VALOR_ALUGUEL = ['valor_liquido_proprietario', 'taxa_administracao_total']
+
+# Causa de cada restrição da tabela alugueis (o nome vale também para a cópia
+# "_particionada" criada por particionar_alugueis.py)
+MOTIVOS_RESTRICOES_ALUGUEL = {
+    'uq_aluguel_simples_periodo': "Já existe um aluguel para este imóvel/proprietário neste período",
+    'alugueis_simples_mes_check': "Mês deve estar entre 1 e 12",
+    'alugueis_simples_ano_check': "Ano deve estar entre 2020 e 2060",
+    'alugueis_simples_taxa_check': "Taxa de administração não pode ser negativa",
+}
+
+# SQLite não informa o nome da restrição única, só as colunas
+UNICIDADE_PERIODO_SQLITE = "UNIQUE constraint failed: " + ", ".join(f"alugueis.{c}" for c in CHAVE_ALUGUEL)
+
+# Máximo de linhas por requisição de upsert em lote
+LIMITE_LOTE_ALUGUEIS = 10000
 
 
 class AluguelService:
@@ -184,22 +211,10 @@ class AluguelService:
         Returns:
             Dicionário com totais mensais
         """
-        from models_final import AluguelSimples
         import calendar
         
-        # Obter todos os períodos disponíveis ordenados por data
-        resultado = db.query(
-            AluguelSimples.ano,
-            AluguelSimples.mes,
-            func.sum(AluguelSimples.valor_liquido_proprietario).label('total_mes'),
-            func.count(AluguelSimples.id).label('quantidade_alugueis')
-        ).group_by(
-            AluguelSimples.ano,
-            AluguelSimples.mes
-        ).order_by(
-            AluguelSimples.ano.desc(),
-            AluguelSimples.mes.desc()
-        ).limit(limite_meses).all()
+        # Totais por período vêm do catálogo, sem agregar a tabela alugueis
+        resultado = AluguelService.listar_periodos(db, limite=limite_meses)
         
         if not resultado:
             return {
@@ -220,8 +235,8 @@ class AluguelService:
                 'ano': row.ano,
                 'mes': row.mes,
                 'periodo': periodo_label,
-                'total_valor': float(row.total_mes),
-                'quantidade_alugueis': int(row.quantidade_alugueis)
+                'total_valor': float(row.total_valor_liquido),
+                'quantidade_alugueis': int(row.quantidade)
             })
         
         return {
@@ -229,6 +244,76 @@ class AluguelService:
             'total_periodos': len(totais_mensais)
         }
     
+    @staticmethod
+    def listar_periodos(db: Session, limite: Optional[int] = None) -> List[PeriodoAluguel]:
+        """
+        Períodos com aluguéis, do mais recente ao mais antigo, lidos do catálogo
+
+        Args:
+            db: Sessão do banco de dados
+            limite: Número máximo de períodos (padrão: todos)
+
+        Returns:
+            Linhas de periodos_alugueis com quantidade e totais de cada período
+        """
+        query = db.query(PeriodoAluguel).order_by(PeriodoAluguel.ano.desc(), PeriodoAluguel.mes.desc())
+        if limite:
+            query = query.limit(limite)
+        return query.all()
+
+    @staticmethod
+    def anos_disponiveis(db: Session) -> List[int]:
+        """Anos com aluguéis, em ordem decrescente, lidos do catálogo de períodos."""
+        anos = db.query(PeriodoAluguel.ano).distinct().order_by(PeriodoAluguel.ano.desc()).all()
+        return [ano for (ano,) in anos]
+
+    @staticmethod
+    def ultimo_periodo(db: Session) -> Optional[PeriodoAluguel]:
+        """Período mais recente com aluguéis (None se não houver nenhum)."""
+        return db.query(PeriodoAluguel).order_by(PeriodoAluguel.ano.desc(), PeriodoAluguel.mes.desc()).first()
+
+    @staticmethod
+    def obter_periodo(db: Session, ano: int, mes: int) -> Optional[PeriodoAluguel]:
+        """Quantidade e totais de um período pela chave primária do catálogo."""
+        return db.get(PeriodoAluguel, (ano, mes))
+
+    @staticmethod
+    def reconstruir_catalogo_periodos(db: Session) -> int:
+        """
+        Recalcula periodos_alugueis a partir da tabela alugueis
+
+        No PostgreSQL o catálogo é mantido pelos triggers da migração 015; esta
+        função serve para bancos sem os triggers (ex.: SQLite em desenvolvimento)
+        e para corrigir o catálogo manualmente. Não faz commit.
+
+        Args:
+            db: Sessão do banco de dados
+
+        Returns:
+            Número de períodos no catálogo
+        """
+        periodos = db.query(
+            AluguelSimples.ano,
+            AluguelSimples.mes,
+            func.count(AluguelSimples.id).label('quantidade'),
+            func.sum(AluguelSimples.valor_liquido_proprietario).label('total_valor_liquido'),
+            func.sum(AluguelSimples.taxa_administracao_proprietario).label('total_taxa_proprietario')
+        ).group_by(AluguelSimples.ano, AluguelSimples.mes).all()
+
+        db.query(PeriodoAluguel).delete(synchronize_session=False)
+        if periodos:
+            db.execute(PeriodoAluguel.__table__.insert(), [
+                {
+                    'ano': p.ano,
+                    'mes': p.mes,
+                    'quantidade': p.quantidade,
+                    'total_valor_liquido': p.total_valor_liquido or 0,
+                    'total_taxa_proprietario': p.total_taxa_proprietario or 0
+                }
+                for p in periodos
+            ])
+        return len(periodos)
+
     @staticmethod
     def get_alugueis_por_imovel(
         db: Session,
@@ -260,19 +345,26 @@ class AluguelService:
         return query.all()
     
     @staticmethod
-    def calcular_impostos(valor_aluguel: Decimal) -> Dict[str, Decimal]:
+    def calcular_impostos(
+        valor_aluguel: Decimal,
+        ano: Optional[int] = None,
+        mes: Optional[int] = None
+    ) -> Dict[str, Decimal]:
         """
-        Calcula impostos sobre valor de aluguel
+        Calcula o carnê-leão sobre valor de aluguel pela tabela progressiva
         
         Args:
             valor_aluguel: Valor do aluguel
+            ano: Ano de competência (padrão: ano atual)
+            mes: Mês de competência (padrão: mês atual)
         
         Returns:
             Dicionário com valores de impostos
         """
-        # Implementar lógica de cálculo de impostos
-        # Exemplo simplificado
-        irrf = valor_aluguel * Decimal('0.15') if valor_aluguel > 1903.98 else Decimal('0')
+        hoje = date.today()
+        irrf = CarneLeaoService.calcular_imposto_mensal(
+            Decimal(valor_aluguel), ano or hoje.year, mes or hoje.month
+        )
         
         return {
             "valor_base": valor_aluguel,
@@ -323,3 +415,185 @@ class AluguelService:
             return False, "Já existe aluguel para este imóvel nesta data"
         
         return True, None
+
+    @staticmethod
+    def validar_lote(
+        db: Session,
+        dados: pd.DataFrame,
+        validacao: Optional[ValidacaoColunar] = None
+    ) -> ValidacaoColunar:
+        """
+        Valida por colunas um lote de aluguéis já convertido para números
+        
+        Usado tanto pelo upsert em lote da API quanto pela importação de planilhas.
+        
+        Args:
+            db: Sessão do banco de dados
+            dados: Colunas da chave, valor_liquido_proprietario e, opcionalmente,
+                taxa_administracao_total
+            validacao: Validação já iniciada pelo chamador (opcional)
+        
+        Returns:
+            Validação com as linhas rejeitadas e os motivos
+        """
+        validacao = validacao or ValidacaoColunar(dados)
+        validacao.rejeitar_nao_inteiros(dados['mes'], 'mes')
+        validacao.rejeitar(~dados['mes'].between(1, 12), 'mes', "Mês deve estar entre 1 e 12")
+        validacao.rejeitar_nao_inteiros(dados['ano'], 'ano')
+        validacao.rejeitar(~dados['ano'].between(2020, 2060), 'ano', "Ano deve estar entre 2020 e 2060")
+        validacao.rejeitar(dados['valor_liquido_proprietario'].isna(), 'valor_liquido_proprietario', "Valor de aluguel ausente ou não numérico")
+        if 'taxa_administracao_total' in dados:
+            validacao.rejeitar(dados['taxa_administracao_total'] < 0, 'taxa_administracao_total', "Taxa de administração não pode ser negativa")
+        validacao.rejeitar_nao_inteiros(dados['imovel_id'], 'imovel_id')
+        validacao.rejeitar_nao_inteiros(dados['proprietario_id'], 'proprietario_id')
+        validacao.rejeitar_inexistentes(db, dados['imovel_id'], Imovel.id, 'imovel_id', "Imóvel")
+        validacao.rejeitar_inexistentes(db, dados['proprietario_id'], Proprietario.id, 'proprietario_id', "Proprietário")
+        validacao.rejeitar_duplicados(dados, CHAVE_ALUGUEL, 'periodo', "Aluguel repetido no lote (prevalece a última ocorrência)")
+        return validacao
+    
+    @staticmethod
+    def classificar_lote(
+        db: Session,
+        registros: List[Dict[str, Any]],
+        colunas: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Separa um lote em novos, alterados e inalterados pela chave natural
+        
+        Args:
+            db: Sessão do banco de dados
+            registros: Aluguéis válidos (chave + colunas de valor)
+            colunas: Colunas comparadas (padrão: valor_liquido_proprietario)
+        
+        Returns:
+            Diff no formato de calcular_diff
+        """
+        return calcular_diff(
+            db, AluguelSimples, registros, chave=CHAVE_ALUGUEL,
+            colunas=colunas or ['valor_liquido_proprietario']
+        )
+    
+    @staticmethod
+    def gravar_lote(
+        db: Session,
+        registros: List[Dict[str, Any]],
+        colunas: Optional[List[str]] = None
+    ) -> Dict[str, int]:
+        """
+        Grava aluguéis com INSERT ... ON CONFLICT na restrição única do período
+        
+        Não faz commit; a transação pertence ao chamador.
+        
+        Args:
+            db: Sessão do banco de dados
+            registros: Aluguéis a gravar (chave + colunas de valor)
+            colunas: Colunas atualizadas em caso de conflito (padrão: valor_liquido_proprietario)
+        
+        Returns:
+            Dicionário com 'criados' e 'atualizados'
+        """
+        return upsert_em_lote(
+            db, AluguelSimples, registros, chave=CHAVE_ALUGUEL,
+            colunas_atualizar=colunas or ['valor_liquido_proprietario']
+        )
+    
+    @staticmethod
+    def motivo_violacao(db: Session, erro: IntegrityError, dados: Dict[str, Any]) -> Tuple[int, str]:
+        """
+        Identifica a causa de uma violação de integridade ao gravar um aluguel
+
+        Deve ser chamado depois do rollback da sessão: chaves estrangeiras são
+        conferidas no banco, porque o nome da restrição varia entre instalações.
+
+        Args:
+            db: Sessão do banco de dados
+            erro: Erro levantado pelo commit
+            dados: Valores enviados (imovel_id e proprietario_id)
+
+        Returns:
+            Status HTTP (400 ou 404) e mensagem com a causa
+        """
+        original = getattr(erro, "orig", None) or erro
+        restricao = getattr(getattr(original, "diag", None), "constraint_name", None) or str(original)
+
+        for nome, motivo in MOTIVOS_RESTRICOES_ALUGUEL.items():
+            if nome in restricao:
+                return 400, motivo
+        if UNICIDADE_PERIODO_SQLITE in restricao:
+            return 400, MOTIVOS_RESTRICOES_ALUGUEL['uq_aluguel_simples_periodo']
+
+        for coluna, modelo, nome in (('imovel_id', Imovel, "Imóvel"), ('proprietario_id', Proprietario, "Proprietário")):
+            if dados.get(coluna) is not None and db.get(modelo, dados[coluna]) is None:
+                return 404, f"{nome} não encontrado"
+        return 400, f"Dados do aluguel violam uma restrição do banco: {str(original).splitlines()[0]}"
+
+    @staticmethod
+    def upsert_lote(db: Session, linhas: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Insere ou atualiza um lote de aluguéis pela chave imóvel/proprietário/mês/ano
+        
+        Linhas inválidas são rejeitadas individualmente sem impedir as demais.
+        Linhas sem taxa_administracao_total mantêm a taxa já gravada.
+        
+        Args:
+            db: Sessão do banco de dados
+            linhas: Aluguéis recebidos pela API
+        
+        Returns:
+            Dicionário com o resumo por status e o resultado de cada linha
+            ('criado', 'atualizado', 'inalterado' ou 'rejeitado')
+        """
+        entrada = pd.DataFrame(linhas, index=pd.RangeIndex(len(linhas)))
+        dados = pd.DataFrame(index=entrada.index)
+        for campo in CHAVE_ALUGUEL + COLUNAS_VALOR_ALUGUEL:
+            if campo in entrada:
+                dados[campo] = pd.to_numeric(entrada[campo], errors='coerce').astype('float64')
+            elif campo != 'taxa_administracao_total':
+                dados[campo] = np.nan
+
+        validacao = AluguelService.validar_lote(db, dados)
+        validos = dados[validacao.validos].astype({c: 'int64' for c in CHAVE_ALUGUEL})
+        com_taxa = validos['taxa_administracao_total'].notna() if 'taxa_administracao_total' in validos else pd.Series(False, index=validos.index)
+
+        status = {}
+        for possui_taxa in (False, True):
+            grupo = validos[com_taxa == possui_taxa]
+            if grupo.empty:
+                continue
+            colunas = COLUNAS_VALOR_ALUGUEL if possui_taxa else ['valor_liquido_proprietario']
+            registros = grupo[CHAVE_ALUGUEL + colunas].astype(object).to_dict('records')
+            diff = AluguelService.classificar_lote(db, registros, colunas)
+            AluguelService.gravar_lote(db, diff["novos"] + [item["registro"] for item in diff["alterados"]], colunas)
+
+            situacao = {}
+            for chave_status, itens in (("criado", diff["novos"]), ("atualizado", [i["registro"] for i in diff["alterados"]]), ("inalterado", diff["inalterados"])):
+                for registro in itens:
+                    situacao[tuple(registro[c] for c in CHAVE_ALUGUEL)] = chave_status
+            for indice, registro in zip(grupo.index, registros):
+                status[indice] = situacao[tuple(registro[c] for c in CHAVE_ALUGUEL)]
+
+        chaves = [tuple(int(v) for v in linha) for linha in validos[CHAVE_ALUGUEL].itertuples(index=False)]
+        ids = {}
+        colunas_chave = [getattr(AluguelSimples, c) for c in CHAVE_ALUGUEL]
+        for bloco in em_blocos(chaves):
+            for linha in db.query(AluguelSimples.id, *colunas_chave).filter(*filtro_chave_em(colunas_chave, bloco)).all():
+                ids[tuple(linha[1:])] = linha.id
+
+        erros = {erro["linha"] - 2: erro for erro in validacao.erros}
+        resultados = []
+        for indice in dados.index:
+            if indice in erros:
+                resultados.append({
+                    "indice": int(indice),
+                    "status": "rejeitado",
+                    "coluna": erros[indice]["coluna"],
+                    "motivo": erros[indice]["motivo"]
+                })
+            else:
+                chave = tuple(int(validos.at[indice, c]) for c in CHAVE_ALUGUEL)
+                resultados.append({"indice": int(indice), "status": status[indice], "id": ids.get(chave)})
+
+        resumo = {situacao: 0 for situacao in ("criado", "atualizado", "inalterado", "rejeitado")}
+        for resultado in resultados:
+            resumo[resultado["status"]] += 1
+        return {"total": len(resultados), "resumo": resumo, "resultados": resultados}
@@ -0,0 +1,215 @@
+"""
+Serviço de Análise de Imóveis - Desempenho por imóvel
+Rendimento bruto e líquido, vacância, tendência e crescimento anual calculados
+de uma vez sobre a matriz imóvel x mês de receitas
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from config import ESTATISTICAS_CACHE_TTL_SECONDS
+from models_final import AluguelSimples, Imovel
+from utils.cache_memoria import CacheMemoria
+
+# Análise completa em cache; descartada a cada escrita, como as estatísticas em lote
+_cache_analise = CacheMemoria(ttl_segundos=ESTATISTICAS_CACHE_TTL_SECONDS, max_itens=1)
+
+MESES_JANELA = 12
+
+# Métricas aceitas pelo ranking
+METRICAS_RANKING = (
+    "rendimento_bruto",
+    "rendimento_liquido",
+    "receita_bruta_12m",
+    "receita_liquida_12m",
+    "taxa_vacancia",
+    "tendencia_12m",
+    "crescimento_anual",
+)
+
+
+def _opcional(valor: float, casas: int = 2) -> Optional[float]:
+    """Converte NaN/inf em None para serialização JSON."""
+    return round(float(valor), casas) if np.isfinite(valor) else None
+
+
+class AnaliseImoveisService:
+    """Serviço de indicadores de desempenho dos imóveis"""
+
+    @staticmethod
+    def carregar_matriz(db: Session) -> Dict[str, Any]:
+        """
+        Carrega a receita mensal de todos os imóveis em matrizes NumPy
+
+        Os aluguéis de todos os proprietários de um imóvel são somados por mês.
+        As colunas vão do primeiro ao último mês com aluguel, sem lacunas; meses
+        sem registro ficam com receita zero.
+
+        Args:
+            db: Sessão do banco de dados
+
+        Returns:
+            Dicionário com 'imoveis' (linhas de Imovel), 'primeiro_mes' (índice
+            ano * 12 + mes - 1 da coluna 0), 'liquido' e 'bruto' (imóveis x meses)
+        """
+        imoveis = db.execute(select(
+            Imovel.id, Imovel.nome, Imovel.valor_mercado, Imovel.valor_cadastral,
+            Imovel.iptu_mensal, Imovel.condominio_mensal
+        ).order_by(Imovel.id)).all()
+        receitas = db.execute(select(
+            AluguelSimples.imovel_id,
+            AluguelSimples.ano * 12 + AluguelSimples.mes - 1,
+            func.sum(AluguelSimples.valor_liquido_proprietario),
+            func.sum(AluguelSimples.taxa_administracao_proprietario)
+        ).group_by(AluguelSimples.imovel_id, AluguelSimples.ano, AluguelSimples.mes)).all()
+
+        ids = np.array([imovel.id for imovel in imoveis], dtype=np.int64)
+        if not receitas:
+            vazia = np.zeros((len(ids), 0))
+            return {"imoveis": imoveis, "primeiro_mes": None, "liquido": vazia, "bruto": vazia.copy()}
+
+        dados = np.array(receitas, dtype=np.float64)
+        meses = dados[:, 1].astype(np.int64)
+        primeiro_mes = int(meses.min())
+        linhas = np.searchsorted(ids, dados[:, 0].astype(np.int64))
+        colunas = meses - primeiro_mes
+
+        liquido = np.zeros((len(ids), int(meses.max()) - primeiro_mes + 1))
+        taxa = np.zeros_like(liquido)
+        np.add.at(liquido, (linhas, colunas), dados[:, 2])
+        np.add.at(taxa, (linhas, colunas), dados[:, 3])
+        return {"imoveis": imoveis, "primeiro_mes": primeiro_mes, "liquido": liquido, "bruto": liquido + taxa}
+
+    @staticmethod
+    def calcular_indicadores(matriz: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Indicadores de todos os imóveis em uma passada vetorizada
+
+        - receita_bruta_12m / receita_liquida_12m: últimos 12 meses, a líquida já
+          descontando 12 meses de IPTU e condomínio
+        - rendimento_bruto / rendimento_liquido: receitas de 12 meses sobre o valor
+          de mercado (ou cadastral, na falta dele), em %
+        - meses_vagos / taxa_vacancia: meses com receita zero ou negativa desde o
+          primeiro aluguel do imóvel
+        - tendencia_12m: inclinação (mínimos quadrados) da receita líquida mensal
+          nos últimos 12 meses, em R$/mês
+        - crescimento_anual: variação % da receita líquida de 12 meses sobre os 12
+          meses anteriores
+
+        Args:
+            matriz: Resultado de carregar_matriz
+
+        Returns:
+            Lista de dicionários, um por imóvel; vazia se não houver nenhum aluguel
+        """
+        imoveis = matriz["imoveis"]
+        liquido, bruto = matriz["liquido"], matriz["bruto"]
+        n_meses = liquido.shape[1]
+        if n_meses == 0:
+            return []
+
+        valor_base = np.array([float(i.valor_mercado or i.valor_cadastral or 0) for i in imoveis])
+        despesas_mensais = np.array([float(i.iptu_mensal or 0) + float(i.condominio_mensal or 0) for i in imoveis])
+
+        # Somas móveis de 12 meses: moveis_12m[:, k] soma as colunas k-12..k-1
+        # (soma acumulada com 12 zeros à esquerda; a última coluna são os últimos 12 meses)
+        acumulado = np.zeros((len(imoveis), n_meses + MESES_JANELA + 1))
+        acumulado[:, MESES_JANELA + 1:] = np.cumsum(liquido, axis=1)
+        moveis_12m = acumulado[:, MESES_JANELA:] - acumulado[:, :-MESES_JANELA]
+        receita_liquida_12m = moveis_12m[:, -1]
+        bruto_12m = bruto[:, -MESES_JANELA:].sum(axis=1)
+        liquida_descontada = receita_liquida_12m - MESES_JANELA * despesas_mensais
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            base = np.where(valor_base > 0, valor_base, np.nan)
+            rendimento_bruto = bruto_12m / base * 100
+            rendimento_liquido = liquida_descontada / base * 100
+
+            # Vacância: meses observados a partir do primeiro mês com receita positiva
+            com_receita = liquido > 0
+            primeiro = np.where(com_receita.any(axis=1), com_receita.argmax(axis=1), n_meses)
+            observados = np.arange(n_meses) >= primeiro[:, None]
+            meses_observados = observados.sum(axis=1)
+            meses_vagos = (observados & (liquido <= 0)).sum(axis=1)
+            taxa_vacancia = np.where(meses_observados > 0, meses_vagos / meses_observados * 100, np.nan)
+
+            janela = liquido[:, -MESES_JANELA:]
+            x = np.arange(janela.shape[1]) - (janela.shape[1] - 1) / 2
+            tendencia = janela @ x / (x @ x) if janela.shape[1] > 1 else np.full(len(imoveis), np.nan)
+
+            anterior_12m = moveis_12m[:, -1 - MESES_JANELA] if n_meses >= 2 * MESES_JANELA else np.full(len(imoveis), np.nan)
+            crescimento = np.where(anterior_12m > 0, (receita_liquida_12m - anterior_12m) / anterior_12m * 100, np.nan)
+
+        return [{
+            "imovel_id": imovel.id,
+            "nome": imovel.nome,
+            "valor_base": _opcional(valor_base[i]) if valor_base[i] > 0 else None,
+            "receita_bruta_12m": _opcional(bruto_12m[i]),
+            "receita_liquida_12m": _opcional(liquida_descontada[i]),
+            "rendimento_bruto": _opcional(rendimento_bruto[i]),
+            "rendimento_liquido": _opcional(rendimento_liquido[i]),
+            "meses_vagos": int(meses_vagos[i]),
+            "taxa_vacancia": _opcional(taxa_vacancia[i]),
+            "tendencia_12m": _opcional(tendencia[i]),
+            "crescimento_anual": _opcional(crescimento[i])
+        } for i, imovel in enumerate(imoveis)]
+
+    @staticmethod
+    def analisar(db: Session) -> List[Dict[str, Any]]:
+        """
+        Indicadores de todos os imóveis, em cache até a próxima escrita
+
+        Args:
+            db: Sessão do banco de dados
+
+        Returns:
+            Lista de dicionários de indicadores, um por imóvel
+        """
+        return _cache_analise.obter_ou_calcular(
+            "indicadores",
+            lambda: AnaliseImoveisService.calcular_indicadores(AnaliseImoveisService.carregar_matriz(db))
+        )
+
+    @staticmethod
+    def ranking(
+        db: Session,
+        metrica: str = "rendimento_liquido",
+        decrescente: bool = True,
+        limite: int = 20
+    ) -> List[Dict[str, Any]]:
+        """
+        Imóveis ordenados por uma métrica, a partir da análise em cache
+
+        Args:
+            db: Sessão do banco de dados
+            metrica: Uma de METRICAS_RANKING
+            decrescente: Maiores valores primeiro
+            limite: Número máximo de imóveis
+
+        Returns:
+            Lista de indicadores com a posição no ranking; imóveis sem valor
+            para a métrica ficam por último
+
+        Raises:
+            ValueError: Se a métrica não for suportada
+        """
+        if metrica not in METRICAS_RANKING:
+            raise ValueError(f"Métrica inválida. Use uma de: {', '.join(METRICAS_RANKING)}")
+
+        indicadores = AnaliseImoveisService.analisar(db)
+        com_valor = sorted(
+            (item for item in indicadores if item[metrica] is not None),
+            key=lambda item: item[metrica], reverse=decrescente
+        )
+        sem_valor = [item for item in indicadores if item[metrica] is None]
+        return [
+            {"posicao": posicao, **item}
+            for posicao, item in enumerate((com_valor + sem_valor)[:limite], start=1)
+        ]
+
+    @staticmethod
+    def invalidar() -> None:
+        """Descarta a análise em cache."""
+        _cache_analise.invalidar()
@@ -0,0 +1,341 @@
+"""
+Serviço de Carnê-Leão - Camada de Lógica de Negócio
+Estima o IRPF mensal sobre aluguéis recebidos de pessoas físicas e
+propõe os DARFs correspondentes
+"""
+import calendar
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Optional, Any, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models_final import AluguelSimples, Darf, Proprietario
+
+# Valor mínimo de DARF: abaixo disso o imposto é somado ao mês seguinte,
+# inclusive de dezembro para janeiro do ano seguinte
+VALOR_MINIMO_DARF = 10.0
+
+
+# Tabelas progressivas mensais, em ordem de vigência.
+# "limites" são os tetos de cada faixa; a última faixa não tem teto.
+TABELAS_IRPF: List[Dict[str, Any]] = [
+    {
+        "versao": "2015-04",
+        "vigencia_inicio": date(2015, 4, 1),
+        "limites": (1903.98, 2826.65, 3751.05, 4664.68),
+        "aliquotas": (0.0, 0.075, 0.15, 0.225, 0.275),
+        "parcelas_deduzir": (0.0, 142.80, 354.80, 636.13, 869.36),
+    },
+    {
+        "versao": "2023-05",
+        "vigencia_inicio": date(2023, 5, 1),
+        "limites": (2112.00, 2826.65, 3751.05, 4664.68),
+        "aliquotas": (0.0, 0.075, 0.15, 0.225, 0.275),
+        "parcelas_deduzir": (0.0, 158.40, 370.40, 651.73, 884.96),
+    },
+    {
+        "versao": "2024-02",
+        "vigencia_inicio": date(2024, 2, 1),
+        "limites": (2259.20, 2826.65, 3751.05, 4664.68),
+        "aliquotas": (0.0, 0.075, 0.15, 0.225, 0.275),
+        "parcelas_deduzir": (0.0, 169.44, 381.44, 662.77, 896.00),
+    },
+    {
+        "versao": "2025-05",
+        "vigencia_inicio": date(2025, 5, 1),
+        "limites": (2428.80, 2826.65, 3751.05, 4664.68),
+        "aliquotas": (0.0, 0.075, 0.15, 0.225, 0.275),
+        "parcelas_deduzir": (0.0, 182.16, 394.16, 675.49, 908.73),
+    },
+]
+
+
+class CarneLeaoService:
+    """Serviço de cálculo do carnê-leão sobre rendimentos de aluguel"""
+
+    @staticmethod
+    def tabela_vigente(ano: int, mes: int) -> Dict[str, Any]:
+        """
+        Retorna a tabela progressiva vigente no mês de competência
+
+        Args:
+            ano: Ano de competência
+            mes: Mês de competência
+
+        Returns:
+            Tabela IRPF aplicável
+        """
+        referencia = date(ano, mes, 1)
+        vigentes = [t for t in TABELAS_IRPF if t["vigencia_inicio"] <= referencia]
+        if not vigentes:
+            return TABELAS_IRPF[0]
+        return vigentes[-1]
+
+    @staticmethod
+    def calcular_imposto(bases: np.ndarray, tabela: Dict[str, Any]) -> np.ndarray:
+        """
+        Aplica a tabela progressiva a um vetor/matriz de bases de cálculo
+
+        Args:
+            bases: Bases de cálculo mensais (qualquer formato)
+            tabela: Tabela IRPF a aplicar
+
+        Returns:
+            Imposto devido, com o mesmo formato de bases, arredondado em centavos
+        """
+        bases = np.clip(np.asarray(bases, dtype=np.float64), 0.0, None)
+        faixa = np.searchsorted(np.asarray(tabela["limites"]), bases, side="left")
+        aliquotas = np.asarray(tabela["aliquotas"])[faixa]
+        deducoes = np.asarray(tabela["parcelas_deduzir"])[faixa]
+        return np.round(np.clip(bases * aliquotas - deducoes, 0.0, None), 2)
+
+    @staticmethod
+    def calcular_imposto_mensal(valor: Decimal, ano: int, mes: int) -> Decimal:
+        """
+        Imposto de uma única base mensal, usando a tabela vigente no período
+
+        Args:
+            valor: Base de cálculo do mês
+            ano: Ano de competência
+            mes: Mês de competência
+
+        Returns:
+            Imposto devido em centavos
+        """
+        tabela = CarneLeaoService.tabela_vigente(ano, mes)
+        imposto = CarneLeaoService.calcular_imposto(np.array([float(valor)]), tabela)[0]
+        return Decimal(str(imposto)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+    @staticmethod
+    def matriz_rendimentos(
+        db: Session,
+        ano: int,
+        proprietario_ids: Optional[List[int]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Monta a matriz proprietário × mês de rendimentos tributáveis
+
+        A base é o valor líquido do proprietário (aluguel já deduzido da
+        taxa de administração), somado entre todos os imóveis do mês.
+
+        Args:
+            db: Sessão do banco de dados
+            ano: Ano-calendário
+            proprietario_ids: Restringe a proprietários específicos
+
+        Returns:
+            Tupla (ids dos proprietários ordenados, matriz n × 12)
+        """
+        query = db.query(
+            AluguelSimples.proprietario_id,
+            AluguelSimples.mes,
+            func.sum(AluguelSimples.valor_liquido_proprietario).label("valor"),
+        ).filter(AluguelSimples.ano == ano)
+        if proprietario_ids:
+            query = query.filter(AluguelSimples.proprietario_id.in_(proprietario_ids))
+        linhas = query.group_by(AluguelSimples.proprietario_id, AluguelSimples.mes).all()
+
+        if not linhas:
+            return np.array([], dtype=np.int64), np.zeros((0, 12))
+
+        dados = np.array([(l.proprietario_id, l.mes, float(l.valor or 0)) for l in linhas], dtype=np.float64)
+        ids, posicoes = np.unique(dados[:, 0].astype(np.int64), return_inverse=True)
+        matriz = np.zeros((len(ids), 12))
+        np.add.at(matriz, (posicoes, dados[:, 1].astype(np.int64) - 1), dados[:, 2])
+        return ids, matriz
+
+    @staticmethod
+    def acumular_minimo(imposto: np.ndarray, saldo_inicial: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Aplica o mínimo de DARF mês a mês, levando o imposto não recolhido adiante
+
+        Args:
+            imposto: Matriz proprietário × mês de imposto devido
+            saldo_inicial: Imposto abaixo do mínimo trazido de antes do primeiro mês
+
+        Returns:
+            Tupla (valor a recolher por mês, saldo abaixo do mínimo após o último mês)
+        """
+        a_recolher = np.zeros_like(imposto)
+        acumulado = np.asarray(saldo_inicial, dtype=np.float64)
+        for coluna in range(imposto.shape[1]):
+            total = acumulado + imposto[:, coluna]
+            recolhe = total >= VALOR_MINIMO_DARF
+            a_recolher[:, coluna] = np.where(recolhe, np.round(total, 2), 0.0)
+            acumulado = np.where(recolhe, 0.0, total)
+        return a_recolher, acumulado
+
+    @staticmethod
+    def saldo_anterior(db: Session, ano: int, proprietario_ids: np.ndarray) -> np.ndarray:
+        """
+        Imposto abaixo do mínimo de DARF que chega a janeiro vindo dos anos anteriores
+
+        Os anos anteriores com rendimentos são lidos numa única consulta agrupada
+        e percorridos mês a mês desde o primeiro, cada mês com a sua tabela.
+
+        Args:
+            db: Sessão do banco de dados
+            ano: Ano-calendário cujo janeiro recebe o saldo
+            proprietario_ids: Proprietários, na ordem das linhas da matriz
+
+        Returns:
+            Vetor com o saldo de cada proprietário
+        """
+        saldo = np.zeros(len(proprietario_ids))
+        if len(proprietario_ids) == 0:
+            return saldo
+        linhas = db.query(
+            AluguelSimples.proprietario_id,
+            AluguelSimples.ano,
+            AluguelSimples.mes,
+            func.sum(AluguelSimples.valor_liquido_proprietario).label("valor"),
+        ).filter(
+            AluguelSimples.ano < ano,
+            AluguelSimples.proprietario_id.in_(proprietario_ids.tolist()),
+        ).group_by(AluguelSimples.proprietario_id, AluguelSimples.ano, AluguelSimples.mes).all()
+        if not linhas:
+            return saldo
+
+        primeiro_ano = min(l.ano for l in linhas)
+        posicoes = {int(pid): i for i, pid in enumerate(proprietario_ids)}
+        bases = np.zeros((len(proprietario_ids), (ano - primeiro_ano) * 12))
+        for l in linhas:
+            bases[posicoes[l.proprietario_id], (l.ano - primeiro_ano) * 12 + l.mes - 1] += float(l.valor or 0)
+
+        imposto = np.zeros_like(bases)
+        for coluna in range(bases.shape[1]):
+            tabela = CarneLeaoService.tabela_vigente(primeiro_ano + coluna // 12, coluna % 12 + 1)
+            imposto[:, coluna] = CarneLeaoService.calcular_imposto(bases[:, coluna], tabela)
+        return CarneLeaoService.acumular_minimo(imposto, saldo)[1]
+
+    @staticmethod
+    def calcular_ano(
+        db: Session,
+        ano: int,
+        proprietario_ids: Optional[List[int]] = None
+    ) -> Dict[str, Any]:
+        """
+        Calcula o carnê-leão de todos os proprietários para o ano inteiro
+
+        Args:
+            db: Sessão do banco de dados
+            ano: Ano-calendário
+            proprietario_ids: Restringe a proprietários específicos
+
+        Returns:
+            Dicionário com ids, bases, imposto do mês, valor a recolher
+            (considerando o mínimo de DARF e o saldo vindo do ano anterior),
+            saldo anterior e versões de tabela por mês
+        """
+        ids, bases = CarneLeaoService.matriz_rendimentos(db, ano, proprietario_ids)
+        imposto = np.zeros_like(bases)
+        versoes = []
+        for mes in range(1, 13):
+            tabela = CarneLeaoService.tabela_vigente(ano, mes)
+            versoes.append(tabela["versao"])
+            imposto[:, mes - 1] = CarneLeaoService.calcular_imposto(bases[:, mes - 1], tabela)
+
+        # Valores abaixo do mínimo acumulam para o mês seguinte
+        saldo_anterior = CarneLeaoService.saldo_anterior(db, ano, ids)
+        a_recolher, _ = CarneLeaoService.acumular_minimo(imposto, saldo_anterior)
+
+        return {
+            "ano": ano,
+            "proprietario_ids": ids,
+            "bases": bases,
+            "imposto": imposto,
+            "a_recolher": a_recolher,
+            "saldo_anterior": np.round(saldo_anterior, 2),
+            "versoes_tabela": versoes,
+        }
+
+    @staticmethod
+    def data_vencimento(ano: int, mes: int) -> date:
+        """Vencimento do carnê-leão: último dia do mês seguinte ao de competência"""
+        ano_venc, mes_venc = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+        return date(ano_venc, mes_venc, calendar.monthrange(ano_venc, mes_venc)[1])
+
+    @staticmethod
+    def mes_competencia(data_darf: date) -> Tuple[int, int]:
+        """(ano, mês) de apuração de um DARF pago em data_darf: o mês anterior ao do pagamento"""
+        return (data_darf.year - 1, 12) if data_darf.month == 1 else (data_darf.year, data_darf.month - 1)
+
+    @staticmethod
+    def propor_darfs(
+        db: Session,
+        ano: int,
+        mes: Optional[int] = None,
+        persistir: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Propõe DARFs a partir do cálculo do carnê-leão
+
+        Args:
+            db: Sessão do banco de dados
+            ano: Ano-calendário
+            mes: Restringe a um mês de competência
+            persistir: Grava as propostas sem DARF existente na mesma competência
+
+        Um DARF já cadastrado corresponde à proposta se for do mesmo proprietário
+        e pago no mês seguinte ao de competência, em qualquer dia (antecipado ou
+        no vencimento); vários pagamentos no mesmo mês são somados.
+
+        Returns:
+            Lista de propostas com status 'novo', 'existente' ou 'criado'
+        """
+        calculo = CarneLeaoService.calcular_ano(db, ano)
+        ids = calculo["proprietario_ids"]
+        a_recolher = calculo["a_recolher"]
+        if len(ids) == 0:
+            return []
+
+        meses = [mes] if mes else list(range(1, 13))
+        linhas, colunas = np.nonzero(a_recolher[:, [m - 1 for m in meses]])
+
+        existentes: Dict[Tuple[int, int], float] = {}
+        for d in db.query(Darf.proprietario_id, Darf.data, Darf.valor_darf).filter(
+            Darf.proprietario_id.in_(ids.tolist()),
+            Darf.data >= CarneLeaoService.data_vencimento(ano, meses[0]).replace(day=1),
+            Darf.data <= CarneLeaoService.data_vencimento(ano, meses[-1]),
+        ).all():
+            chave = (d.proprietario_id, CarneLeaoService.mes_competencia(d.data)[1])
+            existentes[chave] = round(existentes.get(chave, 0.0) + float(d.valor_darf), 2)
+        nomes = {
+            p.id: f"{p.nome} {p.sobrenome or ''}".strip()
+            for p in db.query(Proprietario.id, Proprietario.nome, Proprietario.sobrenome).filter(
+                Proprietario.id.in_(ids.tolist())
+            ).all()
+        }
+
+        propostas = []
+        novos = []
+        for linha, coluna in zip(linhas, colunas):
+            mes_competencia = meses[coluna]
+            proprietario_id = int(ids[linha])
+            vencimento = CarneLeaoService.data_vencimento(ano, mes_competencia)
+            valor = float(a_recolher[linha, mes_competencia - 1])
+            existente = existentes.get((proprietario_id, mes_competencia))
+            status = "existente" if existente is not None else ("criado" if persistir else "novo")
+            propostas.append({
+                "proprietario_id": proprietario_id,
+                "nome_proprietario": nomes.get(proprietario_id),
+                "mes_competencia": mes_competencia,
+                "ano": ano,
+                "data": vencimento.isoformat(),
+                "base_calculo": round(float(calculo["bases"][linha, mes_competencia - 1]), 2),
+                "valor_darf": valor,
+                "valor_existente": existente,
+                "tabela": calculo["versoes_tabela"][mes_competencia - 1],
+                "status": status,
+            })
+            if persistir and existente is None:
+                novos.append(Darf(proprietario_id=proprietario_id, data=vencimento, valor_darf=valor))
+
+        if novos:
+            db.add_all(novos)
+            db.commit()
+        return propostas
+
@@ -0,0 +1,223 @@
+"""
+Serviço de Extrato - Razão mensal por proprietário
+Aluguéis, taxa de administração, DARFs e transferências mês a mês, com saldos
+acumulados calculados no banco por funções de janela
+"""
+import os
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import DateTime, Integer, Numeric, and_, case, cast, column, extract, func, or_, select, text
+from sqlalchemy.orm import Session
+
+from models_final import AluguelSimples, Darf
+from utils.cache_memoria import CacheMemoria
+
+# Páginas do extrato ficam em cache até a próxima escrita que afete o proprietário
+EXTRATO_CACHE_TTL_SECONDS = int(os.getenv("EXTRATO_CACHE_TTL_SECONDS", "300"))
+_cache_extrato = CacheMemoria(ttl_segundos=EXTRATO_CACHE_TTL_SECONDS, max_itens=2048)
+
+LIMITE_PADRAO_EXTRATO = 24
+LIMITE_MAXIMO_EXTRATO = 120
+
+# Valores do proprietário dentro do JSON id_proprietarios das transferências
+_TRANSFERENCIAS_DO_PROPRIETARIO = {
+    "postgresql": """
+        SELECT t.data_criacao, t.data_fim, CAST(e.value ->> 'valor' AS NUMERIC) AS valor
+        FROM transferencias t
+        CROSS JOIN LATERAL jsonb_array_elements(CAST(t.id_proprietarios AS JSONB)) AS e(value)
+        WHERE t.id_proprietarios LIKE '[%' AND CAST(e.value ->> 'id' AS INTEGER) = :proprietario_id
+    """,
+    "sqlite": """
+        SELECT t.data_criacao, t.data_fim, CAST(json_extract(e.value, '$.valor') AS REAL) AS valor
+        FROM transferencias t, json_each(t.id_proprietarios) AS e
+        WHERE json_valid(t.id_proprietarios) AND CAST(json_extract(e.value, '$.id') AS INTEGER) = :proprietario_id
+    """,
+}
+
+
+def _indice_mes(ano, mes):
+    """Meses corridos desde o ano zero (ano * 12 + mes - 1), comparável entre tabelas."""
+    return ano * 12 + mes - 1
+
+
+def _indice_mes_data(data):
+    """Índice de mês de uma coluna de data (EXTRACT devolve NUMERIC no PostgreSQL)."""
+    return _indice_mes(cast(extract("year", data), Integer), cast(extract("month", data), Integer))
+
+
+def _cursor_para_indice(cursor: str) -> int:
+    """Converte um cursor 'AAAA-MM' em índice de mês."""
+    try:
+        ano, mes = (int(parte) for parte in cursor.split("-"))
+    except (AttributeError, ValueError):
+        raise ValueError("Cursor deve estar no formato AAAA-MM")
+    if not 1 <= mes <= 12:
+        raise ValueError("Cursor deve estar no formato AAAA-MM")
+    return _indice_mes(ano, mes)
+
+
+class ExtratoService:
+    """Serviço para o extrato mensal de proprietários"""
+
+    @staticmethod
+    def _consulta_extrato(dialeto: str, proprietario_id: int, apos: Optional[int], limite: int):
+        """
+        Monta o comando único do extrato
+
+        Os meses vão do primeiro ao último com movimento, sem lacunas. Uma
+        transferência vale em todos os meses entre o mês de data_criacao e o de
+        data_fim (sem data_fim, até o último mês do extrato). O saldo do mês é
+        aluguel líquido - DARF + transferências; os saldos acumulado e do ano são
+        somas de janela sobre ele. O filtro do cursor é aplicado depois das
+        janelas, para que os saldos não recomecem a cada página.
+        """
+        if dialeto not in _TRANSFERENCIAS_DO_PROPRIETARIO:
+            raise NotImplementedError(f"Extrato não suportado para o banco '{dialeto}'")
+
+        alugueis = select(
+            _indice_mes(AluguelSimples.ano, AluguelSimples.mes).label("idx"),
+            func.sum(AluguelSimples.valor_liquido_proprietario).label("aluguel"),
+            func.sum(AluguelSimples.taxa_administracao_proprietario).label("taxa_administracao")
+        ).where(
+            AluguelSimples.proprietario_id == proprietario_id
+        ).group_by(AluguelSimples.ano, AluguelSimples.mes).cte("alugueis_mes")
+
+        idx_darf = _indice_mes_data(Darf.data)
+        darfs = select(
+            idx_darf.label("idx"),
+            func.sum(Darf.valor_darf).label("darf")
+        ).where(Darf.proprietario_id == proprietario_id).group_by(idx_darf).cte("darfs_mes")
+
+        valores = text(_TRANSFERENCIAS_DO_PROPRIETARIO[dialeto]).bindparams(
+            proprietario_id=proprietario_id
+        ).columns(
+            column("data_criacao", DateTime), column("data_fim", DateTime), column("valor", Numeric)
+        ).subquery("valores_transferencias")
+        transferencias = select(
+            _indice_mes_data(valores.c.data_criacao).label("inicio"),
+            _indice_mes_data(valores.c.data_fim).label("fim"),
+            valores.c.valor
+        ).where(valores.c.data_criacao.isnot(None)).cte("transferencias_proprietario")
+
+        extremos = select(alugueis.c.idx).union_all(
+            select(darfs.c.idx),
+            select(transferencias.c.inicio),
+            select(transferencias.c.fim).where(transferencias.c.fim.isnot(None))
+        ).subquery("extremos")
+        limites = select(
+            func.min(extremos.c.idx).label("inicio"),
+            func.max(extremos.c.idx).label("fim")
+        ).cte("limites")
+
+        meses = select(limites.c.inicio.label("idx")).where(limites.c.inicio.isnot(None)).cte("meses", recursive=True)
+        meses = meses.union_all(
+            select((meses.c.idx + 1).label("idx")).where(meses.c.idx < select(limites.c.fim).scalar_subquery())
+        )
+
+        movimentos = select(
+            meses.c.idx,
+            func.sum(case((transferencias.c.valor > 0, transferencias.c.valor), else_=0)).label("entrada"),
+            func.sum(case((transferencias.c.valor < 0, transferencias.c.valor), else_=0)).label("saida")
+        ).select_from(meses).join(transferencias, and_(
+            transferencias.c.inicio <= meses.c.idx,
+            or_(transferencias.c.fim.is_(None), transferencias.c.fim >= meses.c.idx)
+        )).group_by(meses.c.idx).cte("transferencias_mes")
+
+        aluguel = func.coalesce(alugueis.c.aluguel, 0)
+        darf = func.coalesce(darfs.c.darf, 0)
+        entrada = func.coalesce(movimentos.c.entrada, 0)
+        saida = func.coalesce(movimentos.c.saida, 0)
+        linhas = select(
+            meses.c.idx,
+            (meses.c.idx // 12).label("ano"),
+            (meses.c.idx % 12 + 1).label("mes"),
+            aluguel.label("aluguel"),
+            func.coalesce(alugueis.c.taxa_administracao, 0).label("taxa_administracao"),
+            darf.label("darf"),
+            entrada.label("transferencia_entrada"),
+            saida.label("transferencia_saida"),
+            (aluguel - darf + entrada + saida).label("saldo_mes")
+        ).select_from(meses).outerjoin(
+            alugueis, alugueis.c.idx == meses.c.idx
+        ).outerjoin(
+            darfs, darfs.c.idx == meses.c.idx
+        ).outerjoin(
+            movimentos, movimentos.c.idx == meses.c.idx
+        ).subquery("linhas")
+
+        saldos = select(
+            linhas,
+            func.sum(linhas.c.saldo_mes).over(order_by=linhas.c.idx).label("saldo_acumulado"),
+            func.sum(linhas.c.saldo_mes).over(partition_by=linhas.c.ano, order_by=linhas.c.idx).label("saldo_ano")
+        ).subquery("saldos")
+
+        consulta = select(saldos).order_by(saldos.c.idx).limit(limite + 1)
+        if apos is not None:
+            consulta = consulta.where(saldos.c.idx > apos)
+        return consulta
+
+    @staticmethod
+    def gerar_extrato(
+        db: Session,
+        proprietario_id: int,
+        apos: Optional[str] = None,
+        limite: int = LIMITE_PADRAO_EXTRATO
+    ) -> Dict[str, Any]:
+        """
+        Extrato mensal do proprietário em ordem cronológica, paginado por cursor
+
+        Args:
+            db: Sessão do banco de dados
+            proprietario_id: ID do proprietário
+            apos: Cursor 'AAAA-MM'; retorna os meses posteriores a ele
+            limite: Número máximo de meses na página
+
+        Returns:
+            Dicionário com 'meses' e 'proximo_cursor' (None na última página)
+
+        Raises:
+            ValueError: Se o cursor for inválido
+        """
+        limite = max(1, min(limite, LIMITE_MAXIMO_EXTRATO))
+        indice_apos = _cursor_para_indice(apos) if apos else None
+        chave = (proprietario_id, indice_apos, limite)
+
+        def calcular():
+            consulta = ExtratoService._consulta_extrato(
+                db.get_bind().dialect.name, proprietario_id, indice_apos, limite
+            )
+            linhas = db.execute(consulta).all()
+            meses = [{
+                "ano": int(linha.ano),
+                "mes": int(linha.mes),
+                "periodo": f"{int(linha.ano):04d}-{int(linha.mes):02d}",
+                "aluguel": float(linha.aluguel),
+                "taxa_administracao": float(linha.taxa_administracao),
+                "darf": float(linha.darf),
+                "transferencia_entrada": float(linha.transferencia_entrada),
+                "transferencia_saida": float(linha.transferencia_saida),
+                "saldo_mes": round(float(linha.saldo_mes), 2),
+                "saldo_ano": round(float(linha.saldo_ano), 2),
+                "saldo_acumulado": round(float(linha.saldo_acumulado), 2)
+            } for linha in linhas[:limite]]
+            return {
+                "proprietario_id": proprietario_id,
+                "meses": meses,
+                "proximo_cursor": meses[-1]["periodo"] if len(linhas) > limite else None
+            }
+
+        return _cache_extrato.obter_ou_calcular(chave, calcular)
+
+    @staticmethod
+    def invalidar(proprietario_ids: Optional[List[int]] = None) -> None:
+        """
+        Descarta extratos em cache após escritas
+
+        Args:
+            proprietario_ids: Proprietários afetados; sem lista, descarta todos
+        """
+        if proprietario_ids is None:
+            _cache_extrato.invalidar()
+        else:
+            afetados = set(proprietario_ids)
+            _cache_extrato.invalidar(lambda chave: chave[0] in afetados)
@@ -5,11 +5,18 @@ Centraliza toda a lógica de negócio relacionada aos imóveis.
 
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import func, literal, select, union_all
 from typing import List, Dict, Optional
 from datetime import datetime
 from fastapi import HTTPException
 
+from config import ESTATISTICAS_CACHE_TTL_SECONDS
 from models_final import Imovel, AluguelSimples, Participacao
+from utils.cache_memoria import CacheMemoria
+from utils.serializacao import como_float, como_texto, projetar
+
+# Estatísticas em lote das telas de listagem, descartadas a cada escrita
+_cache_estatisticas = CacheMemoria(ttl_segundos=ESTATISTICAS_CACHE_TTL_SECONDS, max_itens=256)
 
 
 class ImovelService:
@@ -49,6 +56,45 @@ class ImovelService:
                 detail=f"Erro ao listar imóveis: {str(e)}"
             )
 
+    @staticmethod
+    def listar_linhas(db: Session) -> List[Dict]:
+        """
+        Lista todos os imóveis por nome como dicionários, no formato de to_dict.
+        
+        Seleciona as colunas diretamente, sem hidratar entidades ORM.
+        
+        Args:
+            db: Sessão do banco de dados
+            
+        Returns:
+            Lista de dicionários prontos para serialização
+        """
+        try:
+            return projetar(db, select(
+                Imovel.id,
+                como_texto(Imovel.uuid),
+                Imovel.nome,
+                Imovel.endereco,
+                Imovel.tipo_imovel,
+                como_float(Imovel.area_total),
+                como_float(Imovel.area_construida),
+                como_float(Imovel.valor_cadastral),
+                como_float(Imovel.valor_mercado),
+                como_float(Imovel.iptu_mensal),
+                como_float(Imovel.condominio_mensal),
+                Imovel.data_cadastro,
+                Imovel.numero_quartos,
+                Imovel.numero_banheiros,
+                Imovel.numero_vagas_garagem,
+                Imovel.alugado
+            ).order_by(Imovel.nome))
+            
+        except SQLAlchemyError as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Erro ao listar imóveis: {str(e)}"
+            )
+
     @staticmethod
     def buscar_por_id(db: Session, imovel_id: int, eager_load: bool = False) -> Optional[Imovel]:
         """
@@ -346,10 +392,12 @@ class ImovelService:
                     "participacoes_vazias": dependencias["participacoes_vazias"]
                 }
             else:
-                # Estatísticas gerais
-                total_imoveis = db.query(Imovel).count()
-                imoveis_alugados = db.query(Imovel).filter(Imovel.alugado == True).count()
-                imoveis_disponiveis = db.query(Imovel).filter(Imovel.alugado == False).count()
+                # Estatísticas gerais em um único agregado
+                total_imoveis, imoveis_alugados, imoveis_disponiveis = db.execute(select(
+                    func.count(Imovel.id),
+                    func.count(Imovel.id).filter(Imovel.alugado == True),
+                    func.count(Imovel.id).filter(Imovel.alugado == False)
+                )).one()
                 
                 return {
                     "total_imoveis": total_imoveis,
@@ -366,6 +414,104 @@ class ImovelService:
                 detail=f"Erro ao obter estatísticas: {str(e)}"
             )
 
+    @staticmethod
+    def estatisticas_lote(
+        db: Session,
+        imovel_ids: Optional[List[int]] = None,
+        pular: int = 0,
+        limite: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Estatísticas de vários imóveis em uma única consulta.
+        
+        Participações e aluguéis são unidos em uma só relação e agregados com
+        COUNT/SUM ... FILTER por imóvel, sem multiplicar linhas entre as tabelas.
+        
+        Args:
+            db: Sessão do banco de dados
+            imovel_ids: Restringe aos IDs informados (opcional)
+            pular: Imóveis a pular, em ordem de nome
+            limite: Tamanho da página (None = todos)
+            
+        Returns:
+            Lista de dicionários no formato de obter_estatisticas(imovel_id), ordenada por nome
+        """
+        try:
+            pagina = select(Imovel.id, Imovel.nome, Imovel.alugado)
+            if imovel_ids is not None:
+                pagina = pagina.where(Imovel.id.in_(imovel_ids))
+            pagina = pagina.order_by(Imovel.nome, Imovel.id).offset(pular)
+            if limite is not None:
+                pagina = pagina.limit(limite)
+            pagina = pagina.cte("pagina")
+            
+            ids_pagina = select(pagina.c.id)
+            movimentos = union_all(
+                select(
+                    Participacao.imovel_id.label("imovel_id"),
+                    literal("participacao").label("origem"),
+                    Participacao.porcentagem.label("valor")
+                ).where(Participacao.imovel_id.in_(ids_pagina)),
+                select(
+                    AluguelSimples.imovel_id,
+                    literal("aluguel"),
+                    AluguelSimples.valor_liquido_proprietario
+                ).where(AluguelSimples.imovel_id.in_(ids_pagina))
+            ).subquery("movimentos")
+            
+            eh_aluguel = movimentos.c.origem == "aluguel"
+            eh_participacao = movimentos.c.origem == "participacao"
+            consulta = select(
+                pagina.c.id,
+                pagina.c.nome,
+                pagina.c.alugado,
+                func.count().filter(eh_aluguel).label("alugueis_total"),
+                func.coalesce(func.sum(movimentos.c.valor).filter(eh_aluguel), 0).label("valor_total_alugueis"),
+                func.count().filter(eh_participacao & (movimentos.c.valor > 0)).label("participacoes_ativas"),
+                func.count().filter(eh_participacao & (movimentos.c.valor == 0)).label("participacoes_vazias")
+            ).select_from(pagina).outerjoin(
+                movimentos, movimentos.c.imovel_id == pagina.c.id
+            ).group_by(pagina.c.id, pagina.c.nome, pagina.c.alugado).order_by(pagina.c.nome, pagina.c.id)
+            
+            return [{
+                "imovel_id": linha.id,
+                "nome": linha.nome,
+                "alugado": linha.alugado,
+                "alugueis_total": linha.alugueis_total,
+                "valor_total_alugueis": float(linha.valor_total_alugueis),
+                "participacoes_ativas": linha.participacoes_ativas,
+                "participacoes_vazias": linha.participacoes_vazias
+            } for linha in db.execute(consulta)]
+            
+        except SQLAlchemyError as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Erro ao obter estatísticas dos imóveis: {str(e)}"
+            )
+
+    @staticmethod
+    def estatisticas_lote_em_cache(db: Session, pular: int = 0, limite: Optional[int] = None) -> List[Dict]:
+        """
+        Versão em cache de estatisticas_lote, invalidada por invalidar_estatisticas.
+        
+        Args:
+            db: Sessão do banco de dados
+            pular: Imóveis a pular, em ordem de nome
+            limite: Tamanho da página (None = todos)
+            
+        Returns:
+            Lista de dicionários de estatísticas
+        """
+        return _cache_estatisticas.obter_ou_calcular(
+            (pular, limite),
+            lambda: ImovelService.estatisticas_lote(db, pular=pular, limite=limite)
+        )
+
+    @staticmethod
+    def invalidar_estatisticas() -> None:
+        """Descarta as estatísticas em lote em cache."""
+        _cache_estatisticas.invalidar()
+
     @staticmethod
     def validar_dados(dados: Dict, atualizacao: bool = False) -> None:
         """
@@ -416,22 +562,12 @@ class ImovelService:
         Returns:
             Dicionário com contadores de dependências
         """
-        alugueis_count = db.query(AluguelSimples).filter(
-            AluguelSimples.imovel_id == imovel_id
-        ).count()
-        
-        participacoes_ativas_count = db.query(Participacao).filter(
-            Participacao.imovel_id == imovel_id,
-            Participacao.porcentagem > 0
-        ).count()
-        
-        participacoes_vazias_count = db.query(Participacao).filter(
-            Participacao.imovel_id == imovel_id,
-            Participacao.porcentagem == 0
-        ).count()
+        estatisticas = ImovelService.estatisticas_lote(db, imovel_ids=[imovel_id])
+        if not estatisticas:
+            return {"alugueis": 0, "participacoes_ativas": 0, "participacoes_vazias": 0}
         
         return {
-            "alugueis": alugueis_count,
-            "participacoes_ativas": participacoes_ativas_count,
-            "participacoes_vazias": participacoes_vazias_count
+            "alugueis": estatisticas[0]["alugueis_total"],
+            "participacoes_ativas": estatisticas[0]["participacoes_ativas"],
+            "participacoes_vazias": estatisticas[0]["participacoes_vazias"]
         }
@@ -0,0 +1,372 @@
+"""
+Serviço de Informe de Rendimentos - Camada de Lógica de Negócio
+Gera em lote os informes anuais de todos os proprietários
+"""
+import fcntl
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from typing import Dict, List, Optional, Any
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from config import STORAGE_DIR
+from models_final import AluguelSimples, Darf, Proprietario
+from utils import informe_render
+from utils.informe_render import renderizar_informe, nome_arquivo_informe
+
+FORMATOS_SUPORTADOS = ("xlsx", "pdf")
+
+
+class GeracaoEmAndamento(Exception):
+    """Já existe uma geração de informes em curso para o ano."""
+
+
+class TravaAno:
+    """
+    Trava exclusiva da geração de um ano, em arquivo no STORAGE_DIR
+
+    flock vale entre threads e processos (todos os workers usam o mesmo
+    diretório) e é liberado pelo sistema se o processo morrer. A trava é
+    obtida antes de preparar_lote e liberada ao fim de renderizar_lote.
+    """
+
+    def __init__(self, caminho: str):
+        self._arquivo = open(caminho, "a")
+        try:
+            fcntl.flock(self._arquivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._arquivo.close()
+            raise GeracaoEmAndamento(f"Já existe uma geração de informes em andamento ({caminho})")
+
+    def liberar(self) -> None:
+        """Libera a trava (chamadas repetidas são ignoradas)."""
+        if not self._arquivo.closed:
+            fcntl.flock(self._arquivo.fileno(), fcntl.LOCK_UN)
+            self._arquivo.close()
+
+
+class InformeRendimentosService:
+    """Serviço para gerar e consultar informes de rendimentos anuais"""
+
+    @staticmethod
+    def diretorio_ano(ano: int) -> str:
+        """Diretório do armazenamento pré-calculado para o ano"""
+        diretorio = os.path.join(STORAGE_DIR, "informes", str(ano))
+        os.makedirs(diretorio, exist_ok=True)
+        return diretorio
+
+    @staticmethod
+    def formatos_disponiveis() -> List[str]:
+        """
+        Formatos que este servidor consegue renderizar
+
+        PDF depende do pacote opcional reportlab; sem ele só há xlsx.
+        """
+        return [f for f in FORMATOS_SUPORTADOS if f != "pdf" or informe_render.PDF_DISPONIVEL]
+
+    @staticmethod
+    def travar_ano(ano: int) -> TravaAno:
+        """
+        Obtém a trava de geração do ano
+
+        Raises:
+            GeracaoEmAndamento: Se outra requisição ou worker já a detém
+        """
+        return TravaAno(os.path.join(InformeRendimentosService.diretorio_ano(ano), ".geracao.lock"))
+
+    @staticmethod
+    def agregar_ano(db: Session, ano: int) -> List[Dict[str, Any]]:
+        """
+        Agrega aluguéis, taxas e DARFs de todos os proprietários em uma passada
+
+        São executadas apenas três consultas (aluguéis por proprietário/mês,
+        DARFs por proprietário/mês e dados cadastrais), independentemente do
+        número de proprietários.
+
+        Args:
+            db: Sessão do banco de dados
+            ano: Ano-calendário
+
+        Returns:
+            Lista de informes, um por proprietário com movimento no ano
+        """
+        alugueis = db.query(
+            AluguelSimples.proprietario_id,
+            AluguelSimples.mes,
+            func.sum(AluguelSimples.valor_liquido_proprietario).label("valor_liquido"),
+            func.sum(AluguelSimples.taxa_administracao_proprietario).label("taxa_administracao"),
+        ).filter(
+            AluguelSimples.ano == ano
+        ).group_by(
+            AluguelSimples.proprietario_id, AluguelSimples.mes
+        ).all()
+
+        mes_darf = func.extract("month", Darf.data)
+        darfs = db.query(
+            Darf.proprietario_id,
+            mes_darf.label("mes"),
+            func.sum(Darf.valor_darf).label("valor_darf"),
+        ).filter(
+            Darf.data >= date(ano, 1, 1),
+            Darf.data < date(ano + 1, 1, 1),
+        ).group_by(
+            Darf.proprietario_id, mes_darf
+        ).all()
+
+        matriz: Dict[int, Dict[int, Dict[str, float]]] = {}
+
+        def celula(proprietario_id: int, mes: int) -> Dict[str, float]:
+            meses = matriz.setdefault(proprietario_id, {})
+            return meses.setdefault(mes, {"valor_liquido": 0.0, "taxa_administracao": 0.0, "valor_darf": 0.0})
+
+        for linha in alugueis:
+            item = celula(linha.proprietario_id, int(linha.mes))
+            item["valor_liquido"] += float(linha.valor_liquido or 0)
+            item["taxa_administracao"] += float(linha.taxa_administracao or 0)
+
+        for linha in darfs:
+            item = celula(linha.proprietario_id, int(linha.mes))
+            item["valor_darf"] += float(linha.valor_darf or 0)
+
+        if not matriz:
+            return []
+
+        proprietarios = {
+            p.id: p for p in db.query(
+                Proprietario.id, Proprietario.nome, Proprietario.sobrenome, Proprietario.documento
+            ).filter(Proprietario.id.in_(list(matriz.keys()))).all()
+        }
+
+        informes = []
+        for proprietario_id in sorted(matriz.keys()):
+            proprietario = proprietarios.get(proprietario_id)
+            meses = []
+            totais = {"valor_liquido": 0.0, "taxa_administracao": 0.0, "valor_darf": 0.0}
+            for mes in range(1, 13):
+                valores = matriz[proprietario_id].get(mes, {"valor_liquido": 0.0, "taxa_administracao": 0.0, "valor_darf": 0.0})
+                meses.append({"mes": mes, **{k: round(v, 2) for k, v in valores.items()}})
+                for chave in totais:
+                    totais[chave] += valores[chave]
+
+            informes.append({
+                "ano": ano,
+                "proprietario_id": proprietario_id,
+                "nome_proprietario": f"{proprietario.nome} {proprietario.sobrenome or ''}".strip() if proprietario else "",
+                "documento": proprietario.documento if proprietario else None,
+                "meses": meses,
+                "totais": {k: round(v, 2) for k, v in totais.items()},
+            })
+        return informes
+
+    @staticmethod
+    def _impressao_digital(informe: Dict[str, Any]) -> str:
+        """Hash do conteúdo do informe, usado para retomar execuções"""
+        conteudo = json.dumps(informe, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _caminho_manifesto(ano: int) -> str:
+        return os.path.join(InformeRendimentosService.diretorio_ano(ano), "manifesto.json")
+
+    @staticmethod
+    def carregar_manifesto(ano: int) -> Dict[str, Any]:
+        """
+        Carrega o manifesto de progresso da geração do ano
+
+        Returns:
+            Manifesto (vazio se o ano ainda não foi gerado)
+        """
+        caminho = InformeRendimentosService._caminho_manifesto(ano)
+        if not os.path.exists(caminho):
+            return {"ano": ano, "status": "nao_iniciado", "total": 0, "concluidos": {}, "erros": {}}
+        with open(caminho, "r", encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+
+    @staticmethod
+    def _salvar_manifesto(ano: int, manifesto: Dict[str, Any]) -> None:
+        caminho = InformeRendimentosService._caminho_manifesto(ano)
+        temporario = f"{caminho}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(manifesto, arquivo, ensure_ascii=False, indent=2)
+        os.replace(temporario, caminho)
+
+    @staticmethod
+    def pendentes(
+        informes: List[Dict[str, Any]],
+        manifesto: Dict[str, Any],
+        formatos: List[str],
+        diretorio: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Filtra os informes que ainda precisam ser renderizados
+
+        Um informe é considerado concluído quando o manifesto registra o
+        mesmo hash de conteúdo e os arquivos de todos os formatos existem.
+        """
+        resultado = []
+        concluidos = manifesto.get("concluidos", {})
+        for informe in informes:
+            registro = concluidos.get(str(informe["proprietario_id"]))
+            if (
+                registro
+                and registro.get("hash") == InformeRendimentosService._impressao_digital(informe)
+                and set(formatos).issubset(registro.get("formatos", []))
+                and all(os.path.exists(os.path.join(diretorio, nome)) for nome in registro.get("arquivos", []))
+            ):
+                continue
+            resultado.append(informe)
+        return resultado
+
+    @staticmethod
+    def preparar_lote(
+        db: Session,
+        ano: int,
+        formatos: Optional[List[str]] = None,
+        reprocessar: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Agrega o ano e registra no manifesto o que falta renderizar
+
+        Deve ser chamado com a trava do ano (travar_ano), que segue com a
+        renderização: o manifesto é reescrito aqui.
+
+        Args:
+            db: Sessão do banco de dados
+            ano: Ano-calendário
+            formatos: Formatos desejados (padrão: todos os disponíveis)
+            reprocessar: Ignora o progresso salvo e renderiza tudo novamente
+
+        Returns:
+            Dicionário com o manifesto atualizado e a lista de informes pendentes
+
+        Raises:
+            ValueError: Formato não suportado ou indisponível neste servidor
+        """
+        disponiveis = InformeRendimentosService.formatos_disponiveis()
+        formatos = list(formatos or disponiveis)
+        invalidos = [f for f in formatos if f not in FORMATOS_SUPORTADOS]
+        if invalidos:
+            raise ValueError(f"Formatos não suportados: {', '.join(invalidos)}")
+        indisponiveis = [f for f in formatos if f not in disponiveis]
+        if indisponiveis:
+            raise ValueError(f"Formatos indisponíveis neste servidor (instale o pacote reportlab): {', '.join(indisponiveis)}")
+
+        informes = InformeRendimentosService.agregar_ano(db, ano)
+        diretorio = InformeRendimentosService.diretorio_ano(ano)
+
+        manifesto = InformeRendimentosService.carregar_manifesto(ano)
+        if reprocessar:
+            manifesto["concluidos"] = {}
+        pendentes = InformeRendimentosService.pendentes(informes, manifesto, formatos, diretorio)
+
+        ids_atuais = {str(i["proprietario_id"]) for i in informes}
+        manifesto.update({
+            "ano": ano,
+            "formatos": formatos,
+            "total": len(informes),
+            "status": "pendente" if pendentes else "concluido",
+            "atualizado_em": datetime.now().isoformat(),
+            "concluidos": {k: v for k, v in manifesto.get("concluidos", {}).items() if k in ids_atuais},
+            "erros": {},
+        })
+        InformeRendimentosService._salvar_manifesto(ano, manifesto)
+        return {"manifesto": manifesto, "pendentes": pendentes}
+
+    @staticmethod
+    def renderizar_lote(
+        ano: int,
+        informes: List[Dict[str, Any]],
+        formatos: List[str],
+        max_workers: Optional[int] = None,
+        trava: Optional[TravaAno] = None
+    ) -> Dict[str, Any]:
+        """
+        Renderiza os informes em paralelo num pool de processos
+
+        O manifesto é atualizado a cada informe concluído, de modo que uma
+        execução interrompida pode ser retomada chamando preparar_lote de novo.
+        Não usa o banco de dados, podendo rodar em tarefa de segundo plano.
+
+        Args:
+            ano: Ano-calendário
+            informes: Informes pendentes (retorno de preparar_lote)
+            formatos: Formatos a gerar
+            max_workers: Número de processos (1 renderiza no processo atual)
+            trava: Trava obtida antes de preparar_lote; sem ela, é obtida aqui.
+                É liberada ao final em ambos os casos
+
+        Returns:
+            Manifesto final
+
+        Raises:
+            GeracaoEmAndamento: Se, sem trava informada, outra geração estiver em curso
+        """
+        diretorio = InformeRendimentosService.diretorio_ano(ano)
+        trava = trava or InformeRendimentosService.travar_ano(ano)
+
+        try:
+            manifesto = InformeRendimentosService.carregar_manifesto(ano)
+            manifesto["status"] = "processando"
+            InformeRendimentosService._salvar_manifesto(ano, manifesto)
+            hashes = {i["proprietario_id"]: InformeRendimentosService._impressao_digital(i) for i in informes}
+
+            def registrar(resultado: Dict[str, Any]) -> None:
+                manifesto["concluidos"][str(resultado["proprietario_id"])] = {
+                    "hash": hashes[resultado["proprietario_id"]],
+                    "formatos": formatos,
+                    "arquivos": resultado["arquivos"],
+                    "avisos": resultado["avisos"],
+                }
+                manifesto["atualizado_em"] = datetime.now().isoformat()
+                InformeRendimentosService._salvar_manifesto(ano, manifesto)
+
+            def registrar_erro(proprietario_id: int, erro: Exception) -> None:
+                print(f"❌ Erro ao renderizar informe do proprietário {proprietario_id}: {erro}")
+                manifesto["erros"][str(proprietario_id)] = str(erro)
+                InformeRendimentosService._salvar_manifesto(ano, manifesto)
+
+            workers = max_workers or min(4, os.cpu_count() or 1)
+            if workers <= 1 or len(informes) <= 1:
+                for informe in informes:
+                    try:
+                        registrar(renderizar_informe(informe, diretorio, formatos))
+                    except Exception as e:
+                        registrar_erro(informe["proprietario_id"], e)
+            else:
+                # spawn: os processos filhos não herdam conexões do pool do SQLAlchemy
+                contexto = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers=workers, mp_context=contexto) as executor:
+                    futuros = {
+                        executor.submit(renderizar_informe, informe, diretorio, formatos): informe["proprietario_id"]
+                        for informe in informes
+                    }
+                    for futuro in as_completed(futuros):
+                        try:
+                            registrar(futuro.result())
+                        except Exception as e:
+                            registrar_erro(futuros[futuro], e)
+
+            manifesto["status"] = "concluido_com_erros" if manifesto["erros"] else "concluido"
+            InformeRendimentosService._salvar_manifesto(ano, manifesto)
+            return manifesto
+        finally:
+            trava.liberar()
+
+    @staticmethod
+    def caminho_informe(ano: int, proprietario_id: int, formato: str) -> Optional[str]:
+        """
+        Caminho do informe pré-calculado de um proprietário
+
+        Returns:
+            Caminho do arquivo ou None se ainda não foi gerado
+        """
+        caminho = os.path.join(
+            InformeRendimentosService.diretorio_ano(ano),
+            nome_arquivo_informe(ano, proprietario_id, formato)
+        )
+        return caminho if os.path.exists(caminho) else None
@@ -3,14 +3,36 @@ Serviço de Participações - Camada de Lógica de Negócio
 Centraliza toda a lógica relacionada a participações e versionamento
 """
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, desc, func
+from sqlalchemy import and_, desc, func, insert, inspect, null, select
+from sqlalchemy.exc import IntegrityError
 from typing import List, Dict, Optional, Any
 from datetime import datetime, date, timedelta
 from decimal import Decimal
 
+import numpy as np
+import pandas as pd
+
+from config import ESTATISTICAS_CACHE_TTL_SECONDS
 from models_final import (
-    Participacao, HistoricoParticipacao, Imovel, Proprietario
+    Participacao, HistoricoParticipacao, Imovel, Proprietario, VersaoParticipacao, VersaoAtualParticipacao
 )
+from utils.bulk_upsert import buscar_chaves_existentes, insert_para_dialeto
+from utils.cache_memoria import CacheMemoria
+from utils.serializacao import como_float, como_texto, projetar
+
+# Diferença aceita entre a soma das porcentagens de um imóvel e 100%
+TOLERANCIA_SOMA = 0.01
+# Tentativas de reservar um data_registro livre (colisões só ocorrem com gravações simultâneas)
+TENTATIVAS_VERSAO = 10
+
+# Conjunto de participações de cada versão, por data_registro. Uma nova versão usa
+# outra chave, mas exclusões avulsas alteram uma versão existente: o middleware de
+# main.py descarta o cache após escritas nas rotas de participações, imóveis,
+# proprietários e upload, apenas no worker que as atendeu. Os demais workers podem
+# servir a versão anterior à exclusão por até ESTATISTICAS_CACHE_TTL_SECONDS.
+_cache_versoes = CacheMemoria(ttl_segundos=ESTATISTICAS_CACHE_TTL_SECONDS, max_itens=8)
+# Engines em que a tabela do ponteiro (migração 017) já foi encontrada
+_engines_com_ponteiro = set()
 
 
 class ParticipacaoService:
@@ -296,6 +318,209 @@ class ParticipacaoService:
         
         return True, None
     
+    @staticmethod
+    def validar_matriz(
+        db: Session,
+        participacoes: List[Dict[str, Any]]
+    ) -> tuple[bool, Optional[str], Optional[pd.DataFrame]]:
+        """
+        Valida de uma vez o conjunto completo de participações de uma versão
+
+        Normaliza ids e porcentagens por coluna, verifica a existência de
+        imóveis e proprietários com uma consulta IN por entidade e confere, com
+        um groupby, que cada imóvel soma 100% (imóveis só com 0% ficam sem
+        distribuição e são aceitos).
+
+        Args:
+            db: Sessão do banco de dados
+            participacoes: Lista com [{ imovel_id, proprietario_id, porcentagem }]
+
+        Returns:
+            Tupla (válido, mensagem_erro, DataFrame normalizado). A mensagem é a
+            do primeiro item inválido da lista
+        """
+        if not isinstance(participacoes, list) or not participacoes:
+            return False, "Participações deve ser uma lista não vazia", None
+
+        bruto = pd.DataFrame.from_records(
+            [item if isinstance(item, dict) else {} for item in participacoes],
+            columns=["imovel_id", "proprietario_id", "porcentagem"]
+        )
+        imovel_id = pd.to_numeric(bruto["imovel_id"], errors="coerce")
+        proprietario_id = pd.to_numeric(bruto["proprietario_id"], errors="coerce")
+        # "12,5%" e "12.5" viram 12.5; a representação str de números é exata
+        porcentagem = pd.to_numeric(
+            bruto["porcentagem"].astype(str).str.strip()
+            .str.replace("%", "", regex=False).str.replace(",", ".", regex=False),
+            errors="coerce"
+        )
+
+        ids_invalidos = (
+            imovel_id.isna() | proprietario_id.isna()
+            | (imovel_id != imovel_id.round()) | (proprietario_id != proprietario_id.round())
+        )
+        imoveis = buscar_chaves_existentes(db, [Imovel.id], imovel_id[~ids_invalidos].astype("int64").tolist())
+        proprietarios = buscar_chaves_existentes(db, [Proprietario.id], proprietario_id[~ids_invalidos].astype("int64").tolist())
+        porcentagem_invalida = porcentagem.isna() | np.isinf(porcentagem)
+
+        # Regras por item, na ordem em que eram verificadas; vale o primeiro item com erro
+        regras = [
+            (ids_invalidos, lambda i: f"Item #{i+1}: imovel_id/proprietario_id inválido"),
+            (~ids_invalidos & ~imovel_id.isin(list(imoveis)), lambda i: f"Imóvel id={int(imovel_id[i])} não encontrado"),
+            (~ids_invalidos & ~proprietario_id.isin(list(proprietarios)), lambda i: f"Proprietário id={int(proprietario_id[i])} não encontrado"),
+            (porcentagem_invalida, lambda i: f"Item #{i+1}: porcentagem inválida"),
+            (porcentagem < 0, lambda i: f"Item #{i+1}: porcentagem negativa"),
+            (porcentagem > 100, lambda i: f"Item #{i+1}: porcentagem acima de 100"),
+            (pd.DataFrame({"i": imovel_id, "p": proprietario_id}).duplicated() & ~ids_invalidos,
+             lambda i: f"Item #{i+1}: proprietário repetido no imóvel id={int(imovel_id[i])}"),
+        ]
+        erros = [(int(mascara.idxmax()), ordem) for ordem, (mascara, _) in enumerate(regras) if mascara.any()]
+        if erros:
+            indice, ordem = min(erros)
+            return False, regras[ordem][1](indice), None
+
+        dados = pd.DataFrame({
+            "imovel_id": imovel_id.astype("int64"),
+            "proprietario_id": proprietario_id.astype("int64"),
+            "porcentagem": porcentagem.astype("float64")
+        })
+        somas = dados.groupby("imovel_id", sort=False)["porcentagem"].sum()
+        fora_de_100 = somas[(somas > 0) & ((somas - 100).abs() > TOLERANCIA_SOMA)]
+        if not fora_de_100.empty:
+            imovel, soma = int(fora_de_100.index[0]), float(fora_de_100.iloc[0])
+            return False, f"Imóvel id={imovel}: total de percentuais deve ser 100%. Atual: {soma:.2f}%", None
+
+        return True, None, dados
+
+    @staticmethod
+    def reservar_versao(db: Session, usuario_id: Optional[int] = None) -> datetime:
+        """
+        Reserva o data_registro de uma nova versão em versoes_participacoes
+
+        O horário é o atual, ou 1µs após a última versão se o relógio estiver
+        atrás dela, para que a nova versão seja sempre a mais recente. A chave
+        primária da tabela impede que gravações simultâneas usem o mesmo valor;
+        em caso de colisão o próximo microssegundo é tentado.
+
+        Args:
+            db: Sessão do banco de dados (a reserva é confirmada com a versão)
+            usuario_id: ID do usuário que criou a versão (auditoria)
+
+        Returns:
+            data_registro reservado
+        """
+        ultima = db.query(func.max(VersaoParticipacao.data_registro)).scalar()
+        candidata = datetime.now()
+        if ultima is not None and candidata <= ultima:
+            candidata = ultima + timedelta(microseconds=1)
+
+        for _ in range(TENTATIVAS_VERSAO):
+            try:
+                with db.begin_nested():
+                    db.execute(insert(VersaoParticipacao).values(
+                        data_registro=candidata, usuario_id=usuario_id, criado_em=datetime.now()
+                    ))
+            except IntegrityError:
+                candidata += timedelta(microseconds=1)
+                continue
+            if ParticipacaoService._ponteiro_disponivel(db):
+                ParticipacaoService._apontar_versao_atual(db, candidata)
+            return candidata
+        raise RuntimeError("Não foi possível reservar um data_registro para a nova versão")
+
+    @staticmethod
+    def _ponteiro_disponivel(db: Session) -> bool:
+        """
+        Indica se versao_atual_participacoes existe no banco da sessão
+
+        Consultar uma tabela inexistente abortaria a transação no PostgreSQL,
+        por isso a existência é verificada antes. O resultado positivo fica
+        memorizado por engine; enquanto a tabela não existe a verificação é
+        refeita, de modo que a migração 017 passa a valer sem reiniciar.
+        """
+        engine = db.get_bind().engine
+        if engine not in _engines_com_ponteiro:
+            if not inspect(engine).has_table(VersaoAtualParticipacao.__tablename__):
+                return False
+            _engines_com_ponteiro.add(engine)
+        return True
+
+    @staticmethod
+    def _apontar_versao_atual(db: Session, data_registro: datetime) -> None:
+        """
+        Move o ponteiro da versão vigente, na mesma transação da nova versão
+
+        O ponteiro só avança: entre gravações simultâneas prevalece a versão
+        mais recente, independentemente da ordem dos commits.
+        """
+        comando = insert_para_dialeto(db, VersaoAtualParticipacao).values(
+            id=1, data_registro=data_registro, atualizado_em=datetime.now()
+        )
+        db.execute(comando.on_conflict_do_update(
+            index_elements=[VersaoAtualParticipacao.id],
+            set_={
+                "data_registro": comando.excluded.data_registro,
+                "atualizado_em": comando.excluded.atualizado_em
+            },
+            where=VersaoAtualParticipacao.data_registro < comando.excluded.data_registro
+        ))
+
+    @staticmethod
+    def versao_atual(db: Session) -> Optional[datetime]:
+        """
+        data_registro da versão vigente das participações
+
+        Lê o ponteiro de versao_atual_participacoes (busca pela chave primária).
+        Sem a tabela ou sem a linha do ponteiro (banco anterior à migração 017
+        ou sem nenhuma versão reservada), usa o maior data_registro de
+        participacoes. Com o ponteiro presente, participações gravadas sem
+        reservar_versao não são consideradas.
+
+        Args:
+            db: Sessão do banco de dados
+
+        Returns:
+            data_registro vigente ou None se não houver participações
+        """
+        atual = None
+        if ParticipacaoService._ponteiro_disponivel(db):
+            atual = db.query(VersaoAtualParticipacao.data_registro).filter(VersaoAtualParticipacao.id == 1).scalar()
+        if atual is None:
+            atual = db.query(func.max(Participacao.data_registro)).scalar()
+        return atual
+
+    @staticmethod
+    def listar_versao(db: Session, data_registro: datetime) -> List[Dict[str, Any]]:
+        """
+        Participações de uma versão, em cache por data_registro
+
+        Projeção com as chaves de Participacao.to_dict, sem hidratar entidades.
+        Em outros workers, uma exclusão avulsa pode levar até
+        ESTATISTICAS_CACHE_TTL_SECONDS para aparecer.
+
+        Args:
+            db: Sessão do banco de dados
+            data_registro: Identificador da versão
+
+        Returns:
+            Lista de dicionários, um por participação
+        """
+        consulta = select(
+            Participacao.id,
+            como_texto(Participacao.uuid),
+            como_float(Participacao.porcentagem, padrao=0.0),
+            Participacao.data_registro,
+            null().label("versao_id"),  # Participações ativas não têm versao_id
+            Participacao.imovel_id,
+            Participacao.proprietario_id
+        ).where(Participacao.data_registro == data_registro)
+        return _cache_versoes.obter_ou_calcular(data_registro, lambda: projetar(db, consulta))
+
+    @staticmethod
+    def invalidar_cache() -> None:
+        """Descarta os conjuntos de participações em cache."""
+        _cache_versoes.invalidar()
+
     @staticmethod
     def criar_nova_versao_global(
         db: Session,
@@ -305,115 +530,54 @@ class ParticipacaoService:
         """
         Cria uma nova versão GLOBAL do conjunto de participações
         (Similar ao sistema antigo com data_registro único)
-        
+
+        A matriz inteira é validada em uma passada (validar_matriz) e a versão é
+        gravada com um INSERT em lote para as participações e outro para o
+        histórico, sob um data_registro reservado em versoes_participacoes.
+
         Args:
             db: Sessão do banco de dados
             participacoes: Lista com [{ imovel_id, proprietario_id, porcentagem }]
             usuario_id: ID do usuário (para auditoria)
-        
+
         Returns:
             Tupla (sucesso, mensagem_erro, resultado)
         """
         try:
-            # Validar payload
-            if not isinstance(participacoes, list) or not participacoes:
-                return False, "Participações deve ser uma lista não vazia", None
-            
-            # Validar e normalizar dados
-            por_imovel: Dict[int, float] = {}
-            normalizados = []
-            
-            for idx, item in enumerate(participacoes):
-                # Validar IDs
-                try:
-                    imovel_id = int(item.get("imovel_id"))
-                    proprietario_id = int(item.get("proprietario_id"))
-                except (ValueError, TypeError):
-                    return False, f"Item #{idx+1}: imovel_id/proprietario_id inválido", None
-                
-                # Verificar existência (batch query seria melhor, mas mantemos compatibilidade)
-                if not db.query(Imovel.id).filter(Imovel.id == imovel_id).first():
-                    return False, f"Imóvel id={imovel_id} não encontrado", None
-                if not db.query(Proprietario.id).filter(Proprietario.id == proprietario_id).first():
-                    return False, f"Proprietário id={proprietario_id} não encontrado", None
-                
-                # Normalizar porcentagem
-                porcentagem = item.get("porcentagem")
-                if isinstance(porcentagem, str):
-                    porcentagem = porcentagem.strip().replace('%', '').replace(',', '.')
-                    try:
-                        porcentagem = float(porcentagem)
-                    except ValueError:
-                        return False, f"Item #{idx+1}: porcentagem inválida", None
-                
-                try:
-                    porcentagem = float(porcentagem)
-                except (ValueError, TypeError):
-                    return False, f"Item #{idx+1}: porcentagem inválida", None
-                
-                if porcentagem < 0:
-                    return False, f"Item #{idx+1}: porcentagem negativa", None
-                
-                # Acumular por imóvel (para validação futura se necessário)
-                por_imovel[imovel_id] = por_imovel.get(imovel_id, 0.0) + porcentagem
-                
-                normalizados.append({
-                    "imovel_id": imovel_id,
-                    "proprietario_id": proprietario_id,
-                    "porcentagem": porcentagem
-                })
-            
-            # Criar data_registro única
-            data_registro_novo = datetime.now()
-            tentativas = 0
-            while True:
-                existe = db.query(Participacao).filter(
-                    Participacao.data_registro == data_registro_novo
-                ).first()
-                if not existe:
-                    break
-                tentativas += 1
-                data_registro_novo = data_registro_novo + timedelta(microseconds=tentativas)
-            
-            # Criar novas participações
-            novas_participacoes = []
-            for item in normalizados:
-                participacao = Participacao(
-                    imovel_id=item["imovel_id"],
-                    proprietario_id=item["proprietario_id"],
-                    porcentagem=item["porcentagem"],
-                    data_registro=data_registro_novo
-                )
-                db.add(participacao)
-                novas_participacoes.append(participacao)
-            
-            db.flush()  # Para obter IDs
-            
-            # Salvar no histórico
+            valido, erro, dados = ParticipacaoService.validar_matriz(db, participacoes)
+            if not valido:
+                return False, erro, None
+
+            data_registro_novo = ParticipacaoService.reservar_versao(db, usuario_id)
             versao_id = data_registro_novo.isoformat()
-            for participacao in novas_participacoes:
-                historico = HistoricoParticipacao(
-                    versao_id=versao_id,
-                    data_versao=data_registro_novo,
-                    porcentagem=participacao.porcentagem,
-                    data_registro_original=participacao.data_registro,
-                    imovel_id=participacao.imovel_id,
-                    proprietario_id=participacao.proprietario_id
-                )
-                db.add(historico)
-            
+
+            # Tipos Python (não NumPy) para o driver do banco
+            linhas = list(zip(
+                dados["imovel_id"].tolist(), dados["proprietario_id"].tolist(), dados["porcentagem"].tolist()
+            ))
+            db.execute(insert(Participacao), [
+                {"imovel_id": imovel_id, "proprietario_id": proprietario_id,
+                 "porcentagem": porcentagem, "data_registro": data_registro_novo}
+                for imovel_id, proprietario_id, porcentagem in linhas
+            ])
+            db.execute(insert(HistoricoParticipacao), [
+                {"versao_id": versao_id, "data_versao": data_registro_novo, "porcentagem": porcentagem,
+                 "data_registro_original": data_registro_novo, "imovel_id": imovel_id,
+                 "proprietario_id": proprietario_id}
+                for imovel_id, proprietario_id, porcentagem in linhas
+            ])
             db.commit()
-            
+
             resultado = {
                 "success": True,
-                "data_registro": data_registro_novo.isoformat(),
-                "quantidade": len(novas_participacoes),
+                "data_registro": versao_id,
+                "quantidade": len(linhas),
+                "imoveis": int(dados["imovel_id"].nunique()),
                 "versao_id": versao_id
             }
-            
+
             return True, None, resultado
-            
+
         except Exception as e:
             db.rollback()
             return False, f"Erro ao criar nova versão: {str(e)}", None
-
@@ -3,11 +3,17 @@ Serviço de Proprietários - Camada de Lógica de Negócio
 Centraliza toda a lógica relacionada a proprietários
 """
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, or_, and_
+from sqlalchemy import Boolean, Numeric, func, or_, and_, case, cast, literal, null, select, union_all
 from typing import List, Dict, Optional, Any, Tuple
 from datetime import datetime
 
+from config import ESTATISTICAS_CACHE_TTL_SECONDS
 from models_final import Proprietario, Participacao, AluguelSimples
+from utils.cache_memoria import CacheMemoria
+from utils.serializacao import como_texto, projetar
+
+# Estatísticas em lote das telas de listagem, descartadas a cada escrita
+_cache_estatisticas = CacheMemoria(ttl_segundos=ESTATISTICAS_CACHE_TTL_SECONDS, max_itens=256)
 
 
 class ProprietarioService:
@@ -48,6 +54,29 @@ class ProprietarioService:
         
         return query.all()
     
+    @staticmethod
+    def listar_linhas(db: Session) -> List[Dict[str, Any]]:
+        """
+        Lista todos os proprietários por nome como dicionários, no formato de to_dict
+        
+        Seleciona as colunas diretamente, sem hidratar entidades ORM.
+        
+        Args:
+            db: Sessão do banco de dados
+        
+        Returns:
+            Lista de dicionários prontos para serialização
+        """
+        colunas = [
+            como_texto(coluna) if coluna.key == 'uuid' else coluna
+            for coluna in Proprietario.__table__.columns
+        ]
+        nome_completo = case(
+            (func.coalesce(Proprietario.sobrenome, '') != '', Proprietario.nome + ' ' + Proprietario.sobrenome),
+            else_=Proprietario.nome
+        ).label('nome_completo')
+        return projetar(db, select(*colunas, nome_completo).order_by(Proprietario.nome))
+    
     @staticmethod
     def buscar_por_id(
         db: Session,
@@ -257,38 +286,101 @@ class ProprietarioService:
         Returns:
             Dicionário com estatísticas ou None
         """
-        proprietario = db.query(Proprietario).filter(
-            Proprietario.id == proprietario_id
-        ).first()
-        
-        if not proprietario:
-            return None
-        
-        # Contar participações ativas
-        participacoes_ativas = db.query(Participacao).filter(
-            Participacao.proprietario_id == proprietario_id,
-            Participacao.ativo == True
-        ).count()
-        
-        # Contar total de aluguéis
-        total_alugueis = db.query(AluguelSimples).filter(
-            AluguelSimples.proprietario_id == proprietario_id
-        ).count()
-        
-        # Calcular total recebido
-        total_recebido = db.query(
-            func.sum(AluguelSimples.valor_liquido_proprietario)
-        ).filter(
-            AluguelSimples.proprietario_id == proprietario_id
-        ).scalar() or 0.0
-        
-        return {
-            "proprietario_id": proprietario_id,
-            "nome": proprietario.nome,
-            "participacoes_ativas": participacoes_ativas,
-            "total_alugueis": total_alugueis,
-            "total_recebido": float(total_recebido)
-        }
+        estatisticas = ProprietarioService.estatisticas_lote(db, proprietario_ids=[proprietario_id])
+        return estatisticas[0] if estatisticas else None
+    
+    @staticmethod
+    def estatisticas_lote(
+        db: Session,
+        proprietario_ids: Optional[List[int]] = None,
+        pular: int = 0,
+        limite: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Estatísticas de vários proprietários em uma única consulta
+        
+        Participações e aluguéis são unidos em uma só relação de movimentos e
+        agregados com COUNT/SUM ... FILTER por proprietário, sem multiplicar
+        linhas entre as duas tabelas.
+        
+        Args:
+            db: Sessão do banco de dados
+            proprietario_ids: Restringe aos IDs informados (opcional)
+            pular: Proprietários a pular, em ordem de nome
+            limite: Tamanho da página (None = todos)
+        
+        Returns:
+            Lista de dicionários no formato de obter_estatisticas, ordenada por nome
+        """
+        pagina = select(Proprietario.id, Proprietario.nome)
+        if proprietario_ids is not None:
+            pagina = pagina.where(Proprietario.id.in_(proprietario_ids))
+        pagina = pagina.order_by(Proprietario.nome, Proprietario.id).offset(pular)
+        if limite is not None:
+            pagina = pagina.limit(limite)
+        pagina = pagina.cte("pagina")
+        
+        ids_pagina = select(pagina.c.id)
+        movimentos = union_all(
+            select(
+                Participacao.proprietario_id.label("proprietario_id"),
+                literal("participacao").label("origem"),
+                Participacao.ativo.label("ativo"),
+                cast(null(), Numeric).label("valor")
+            ).where(Participacao.proprietario_id.in_(ids_pagina)),
+            select(
+                AluguelSimples.proprietario_id,
+                literal("aluguel"),
+                cast(null(), Boolean),
+                AluguelSimples.valor_liquido_proprietario
+            ).where(AluguelSimples.proprietario_id.in_(ids_pagina))
+        ).subquery("movimentos")
+        
+        eh_aluguel = movimentos.c.origem == "aluguel"
+        consulta = select(
+            pagina.c.id,
+            pagina.c.nome,
+            func.count().filter(and_(movimentos.c.origem == "participacao", movimentos.c.ativo == True)).label("participacoes_ativas"),
+            func.count().filter(eh_aluguel).label("total_alugueis"),
+            func.coalesce(func.sum(movimentos.c.valor).filter(eh_aluguel), 0).label("total_recebido")
+        ).select_from(pagina).outerjoin(
+            movimentos, movimentos.c.proprietario_id == pagina.c.id
+        ).group_by(pagina.c.id, pagina.c.nome).order_by(pagina.c.nome, pagina.c.id)
+        
+        return [{
+            "proprietario_id": linha.id,
+            "nome": linha.nome,
+            "participacoes_ativas": linha.participacoes_ativas,
+            "total_alugueis": linha.total_alugueis,
+            "total_recebido": float(linha.total_recebido)
+        } for linha in db.execute(consulta)]
+    
+    @staticmethod
+    def estatisticas_lote_em_cache(
+        db: Session,
+        pular: int = 0,
+        limite: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Versão em cache de estatisticas_lote, invalidada por invalidar_estatisticas
+        
+        Args:
+            db: Sessão do banco de dados
+            pular: Proprietários a pular, em ordem de nome
+            limite: Tamanho da página (None = todos)
+        
+        Returns:
+            Lista de dicionários de estatísticas
+        """
+        return _cache_estatisticas.obter_ou_calcular(
+            (pular, limite),
+            lambda: ProprietarioService.estatisticas_lote(db, pular=pular, limite=limite)
+        )
+    
+    @staticmethod
+    def invalidar_estatisticas() -> None:
+        """Descarta as estatísticas em lote em cache."""
+        _cache_estatisticas.invalidar()
     
     @staticmethod
     def validar_dados(dados: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
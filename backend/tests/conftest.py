@@ -1,11 +1,20 @@
+import os
+import tempfile
+
+# Contadores de rate limiting isolados por execução (o padrão é compartilhado no host)
+os.environ.setdefault("RATE_LIMIT_STORAGE_URI", f"sqlite:///{tempfile.mkdtemp()}/rate_limit.db")
+# Informes gerados nos testes não vão para o armazenamento permanente
+os.environ.setdefault("STORAGE_DIR", tempfile.mkdtemp())
+# Custo mínimo do bcrypt para os testes
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 from main import app
-from config import get_db
+from config import get_db, get_db_read
 from models_final import Base
-import os
 
 # Database de teste
 TEST_DATABASE_URL = "sqlite:////tmp/test.db"
@@ -35,6 +44,8 @@ def client(db_session: Session):
         yield db_session
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_db_read] = override_get_db
     yield TestClient(app)
     # clean up dependency override
-    del app.dependency_overrides[get_db]
\ No newline at end of file
+    del app.dependency_overrides[get_db]
+    del app.dependency_overrides[get_db_read]
\ No newline at end of file
@@ -0,0 +1,31 @@
+"""
+Testes para o casamento de nomes de proprietários com Aho-Corasick
+"""
+from utils.aho_corasick import AutomatoNomes, normalizar_nome
+
+
+def test_normalizar_nome():
+    """Testa a remoção de acentos, caixa e espaços repetidos."""
+    assert normalizar_nome("  João   Araújo ") == "joao araujo"
+
+
+def test_nome_mais_longo_vence():
+    """Testa que o nome completo prevalece sobre o primeiro nome de outro proprietário."""
+    automato = AutomatoNomes([("Ana", 1), ("Ana Maria", 2), ("Maria", 3)])
+    assert automato.melhor_correspondencia("ANA MARIA (50%)") == 2
+    assert automato.melhor_correspondencia("Maria") == 3
+    assert automato.melhor_correspondencia("Ana") == 1
+
+
+def test_ocorrencia_precisa_ser_delimitada():
+    """Testa que nomes dentro de outras palavras não são considerados."""
+    automato = AutomatoNomes([("Ana", 1), ("Val", 2)])
+    assert automato.melhor_correspondencia("Mariana") is None
+    assert automato.melhor_correspondencia("VALOR") is None
+    assert automato.mapear(["Nome", "Mariana", "Ana - repasse", "Val"]) == {"Ana - repasse": 1, "Val": 2}
+
+
+def test_nomes_repetidos_mantem_primeiro_valor():
+    """Testa o desempate determinístico entre proprietários homônimos."""
+    automato = AutomatoNomes([("Célia", 7), ("celia", 9)])
+    assert automato.melhor_correspondencia("CELIA") == 7
@@ -0,0 +1,102 @@
+"""
+Testes para o upsert em lote de aluguéis
+"""
+from sqlalchemy.exc import IntegrityError
+
+from models_final import AluguelSimples, Imovel, Proprietario
+from services.aluguel_service import AluguelService, CHAVE_ALUGUEL
+from utils.bulk_upsert import filtro_chave_em
+
+
+def _imovel_e_proprietario(db_session):
+    imovel = Imovel(nome="Lote Aluguel", endereco="Rua do Lote, 5")
+    proprietario = Proprietario(nome="Davi", sobrenome="Lote")
+    db_session.add_all([imovel, proprietario])
+    db_session.flush()
+    return imovel, proprietario
+
+
+def test_upsert_lote_resultado_por_linha(db_session):
+    """Testa criação, atualização, inalterado e rejeição no mesmo lote."""
+    imovel, proprietario = _imovel_e_proprietario(db_session)
+    base = {"imovel_id": imovel.id, "proprietario_id": proprietario.id, "ano": 2025}
+    db_session.add_all([
+        AluguelSimples(**base, mes=1, valor_liquido_proprietario=100, taxa_administracao_total=10),
+        AluguelSimples(**base, mes=2, valor_liquido_proprietario=200),
+    ])
+    db_session.flush()
+
+    resultado = AluguelService.upsert_lote(db_session, [
+        {**base, "mes": 1, "valor_liquido_proprietario": 150},
+        {**base, "mes": 2, "valor_liquido_proprietario": "200"},
+        {**base, "mes": 3, "valor_liquido_proprietario": 300, "taxa_administracao_total": 30},
+        {**base, "mes": 13, "valor_liquido_proprietario": 1},
+        {**base, "proprietario_id": 999999, "mes": 4, "valor_liquido_proprietario": 1},
+    ])
+
+    assert resultado["resumo"] == {"criado": 1, "atualizado": 1, "inalterado": 1, "rejeitado": 2}
+    assert [r["status"] for r in resultado["resultados"]] == ["atualizado", "inalterado", "criado", "rejeitado", "rejeitado"]
+    assert resultado["resultados"][3]["motivo"] == "Mês deve estar entre 1 e 12"
+    assert resultado["resultados"][4]["coluna"] == "proprietario_id"
+
+    janeiro = db_session.query(AluguelSimples).filter_by(**base, mes=1).one()
+    db_session.refresh(janeiro)
+    assert resultado["resultados"][0]["id"] == janeiro.id
+    assert float(janeiro.valor_liquido_proprietario) == 150.0
+    # Linha sem taxa não apaga a taxa já gravada
+    assert float(janeiro.taxa_administracao_total) == 10.0
+    marco = db_session.query(AluguelSimples).filter_by(**base, mes=3).one()
+    assert float(marco.taxa_administracao_total) == 30.0
+
+
+def test_endpoint_lote_exige_autenticacao(client):
+    """Testa que o upsert em lote exige autenticação."""
+    response = client.post("/api/alugueis/lote", json={"alugueis": []})
+    assert response.status_code == 401
+
+
+def test_filtro_chave_inclui_coluna_de_particao():
+    """Testa que chaves de aluguel filtram também por ano (poda de partições)."""
+    colunas = [getattr(AluguelSimples, c) for c in CHAVE_ALUGUEL]
+    filtros = filtro_chave_em(colunas, [(1, 2, 3, 2025), (1, 2, 12, 2024)])
+
+    assert len(filtros) == 2
+    sql = str(filtros[1].compile(compile_kwargs={"literal_binds": True}))
+    assert sql == "alugueis.ano IN (2024, 2025)"
+    assert len(filtro_chave_em([Imovel.id, Imovel.nome], [(1, "A")])) == 1
+
+
+def _violacao(db_session, **valores):
+    """Grava um aluguel num savepoint e devolve o IntegrityError levantado."""
+    try:
+        with db_session.begin_nested():
+            db_session.add(AluguelSimples(**valores))
+            db_session.flush()
+    except IntegrityError as e:
+        return e
+    raise AssertionError("O aluguel deveria violar uma restrição")
+
+
+def test_motivo_violacao_identifica_a_restricao(db_session):
+    """Duplicidade, CHECK de mês/ano e chave estrangeira têm mensagens próprias."""
+    imovel, proprietario = _imovel_e_proprietario(db_session)
+    base = {"imovel_id": imovel.id, "proprietario_id": proprietario.id, "ano": 2025, "valor_liquido_proprietario": 100}
+    db_session.add(AluguelSimples(**base, mes=1))
+    db_session.flush()
+
+    duplicado = _violacao(db_session, **base, mes=1)
+    assert AluguelService.motivo_violacao(db_session, duplicado, base) == (
+        400, "Já existe um aluguel para este imóvel/proprietário neste período")
+
+    mes_invalido = _violacao(db_session, **base, mes=13)
+    assert AluguelService.motivo_violacao(db_session, mes_invalido, base) == (400, "Mês deve estar entre 1 e 12")
+
+    ano_invalido = _violacao(db_session, **{**base, "ano": 1999}, mes=1)
+    assert AluguelService.motivo_violacao(db_session, ano_invalido, base) == (400, "Ano deve estar entre 2020 e 2060")
+
+    # SQLite sem PRAGMA foreign_keys não recusa a linha; o erro do PostgreSQL é simulado
+    chave_estrangeira = IntegrityError(
+        "INSERT INTO alugueis", {},
+        Exception('insert or update on table "alugueis" violates foreign key constraint "alugueis_proprietario_id_fkey"'))
+    assert AluguelService.motivo_violacao(db_session, chave_estrangeira, {**base, "proprietario_id": 999999}) == (
+        404, "Proprietário não encontrado")
@@ -0,0 +1,120 @@
+"""
+Testes para a análise de desempenho dos imóveis
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from main import app
+from models_final import AluguelSimples, Imovel, Proprietario
+from routers.auth import verify_token_flexible
+from services.analise_imoveis_service import AnaliseImoveisService
+
+
+def _imovel(id, valor_mercado=None, valor_cadastral=None, iptu=None, condominio=None):
+    return SimpleNamespace(id=id, nome=f"Imóvel {id}", valor_mercado=valor_mercado, valor_cadastral=valor_cadastral,
+                           iptu_mensal=iptu, condominio_mensal=condominio)
+
+
+def test_indicadores_vetorizados():
+    """Testa rendimento, vacância, tendência e crescimento anual sobre 24 meses."""
+    crescente = np.concatenate([np.full(12, 1000.0), 1000.0 + 100.0 * np.arange(12)])
+    com_vagas = np.full(24, 2000.0)
+    com_vagas[[0, 1, 20, 21]] = [0, 0, 0, -50]
+    matriz = {
+        "imoveis": [_imovel(1, valor_mercado=200000, iptu=100, condominio=200), _imovel(2, valor_cadastral=480000), _imovel(3)],
+        "primeiro_mes": 2024 * 12,
+        "liquido": np.vstack([crescente, com_vagas, np.zeros(24)]),
+        "bruto": np.vstack([crescente * 1.1, com_vagas, np.zeros(24)]),
+    }
+
+    crescente_ind, vagas_ind, sem_receita = AnaliseImoveisService.calcular_indicadores(matriz)
+
+    receita_12m = crescente[-12:].sum()
+    assert crescente_ind["receita_liquida_12m"] == round(receita_12m - 12 * 300, 2)
+    assert crescente_ind["rendimento_bruto"] == round(receita_12m * 1.1 / 200000 * 100, 2)
+    assert crescente_ind["rendimento_liquido"] == round((receita_12m - 3600) / 200000 * 100, 2)
+    assert crescente_ind["tendencia_12m"] == 100.0
+    assert crescente_ind["crescimento_anual"] == round((receita_12m - 12000) / 12000 * 100, 2)
+    assert crescente_ind["meses_vagos"] == 0
+
+    # Vacância conta a partir do primeiro mês com receita: 22 meses observados, 2 vagos
+    assert vagas_ind["meses_vagos"] == 2
+    assert vagas_ind["taxa_vacancia"] == round(2 / 22 * 100, 2)
+    assert vagas_ind["valor_base"] == 480000.0
+
+    assert sem_receita["rendimento_bruto"] is None
+    assert sem_receita["taxa_vacancia"] is None
+    assert sem_receita["crescimento_anual"] is None
+
+
+def test_indicadores_sem_historico_suficiente():
+    """Testa que crescimento anual exige 24 meses e tendência ao menos 2."""
+    matriz = {"imoveis": [_imovel(1, valor_mercado=100000)], "primeiro_mes": 0,
+              "liquido": np.array([[500.0]]), "bruto": np.array([[500.0]])}
+
+    indicadores = AnaliseImoveisService.calcular_indicadores(matriz)[0]
+
+    assert indicadores["receita_liquida_12m"] == 500.0
+    assert indicadores["tendencia_12m"] is None
+    assert indicadores["crescimento_anual"] is None
+
+
+def test_indicadores_sem_alugueis():
+    """Testa que uma matriz sem meses (nenhum aluguel) resulta em análise vazia."""
+    matriz = {"imoveis": [_imovel(1, valor_mercado=100000)], "primeiro_mes": None,
+              "liquido": np.zeros((1, 0)), "bruto": np.zeros((1, 0))}
+
+    assert AnaliseImoveisService.calcular_indicadores(matriz) == []
+
+
+def test_ranking_com_banco_sem_alugueis(client, db_session):
+    """Testa que o ranking sem nenhum aluguel cadastrado responde 200 com lista vazia."""
+    AnaliseImoveisService.invalidar()
+    db_session.add(Imovel(nome="Sem Aluguel", endereco="Rua V, 1", valor_mercado=100000))
+    db_session.flush()
+    app.dependency_overrides[verify_token_flexible] = lambda: None
+    try:
+        response = client.get("/api/imoveis/ranking")
+    finally:
+        del app.dependency_overrides[verify_token_flexible]
+        AnaliseImoveisService.invalidar()
+
+    assert response.status_code == 200
+    assert response.json()["data"] == []
+def test_ranking_a_partir_do_banco(db_session):
+    """Testa a matriz carregada do banco e o ranking em cache até invalidar."""
+    AnaliseImoveisService.invalidar()
+    imoveis = [Imovel(nome="Ranking Alto", endereco="Rua R, 1", valor_mercado=100000),
+               Imovel(nome="Ranking Baixo", endereco="Rua R, 2", valor_mercado=400000)]
+    proprietarios = [Proprietario(nome="Rita", sobrenome="Ranking"), Proprietario(nome="Rui", sobrenome="Ranking")]
+    db_session.add_all([*imoveis, *proprietarios])
+    db_session.flush()
+    for imovel in imoveis:
+        for proprietario in proprietarios:
+            db_session.add(AluguelSimples(imovel_id=imovel.id, proprietario_id=proprietario.id, ano=2025, mes=1,
+                                          valor_liquido_proprietario=450, taxa_administracao_proprietario=50))
+    db_session.flush()
+
+    try:
+        ranking = [item for item in AnaliseImoveisService.ranking(db_session, metrica="rendimento_bruto", limite=1000)
+                   if item["imovel_id"] in {imoveis[0].id, imoveis[1].id}]
+        assert [item["nome"] for item in ranking] == ["Ranking Alto", "Ranking Baixo"]
+        assert ranking[0]["receita_bruta_12m"] == 1000.0
+        assert ranking[0]["rendimento_bruto"] == 1.0
+
+        imoveis[0].valor_mercado = 1000000
+        db_session.flush()
+        assert AnaliseImoveisService.ranking(db_session, metrica="rendimento_bruto", limite=1000)[0]["posicao"] == 1
+        em_cache = next(i for i in AnaliseImoveisService.analisar(db_session) if i["imovel_id"] == imoveis[0].id)
+        assert em_cache["rendimento_bruto"] == 1.0
+
+        AnaliseImoveisService.invalidar()
+        atualizado = next(i for i in AnaliseImoveisService.analisar(db_session) if i["imovel_id"] == imoveis[0].id)
+        assert atualizado["rendimento_bruto"] == 0.1
+
+        with pytest.raises(ValueError):
+            AnaliseImoveisService.ranking(db_session, metrica="inexistente")
+    finally:
+        AnaliseImoveisService.invalidar()
@@ -5,12 +5,12 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 from models_final import Usuario
-from routers.auth import get_password_hash
+from utils.senhas import pwd_context
 
 def test_login_success(client: TestClient, db_session: Session):
     """Testa login bem-sucedido."""
     # Criar usuário de teste
-    hashed_password = get_password_hash("test123")
+    hashed_password = pwd_context.hash("test123")
     test_user = Usuario(
         usuario="testuser",
         senha=hashed_password,
@@ -0,0 +1,116 @@
+"""
+Testes para o motor de cálculo do carnê-leão
+"""
+import time
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+
+from models_final import AluguelSimples, Darf, Imovel, Proprietario
+from services.aluguel_service import AluguelService
+from services.carne_leao_service import CarneLeaoService
+
+
+def test_tabela_vigente_por_periodo():
+    """Testa a escolha da versão da tabela progressiva pela competência."""
+    assert CarneLeaoService.tabela_vigente(2023, 4)["versao"] == "2015-04"
+    assert CarneLeaoService.tabela_vigente(2023, 5)["versao"] == "2023-05"
+    assert CarneLeaoService.tabela_vigente(2024, 1)["versao"] == "2023-05"
+    assert CarneLeaoService.tabela_vigente(2024, 2)["versao"] == "2024-02"
+
+
+def test_calcular_imposto_vetorizado():
+    """Testa a aplicação das faixas sobre um vetor de bases."""
+    tabela = CarneLeaoService.tabela_vigente(2024, 6)
+    bases = np.array([-50.0, 2000.0, 2300.0, 3000.0, 4664.68, 10000.0])
+    imposto = CarneLeaoService.calcular_imposto(bases, tabela)
+    assert imposto.tolist() == [0.0, 0.0, 3.06, 68.56, 386.78, 1854.0]
+
+
+def test_calcular_impostos_usa_tabela_progressiva():
+    """Testa que o cálculo escalar do AluguelService delega ao motor."""
+    resultado = AluguelService.calcular_impostos(Decimal("3000"), 2024, 6)
+    assert resultado["irrf"] == Decimal("68.56")
+    assert resultado["liquido"] == Decimal("2931.44")
+
+
+def test_valor_abaixo_do_minimo_acumula(db_session):
+    """Testa que imposto abaixo de R$ 10 é somado ao mês seguinte e gera DARF."""
+    proprietario = Proprietario(nome="Carlos", sobrenome="Leão", documento="99988877766")
+    imovel = Imovel(nome="Carne Leao Teste", endereco="Rua B, 2")
+    db_session.add_all([proprietario, imovel])
+    db_session.flush()
+    for mes, valor in [(3, 2300), (4, 2300), (5, 3000)]:
+        db_session.add(AluguelSimples(
+            imovel_id=imovel.id, proprietario_id=proprietario.id, mes=mes, ano=2024,
+            valor_liquido_proprietario=valor
+        ))
+    db_session.flush()
+
+    calculo = CarneLeaoService.calcular_ano(db_session, 2024, [proprietario.id])
+    assert calculo["a_recolher"][0, 2] == 0.0
+    assert calculo["a_recolher"][0, 3] == 0.0
+    assert calculo["a_recolher"][0, 4] == 74.68
+
+    propostas = CarneLeaoService.propor_darfs(db_session, 2024, persistir=True)
+    proposta = next(p for p in propostas if p["proprietario_id"] == proprietario.id)
+    assert proposta["data"] == "2024-06-30"
+    assert proposta["status"] == "criado"
+    assert db_session.query(Darf).filter(
+        Darf.proprietario_id == proprietario.id, Darf.data == date(2024, 6, 30)
+    ).count() == 1
+
+    novamente = CarneLeaoService.propor_darfs(db_session, 2024, mes=5)
+    assert next(p for p in novamente if p["proprietario_id"] == proprietario.id)["status"] == "existente"
+
+
+def test_saldo_abaixo_do_minimo_passa_para_janeiro(db_session):
+    """Testa que o imposto abaixo de R$ 10 em dezembro é recolhido em janeiro do ano seguinte."""
+    proprietario = Proprietario(nome="Dora", sobrenome="Virada", documento="12312312399")
+    imovel = Imovel(nome="Carne Leao Virada", endereco="Rua D, 4")
+    db_session.add_all([proprietario, imovel])
+    db_session.flush()
+    for mes, ano in [(12, 2023), (1, 2024)]:
+        db_session.add(AluguelSimples(
+            imovel_id=imovel.id, proprietario_id=proprietario.id, mes=mes, ano=ano,
+            valor_liquido_proprietario=2200
+        ))
+    db_session.flush()
+
+    dezembro = CarneLeaoService.calcular_ano(db_session, 2023, [proprietario.id])
+    assert dezembro["a_recolher"][0, 11] == 0.0
+
+    janeiro = CarneLeaoService.calcular_ano(db_session, 2024, [proprietario.id])
+    assert janeiro["saldo_anterior"].tolist() == [6.6]
+    assert janeiro["a_recolher"][0, 0] == 13.2
+
+
+def test_darf_existente_casado_pela_competencia(db_session):
+    """Testa que um DARF pago antes do vencimento conta como existente para a competência."""
+    proprietario = Proprietario(nome="Ester", sobrenome="Antecipada", documento="45645645699")
+    imovel = Imovel(nome="Carne Leao Antecipado", endereco="Rua E, 5")
+    db_session.add_all([proprietario, imovel])
+    db_session.flush()
+    db_session.add(AluguelSimples(
+        imovel_id=imovel.id, proprietario_id=proprietario.id, mes=5, ano=2024,
+        valor_liquido_proprietario=3000
+    ))
+    db_session.add(Darf(proprietario_id=proprietario.id, data=date(2024, 6, 14), valor_darf=68.56))
+    db_session.flush()
+
+    propostas = CarneLeaoService.propor_darfs(db_session, 2024, persistir=True)
+    proposta = next(p for p in propostas if p["proprietario_id"] == proprietario.id)
+
+    assert proposta["status"] == "existente"
+    assert proposta["valor_existente"] == 68.56
+    assert db_session.query(Darf).filter(Darf.proprietario_id == proprietario.id).count() == 1
+
+
+def test_calculo_em_massa_rapido():
+    """Testa que o cálculo de um ano inteiro para muitos proprietários é sub-segundo."""
+    bases = np.random.default_rng(0).uniform(0, 20000, size=(20000, 12))
+    inicio = time.perf_counter()
+    for mes in range(1, 13):
+        CarneLeaoService.calcular_imposto(bases[:, mes - 1], CarneLeaoService.tabela_vigente(2025, mes))
+    assert time.perf_counter() - inicio < 1.0
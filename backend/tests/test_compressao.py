@@ -0,0 +1,142 @@
+"""
+Testes para o middleware de compressão de respostas
+"""
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from utils import compressao
+from utils.compressao import (
+    CompressaoMiddleware, HEADER_TAMANHO_COMPRIMIDO, HEADER_TAMANHO_ORIGINAL, escolher_codificacao
+)
+
+LINHAS = [{"id": i, "imovel": f"Imóvel {i}", "valor": 1234.56} for i in range(2000)]
+
+
+@pytest.fixture
+def cliente():
+    app = FastAPI()
+    app.add_middleware(CompressaoMiddleware, tamanho_minimo=500, tamanho_minimo_thread=10_000)
+
+    @app.get("/grande")
+    def grande():
+        return LINHAS
+
+    @app.get("/pequeno")
+    def pequeno():
+        return {"ok": True}
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"x" * 5000, b"y" * 5000]), media_type="text/plain")
+
+    @app.get("/arquivo")
+    def arquivo():
+        # Corpo com Content-Length entregue em partes, como faz um BaseHTTPMiddleware
+        return StreamingResponse(
+            iter([b"a" * 3000, b"b" * 3000]), media_type="text/plain", headers={"Content-Length": "6000"}
+        )
+
+    @app.get("/binario")
+    def binario():
+        return PlainTextResponse("z" * 5000, media_type="application/octet-stream")
+
+    return TestClient(app)
+
+
+def test_comprime_com_gzip_e_informa_tamanhos(cliente):
+    """Testa gzip acima do limite (em thread) com os cabeçalhos de tamanho."""
+    resposta = cliente.get("/grande", headers={"Accept-Encoding": "gzip"})
+
+    assert resposta.headers["content-encoding"] == "gzip"
+    assert resposta.headers["vary"] == "Accept-Encoding"
+    original = int(resposta.headers[HEADER_TAMANHO_ORIGINAL])
+    comprimido = int(resposta.headers[HEADER_TAMANHO_COMPRIMIDO])
+    assert comprimido < original / 5
+    assert resposta.json() == LINHAS  # o cliente descomprime
+
+
+def test_nao_comprime_sem_aceitar_pequeno_stream_ou_binario(cliente):
+    """Testa os casos em que a resposta passa sem compressão."""
+    assert "content-encoding" not in cliente.get("/grande", headers={"Accept-Encoding": "identity"}).headers
+    assert "content-encoding" not in cliente.get("/pequeno", headers={"Accept-Encoding": "gzip"}).headers
+
+    stream = cliente.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in stream.headers
+    assert stream.text == "x" * 5000 + "y" * 5000
+
+    assert "content-encoding" not in cliente.get("/binario", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_escolher_codificacao(monkeypatch):
+    """Testa a negociação por Accept-Encoding, com e sem brotli disponível."""
+    monkeypatch.setattr(compressao, "BROTLI_DISPONIVEL", True)
+    assert escolher_codificacao("gzip, deflate, br") == "br"
+    assert escolher_codificacao("br;q=0.5, gzip") == "gzip"
+    assert escolher_codificacao("*") == "br"
+    assert escolher_codificacao("br;q=0, gzip;q=0") is None
+    assert escolher_codificacao("") is None
+
+    monkeypatch.setattr(compressao, "BROTLI_DISPONIVEL", False)
+    assert escolher_codificacao("br") is None
+    assert escolher_codificacao("br, gzip") == "gzip"
+
+
+@pytest.mark.skipif(not compressao.BROTLI_DISPONIVEL, reason="brotli não instalado")
+def test_comprime_com_brotli(cliente):
+    """Testa brotli quando o cliente o aceita."""
+    resposta = cliente.get("/grande", headers={"Accept-Encoding": "br"})
+
+    assert resposta.headers["content-encoding"] == "br"
+    assert resposta.json() == LINHAS
+
+
+def test_gzip_deterministico():
+    """Testa que o gzip não embute data (mtime=0), mantendo respostas idênticas comparáveis."""
+    corpo = json.dumps(LINHAS).encode()
+    assert compressao.comprimir(corpo, "gzip", 6, 4) == compressao.comprimir(corpo, "gzip", 6, 4)
+    assert gzip.decompress(compressao.comprimir(corpo, "gzip", 6, 4)) == corpo
+
+
+def test_remonta_corpo_com_content_length_em_partes(cliente):
+    """Testa que um corpo com Content-Length entregue em partes é remontado e comprimido."""
+    resposta = cliente.get("/arquivo", headers={"Accept-Encoding": "gzip"})
+
+    assert resposta.headers["content-encoding"] == "gzip"
+    assert resposta.headers[HEADER_TAMANHO_ORIGINAL] == "6000"
+    assert resposta.text == "a" * 3000 + "b" * 3000
+
+
+def test_comprime_atras_de_middleware_http():
+    """Testa a compressão quando há um @app.middleware("http") entre o middleware e a rota."""
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def repassar(request, call_next):
+        return await call_next(request)
+
+    app.add_middleware(CompressaoMiddleware, tamanho_minimo=500)
+
+    @app.get("/grande")
+    def grande():
+        return LINHAS
+
+    resposta = TestClient(app).get("/grande", headers={"Accept-Encoding": "gzip"})
+    assert resposta.headers["content-encoding"] == "gzip"
+    assert resposta.json() == LINHAS
+
+
+def test_comprime_na_aplicacao_real():
+    """Testa a compressão com a pilha de middlewares de main.app."""
+    from main import app
+
+    resposta = TestClient(app).get("/openapi.json", headers={"Accept-Encoding": "gzip"})
+
+    assert resposta.status_code == 200
+    assert resposta.headers["content-encoding"] == "gzip"
+    assert int(resposta.headers[HEADER_TAMANHO_COMPRIMIDO]) < int(resposta.headers[HEADER_TAMANHO_ORIGINAL])
+    assert resposta.json()["paths"]
@@ -0,0 +1,96 @@
+"""
+Testes para as estatísticas em lote de proprietários e imóveis
+"""
+import pytest
+
+from main import app
+from models_final import AluguelSimples, Imovel, Participacao, Proprietario
+from routers.auth import verify_token_flexible
+from services.imovel_service import ImovelService
+from services.proprietario_service import ProprietarioService
+
+
+@pytest.fixture
+def carteira(db_session):
+    """Dois imóveis e dois proprietários, com participações e aluguéis em um deles."""
+    ProprietarioService.invalidar_estatisticas()
+    ImovelService.invalidar_estatisticas()
+    imoveis = [Imovel(nome="Lote A", endereco="Rua A, 1", alugado=True), Imovel(nome="Lote B", endereco="Rua B, 2", alugado=False)]
+    proprietarios = [Proprietario(nome="Ana Lote", sobrenome="X"), Proprietario(nome="Bia Lote", sobrenome="Y")]
+    db_session.add_all([*imoveis, *proprietarios])
+    db_session.flush()
+    db_session.add_all([
+        Participacao(imovel_id=imoveis[0].id, proprietario_id=proprietarios[0].id, porcentagem=60, ativo=True),
+        Participacao(imovel_id=imoveis[0].id, proprietario_id=proprietarios[1].id, porcentagem=40, ativo=False),
+        Participacao(imovel_id=imoveis[1].id, proprietario_id=proprietarios[0].id, porcentagem=0, ativo=True),
+    ])
+    for mes in (1, 2, 3):
+        db_session.add(AluguelSimples(imovel_id=imoveis[0].id, proprietario_id=proprietarios[0].id, ano=2025, mes=mes,
+                                      valor_liquido_proprietario=600))
+    db_session.flush()
+    yield imoveis, proprietarios
+    ProprietarioService.invalidar_estatisticas()
+    ImovelService.invalidar_estatisticas()
+
+
+def test_estatisticas_lote_proprietarios(db_session, carteira):
+    """Testa contagens e somas por proprietário, sem multiplicar linhas entre tabelas."""
+    _, proprietarios = carteira
+    ids = [p.id for p in proprietarios]
+
+    estatisticas = ProprietarioService.estatisticas_lote(db_session, proprietario_ids=ids)
+
+    assert [e["nome"] for e in estatisticas] == ["Ana Lote", "Bia Lote"]
+    assert estatisticas[0]["participacoes_ativas"] == 2
+    assert estatisticas[0]["total_alugueis"] == 3
+    assert estatisticas[0]["total_recebido"] == 1800.0
+    assert estatisticas[1] == {"proprietario_id": ids[1], "nome": "Bia Lote", "participacoes_ativas": 0,
+                               "total_alugueis": 0, "total_recebido": 0.0}
+    assert ProprietarioService.obter_estatisticas(db_session, ids[0]) == estatisticas[0]
+    assert ProprietarioService.obter_estatisticas(db_session, 999999) is None
+
+
+def test_estatisticas_lote_imoveis_e_paginacao(db_session, carteira):
+    """Testa estatísticas por imóvel, paginação e o agregado geral."""
+    imoveis, _ = carteira
+    ids = [i.id for i in imoveis]
+
+    estatisticas = ImovelService.estatisticas_lote(db_session, imovel_ids=ids)
+    assert estatisticas[0]["alugueis_total"] == 3
+    assert estatisticas[0]["valor_total_alugueis"] == 1800.0
+    assert (estatisticas[0]["participacoes_ativas"], estatisticas[0]["participacoes_vazias"]) == (2, 0)
+    assert (estatisticas[1]["participacoes_ativas"], estatisticas[1]["participacoes_vazias"]) == (0, 1)
+
+    pagina = ImovelService.estatisticas_lote(db_session, imovel_ids=ids, pular=1, limite=1)
+    assert [e["nome"] for e in pagina] == ["Lote B"]
+
+    assert ImovelService._verificar_dependencias(db_session, ids[1]) == {
+        "alugueis": 0, "participacoes_ativas": 0, "participacoes_vazias": 1
+    }
+    geral = ImovelService.obter_estatisticas(db_session)
+    assert geral["total_imoveis"] == geral["imoveis_alugados"] + geral["imoveis_disponiveis"]
+
+
+def test_estatisticas_em_cache_descartadas_apos_escrita(client, db_session, carteira):
+    """Testa que a versão em cache só reflete mudanças após uma escrita pela API."""
+    imoveis, proprietarios = carteira
+    app.dependency_overrides[verify_token_flexible] = lambda: None
+    try:
+        def total_alugueis_ana():
+            dados = client.get("/api/proprietarios/estatisticas").json()
+            return next(e["total_alugueis"] for e in dados if e["proprietario_id"] == proprietarios[0].id)
+
+        assert total_alugueis_ana() == 3
+        db_session.add(AluguelSimples(imovel_id=imoveis[0].id, proprietario_id=proprietarios[0].id, ano=2025, mes=4,
+                                      valor_liquido_proprietario=600))
+        db_session.flush()
+        assert total_alugueis_ana() == 3
+
+        assert client.post("/api/alugueis/lote", json={"alugueis": []}).status_code == 200
+        assert total_alugueis_ana() == 4
+
+        resposta = client.get("/api/imoveis/estatisticas", params={"usar_cache": False, "limite": 1000})
+        assert resposta.status_code == 200
+        assert any(e["alugueis_total"] == 4 for e in resposta.json()["data"])
+    finally:
+        del app.dependency_overrides[verify_token_flexible]
@@ -0,0 +1,111 @@
+"""
+Testes para o extrato mensal de proprietários
+"""
+import json
+from datetime import date, datetime
+
+import pytest
+
+from main import app
+from models_final import Alias, AluguelSimples, Darf, Imovel, Proprietario, Transferencia
+from routers.auth import verify_token_flexible
+from services.extrato_service import ExtratoService
+from utils.cache_memoria import CacheMemoria
+
+
+@pytest.fixture
+def proprietario_com_movimentos(db_session):
+    """Proprietário com aluguéis em dez/2024 e jan-fev/2025, um DARF e uma transferência."""
+    ExtratoService.invalidar()
+    imovel = Imovel(nome="Extrato Centro", endereco="Rua do Extrato, 1")
+    proprietario = Proprietario(nome="Gil", sobrenome="Extrato")
+    alias = Alias(alias="Extrato Família")
+    db_session.add_all([imovel, proprietario, alias])
+    db_session.flush()
+    for ano, mes, valor in [(2024, 12, 1000), (2025, 1, 1000), (2025, 2, 1200)]:
+        db_session.add(AluguelSimples(imovel_id=imovel.id, proprietario_id=proprietario.id, ano=ano, mes=mes,
+                                      valor_liquido_proprietario=valor, taxa_administracao_proprietario=50))
+    db_session.add(Darf(proprietario_id=proprietario.id, data=date(2025, 1, 20), valor_darf=150))
+    db_session.add(Transferencia(
+        alias_id=alias.id, nome_transferencia="Ajuste", valor_total=-100,
+        id_proprietarios=json.dumps([{"id": proprietario.id, "valor": -100}, {"id": proprietario.id + 999, "valor": 100}]),
+        data_criacao=datetime(2025, 1, 1), data_fim=datetime(2025, 2, 28)
+    ))
+    db_session.flush()
+    yield proprietario
+    ExtratoService.invalidar()
+
+
+def test_extrato_saldos_acumulados(db_session, proprietario_com_movimentos):
+    """Testa saldos do mês, do ano e acumulado no extrato completo."""
+    extrato = ExtratoService.gerar_extrato(db_session, proprietario_com_movimentos.id)
+
+    assert [mes["periodo"] for mes in extrato["meses"]] == ["2024-12", "2025-01", "2025-02"]
+    assert [mes["saldo_mes"] for mes in extrato["meses"]] == [1000.0, 750.0, 1100.0]
+    assert [mes["saldo_ano"] for mes in extrato["meses"]] == [1000.0, 750.0, 1850.0]
+    assert [mes["saldo_acumulado"] for mes in extrato["meses"]] == [1000.0, 1750.0, 2850.0]
+    assert extrato["meses"][1]["darf"] == 150.0
+    assert extrato["meses"][1]["transferencia_saida"] == -100.0
+    assert extrato["meses"][0]["taxa_administracao"] == 50.0
+    assert extrato["proximo_cursor"] is None
+
+
+def test_extrato_paginado_por_cursor(db_session, proprietario_com_movimentos):
+    """Testa que a página seguinte continua os saldos da anterior."""
+    primeira = ExtratoService.gerar_extrato(db_session, proprietario_com_movimentos.id, limite=2)
+    assert primeira["proximo_cursor"] == "2025-01"
+
+    segunda = ExtratoService.gerar_extrato(db_session, proprietario_com_movimentos.id,
+                                           apos=primeira["proximo_cursor"], limite=2)
+    assert [mes["periodo"] for mes in segunda["meses"]] == ["2025-02"]
+    assert segunda["meses"][0]["saldo_acumulado"] == 2850.0
+    assert segunda["proximo_cursor"] is None
+
+    with pytest.raises(ValueError):
+        ExtratoService.gerar_extrato(db_session, proprietario_com_movimentos.id, apos="2025-13")
+
+
+def test_extrato_em_cache_ate_invalidar(db_session, proprietario_com_movimentos):
+    """Testa que escritas só aparecem no extrato após a invalidação do proprietário."""
+    proprietario_id = proprietario_com_movimentos.id
+    ExtratoService.gerar_extrato(db_session, proprietario_id)
+
+    db_session.add(Darf(proprietario_id=proprietario_id, data=date(2025, 2, 20), valor_darf=100))
+    db_session.flush()
+    assert ExtratoService.gerar_extrato(db_session, proprietario_id)["meses"][-1]["darf"] == 0.0
+
+    ExtratoService.invalidar([proprietario_id + 1])
+    assert ExtratoService.gerar_extrato(db_session, proprietario_id)["meses"][-1]["darf"] == 0.0
+
+    ExtratoService.invalidar([proprietario_id])
+    assert ExtratoService.gerar_extrato(db_session, proprietario_id)["meses"][-1]["darf"] == 100.0
+
+
+def test_endpoint_extrato(client, db_session, proprietario_com_movimentos):
+    """Testa o endpoint do extrato, incluindo proprietário inexistente e cursor inválido."""
+    app.dependency_overrides[verify_token_flexible] = lambda: None
+    try:
+        response = client.get(f"/api/proprietarios/{proprietario_com_movimentos.id}/extrato", params={"limite": 1})
+        assert response.status_code == 200
+        assert response.json()["proximo_cursor"] == "2024-12"
+
+        assert client.get("/api/proprietarios/999999/extrato").status_code == 404
+        assert client.get(f"/api/proprietarios/{proprietario_com_movimentos.id}/extrato",
+                          params={"apos": "x"}).status_code == 400
+    finally:
+        del app.dependency_overrides[verify_token_flexible]
+
+
+def test_cache_memoria_expira_e_descarta_menos_usados():
+    """Testa expiração por TTL e descarte LRU do cache em memória."""
+    cache = CacheMemoria(ttl_segundos=60, max_itens=2)
+    cache.definir("a", 1)
+    cache.definir("b", 2)
+    cache.obter("a")
+    cache.definir("c", 3)
+    assert cache.obter("b") is None
+    assert (cache.obter("a"), cache.obter("c")) == (1, 3)
+
+    expirado = CacheMemoria(ttl_segundos=-1)
+    expirado.definir("a", 1)
+    assert expirado.obter("a") is None
@@ -0,0 +1,403 @@
+"""
+Testes para os importadores em lote da planilha de upload
+"""
+import asyncio
+import os
+
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from models_final import AluguelSimples, Imovel, Participacao, Proprietario
+from routers.upload import (
+    aplicar_alugueis, aplicar_participacoes, hash_planilha, import_alquileres, import_inmuebles, import_participacoes,
+    import_propietarios, normalizar_documentos, planejar_alugueis_matricial, planejar_imoveis, planejar_participacoes, replanejar_plano, uploaded_files
+)
+
+
+def test_normalizar_documentos_recupera_zeros_a_esquerda():
+    """Testa a normalização vetorizada de CPF/CNPJ vindos do Excel."""
+    documentos = pd.Series(["123.456.789-01", 1234567890.0, "11222333000181", None])
+    tipos = pd.Series(["CPF", "CPF", "CNPJ", "CPF"])
+    assert normalizar_documentos(documentos, tipos).tolist() == [
+        "12345678901", "01234567890", "11222333000181", None
+    ]
+
+
+def test_import_propietarios_upsert_em_lote(db_session):
+    """Testa que a importação cria e atualiza proprietários pela chave documento."""
+    db_session.add_all([
+        Proprietario(nome="Maria", sobrenome="Lima", documento="52998224725", email="antigo@example.com"),
+        Proprietario(nome="Pedro", sobrenome="Alves", documento=None),
+    ])
+    db_session.flush()
+
+    df = pd.DataFrame({
+        "Nome": ["Maria", "João", "Pedro", "Sem Sobrenome"],
+        "Sobrenome": ["Lima", "Costa", "Alves", None],
+        "Documento": ["529.982.247-25", "11144477735", None, "39053344705"],
+        "Email": ["novo@example.com", "joao@example.com", "pedro@example.com", None],
+    })
+
+    resultado = asyncio.run(import_propietarios(df, db_session))
+
+    assert {k: resultado[k] for k in ("total", "criados", "atualizados", "rejeitados")} == {
+        "total": 3, "criados": 1, "atualizados": 2, "rejeitados": 1
+    }
+    maria = db_session.query(Proprietario).filter_by(documento="52998224725").one()
+    db_session.refresh(maria)
+    assert maria.email == "novo@example.com"
+    assert db_session.query(Proprietario).filter_by(documento="11144477735").one().nome == "João"
+    pedro = db_session.query(Proprietario).filter_by(nome="Pedro", sobrenome="Alves").one()
+    db_session.refresh(pedro)
+    assert pedro.email == "pedro@example.com"
+
+
+def test_import_propietarios_preserva_colunas_ausentes(db_session):
+    """Testa que colunas ausentes da planilha não apagam os dados gravados."""
+    db_session.add_all([
+        Proprietario(nome="Clara", sobrenome="Nunes", documento="52998224725",
+                     email="clara@example.com", telefone="1199990000", banco="Banco A", ativo=False),
+        Proprietario(nome="Davi", sobrenome="Reis", documento=None, email="davi@example.com"),
+    ])
+    db_session.flush()
+
+    df = pd.DataFrame({
+        "Nome": ["Clara", "Davi"],
+        "Sobrenome": ["Nunes", "Reis"],
+        "Documento": ["52998224725", None],
+        "Telefone": ["1188887777", "1177776666"],
+    })
+
+    asyncio.run(import_propietarios(df, db_session))
+
+    clara = db_session.query(Proprietario).filter_by(documento="52998224725").one()
+    db_session.refresh(clara)
+    assert clara.telefone == "1188887777"
+    assert (clara.email, clara.banco, clara.ativo) == ("clara@example.com", "Banco A", False)
+    davi = db_session.query(Proprietario).filter_by(nome="Davi", sobrenome="Reis").one()
+    db_session.refresh(davi)
+    assert (davi.telefone, davi.email) == ("1177776666", "davi@example.com")
+
+
+def _planilha_imoveis():
+    return pd.DataFrame({
+        "Nome": ["Casa Azul", "Apto Centro", "Sem Endereço"],
+        "Endereço": ["Rua 1, 10", "Av. Central, 200", None],
+        "Área Total": ["120,50", 80, 50],
+        "Quartos": [3, "2", 1],
+        "IPTU Mensal": [150.0, None, 10],
+    })
+
+
+def test_planejar_imoveis_nao_grava(db_session):
+    """Testa que o plano de imóveis (diff do /process) não altera o banco."""
+    db_session.add(Imovel(nome="Apto Centro", endereco="Av. Central, 200", area_total=75, numero_quartos=2))
+    db_session.flush()
+
+    plano = planejar_imoveis(_planilha_imoveis(), db_session)
+
+    assert plano["resumo"]["inserir"] == 1 and plano["resumo"]["atualizar"] == 1 and plano["resumo"]["conflitos"] == 1
+    alteracoes = plano["alteracoes"][0]["alteracoes"]
+    assert alteracoes["area_total"] == {"atual": 75.0, "novo": 80.0}
+    assert "numero_quartos" not in alteracoes
+    assert db_session.query(Imovel).filter_by(nome="Casa Azul").count() == 0
+
+
+def test_import_inmuebles_upsert_por_nome(db_session):
+    """Testa que a importação grava novos imóveis e atualiza os existentes pelo nome."""
+    db_session.add(Imovel(nome="Apto Centro", endereco="Av. Central, 200", area_total=75))
+    db_session.flush()
+
+    resultado = asyncio.run(import_inmuebles(_planilha_imoveis(), db_session))
+
+    assert resultado["total"] == 2
+    casa = db_session.query(Imovel).filter_by(nome="Casa Azul").one()
+    assert float(casa.area_total) == 120.5 and casa.numero_quartos == 3
+    apto = db_session.query(Imovel).filter_by(nome="Apto Centro").one()
+    db_session.refresh(apto)
+    assert float(apto.area_total) == 80.0
+
+    novamente = asyncio.run(import_inmuebles(_planilha_imoveis(), db_session))
+    assert novamente["inalterados"] == 2 and novamente["total"] == 0
+
+
+def test_import_inmuebles_iptu_anual_e_coluna_ativo(db_session):
+    """Testa que IPTU anual vira mensal (/12) e que 'Ativo' não é lido como alugado."""
+    df = pd.DataFrame({
+        "Nome": ["IPTU Anual"],
+        "Endereço": ["Rua do Imposto, 12"],
+        "IPTU Anual": ["1.800,00"],
+        "Ativo": ["sim"],
+    })
+
+    resultado = asyncio.run(import_inmuebles(df, db_session))
+
+    assert resultado["criados"] == 1
+    imovel = db_session.query(Imovel).filter_by(nome="IPTU Anual").one()
+    assert float(imovel.iptu_mensal) == 150.0
+    assert not imovel.alugado
+
+def _imovel_e_proprietario(db_session):
+    imovel = Imovel(nome="Importação Tabular", endereco="Rua C, 3")
+    proprietario = Proprietario(nome="Beatriz", sobrenome="Rocha")
+    db_session.add_all([imovel, proprietario])
+    db_session.flush()
+    return imovel, proprietario
+
+
+def test_import_alquileres_aceita_int64_e_retorna_tabela_de_erros(db_session):
+    """Testa que mês/ano int64 são aceitos e as linhas inválidas viram erros."""
+    imovel, proprietario = _imovel_e_proprietario(db_session)
+    df = pd.DataFrame({
+        "mes": pd.Series([1, 13, 2, 3], dtype="int64"),
+        "ano": pd.Series([2024, 2024, 2024, 2024], dtype="int64"),
+        "valor_aluguel_propietario": [-150.5, 100, None, 300],
+        "inmueble_id": [imovel.id, imovel.id, imovel.id, 999999],
+        "proprietario_id": [proprietario.id] * 4,
+    })
+
+    resultado = asyncio.run(import_alquileres(df, db_session))
+
+    assert resultado["total"] == 1
+    assert resultado["erros"] == [
+        {"linha": 3, "coluna": "mes", "motivo": "Mês deve estar entre 1 e 12"},
+        {"linha": 4, "coluna": "valor_liquido_proprietario", "motivo": "Valor de aluguel ausente ou não numérico"},
+        {"linha": 5, "coluna": "imovel_id", "motivo": "Imóvel não encontrado"},
+    ]
+    aluguel = db_session.query(AluguelSimples).filter_by(imovel_id=imovel.id).one()
+    assert aluguel.mes == 1 and float(aluguel.valor_liquido_proprietario) == -150.5
+
+
+def test_import_participacoes_validacao_colunar(db_session):
+    """Testa que participações válidas são gravadas e as demais rejeitadas."""
+    imovel, proprietario = _imovel_e_proprietario(db_session)
+    df = pd.DataFrame({
+        "Imovel ID": [imovel.id, imovel.id, imovel.id],
+        "Proprietario ID": [proprietario.id, 999999, proprietario.id],
+        "Porcentagem": ["100", "50", "150"],
+    })
+
+    resultado = asyncio.run(import_participacoes(df, db_session))
+
+    assert resultado["total"] == 1
+    assert [(e["linha"], e["coluna"]) for e in resultado["erros"]] == [(3, "proprietario_id"), (4, "porcentagem")]
+    ativa = db_session.query(Participacao).filter_by(imovel_id=imovel.id, ativo=True).one()
+    assert float(ativa.porcentagem) == 100.0
+
+
+def test_process_calcula_diff_e_import_aplica_plano(client, db_session, tmp_path):
+    """Testa que /process retorna o diff por planilha e /import aplica o plano guardado."""
+    db_session.add(Proprietario(nome="Helena", sobrenome="Prado", documento="52998224725", email="antigo@example.com"))
+    db_session.flush()
+
+    caminho = tmp_path / "proprietarios.xlsx"
+    pd.DataFrame({
+        "Nome": ["Helena", "Otávio"],
+        "Sobrenome": ["Prado", "Nunes"],
+        "Documento": ["52998224725", "11144477735"],
+        "Email": ["nova@example.com", "otavio@example.com"],
+    }).to_excel(caminho, sheet_name="Proprietarios", index=False)
+    uploaded_files["plano-teste"] = {
+        "id": "plano-teste", "original_name": "proprietarios.xlsx",
+        "saved_path": str(caminho), "processed": False
+    }
+
+    response = client.post("/api/upload/process/plano-teste")
+    assert response.status_code == 200
+    diff = response.json()["diff"]["Proprietarios"]
+    assert diff["resumo"] == {"inserir": 1, "atualizar": 1, "inalterados": 0, "conflitos": 0}
+    assert diff["alteracoes"] == [{
+        "registro": "Helena Prado",
+        "alteracoes": {"email": {"atual": "antigo@example.com", "novo": "nova@example.com"}}
+    }]
+
+    # O plano guardado é aplicado sem reler o arquivo
+    os.remove(caminho)
+    response = client.post("/api/upload/import/plano-teste")
+    assert response.status_code == 200
+    assert response.json()["records_imported"] == {"proprietarios": 2}
+    assert db_session.query(Proprietario).filter_by(documento="11144477735").one().nome == "Otávio"
+    assert client.post("/api/upload/import/plano-teste").status_code == 400
+    uploaded_files.pop("plano-teste")
+
+
+def test_importa_pasta_com_referencias_entre_planilhas(client, db_session, tmp_path):
+    """Testa que participações de uma pasta veem os proprietários e imóveis novos da mesma pasta."""
+    caminho = tmp_path / "pasta_completa.xlsx"
+    with pd.ExcelWriter(caminho) as writer:
+        # Fora da ordem de dependência de propósito
+        pd.DataFrame({
+            "Nome": ["Casa Cruzada"], "Endereço": ["Rua Cruzada, 7"], "Lívia": [60], "Rui": [40],
+        }).to_excel(writer, sheet_name="Participacoes", index=False)
+        pd.DataFrame({
+            "Nome": ["Casa Cruzada"], "Endereco_Completo": ["Rua Cruzada, 7"], "Area_Total": [80],
+        }).to_excel(writer, sheet_name="Imoveis", index=False)
+        pd.DataFrame({
+            "Nome": ["Lívia", "Rui"], "Sobrenome": ["Campos", "Campos"],
+            "Documento": ["52998224725", "11144477735"], "Email": ["livia@example.com", "rui@example.com"],
+        }).to_excel(writer, sheet_name="Proprietarios", index=False)
+    uploaded_files["pasta-cruzada"] = {
+        "id": "pasta-cruzada", "original_name": "pasta_completa.xlsx",
+        "saved_path": str(caminho), "processed": False
+    }
+
+    response = client.post("/api/upload/process/pasta-cruzada")
+    assert response.status_code == 200
+    processado = response.json()
+    assert list(processado["diff"]) == ["Proprietarios", "Imoveis", "Participacoes"]
+    assert processado["diff"]["Participacoes"]["resumo"]["inserir"] == 2
+    assert processado["diff"]["Participacoes"]["conflitos"] == []
+    # A prévia não grava nada
+    assert db_session.query(Imovel).filter_by(nome="Casa Cruzada").count() == 0
+
+    response = client.post("/api/upload/import/pasta-cruzada")
+    assert response.status_code == 200
+    assert response.json()["records_imported"] == {"proprietarios": 2, "imoveis": 1, "participacoes": 2}
+    imovel = db_session.query(Imovel).filter_by(nome="Casa Cruzada").one()
+    ativas = {
+        db_session.get(Proprietario, p.proprietario_id).nome: float(p.porcentagem)
+        for p in db_session.query(Participacao).filter_by(imovel_id=imovel.id, ativo=True)
+    }
+    assert ativas == {"Lívia": 60.0, "Rui": 40.0}
+    uploaded_files.pop("pasta-cruzada")
+
+
+def test_replanejar_recusa_resumo_divergente(db_session):
+    """Testa que um plano dependente cujo resumo mudou desde /process é recusado com 409."""
+    imovel, proprietario = _imovel_e_proprietario(db_session)
+    df = pd.DataFrame({"Imovel ID": [imovel.id], "Proprietario ID": [proprietario.id], "Porcentagem": [100]})
+    plano = planejar_participacoes(df, db_session)
+    plano.update(hash="h", periodo=None, depende=True)
+
+    assert replanejar_plano(plano, "Participacoes", df, db_session)["resumo"] == plano["resumo"]
+
+    asyncio.run(aplicar_participacoes(plano, db_session))
+    with pytest.raises(HTTPException) as erro:
+        replanejar_plano(plano, "Participacoes", df, db_session)
+    assert erro.value.status_code == 409
+
+
+def test_import_recusa_plano_desatualizado(client, db_session, tmp_path):
+    """Testa que /import recusa com 409 um plano cujas linhas mudaram no banco depois de /process."""
+    helena = Proprietario(nome="Helena", sobrenome="Prado", documento="52998224725", email="antigo@example.com")
+    db_session.add(helena)
+    db_session.flush()
+
+    caminho = tmp_path / "proprietarios.xlsx"
+    pd.DataFrame({
+        "Nome": ["Helena"], "Sobrenome": ["Prado"], "Documento": ["52998224725"], "Email": ["nova@example.com"],
+    }).to_excel(caminho, sheet_name="Proprietarios", index=False)
+    uploaded_files["plano-antigo"] = {
+        "id": "plano-antigo", "original_name": "proprietarios.xlsx",
+        "saved_path": str(caminho), "processed": False
+    }
+    assert client.post("/api/upload/process/plano-antigo").status_code == 200
+
+    # Edição concorrente entre a prévia e a confirmação
+    helena.email = "editado@example.com"
+    db_session.flush()
+
+    response = client.post("/api/upload/import/plano-antigo")
+    assert response.status_code == 409
+    assert "Proprietarios" in response.json()["detail"]
+    db_session.refresh(helena)
+    assert helena.email == "editado@example.com"
+    assert client.post("/api/upload/import/plano-antigo").status_code == 400
+    uploaded_files.pop("plano-antigo")
+
+
+def test_aplicar_participacoes_nao_faz_commit(db_session, monkeypatch):
+    """Testa que a versão de participações é gravada na transação do chamador, sem commit próprio."""
+    imovel, proprietario = _imovel_e_proprietario(db_session)
+    db_session.add(Participacao(imovel_id=imovel.id, proprietario_id=proprietario.id, porcentagem=100, ativo=True))
+    db_session.flush()
+    outro = Proprietario(nome="Caio", sobrenome="Rocha")
+    db_session.add(outro)
+    db_session.flush()
+
+    plano = planejar_participacoes(pd.DataFrame({
+        "Imovel ID": [imovel.id, imovel.id],
+        "Proprietario ID": [proprietario.id, outro.id],
+        "Porcentagem": [60, 40],
+    }), db_session)
+
+    def commit_proibido():
+        raise AssertionError("aplicar_participacoes não deve fazer commit")
+
+    monkeypatch.setattr(db_session, "commit", commit_proibido)
+    asyncio.run(aplicar_participacoes(plano, db_session))
+
+    ativas = db_session.query(Participacao).filter_by(imovel_id=imovel.id, ativo=True).all()
+    assert sorted(float(p.porcentagem) for p in ativas) == [40.0, 60.0]
+
+
+def test_planejar_alugueis_matricial_periodo_e_conflitos(db_session):
+    """Testa o diff de aluguéis matriciais: período pelo nome da planilha e conflitos por linha."""
+    imovel = Imovel(nome="Matricial Um", endereco="Rua das Flores, 10")
+    proprietarios = [Proprietario(nome=nome, sobrenome="Teste") for nome in ("Alfa", "Bravo", "Charlie")]
+    db_session.add_all([imovel, *proprietarios])
+    db_session.flush()
+    db_session.add(AluguelSimples(
+        imovel_id=imovel.id, proprietario_id=proprietarios[0].id, mes=3, ano=2025,
+        valor_liquido_proprietario=100
+    ))
+    db_session.flush()
+
+    df = pd.DataFrame({
+        "Endereço": ["Rua das Flores", "Rua Inexistente"],
+        "Alfa": [150.0, 10.0],
+        "Bravo": ["abc", 20.0],
+        "Charlie": [0.0, 30.0],
+    })
+    df.attrs["sheet_name"] = "Mar2025"
+
+    plano = planejar_alugueis_matricial(df, db_session)
+
+    assert plano["resumo"] == {"inserir": 1, "atualizar": 1, "inalterados": 0, "conflitos": 2}
+    assert plano["alteracoes"][0]["alteracoes"] == {"valor_liquido_proprietario": {"atual": 100.0, "novo": 150.0}}
+    assert [(c["linha"], c["coluna"]) for c in plano["conflitos"]] == [(2, "Bravo"), (3, "Endereço")]
+
+    resultado = aplicar_alugueis(plano, db_session)
+    assert resultado["criados"] == 1 and resultado["atualizados"] == 1
+    atual = db_session.query(AluguelSimples).filter_by(imovel_id=imovel.id, proprietario_id=proprietarios[0].id).one()
+    db_session.refresh(atual)
+    assert float(atual.valor_liquido_proprietario) == 150.0
+
+
+def test_hash_planilha_ignora_formato_das_celulas():
+    """Testa que o hash depende do conteúdo normalizado, do tipo e do período."""
+    df = pd.DataFrame({"Nome": ["Ana ", "Bia"], "Quartos": [1.0, 2.0], "Vazia": [None, None]})
+    igual = pd.DataFrame({"Nome": ["Ana", "Bia"], "Quartos": [1, 2]})
+    assert hash_planilha(df, "imoveis", None) == hash_planilha(igual, "imoveis", None)
+    assert hash_planilha(df, "alugueis", "2025-01") != hash_planilha(df, "alugueis", "2025-02")
+
+
+def test_process_pula_planilhas_ja_importadas(client, db_session, tmp_path):
+    """Testa que, no reenvio da pasta, só a planilha alterada é planejada e importada."""
+    proprietarios = pd.DataFrame({"Nome": ["Irene"], "Sobrenome": ["Matos"], "Documento": ["39053344705"], "Email": ["irene@example.com"]})
+    imoveis = pd.DataFrame({"Nome": ["Hash Loft"], "Endereco_Completo": ["Rua Hash, 1"], "Area_Total": [40]})
+
+    def enviar(nome_arquivo):
+        caminho = tmp_path / nome_arquivo
+        with pd.ExcelWriter(caminho) as writer:
+            proprietarios.to_excel(writer, sheet_name="Proprietarios", index=False)
+            imoveis.to_excel(writer, sheet_name="Imoveis", index=False)
+        uploaded_files[nome_arquivo] = {"id": nome_arquivo, "original_name": nome_arquivo, "saved_path": str(caminho), "processed": False}
+        processado = client.post(f"/api/upload/process/{nome_arquivo}").json()
+        importado = client.post(f"/api/upload/import/{nome_arquivo}").json()
+        uploaded_files.pop(nome_arquivo)
+        return processado, importado
+
+    processado, _ = enviar("primeiro.xlsx")
+    assert processado["skipped_sheets"] == []
+
+    imoveis.loc[0, "Area_Total"] = 45
+    processado, importado = enviar("segundo.xlsx")
+
+    assert [p["sheet_name"] for p in processado["skipped_sheets"]] == ["Proprietarios"]
+    assert processado["skipped_sheets"][0]["arquivo_original"] == "primeiro.xlsx"
+    assert list(processado["diff"]) == ["Imoveis"]
+    assert processado["diff"]["Imoveis"]["resumo"]["atualizar"] == 1
+    assert importado["records_imported"] == {"imoveis": 1}
+    assert [p["sheet_name"] for p in importado["skipped_sheets"]] == ["Proprietarios"]
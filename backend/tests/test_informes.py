@@ -0,0 +1,147 @@
+"""
+Testes para o gerador de informes de rendimentos
+"""
+import os
+from datetime import date
+
+import pytest
+from openpyxl import load_workbook
+
+from main import app
+from models_final import AluguelSimples, Darf, Imovel, Proprietario
+from routers.auth import is_admin
+from services import informe_rendimentos_service
+from services.informe_rendimentos_service import GeracaoEmAndamento, InformeRendimentosService
+
+
+@pytest.fixture(autouse=True)
+def storage_temporario(tmp_path, monkeypatch):
+    """Cada teste usa o próprio diretório de armazenamento."""
+    monkeypatch.setattr(informe_rendimentos_service, "STORAGE_DIR", str(tmp_path))
+
+
+def _criar_dados(db_session):
+    proprietario = Proprietario(nome="Ana", sobrenome="Souza", documento="11122233344")
+    imovel = Imovel(nome="Informe Teste", endereco="Rua A, 1")
+    db_session.add_all([proprietario, imovel])
+    db_session.flush()
+    for mes, liquido, taxa in [(1, 1000, 100), (2, 1200, 120)]:
+        db_session.add(AluguelSimples(
+            imovel_id=imovel.id, proprietario_id=proprietario.id, mes=mes, ano=2024,
+            valor_liquido_proprietario=liquido, taxa_administracao_total=taxa,
+            taxa_administracao_proprietario=taxa
+        ))
+    db_session.add(Darf(proprietario_id=proprietario.id, data=date(2024, 2, 28), valor_darf=55.5))
+    db_session.flush()
+    return proprietario
+
+
+def test_agregar_ano_combina_alugueis_e_darfs(db_session):
+    """Testa que a agregação anual soma líquido, taxas e DARFs por mês."""
+    proprietario = _criar_dados(db_session)
+
+    informes = InformeRendimentosService.agregar_ano(db_session, 2024)
+    informe = next(i for i in informes if i["proprietario_id"] == proprietario.id)
+
+    assert informe["nome_proprietario"] == "Ana Souza"
+    assert len(informe["meses"]) == 12
+    assert informe["meses"][1] == {"mes": 2, "valor_liquido": 1200.0, "taxa_administracao": 120.0, "valor_darf": 55.5}
+    assert informe["totais"] == {"valor_liquido": 2200.0, "taxa_administracao": 220.0, "valor_darf": 55.5}
+
+
+def test_geracao_em_lote_retoma_progresso(db_session):
+    """Testa que uma segunda execução não renderiza novamente informes já gerados."""
+    proprietario = _criar_dados(db_session)
+
+    lote = InformeRendimentosService.preparar_lote(db_session, 2024, ["xlsx"], reprocessar=True)
+    assert len(lote["pendentes"]) == lote["manifesto"]["total"]
+
+    manifesto = InformeRendimentosService.renderizar_lote(2024, lote["pendentes"], ["xlsx"], max_workers=1)
+    assert manifesto["status"] == "concluido"
+
+    caminho = InformeRendimentosService.caminho_informe(2024, proprietario.id, "xlsx")
+    assert caminho and os.path.exists(caminho)
+    planilha = load_workbook(caminho).active
+    assert planilha["B2"].value == "Ana Souza"
+
+    novo_lote = InformeRendimentosService.preparar_lote(db_session, 2024, ["xlsx"])
+    assert novo_lote["pendentes"] == []
+
+
+def test_baixar_informe_sem_autenticacao(client):
+    """Testa que o download de informe exige autenticação."""
+    response = client.get("/api/informes/2024/1")
+    assert response.status_code == 401
+
+
+def test_trava_do_ano_exclusiva_ate_o_fim_da_renderizacao(db_session):
+    """Com a trava obtida, outra geração é recusada até renderizar_lote liberá-la."""
+    _criar_dados(db_session)
+    trava = InformeRendimentosService.travar_ano(2024)
+    lote = InformeRendimentosService.preparar_lote(db_session, 2024, ["xlsx"])
+
+    with pytest.raises(GeracaoEmAndamento):
+        InformeRendimentosService.travar_ano(2024)
+    with pytest.raises(GeracaoEmAndamento):
+        InformeRendimentosService.renderizar_lote(2024, lote["pendentes"], ["xlsx"], max_workers=1)
+    InformeRendimentosService.travar_ano(2023).liberar()
+
+    manifesto = InformeRendimentosService.renderizar_lote(2024, lote["pendentes"], ["xlsx"], max_workers=1, trava=trava)
+
+    assert manifesto["status"] == "concluido"
+    InformeRendimentosService.travar_ano(2024).liberar()
+
+
+def test_gerar_com_geracao_em_andamento_responde_409(client, db_session):
+    """Uma segunda geração do mesmo ano não prepara o lote nem altera o manifesto."""
+    _criar_dados(db_session)
+    trava = InformeRendimentosService.travar_ano(2024)
+    app.dependency_overrides[is_admin] = lambda: None
+    try:
+        em_andamento = client.post("/api/informes/2024/gerar?formatos=xlsx&max_workers=1")
+        trava.liberar()
+        liberado = client.post("/api/informes/2024/gerar?formatos=xlsx&max_workers=1")
+    finally:
+        del app.dependency_overrides[is_admin]
+        trava.liberar()
+
+    assert em_andamento.status_code == 409
+    assert liberado.status_code == 200 and liberado.json()["data"]["pendentes"] >= 1
+    assert InformeRendimentosService.carregar_manifesto(2024)["status"] == "concluido"
+    InformeRendimentosService.travar_ano(2024).liberar()
+
+
+def test_pdf_sem_reportlab_responde_400(client, db_session, monkeypatch):
+    """Sem reportlab o pdf é recusado e o padrão gera só o que o servidor renderiza."""
+    monkeypatch.setattr(informe_rendimentos_service.informe_render, "PDF_DISPONIVEL", False)
+    _criar_dados(db_session)
+    app.dependency_overrides[is_admin] = lambda: None
+    try:
+        pdf = client.post("/api/informes/2024/gerar?formatos=xlsx,pdf&max_workers=1")
+        padrao = client.post("/api/informes/2024/gerar?max_workers=1")
+    finally:
+        del app.dependency_overrides[is_admin]
+
+    assert pdf.status_code == 400 and "reportlab" in pdf.json()["detail"]
+    assert padrao.status_code == 200 and padrao.json()["data"]["formatos"] == ["xlsx"]
+    assert InformeRendimentosService.carregar_manifesto(2024)["formatos"] == ["xlsx"]
+
+
+def test_progresso_mostra_avisos_da_renderizacao(client):
+    """Avisos gravados por proprietário no manifesto aparecem no progresso."""
+    InformeRendimentosService._salvar_manifesto(2024, {
+        "status": "concluido", "total": 2, "erros": {},
+        "concluidos": {
+            "1": {"hash": "a", "formatos": ["xlsx", "pdf"], "arquivos": ["informe_2024_1.xlsx"],
+                  "avisos": ["PDF indisponível: instale o pacote reportlab"]},
+            "2": {"hash": "b", "formatos": ["xlsx"], "arquivos": ["informe_2024_2.xlsx"], "avisos": []},
+        },
+    })
+    app.dependency_overrides[is_admin] = lambda: None
+    try:
+        resposta = client.get("/api/informes/2024/progresso")
+    finally:
+        del app.dependency_overrides[is_admin]
+
+    assert resposta.status_code == 200
+    assert resposta.json()["data"]["avisos"] == {"1": ["PDF indisponível: instale o pacote reportlab"]}
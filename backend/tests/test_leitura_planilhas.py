@@ -0,0 +1,56 @@
+"""
+Testes para a leitura das planilhas fora do event loop
+"""
+import asyncio
+
+import pandas as pd
+
+from utils import leitura_planilhas
+from utils.leitura_planilhas import ler_planilhas_excel, usar_pool
+
+
+def _pasta(caminho, meses):
+    with pd.ExcelWriter(caminho) as writer:
+        for posicao, mes in enumerate(meses):
+            pd.DataFrame({"Endereço": ["Rua A", "Rua B"], "Valor": [100.5 + posicao, 200]}).to_excel(
+                writer, sheet_name=mes, index=False
+            )
+
+
+def test_leitura_paralela_preserva_ordem_e_conteudo(tmp_path):
+    """Testa que o pool devolve as planilhas na ordem da pasta e com os mesmos dados."""
+    caminho = tmp_path / "anual.xlsx"
+    meses = ["Jan2025", "Fev2025", "Mar2025"]
+    _pasta(caminho, meses)
+
+    paralelo = asyncio.run(ler_planilhas_excel(str(caminho), meses, paralelo=True))
+    pool = leitura_planilhas._pool
+    sequencial = asyncio.run(ler_planilhas_excel(str(caminho), meses, paralelo=False))
+    asyncio.run(ler_planilhas_excel(str(caminho), meses[:1], paralelo=True))
+
+    assert list(paralelo) == meses
+    for mes in meses:
+        pd.testing.assert_frame_equal(paralelo[mes], sequencial[mes])
+    assert paralelo["Mar2025"]["Valor"].tolist() == [102.5, 200]
+    # O mesmo pool atende as leituras seguintes
+    assert pool is not None and leitura_planilhas._pool is pool
+
+
+def test_pasta_pequena_ou_com_uma_planilha_le_em_sequencia(tmp_path, monkeypatch):
+    """O pool só é usado para pastas com várias planilhas acima do tamanho mínimo."""
+    import config
+
+    caminho = tmp_path / "pequena.xlsx"
+    meses = ["Jan2025", "Fev2025"]
+    _pasta(caminho, meses)
+    monkeypatch.setattr(config, "IMPORT_MAX_WORKERS", 4)
+
+    monkeypatch.setattr(config, "IMPORT_PARALLEL_MIN_KB", 2048)
+    assert not usar_pool(str(caminho), meses)
+
+    monkeypatch.setattr(config, "IMPORT_PARALLEL_MIN_KB", 0)
+    assert usar_pool(str(caminho), meses)
+    assert not usar_pool(str(caminho), meses[:1])
+
+    monkeypatch.setattr(config, "IMPORT_MAX_WORKERS", 1)
+    assert not usar_pool(str(caminho), meses)
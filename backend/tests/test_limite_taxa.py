@@ -0,0 +1,110 @@
+"""
+Testes do rate limiting compartilhado entre workers (storage SQLite)
+"""
+import multiprocessing
+import time
+
+import pytest
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import SlidingWindowCounterRateLimiter
+
+from utils.limite_taxa import ArmazenamentoSQLite, limiter
+
+
+@pytest.fixture
+def uri(tmp_path):
+    return f"sqlite:///{tmp_path / 'contadores.db'}"
+
+
+def _consumir(uri, quantidade, fila):
+    """Processo worker: tenta `quantidade` acessos e informa quantos passaram."""
+    limitador = SlidingWindowCounterRateLimiter(storage_from_string(uri))
+    item = parse("20/minute")
+    fila.put(sum(limitador.hit(item, "login", "10.0.0.1") for _ in range(quantidade)))
+
+
+def test_esquema_sqlite_registrado(uri):
+    """sqlite:/// resolve para o storage compartilhado."""
+    assert isinstance(storage_from_string(uri), ArmazenamentoSQLite)
+
+
+def test_janela_deslizante_bloqueia_apos_limite(uri):
+    """O sexto acesso na janela é recusado e test/get_window_stats concordam."""
+    limitador = SlidingWindowCounterRateLimiter(storage_from_string(uri))
+    item = parse("5/minute")
+
+    resultados = [limitador.hit(item, "cliente") for _ in range(6)]
+
+    assert resultados == [True] * 5 + [False]
+    assert limitador.test(item, "cliente") is False
+    assert limitador.get_window_stats(item, "cliente").remaining == 0
+    # Outra chave não é afetada
+    assert limitador.hit(item, "outro_cliente") is True
+
+
+def test_contadores_compartilhados_entre_instancias(uri):
+    """Duas instâncias (como dois workers) somam no mesmo contador."""
+    item = parse("3/minute")
+    worker_a = SlidingWindowCounterRateLimiter(storage_from_string(uri))
+    worker_b = SlidingWindowCounterRateLimiter(storage_from_string(uri))
+
+    assert worker_a.hit(item, "ip") and worker_b.hit(item, "ip") and worker_a.hit(item, "ip")
+    assert worker_b.hit(item, "ip") is False
+
+
+def test_contadores_compartilhados_entre_processos(uri):
+    """Processos concorrentes não ultrapassam o limite somado."""
+    storage_from_string(uri)  # cria a tabela antes dos processos
+    contexto = multiprocessing.get_context("spawn")
+    fila = contexto.Queue()
+    processos = [contexto.Process(target=_consumir, args=(uri, 15, fila)) for _ in range(3)]
+    for processo in processos:
+        processo.start()
+    aceitos = sum(fila.get(timeout=60) for _ in processos)
+    for processo in processos:
+        processo.join(timeout=60)
+
+    assert aceitos == 20
+
+
+def test_clear_e_reset(uri):
+    """clear_sliding_window libera a chave; reset apaga todos os contadores."""
+    storage = storage_from_string(uri)
+    limitador = SlidingWindowCounterRateLimiter(storage)
+    item = parse("1/minute")
+    assert limitador.hit(item, "a") and not limitador.hit(item, "a")
+
+    limitador.clear(item, "a")
+    assert limitador.hit(item, "a") is True
+
+    storage.incr("fixa", 60)
+    assert storage.get("fixa") == 1
+    assert storage.reset() >= 2
+    assert storage.get("fixa") == 0
+
+
+def test_custo_por_requisicao(uri):
+    """Um acesso custa na ordem de dezenas de microssegundos."""
+    limitador = SlidingWindowCounterRateLimiter(storage_from_string(uri))
+    item = parse("1000000/minute")
+    limitador.hit(item, "aquecimento")
+
+    repeticoes = 2000
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        limitador.hit(item, "ip")
+    media = (time.perf_counter() - inicio) / repeticoes
+
+    # Margem folgada para máquinas de CI lentas; a meta é < 100µs
+    assert media < 0.001
+
+
+def test_limiter_da_aplicacao_usa_storage_compartilhado():
+    """main.py e routers/auth.py usam a mesma instância, sobre o storage SQLite."""
+    from main import app
+    from routers import auth
+
+    assert app.state.limiter is limiter
+    assert auth.limiter is limiter
+    assert isinstance(limiter._storage, ArmazenamentoSQLite)
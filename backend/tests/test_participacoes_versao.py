@@ -0,0 +1,240 @@
+"""
+Testes da criação de versões globais de participações em lote e do ponteiro da versão vigente
+"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from main import app
+from models_final import (
+    Base, HistoricoParticipacao, Imovel, Participacao, Proprietario, Usuario, VersaoAtualParticipacao,
+    VersaoParticipacao
+)
+from routers.auth import is_admin, verify_token_flexible
+from services import participacao_service
+from services.participacao_service import ParticipacaoService
+from utils.limite_taxa import limiter
+from utils.senhas import pwd_context
+
+
+@pytest.fixture
+def cadastro(db_session):
+    """Dois imóveis e três proprietários."""
+    imoveis = [Imovel(nome="Versão A", endereco="Rua A, 1"), Imovel(nome="Versão B", endereco="Rua B, 2")]
+    proprietarios = [Proprietario(nome=f"Dono {i}") for i in range(3)]
+    db_session.add_all([*imoveis, *proprietarios])
+    db_session.flush()
+    return [i.id for i in imoveis], [p.id for p in proprietarios]
+
+
+def test_nova_versao_grava_matriz_em_lote(db_session, cadastro):
+    """Formatos de porcentagem normalizados; participações, histórico e versão com o mesmo data_registro."""
+    (a, b), (p1, p2, p3) = cadastro
+    itens = [
+        {"imovel_id": a, "proprietario_id": p1, "porcentagem": "12,5%"},
+        {"imovel_id": a, "proprietario_id": p2, "porcentagem": "87.5"},
+        {"imovel_id": str(b), "proprietario_id": p3, "porcentagem": 100},
+        {"imovel_id": b, "proprietario_id": p1, "porcentagem": 0},
+    ]
+
+    sucesso, erro, resultado = ParticipacaoService.criar_nova_versao_global(db_session, itens)
+
+    assert sucesso, erro
+    assert resultado["quantidade"] == 4 and resultado["imoveis"] == 2
+    data_registro = datetime.fromisoformat(resultado["data_registro"])
+    gravadas = db_session.query(Participacao).filter(Participacao.data_registro == data_registro).all()
+    assert sorted((p.imovel_id, p.proprietario_id, float(p.porcentagem)) for p in gravadas) == sorted([
+        (a, p1, 12.5), (a, p2, 87.5), (b, p3, 100.0), (b, p1, 0.0)
+    ])
+    assert all(p.uuid for p in gravadas)
+    assert db_session.query(HistoricoParticipacao).filter(
+        HistoricoParticipacao.versao_id == resultado["versao_id"]
+    ).count() == 4
+    assert db_session.get(VersaoParticipacao, data_registro) is not None
+
+
+@pytest.mark.parametrize("itens, mensagem", [
+    ([], "lista não vazia"),
+    ([{"imovel_id": "x", "proprietario_id": 1, "porcentagem": 100}], "Item #1: imovel_id/proprietario_id inválido"),
+    ([{"imovel_id": 0, "proprietario_id": 0, "porcentagem": 100}], "Imóvel id=0 não encontrado"),
+    ([{"imovel_id": "A", "proprietario_id": 999999, "porcentagem": 100}], "Proprietário id=999999 não encontrado"),
+    ([{"imovel_id": "A", "proprietario_id": "P1", "porcentagem": "abc"}], "Item #1: porcentagem inválida"),
+    ([{"imovel_id": "A", "proprietario_id": "P1", "porcentagem": 60},
+      {"imovel_id": "A", "proprietario_id": "P2", "porcentagem": -10}], "Item #2: porcentagem negativa"),
+    ([{"imovel_id": "A", "proprietario_id": "P1", "porcentagem": 50},
+      {"imovel_id": "A", "proprietario_id": "P1", "porcentagem": 50}], "Item #2: proprietário repetido"),
+    ([{"imovel_id": "A", "proprietario_id": "P1", "porcentagem": 60},
+      {"imovel_id": "A", "proprietario_id": "P2", "porcentagem": 30}], "total de percentuais deve ser 100%. Atual: 90.00%"),
+])
+def test_validacao_da_matriz(db_session, cadastro, itens, mensagem):
+    """A primeira regra violada (na ordem dos itens) vira a mensagem de erro e nada é gravado."""
+    (a, _), (p1, p2, _) = cadastro
+    substituir = {"A": a, "P1": p1, "P2": p2}
+    itens = [{k: substituir.get(v, v) if isinstance(v, str) else v for k, v in item.items()} for item in itens]
+    antes = db_session.query(Participacao).count()
+
+    sucesso, erro, resultado = ParticipacaoService.criar_nova_versao_global(db_session, itens)
+
+    assert not sucesso and resultado is None
+    assert mensagem in erro
+    assert db_session.query(Participacao).count() == antes
+
+
+def test_reservar_versao_sempre_depois_da_ultima(db_session):
+    """Com uma versão registrada no futuro, a próxima fica 1µs depois dela."""
+    futuro = datetime.now() + timedelta(hours=1)
+    db_session.execute(insert(VersaoParticipacao).values(data_registro=futuro))
+
+    primeira = ParticipacaoService.reservar_versao(db_session)
+    segunda = ParticipacaoService.reservar_versao(db_session)
+
+    assert primeira == futuro + timedelta(microseconds=1)
+    assert segunda == primeira + timedelta(microseconds=1)
+
+
+def test_nova_versao_mil_imoveis_em_menos_de_um_segundo(db_session):
+    """1.000 imóveis com dois proprietários cada: validação e gravação bem abaixo de 1s."""
+    db_session.execute(insert(Imovel), [{"nome": f"Perf {i}", "endereco": f"Rua {i}"} for i in range(1000)])
+    db_session.execute(insert(Proprietario), [{"nome": "Perf X"}, {"nome": "Perf Y"}])
+    imoveis = [i for (i,) in db_session.query(Imovel.id).filter(Imovel.nome.like("Perf %")).all()]
+    x, y = [p for (p,) in db_session.query(Proprietario.id).filter(Proprietario.nome.like("Perf %")).all()]
+    itens = [item for i in imoveis for item in (
+        {"imovel_id": i, "proprietario_id": x, "porcentagem": 33.33333333},
+        {"imovel_id": i, "proprietario_id": y, "porcentagem": 66.66666667},
+    )]
+
+    inicio = time.perf_counter()
+    sucesso, erro, resultado = ParticipacaoService.criar_nova_versao_global(db_session, itens)
+    duracao = time.perf_counter() - inicio
+
+    assert sucesso, erro
+    assert resultado["quantidade"] == 2000 and resultado["imoveis"] == 1000
+    assert duracao < 1.0
+
+
+def test_endpoint_nova_versao(client, cadastro):
+    """O endpoint devolve 400 com a mensagem da validação e 200 com a versão criada."""
+    (a, b), (p1, _, _) = cadastro
+    app.dependency_overrides[is_admin] = lambda: None
+    try:
+        invalido = client.post("/api/participacoes/nova-versao", json={"participacoes": [
+            {"imovel_id": a, "proprietario_id": p1, "porcentagem": 50}
+        ]})
+        valido = client.post("/api/participacoes/nova-versao", json={"participacoes": [
+            {"imovel_id": a, "proprietario_id": p1, "porcentagem": 100},
+            {"imovel_id": b, "proprietario_id": p1, "porcentagem": 100},
+        ]})
+    finally:
+        del app.dependency_overrides[is_admin]
+
+    assert invalido.status_code == 400 and "Atual: 50.00%" in invalido.json()["detail"]
+    assert valido.status_code == 200 and valido.json()["quantidade"] == 2
+
+
+def test_ponteiro_acompanha_nova_versao_e_nunca_recua(db_session, cadastro):
+    """Cada versão reservada move o ponteiro; uma versão mais antiga não o faz recuar."""
+    (a, _), (p1, _, _) = cadastro
+    sucesso, erro, resultado = ParticipacaoService.criar_nova_versao_global(
+        db_session, [{"imovel_id": a, "proprietario_id": p1, "porcentagem": 100}]
+    )
+    assert sucesso, erro
+    atual = datetime.fromisoformat(resultado["data_registro"])
+    assert ParticipacaoService.versao_atual(db_session) == atual
+
+    ParticipacaoService._apontar_versao_atual(db_session, atual - timedelta(days=1))
+
+    assert ParticipacaoService.versao_atual(db_session) == atual
+    assert db_session.query(VersaoAtualParticipacao).count() == 1
+
+
+def test_versao_atual_sem_ponteiro_usa_maior_data_registro(db_session, cadastro):
+    """Sem linha em versao_atual_participacoes, vale o maior data_registro gravado."""
+    (a, _), (p1, _, _) = cadastro
+    db_session.query(VersaoAtualParticipacao).delete()
+    data = datetime(2031, 5, 1, 8, 0)
+    db_session.add(Participacao(imovel_id=a, proprietario_id=p1, porcentagem=100, data_registro=data))
+    db_session.flush()
+
+    assert ParticipacaoService.versao_atual(db_session) == data
+
+
+def test_banco_sem_tabela_do_ponteiro(tmp_path):
+    """Sem a migração 017, leitura e reserva de versão seguem funcionando pelo fallback."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'sem_ponteiro.db'}")
+    Base.metadata.create_all(engine, tables=[
+        tabela for tabela in Base.metadata.sorted_tables if tabela.name != VersaoAtualParticipacao.__tablename__
+    ])
+    data = datetime(2024, 5, 1, 8, 0)
+    try:
+        with Session(engine) as sessao:
+            sessao.add(Participacao(imovel_id=1, proprietario_id=1, porcentagem=100, data_registro=data))
+            sessao.flush()
+
+            assert ParticipacaoService.versao_atual(sessao) == data
+            assert ParticipacaoService.reservar_versao(sessao) > data
+    finally:
+        engine.dispose()
+
+
+def test_listagem_ativa_segue_ponteiro_e_cache_e_invalidado(client, db_session, cadastro):
+    """A listagem usa a versão apontada; após uma escrita pela API o cache não devolve a versão anterior."""
+    (a, b), (p1, p2, _) = cadastro
+    ParticipacaoService.invalidar_cache()
+    app.dependency_overrides[is_admin] = lambda: None
+    app.dependency_overrides[verify_token_flexible] = lambda: None
+    try:
+        primeira = client.post("/api/participacoes/nova-versao", json={"participacoes": [
+            {"imovel_id": a, "proprietario_id": p1, "porcentagem": 100},
+        ]})
+        antes = client.get("/api/participacoes/").json()["data"]
+        segunda = client.post("/api/participacoes/nova-versao", json={"participacoes": [
+            {"imovel_id": a, "proprietario_id": p2, "porcentagem": 100},
+            {"imovel_id": b, "proprietario_id": p1, "porcentagem": 100},
+        ]})
+        depois = client.get("/api/participacoes/?data_registro=ativo").json()["data"]
+        historica = client.get(f"/api/participacoes/?data_registro={primeira.json()['data_registro']}").json()["data"]
+    finally:
+        del app.dependency_overrides[is_admin]
+        del app.dependency_overrides[verify_token_flexible]
+        ParticipacaoService.invalidar_cache()
+
+    assert primeira.status_code == 200 and segunda.status_code == 200
+    assert [(p["imovel_id"], p["proprietario_id"]) for p in antes] == [(a, p1)]
+    assert sorted((p["imovel_id"], p["proprietario_id"]) for p in depois) == sorted([(a, p2), (b, p1)])
+    assert {p["data_registro"][:19] for p in depois} == {segunda.json()["data_registro"][:19]}
+    assert [(p["imovel_id"], p["proprietario_id"]) for p in historica] == [(a, p1)]
+
+
+def test_cache_descartado_apenas_por_escritas_de_participacoes(client, db_session, cadastro):
+    """Login não descarta o cache; excluir uma participação sim, e a listagem reflete a exclusão."""
+    (a, _), (p1, p2, _) = cadastro
+    sucesso, erro, resultado = ParticipacaoService.criar_nova_versao_global(db_session, [
+        {"imovel_id": a, "proprietario_id": p1, "porcentagem": 50},
+        {"imovel_id": a, "proprietario_id": p2, "porcentagem": 50},
+    ])
+    assert sucesso, erro
+    data_registro = datetime.fromisoformat(resultado["data_registro"])
+    db_session.add(Usuario(usuario="cache_participacoes", senha=pwd_context.hash("segredo1"), tipo_de_usuario="usuario"))
+    db_session.commit()
+    ParticipacaoService.invalidar_cache()
+    limiter.reset()
+    app.dependency_overrides[verify_token_flexible] = lambda: None
+    try:
+        ativas = client.get("/api/participacoes/").json()["data"]
+        login = client.post("/api/auth/login", json={"usuario": "cache_participacoes", "senha": "segredo1"})
+        em_cache_apos_login = participacao_service._cache_versoes.obter(data_registro)
+        exclusao = client.delete(f"/api/participacoes/{ativas[0]['id']}")
+        em_cache_apos_exclusao = participacao_service._cache_versoes.obter(data_registro)
+        depois = client.get("/api/participacoes/").json()["data"]
+    finally:
+        del app.dependency_overrides[verify_token_flexible]
+        ParticipacaoService.invalidar_cache()
+        limiter.reset()
+
+    assert login.status_code == 200 and exclusao.status_code == 200
+    assert em_cache_apos_login is not None
+    assert em_cache_apos_exclusao is None
+    assert len(ativas) == 2 and [p["id"] for p in depois] == [ativas[1]["id"]]
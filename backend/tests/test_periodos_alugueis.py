@@ -0,0 +1,55 @@
+"""
+Testes para o catálogo de períodos de aluguéis
+"""
+from models_final import AluguelSimples, Imovel, PeriodoAluguel, Proprietario
+from routers.dashboard import get_dashboard_summary
+from services.aluguel_service import AluguelService
+
+
+def _popular_alugueis(db_session):
+    imovel = Imovel(nome="Catálogo Períodos", endereco="Rua do Catálogo, 7")
+    proprietarios = [Proprietario(nome="Eva", sobrenome="Períodos"), Proprietario(nome="Fábio", sobrenome="Períodos")]
+    db_session.add_all([imovel, *proprietarios])
+    db_session.flush()
+    for proprietario in proprietarios:
+        db_session.add_all([
+            AluguelSimples(imovel_id=imovel.id, proprietario_id=proprietario.id, ano=2024, mes=12,
+                           valor_liquido_proprietario=100, taxa_administracao_proprietario=5),
+            AluguelSimples(imovel_id=imovel.id, proprietario_id=proprietario.id, ano=2025, mes=1,
+                           valor_liquido_proprietario=150, taxa_administracao_proprietario=5),
+        ])
+    db_session.flush()
+
+
+def test_reconstruir_catalogo_periodos(db_session):
+    """Testa que o catálogo agrega quantidade e totais por período."""
+    _popular_alugueis(db_session)
+
+    assert AluguelService.reconstruir_catalogo_periodos(db_session) == 2
+
+    assert AluguelService.anos_disponiveis(db_session) == [2025, 2024]
+    ultimo = AluguelService.ultimo_periodo(db_session)
+    assert (ultimo.ano, ultimo.mes) == (2025, 1)
+    assert ultimo.to_dict()["quantidade"] == 2
+    assert ultimo.to_dict()["total_valor_liquido"] == 300.0
+    assert AluguelService.obter_periodo(db_session, 2024, 12).to_dict()["total_taxa_proprietario"] == 10.0
+    assert AluguelService.obter_periodo(db_session, 2023, 1) is None
+
+
+def test_totais_mensais_e_dashboard_usam_catalogo(db_session):
+    """Testa que totais mensais e dashboard leem os totais do catálogo."""
+    db_session.add_all([
+        PeriodoAluguel(ano=2025, mes=2, quantidade=3, total_valor_liquido=200, total_taxa_proprietario=0),
+        PeriodoAluguel(ano=2025, mes=3, quantidade=3, total_valor_liquido=300, total_taxa_proprietario=0),
+    ])
+    db_session.flush()
+
+    totais = AluguelService.get_totais_mensais(db_session, limite_meses=1)
+    assert totais["total_periodos"] == 1
+    assert totais["totais_mensais"][0]["total_valor"] == 300.0
+    assert totais["totais_mensais"][0]["quantidade_alugueis"] == 3
+
+    resumo = get_dashboard_summary(db=db_session, current_user=None)
+    assert resumo["receitas_ultimo_mes"] == 300.0
+    assert resumo["variacao_percentual"] == 50.0
+    assert resumo["income_chart_data"]["values"] == [200.0, 300.0]
@@ -0,0 +1,67 @@
+"""
+Testes para o roteamento de leituras entre primário e réplica
+"""
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import config
+from config import COOKIE_ULTIMA_ESCRITA, HEADER_LER_PRIMARIO
+from main import app
+from models_final import Base, PeriodoAluguel
+from routers.auth import verify_token_flexible
+
+
+def _banco(caminho, ano):
+    """Cria um banco SQLite com um único período no catálogo."""
+    engine = create_engine(f"sqlite:///{caminho}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    fabrica = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with fabrica() as db:
+        db.add(PeriodoAluguel(ano=ano, mes=1, quantidade=1, total_valor_liquido=10, total_taxa_proprietario=0))
+        db.commit()
+    return fabrica
+
+
+@pytest.fixture
+def primario_e_replica(tmp_path, monkeypatch):
+    """Primário com dados de 2025 e réplica atrasada, ainda com 2024."""
+    monkeypatch.setattr(config, "SessionLocal", _banco(tmp_path / "primario.db", 2025))
+    monkeypatch.setattr(config, "ReadSessionLocal", _banco(tmp_path / "replica.db", 2024))
+    monkeypatch.setattr(config, "REPLICA_CONFIGURADA", True)
+    app.dependency_overrides[verify_token_flexible] = lambda: None
+    yield TestClient(app)
+    del app.dependency_overrides[verify_token_flexible]
+
+
+def test_leitura_usa_replica_e_escape_para_primario(primario_e_replica):
+    """Testa que GETs leem da réplica, exceto com cabeçalho ou escrita recente."""
+    client = primario_e_replica
+
+    assert client.get("/api/reportes/anos-disponiveis").json() == [2024]
+    assert client.get("/api/reportes/anos-disponiveis", headers={HEADER_LER_PRIMARIO: "1"}).json() == [2025]
+
+    client.cookies.set(COOKIE_ULTIMA_ESCRITA, str(time.time()))
+    assert client.get("/api/reportes/anos-disponiveis").json() == [2025]
+
+    client.cookies.set(COOKIE_ULTIMA_ESCRITA, str(time.time() - config.READ_YOUR_WRITES_SECONDS - 1))
+    assert client.get("/api/reportes/anos-disponiveis").json() == [2024]
+
+
+def test_escrita_marca_cliente_para_ler_do_primario(primario_e_replica):
+    """Testa que uma escrita bem-sucedida devolve o cookie de escrita recente."""
+    response = primario_e_replica.post("/api/alugueis/lote", json={"alugueis": []})
+
+    assert response.status_code == 200
+    assert COOKIE_ULTIMA_ESCRITA in response.cookies
+
+
+def test_replica_indisponivel_usa_primario(primario_e_replica, tmp_path, monkeypatch):
+    """Testa o fallback para o primário quando a réplica não aceita conexões."""
+    inacessivel = create_engine(f"sqlite:///{tmp_path / 'nao_existe' / 'replica.db'}")
+    monkeypatch.setattr(config, "ReadSessionLocal", sessionmaker(bind=inacessivel))
+
+    assert primario_e_replica.get("/api/reportes/anos-disponiveis").json() == [2025]
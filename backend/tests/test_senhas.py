@@ -0,0 +1,120 @@
+"""
+Testes do hash de senhas no pool dedicado (bcrypt fora do event loop)
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from passlib.context import CryptContext
+from sqlalchemy.orm import Session
+
+from config import BCRYPT_ROUNDS
+from models_final import Usuario
+from routers import auth
+from utils.limite_taxa import limiter
+from utils.senhas import FilaHashCheia, PoolHashSenhas, pwd_context
+
+
+@pytest.fixture(autouse=True)
+def limpar_rate_limit():
+    """Os testes de login não herdam as tentativas de test_auth."""
+    limiter.reset()
+    yield
+    limiter.reset()
+
+
+def _rounds(hash_senha: str) -> int:
+    return pwd_context.handler("bcrypt").from_string(hash_senha).rounds
+
+
+def _criar_usuario(db_session: Session, hash_senha: str) -> Usuario:
+    usuario = Usuario(usuario="rehash", senha=hash_senha, tipo_de_usuario="usuario")
+    db_session.add(usuario)
+    db_session.commit()
+    return usuario
+
+
+def test_login_refaz_hash_com_custo_diferente(client: TestClient, db_session: Session):
+    """Hash com outro custo é substituído pelo custo configurado após login válido."""
+    antigo = CryptContext(schemes=["bcrypt"], bcrypt__rounds=BCRYPT_ROUNDS + 1).hash("segredo1")
+    usuario = _criar_usuario(db_session, antigo)
+
+    response = client.post("/api/auth/login", json={"usuario": "rehash", "senha": "segredo1"})
+
+    assert response.status_code == 200
+    db_session.refresh(usuario)
+    assert usuario.senha != antigo
+    assert _rounds(usuario.senha) == BCRYPT_ROUNDS
+    assert pwd_context.verify("segredo1", usuario.senha)
+
+
+def test_login_mantem_hash_com_custo_atual(client: TestClient, db_session: Session):
+    """Sem mudança de custo o hash gravado não é alterado; senha errada não regrava."""
+    atual = pwd_context.hash("segredo1")
+    usuario = _criar_usuario(db_session, atual)
+
+    assert client.post("/api/auth/login", json={"usuario": "rehash", "senha": "errada"}).status_code == 401
+    assert client.post("/api/auth/login", json={"usuario": "rehash", "senha": "segredo1"}).status_code == 200
+    db_session.refresh(usuario)
+    assert usuario.senha == atual
+
+
+def test_login_com_pool_cheio_responde_503(client: TestClient, db_session: Session, monkeypatch):
+    """Fila do pool cheia vira 503 com Retry-After, não uma espera indefinida."""
+    _criar_usuario(db_session, pwd_context.hash("segredo1"))
+
+    async def fila_cheia(*args):
+        raise FilaHashCheia("cheia")
+
+    monkeypatch.setattr(auth, "verificar_senha", fila_cheia)
+    response = client.post("/api/auth/login", json={"usuario": "rehash", "senha": "segredo1"})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+def test_pool_recusa_acima_da_fila_e_mede_profundidade():
+    """Com 1 worker e fila 1, a terceira operação simultânea é recusada."""
+    pool = PoolHashSenhas(workers=1, max_fila=1)
+    liberar = threading.Event()
+
+    async def cenario():
+        primeira = asyncio.ensure_future(pool.executar(liberar.wait, 5))
+        segunda = asyncio.ensure_future(pool.executar(lambda: "ok"))
+        await asyncio.sleep(0.05)
+        metricas = pool.metricas()
+        with pytest.raises(FilaHashCheia):
+            await pool.executar(lambda: "recusada")
+        liberar.set()
+        return metricas, await primeira, await segunda
+
+    metricas, primeira, segunda = asyncio.run(cenario())
+
+    assert (primeira, segunda) == (True, "ok")
+    assert metricas["em_execucao"] == 1 and metricas["na_fila"] == 1
+    final = pool.metricas()
+    assert final["recusadas"] == 1 and final["concluidas"] == 2
+    assert final["na_fila"] == 0 and final["maior_fila"] == 1
+
+
+def test_pool_nao_bloqueia_event_loop():
+    """Enquanto uma operação lenta roda no pool, o event loop segue atendendo."""
+    pool = PoolHashSenhas(workers=1, max_fila=4)
+
+    async def cenario():
+        ticks = 0
+
+        async def relogio():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        tarefa = asyncio.ensure_future(relogio())
+        await pool.executar(time.sleep, 0.2)
+        tarefa.cancel()
+        return ticks
+
+    assert asyncio.run(cenario()) >= 5
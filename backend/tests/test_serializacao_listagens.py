@@ -0,0 +1,85 @@
+"""
+Testes para as listagens projetadas e serializadas com orjson
+"""
+import json
+from datetime import date, datetime
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from main import app
+from models_final import Alias, Darf, DarfResponse, Imovel, Participacao, Proprietario, Transferencia
+from routers.auth import is_admin, is_user_or_admin, verify_token, verify_token_flexible
+from utils.serializacao import RespostaJSONRapida
+
+
+@pytest.fixture
+def cliente_autenticado(client):
+    for dependencia in (verify_token, verify_token_flexible, is_admin, is_user_or_admin):
+        app.dependency_overrides[dependencia] = lambda: None
+    yield client
+    for dependencia in (verify_token, verify_token_flexible, is_admin, is_user_or_admin):
+        del app.dependency_overrides[dependencia]
+
+
+@pytest.fixture
+def cadastro(db_session):
+    """Imóvel, proprietários, participações, DARF e transferência para comparar com to_dict."""
+    imovel = Imovel(nome="Serializa Centro", endereco="Rua JSON, 1", valor_mercado=350000.5, iptu_mensal=120, alugado=True)
+    proprietarios = [Proprietario(nome="Sérgio", sobrenome="Serializa", email="s@x.com"), Proprietario(nome="Solange")]
+    alias = Alias(alias="Serializa Família")
+    db_session.add_all([imovel, *proprietarios, alias])
+    db_session.flush()
+    data_registro = datetime(2030, 1, 1, 12, 30)
+    db_session.add_all([
+        Participacao(imovel_id=imovel.id, proprietario_id=proprietarios[0].id, porcentagem=62.5, data_registro=data_registro),
+        Participacao(imovel_id=imovel.id, proprietario_id=proprietarios[1].id, porcentagem=37.5, data_registro=data_registro),
+        Darf(proprietario_id=proprietarios[0].id, data=date(2025, 3, 20), valor_darf=321.45),
+        Transferencia(alias_id=alias.id, nome_transferencia="Repasse", valor_total=99.9,
+                      id_proprietarios='[{"id": 1, "valor": 99.9}]', origem_id_proprietario=proprietarios[0].id,
+                      data_criacao=datetime(2025, 1, 1)),
+    ])
+    db_session.flush()
+    return imovel, proprietarios
+
+
+def _esperado(dados):
+    return json.loads(json.dumps(jsonable_encoder(dados)))
+
+
+def test_listagens_iguais_ao_to_dict(cliente_autenticado, db_session, cadastro):
+    """Testa que as projeções devolvem os mesmos campos e valores que to_dict."""
+    imovel, proprietarios = cadastro
+
+    proprietarios_json = cliente_autenticado.get("/api/proprietarios/").json()
+    for proprietario in proprietarios:
+        assert _esperado(proprietario.to_dict()) in proprietarios_json
+
+    imoveis_json = cliente_autenticado.get("/api/imoveis/").json()["data"]
+    assert _esperado(imovel.to_dict()) in imoveis_json
+
+    participacoes_json = cliente_autenticado.get("/api/participacoes/").json()["data"]
+    esperadas = [_esperado(p.to_dict()) for p in db_session.query(Participacao).filter(Participacao.imovel_id == imovel.id)]
+    assert sorted(participacoes_json, key=lambda p: p["id"]) == sorted(esperadas, key=lambda p: p["id"])
+
+    darf = db_session.query(Darf).filter(Darf.proprietario_id == proprietarios[0].id).one()
+    darfs_json = cliente_autenticado.get("/api/darf/", params={"proprietario_id": proprietarios[0].id}).json()
+    assert darfs_json == [_esperado(DarfResponse(**darf.to_dict()))]
+
+    transferencia = db_session.query(Transferencia).filter(Transferencia.nome_transferencia == "Repasse").one()
+    transferencias_json = cliente_autenticado.get("/api/transferencias/").json()
+    assert _esperado(transferencia.to_dict()) in transferencias_json
+
+
+def test_resposta_rapida_serializa_tipos_do_banco():
+    """Testa Decimal, datas, UUID e caracteres não ASCII na resposta orjson."""
+    from decimal import Decimal
+    from uuid import UUID
+
+    corpo = RespostaJSONRapida({
+        "valor": Decimal("10.50"), "data": date(2025, 1, 2), "uuid": UUID(int=1), "nome": "Imóvel"
+    }).body
+
+    assert json.loads(corpo) == {
+        "valor": 10.5, "data": "2025-01-02", "uuid": "00000000-0000-0000-0000-000000000001", "nome": "Imóvel"
+    }
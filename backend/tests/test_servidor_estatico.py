@@ -0,0 +1,125 @@
+"""
+Testes do servidor estático do frontend (frontend/serve.py, modo produção)
+"""
+import gzip
+import http.client
+import http.server
+import importlib.util
+import threading
+from pathlib import Path
+
+import pytest
+
+SERVE_PY = Path(__file__).resolve().parents[2] / "frontend" / "serve.py"
+_spec = importlib.util.spec_from_file_location("serve_frontend", SERVE_PY)
+serve = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(serve)
+
+
+@pytest.mark.parametrize("cabecera, esperado", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=10-", (10, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=990-5000", (990, 999)),
+    (" bytes=0-0 ", (0, 0)),
+    ("bytes=-", None),
+    ("bytes=0-10,20-30", None),
+    ("items=0-10", None),
+])
+def test_rango_solicitado(cabecera, esperado):
+    """Intervalos com início e fim, abertos, por sufixo e cabeçalhos não aplicáveis."""
+    assert serve.rango_solicitado(cabecera, 1000) == esperado
+
+
+@pytest.mark.parametrize("cabecera", ["bytes=1000-", "bytes=1000-1010", "bytes=50-10", "bytes=-0"])
+def test_rango_solicitado_nao_satisfazivel(cabecera):
+    """Início além do arquivo, fim antes do início e sufixo vazio viram 416."""
+    with pytest.raises(ValueError):
+        serve.rango_solicitado(cabecera, 1000)
+
+
+@pytest.mark.parametrize("accept_encoding, esperado", [
+    ("gzip, br", "br"),
+    ("gzip;q=1.0, br;q=0.5", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("GZIP;Q=0.8", "gzip"),
+    ("*;q=0.3", "br"),
+    ("*, br;q=0", "gzip"),
+    ("gzip;q=abc", None),
+    ("identity", None),
+    ("", None),
+])
+def test_elegir_codificacion(accept_encoding, esperado):
+    """Valores q, empate a favor de br, curinga e recusas explícitas."""
+    assert serve.elegir_codificacion(accept_encoding, {"gzip": b"", "br": b""}) == esperado
+
+
+def test_elegir_codificacion_sem_variantes():
+    """Sem variantes comprimidas o arquivo é servido como está."""
+    assert serve.elegir_codificacion("gzip, br", {}) is None
+
+
+@pytest.fixture
+def servidor(tmp_path):
+    (tmp_path / "index.html").write_text("<html>" + "conteúdo " * 500 + "</html>", encoding="utf-8")
+    catalogo = serve.cargar_catalogo(tmp_path)
+    handler = type("HandlerTeste", (serve.StaticHandler,), {"catalogo": catalogo})
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    def pedir(caminho, **cabecalhos):
+        conexao = http.client.HTTPConnection("127.0.0.1", httpd.server_address[1], timeout=5)
+        conexao.request("GET", caminho, headers=cabecalhos)
+        resposta = conexao.getresponse()
+        corpo = resposta.read()
+        conexao.close()
+        return resposta, corpo
+
+    try:
+        yield catalogo["index.html"], pedir
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_if_none_match_por_variante(servidor):
+    """O 304 usa o ETag da representação negociada; o ETag de outra variante não vale."""
+    recurso, pedir = servidor
+    resposta, corpo = pedir("/", **{"Accept-Encoding": "gzip"})
+    etag_gzip = resposta.getheader("ETag")
+    assert resposta.status == 200 and etag_gzip == recurso.etag_de("gzip")
+    assert gzip.decompress(corpo) == recurso.contenido
+
+    resposta, corpo = pedir("/", **{"Accept-Encoding": "gzip", "If-None-Match": etag_gzip})
+    assert resposta.status == 304 and corpo == b""
+
+    resposta, _ = pedir("/", **{"Accept-Encoding": "gzip", "If-None-Match": f'"outro", W/{etag_gzip}'})
+    assert resposta.status == 304
+
+    resposta, corpo = pedir("/", **{"If-None-Match": etag_gzip})
+    assert resposta.status == 200 and corpo == recurso.contenido
+
+    resposta, _ = pedir("/", **{"If-None-Match": "*"})
+    assert resposta.status == 304
+
+
+def test_range_e_416(servidor):
+    """Range é servido sobre o conteúdo sem compressão e intervalos inválidos dão 416."""
+    recurso, pedir = servidor
+    tamanho = len(recurso.contenido)
+
+    resposta, corpo = pedir("/index.html", Range="bytes=-10", **{"Accept-Encoding": "gzip"})
+    assert resposta.status == 206
+    assert corpo == recurso.contenido[-10:]
+    assert resposta.getheader("Content-Range") == f"bytes {tamanho - 10}-{tamanho - 1}/{tamanho}"
+    assert resposta.getheader("Content-Encoding") is None
+
+    resposta, _ = pedir("/index.html", Range=f"bytes={tamanho}-")
+    assert resposta.status == 416
+    assert resposta.getheader("Content-Range") == f"bytes */{tamanho}"
+
+    # If-Range com ETag antigo: o arquivo é servido inteiro
+    resposta, corpo = pedir("/index.html", Range="bytes=0-9", **{"If-Range": '"antigo"'})
+    assert resposta.status == 200 and corpo == recurso.contenido
@@ -23,10 +23,110 @@ def test_upload_invalid_file_type_unauthorized(client: TestClient):
     assert response.status_code == 401
 
 def test_upload_large_file_unauthorized(client: TestClient):
-    """Testa upload de arquivo muito grande sem autenticação."""
+    """Testa upload de arquivo muito grande sem autenticação (recusado antes de ler o corpo)."""
     large_content = b"x" * (11 * 1024 * 1024)  # 11MB
     files = {"file": ("large.xlsx", io.BytesIO(large_content), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
 
     response = client.post("/api/upload/", files=files)
 
-    assert response.status_code == 401
\ No newline at end of file
+    assert response.status_code == 413
+
+@pytest.fixture
+def admin_client(client: TestClient):
+    """Cliente com a dependência de administrador liberada."""
+    from main import app
+    from routers.auth import is_admin
+    app.dependency_overrides[is_admin] = lambda: None
+    yield client
+    del app.dependency_overrides[is_admin]
+
+
+def test_upload_grava_em_blocos_com_sha256(admin_client: TestClient, monkeypatch):
+    """O arquivo é gravado em blocos e o SHA-256 é calculado durante a cópia."""
+    import hashlib
+    from routers import upload
+
+    monkeypatch.setattr(upload, "UPLOAD_CHUNK_SIZE", 1000)
+    conteudo = bytes(range(256)) * 40  # 10240 bytes, 11 blocos
+    files = {"file": ("planilha.xlsx", io.BytesIO(conteudo), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+
+    response = admin_client.post("/api/upload/", files=files)
+
+    assert response.status_code == 200
+    dados = response.json()
+    assert dados["size"] == len(conteudo)
+    assert dados["sha256"] == hashlib.sha256(conteudo).hexdigest()
+    info = upload.uploaded_files.pop(dados["file_id"])
+    with open(info["saved_path"], "rb") as arquivo:
+        assert arquivo.read() == conteudo
+    assert info["sha256"] == dados["sha256"]
+
+
+def test_upload_acima_do_limite_aborta_e_remove_parcial(admin_client: TestClient, monkeypatch):
+    """Ao ultrapassar o limite a gravação para no bloco e o arquivo parcial é apagado."""
+    import os
+    from routers import upload
+
+    monkeypatch.setattr(upload, "MAX_FILE_SIZE", 4096)
+    monkeypatch.setattr(upload, "UPLOAD_CHUNK_SIZE", 1024)
+    antes = set(os.listdir(upload.UPLOAD_DIR))
+    files = {"file": ("grande.xlsx", io.BytesIO(b"x" * 5000), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+
+    response = admin_client.post("/api/upload/", files=files)
+
+    assert response.status_code == 413
+    assert set(os.listdir(upload.UPLOAD_DIR)) == antes
+
+
+def test_upload_recusado_pelo_content_length_antes_do_corpo():
+    """O middleware responde 413 pelo Content-Length sem chamar a aplicação."""
+    from utils.upload_blocos import LimiteUploadMiddleware
+
+    chamadas = []
+
+    async def aplicacao(scope, receive, send):
+        chamadas.append(scope["path"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    cliente = TestClient(LimiteUploadMiddleware(aplicacao, limite_bytes=1024 * 1024))
+
+    grande = cliente.post("/api/upload/", content=b"x" * (2 * 1024 * 1024))
+    pequeno = cliente.post("/api/upload/", content=b"x" * 1024)
+    outra_rota = cliente.post("/api/alugueis/", content=b"x" * (2 * 1024 * 1024))
+
+    assert grande.status_code == 413
+    assert pequeno.status_code == 200 and outra_rota.status_code == 200
+    assert chamadas == ["/api/upload/", "/api/alugueis/"]
+
+
+def test_upload_chunked_recusado_ao_passar_do_limite():
+    """Sem Content-Length, o middleware conta os bytes e responde 413 ao passar do limite."""
+    from utils.upload_blocos import FOLGA_MULTIPART, LimiteUploadMiddleware
+
+    lidos = []
+
+    async def aplicacao(scope, receive, send):
+        while True:
+            mensagem = await receive()
+            if mensagem["type"] == "http.disconnect":
+                raise RuntimeError("cliente desconectado")
+            lidos.append(len(mensagem.get("body", b"")))
+            if not mensagem.get("more_body"):
+                break
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    cliente = TestClient(LimiteUploadMiddleware(aplicacao, limite_bytes=1024 * 1024))
+
+    def blocos(quantidade):
+        for _ in range(quantidade):
+            yield b"x" * (256 * 1024)
+
+    grande = cliente.post("/api/upload/", content=blocos(8))
+    assert grande.status_code == 413
+    assert sum(lidos) <= 1024 * 1024 + FOLGA_MULTIPART
+
+    lidos.clear()
+    assert cliente.post("/api/upload/", content=blocos(2)).status_code == 200
+    assert sum(lidos) == 512 * 1024
@@ -0,0 +1,112 @@
+"""
+Casamento de nomes com autômato Aho-Corasick
+
+Usado para associar cabeçalhos de colunas das planilhas matriciais a
+proprietários: o autômato é montado uma vez com todos os nomes e cada
+cabeçalho é percorrido uma única vez, independentemente do número de nomes.
+"""
+import re
+import unicodedata
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def normalizar_nome(texto: Any) -> str:
+    """Minúsculas, sem acentos e com espaços simples, para comparação de nomes."""
+    texto = unicodedata.normalize("NFKD", str(texto))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", texto).strip().lower()
+
+
+class AutomatoNomes:
+    """
+    Autômato Aho-Corasick sobre nomes normalizados
+
+    Só valem ocorrências delimitadas (início/fim do texto ou caractere não
+    alfanumérico em volta), para que 'Ana' não case com 'Mariana'. Quando mais
+    de um nome ocorre no mesmo texto, vence o mais longo; empates ficam com a
+    ocorrência mais à esquerda. Nomes repetidos mantêm o primeiro valor.
+    """
+
+    def __init__(self, nomes: Iterable[Tuple[Any, Any]]):
+        """
+        Args:
+            nomes: Pares (nome, valor) na ordem de prioridade
+        """
+        self._transicoes: List[Dict[str, int]] = [{}]
+        self._falha: List[int] = [0]
+        self._saidas: List[List[int]] = [[]]
+        self._padroes: List[Tuple[int, Any]] = []
+
+        vistos = set()
+        for nome, valor in nomes:
+            padrao = normalizar_nome(nome)
+            if not padrao or padrao in vistos:
+                continue
+            vistos.add(padrao)
+            self._inserir(padrao, len(self._padroes))
+            self._padroes.append((len(padrao), valor))
+        self._construir_falhas()
+
+    def _inserir(self, padrao: str, indice: int) -> None:
+        estado = 0
+        for caractere in padrao:
+            proximo = self._transicoes[estado].get(caractere)
+            if proximo is None:
+                proximo = len(self._transicoes)
+                self._transicoes[estado][caractere] = proximo
+                self._transicoes.append({})
+                self._falha.append(0)
+                self._saidas.append([])
+            estado = proximo
+        self._saidas[estado].append(indice)
+
+    def _construir_falhas(self) -> None:
+        fila = deque(self._transicoes[0].values())
+        while fila:
+            estado = fila.popleft()
+            for caractere, proximo in self._transicoes[estado].items():
+                fila.append(proximo)
+                falha = self._falha[estado]
+                while falha and caractere not in self._transicoes[falha]:
+                    falha = self._falha[falha]
+                destino = self._transicoes[falha].get(caractere, 0)
+                self._falha[proximo] = destino if destino != proximo else 0
+                self._saidas[proximo] = self._saidas[proximo] + self._saidas[self._falha[proximo]]
+
+    def melhor_correspondencia(self, texto: Any) -> Optional[Any]:
+        """
+        Valor do nome mais longo que ocorre no texto
+
+        Args:
+            texto: Texto a percorrer (ex.: cabeçalho de coluna)
+
+        Returns:
+            Valor associado ao nome escolhido ou None se nenhum ocorrer
+        """
+        texto = normalizar_nome(texto)
+        melhor: Optional[Tuple[int, int, Any]] = None
+        estado = 0
+        for fim, caractere in enumerate(texto):
+            while estado and caractere not in self._transicoes[estado]:
+                estado = self._falha[estado]
+            estado = self._transicoes[estado].get(caractere, 0)
+            for indice in self._saidas[estado]:
+                tamanho, valor = self._padroes[indice]
+                inicio = fim - tamanho + 1
+                if inicio > 0 and texto[inicio - 1].isalnum():
+                    continue
+                if fim + 1 < len(texto) and texto[fim + 1].isalnum():
+                    continue
+                if melhor is None or (tamanho, -inicio) > (melhor[0], -melhor[1]):
+                    melhor = (tamanho, inicio, valor)
+        return melhor[2] if melhor else None
+
+    def mapear(self, textos: Iterable[Any]) -> Dict[Any, Any]:
+        """Associa cada texto ao valor do seu melhor nome (textos sem nome ficam de fora)."""
+        mapeamento = {}
+        for texto in textos:
+            valor = self.melhor_correspondencia(texto)
+            if valor is not None:
+                mapeamento[texto] = valor
+        return mapeamento
@@ -0,0 +1,379 @@
+"""
+Utilitários de importação em lote (upsert set-based)
+
+Centraliza a resolução de colunas das planilhas, as consultas IN em blocos
+e o INSERT ... ON CONFLICT DO UPDATE usados pelos importadores.
+"""
+import hashlib
+import math
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+# Limite de parâmetros por consulta IN / por lote de upsert
+TAMANHO_LOTE = 1000
+
+
+def em_blocos(valores: Sequence[Any], tamanho: int = TAMANHO_LOTE) -> Iterator[Sequence[Any]]:
+    """Divide uma sequência em blocos de tamanho fixo."""
+    for inicio in range(0, len(valores), tamanho):
+        yield valores[inicio:inicio + tamanho]
+
+
+def resolver_colunas(df: pd.DataFrame, column_mapping: Dict[str, List[str]]) -> Dict[str, str]:
+    """
+    Resolve, uma única vez por planilha, qual coluna do DataFrame atende cada campo
+
+    A comparação ignora maiúsculas/minúsculas e espaços nas pontas.
+
+    Args:
+        df: DataFrame da planilha
+        column_mapping: Campo -> lista de nomes aceitos
+
+    Returns:
+        Campo -> nome real da coluna (apenas campos encontrados)
+    """
+    colunas = {str(col).strip().lower(): col for col in df.columns}
+    resolvidas = {}
+    for campo, aliases in column_mapping.items():
+        for alias in [campo, *aliases]:
+            coluna = colunas.get(str(alias).strip().lower())
+            if coluna is not None:
+                resolvidas[campo] = coluna
+                break
+    return resolvidas
+
+
+def coluna_texto(df: pd.DataFrame, colunas: Dict[str, str], campo: str) -> pd.Series:
+    """
+    Retorna a coluna do campo como texto sem espaços, com vazios como None
+
+    Valores numéricos inteiros vindos do Excel (ex.: 123.0) perdem o sufixo '.0'.
+    """
+    if campo not in colunas:
+        return pd.Series([None] * len(df), index=df.index, dtype=object)
+    serie = df[colunas[campo]].astype("string").str.strip()
+    serie = serie.str.replace(r"\.0+$", "", regex=True)
+    serie = serie.mask(serie.isin(["", "nan", "None", "<NA>"]))
+    return serie.astype(object).where(serie.notna(), None)
+
+
+def coluna_numerica(df: pd.DataFrame, colunas: Dict[str, str], campo: str) -> pd.Series:
+    """
+    Converte a coluna do campo para número de forma vetorizada
+
+    Aceita vírgula decimal e separador de milhar no formato brasileiro.
+    Valores não numéricos viram NaN.
+    """
+    if campo not in colunas:
+        return pd.Series([float("nan")] * len(df), index=df.index, dtype="float64")
+    serie = df[colunas[campo]]
+    if pd.api.types.is_numeric_dtype(serie):
+        return pd.to_numeric(serie, errors="coerce").astype("float64")
+    texto = serie.astype("string").str.strip().str.replace(r"[R$\s]", "", regex=True)
+    formato_br = texto.str.contains(",", na=False)
+    texto = texto.mask(formato_br, texto.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    return pd.to_numeric(texto, errors="coerce").astype("float64")
+
+
+class ValidacaoColunar:
+    """
+    Acumula a validação de uma planilha por colunas inteiras (máscaras booleanas)
+
+    Cada linha recebe no máximo um erro: a primeira regra que a rejeita.
+    Os números de linha seguem a planilha (cabeçalho na linha 1).
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.invalido = pd.Series(False, index=df.index)
+        self.erros: List[Dict[str, Any]] = []
+        self._linhas = pd.Series(np.arange(len(df)) + 2, index=df.index)
+
+    def rejeitar(self, condicao: pd.Series, coluna: str, motivo: str) -> None:
+        """Marca como inválidas as linhas ainda válidas em que a condição é verdadeira."""
+        mascara = condicao.fillna(False).astype(bool) & ~self.invalido
+        if mascara.any():
+            self.erros.extend(
+                {"linha": int(linha), "coluna": coluna, "motivo": motivo}
+                for linha in self._linhas[mascara]
+            )
+            self.invalido |= mascara
+
+    def rejeitar_nao_inteiros(self, valores: pd.Series, coluna: str) -> None:
+        """Rejeita valores vazios ou não inteiros (aceita int64/float inteiros do pandas)."""
+        self.rejeitar(valores.isna(), coluna, "Valor obrigatório ausente ou não numérico")
+        self.rejeitar(valores != valores.round(), coluna, "Valor deve ser inteiro")
+
+    def rejeitar_inexistentes(self, db: Session, valores: pd.Series, coluna_modelo: Any, coluna: str, rotulo: str) -> None:
+        """Rejeita ids que não existem na tabela, com uma consulta IN em lote."""
+        ids = valores[self.validos].astype("int64")
+        existentes = buscar_chaves_existentes(db, [coluna_modelo], ids.unique().tolist())
+        self.rejeitar(~valores.isin(list(existentes)), coluna, f"{rotulo} não encontrado")
+
+    def rejeitar_duplicados(self, dados: pd.DataFrame, chave: List[str], coluna: str, motivo: str) -> None:
+        """Rejeita linhas válidas repetidas pela chave; a última ocorrência válida prevalece."""
+        repetidos = dados[self.validos].duplicated(subset=chave, keep="last")
+        self.rejeitar(repetidos.reindex(dados.index, fill_value=False), coluna, motivo)
+
+    @property
+    def validos(self) -> pd.Series:
+        """Máscara das linhas que passaram em todas as regras."""
+        return ~self.invalido
+
+    def tabela_erros(self) -> List[Dict[str, Any]]:
+        """Erros ordenados por linha."""
+        return sorted(self.erros, key=lambda e: e["linha"])
+
+
+def insert_para_dialeto(db: Session, model):
+    """Retorna um INSERT com suporte a ON CONFLICT para o banco da sessão."""
+    dialeto = db.get_bind().dialect.name
+    if dialeto == "postgresql":
+        return postgresql.insert(model)
+    if dialeto == "sqlite":
+        return sqlite.insert(model)
+    raise NotImplementedError(f"Upsert em lote não suportado para o banco '{dialeto}'")
+
+
+def filtro_chave_em(colunas_chave: List[Any], chaves: Sequence[Any]) -> List[Any]:
+    """
+    Filtros para localizar um bloco de chaves (escalares ou tuplas)
+
+    Chaves compostas usam (a, b, ...) IN (...). Se a tabela declara uma coluna
+    de partição em Table.info['chave_particao'] e ela faz parte da chave, um
+    IN adicional sobre essa coluna permite ao PostgreSQL descartar partições,
+    o que ele não faz a partir da comparação de tuplas.
+    """
+    if len(colunas_chave) == 1:
+        return [colunas_chave[0].in_(list(chaves))]
+    filtros = [tuple_(*colunas_chave).in_(list(chaves))]
+    for posicao, coluna in enumerate(colunas_chave):
+        tabela = getattr(coluna, "table", None)
+        if tabela is not None and tabela.info.get("chave_particao") == coluna.key:
+            filtros.append(coluna.in_(sorted({chave[posicao] for chave in chaves})))
+    return filtros
+
+
+def buscar_chaves_existentes(db: Session, colunas_chave: List[Any], valores: Iterable[Any]) -> Set[Any]:
+    """
+    Consulta, em blocos, quais chaves já existem no banco
+
+    Args:
+        db: Sessão do banco de dados
+        colunas_chave: Colunas do modelo que formam a chave
+        valores: Chaves a verificar (escalares ou tuplas, conforme a chave)
+
+    Returns:
+        Conjunto com as chaves encontradas
+    """
+    valores = list(dict.fromkeys(v for v in valores if v is not None))
+    existentes: Set[Any] = set()
+    composta = len(colunas_chave) > 1
+    for bloco in em_blocos(valores):
+        linhas = db.query(*colunas_chave).filter(*filtro_chave_em(colunas_chave, bloco)).all()
+        existentes.update(tuple(l) if composta else l[0] for l in linhas)
+    return existentes
+
+
+def _valor_comparavel(valor: Any) -> Any:
+    """Normaliza valores do banco e da planilha para comparação."""
+    if valor is None:
+        return None
+    if isinstance(valor, bool):
+        return valor
+    if isinstance(valor, (int, float, Decimal)):
+        numero = float(valor)
+        return None if math.isnan(numero) else round(numero, 2)
+    if isinstance(valor, str):
+        return valor.strip()
+    return valor
+
+
+def consultar_linhas(
+    db: Session,
+    model,
+    chave: List[str],
+    colunas: List[str],
+    chaves: Sequence[Any],
+    filtros: Optional[Dict[str, Any]] = None,
+) -> List[Any]:
+    """
+    Busca, em blocos, as linhas atuais (chave + colunas) de um conjunto de chaves
+
+    Args:
+        db: Sessão do banco de dados
+        model: Modelo SQLAlchemy consultado
+        chave: Colunas que identificam o registro
+        colunas: Colunas de valor retornadas após a chave
+        chaves: Chaves procuradas (escalares ou tuplas, conforme a chave)
+        filtros: Igualdades adicionais (coluna -> valor), ex.: {'ativo': True}
+
+    Returns:
+        Linhas encontradas, na forma (*chave, *colunas)
+    """
+    colunas_chave = [getattr(model, c) for c in chave]
+    extras = [getattr(model, c) == valor for c, valor in (filtros or {}).items()]
+    linhas = []
+    for bloco in em_blocos(list(chaves)):
+        linhas.extend(db.query(*colunas_chave, *[getattr(model, c) for c in colunas]).filter(
+            *filtro_chave_em(colunas_chave, bloco), *extras
+        ).all())
+    return linhas
+
+
+def impressao_linhas(linhas: Iterable[Sequence[Any]]) -> str:
+    """Hash SHA-256 do conteúdo das linhas, independente da ordem em que vieram do banco."""
+    normalizadas = sorted(repr([_valor_comparavel(valor) for valor in linha]) for linha in linhas)
+    return hashlib.sha256("\n".join(normalizadas).encode("utf-8")).hexdigest()
+
+
+def verificacao_linhas(
+    model,
+    chave: List[str],
+    colunas: List[str],
+    chaves: Sequence[Any],
+    linhas: Iterable[Sequence[Any]],
+    filtros: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Registra o estado das linhas lidas por consultar_linhas para conferência posterior
+
+    Args:
+        model: Modelo consultado
+        chave, colunas, chaves, filtros: Os mesmos argumentos de consultar_linhas
+        linhas: Linhas retornadas pela consulta
+
+    Returns:
+        Dicionário com a tabela, os argumentos da consulta e a impressão das linhas
+    """
+    return {
+        "tabela": model.__tablename__,
+        "chave": list(chave),
+        "colunas": list(colunas),
+        "chaves": list(chaves),
+        "filtros": dict(filtros or {}),
+        "impressao": impressao_linhas(linhas),
+    }
+
+
+def linhas_alteradas(db: Session, model, verificacao: Dict[str, Any]) -> bool:
+    """Indica se as linhas de uma verificação mudaram no banco desde que foram lidas."""
+    linhas = consultar_linhas(
+        db, model, verificacao["chave"], verificacao["colunas"],
+        verificacao["chaves"], verificacao["filtros"]
+    )
+    return impressao_linhas(linhas) != verificacao["impressao"]
+
+
+def calcular_diff(
+    db: Session,
+    model,
+    registros: List[Dict[str, Any]],
+    chave: List[str],
+    colunas: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Compara registros da planilha com o estado atual do banco, sem gravar
+
+    Args:
+        db: Sessão do banco de dados
+        model: Modelo SQLAlchemy de destino
+        registros: Dicionários com os valores de cada linha
+        chave: Colunas que identificam o registro
+        colunas: Colunas comparadas (padrão: todas as dos registros exceto a chave)
+
+    Returns:
+        Dicionário com listas 'novos', 'alterados' (registro + alterações
+        campo -> {atual, novo}) e 'inalterados', e a 'verificacao' das linhas
+        lidas (ver verificacao_linhas; None se não havia registros)
+    """
+    diff = {"novos": [], "alterados": [], "inalterados": [], "verificacao": None}
+    if not registros:
+        return diff
+
+    unicos = {tuple(r[c] for c in chave): r for r in registros}
+    if colunas is None:
+        colunas = [c for c in registros[0].keys() if c not in chave]
+
+    composta = len(chave) > 1
+    chaves = [k if composta else k[0] for k in unicos.keys()]
+
+    linhas = consultar_linhas(db, model, chave, colunas, chaves)
+    atuais: Dict[tuple, Any] = {tuple(linha[:len(chave)]): linha for linha in linhas}
+    diff["verificacao"] = verificacao_linhas(model, chave, colunas, chaves, linhas)
+
+    for chave_registro, registro in unicos.items():
+        atual = atuais.get(chave_registro)
+        if atual is None:
+            diff["novos"].append(registro)
+            continue
+        alteracoes = {}
+        for posicao, coluna in enumerate(colunas, start=len(chave)):
+            valor_atual = _valor_comparavel(atual[posicao])
+            valor_novo = _valor_comparavel(registro.get(coluna))
+            if valor_atual != valor_novo:
+                alteracoes[coluna] = {"atual": valor_atual, "novo": valor_novo}
+        if alteracoes:
+            diff["alterados"].append({"registro": registro, "alteracoes": alteracoes})
+        else:
+            diff["inalterados"].append(registro)
+    return diff
+
+
+def upsert_em_lote(
+    db: Session,
+    model,
+    registros: List[Dict[str, Any]],
+    chave: List[str],
+    colunas_atualizar: Optional[List[str]] = None,
+) -> Dict[str, int]:
+    """
+    Insere ou atualiza registros com INSERT ... ON CONFLICT DO UPDATE
+
+    A separação entre criados e atualizados é obtida consultando as chaves
+    existentes antes do upsert (em blocos), o que funciona em qualquer banco
+    suportado sem depender de colunas de sistema.
+
+    Args:
+        db: Sessão do banco de dados
+        model: Modelo SQLAlchemy de destino
+        registros: Dicionários com os valores de cada linha (mesmas chaves)
+        chave: Colunas com restrição única usadas no ON CONFLICT
+        colunas_atualizar: Colunas atualizadas em caso de conflito
+            (padrão: todas as colunas dos registros exceto a chave)
+
+    Returns:
+        Dicionário com 'criados' e 'atualizados'
+    """
+    if not registros:
+        return {"criados": 0, "atualizados": 0}
+
+    # Última ocorrência de cada chave prevalece (ON CONFLICT não aceita duplicatas no mesmo comando)
+    unicos = {tuple(r[c] for c in chave): r for r in registros}
+    registros = list(unicos.values())
+
+    colunas_chave = [getattr(model, c) for c in chave]
+    chaves = [k if len(chave) > 1 else k[0] for k in unicos.keys()]
+    existentes = buscar_chaves_existentes(db, colunas_chave, chaves)
+
+    if colunas_atualizar is None:
+        colunas_atualizar = [c for c in registros[0].keys() if c not in chave]
+
+    for bloco in em_blocos(registros):
+        stmt = insert_para_dialeto(db, model)
+        if colunas_atualizar:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=chave,
+                set_={c: getattr(stmt.excluded, c) for c in colunas_atualizar}
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=chave)
+        db.execute(stmt, list(bloco))
+
+    atualizados = len(existentes)
+    return {"criados": len(registros) - atualizados, "atualizados": atualizados}
@@ -0,0 +1,73 @@
+"""
+Cache em memória com expiração e limite de itens
+
+Cada processo (worker) mantém seu próprio cache; a expiração limita por quanto
+tempo um worker pode servir um valor já invalidado em outro.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class CacheMemoria:
+    """Cache LRU com TTL, seguro para uso entre threads."""
+
+    def __init__(self, ttl_segundos: float, max_itens: int = 1024):
+        """
+        Args:
+            ttl_segundos: Tempo de vida de cada item
+            max_itens: Número máximo de itens (os menos usados saem primeiro)
+        """
+        self.ttl_segundos = ttl_segundos
+        self.max_itens = max_itens
+        self._itens: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave: Hashable) -> Optional[Any]:
+        """Valor da chave ou None se ausente/expirado."""
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            expira_em, valor = item
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return valor
+
+    def definir(self, chave: Hashable, valor: Any) -> None:
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl_segundos, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def obter_ou_calcular(self, chave: Hashable, calcular: Callable[[], Any]) -> Any:
+        """Valor em cache ou, na ausência, o resultado de calcular() (que passa a ser guardado)."""
+        valor = self.obter(chave)
+        if valor is None:
+            valor = calcular()
+            self.definir(chave, valor)
+        return valor
+
+    def invalidar(self, filtro: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """
+        Remove itens do cache
+
+        Args:
+            filtro: Função chave -> bool; sem filtro, remove tudo
+
+        Returns:
+            Número de itens removidos
+        """
+        with self._lock:
+            if filtro is None:
+                removidos = len(self._itens)
+                self._itens.clear()
+                return removidos
+            chaves = [chave for chave in self._itens if filtro(chave)]
+            for chave in chaves:
+                del self._itens[chave]
+            return len(chaves)
@@ -0,0 +1,169 @@
+"""
+Compressão de respostas (brotli ou gzip)
+
+Middleware ASGI que comprime respostas JSON/texto acima de um limite de
+tamanho, negociando o algoritmo pelo cabeçalho Accept-Encoding. Corpos grandes
+são comprimidos em uma thread, sem bloquear o event loop. Os cabeçalhos
+X-Uncompressed-Size e X-Compressed-Size informam os tamanhos original e
+comprimido de cada resposta comprimida.
+
+Respostas em streaming sem Content-Length (StreamingResponse) passam sem
+compressão: bufferizá-las anularia o streaming. Corpos com Content-Length que
+chegam em partes são remontados antes de decidir, até tamanho_maximo: é assim
+que camadas BaseHTTPMiddleware (@app.middleware("http"), SlowAPIMiddleware)
+repassam qualquer resposta, inclusive um JSONResponse inteiro.
+"""
+import gzip
+from typing import Dict, List, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+    BROTLI_DISPONIVEL = True
+except ImportError:  # brotli é opcional; sem ele só gzip é oferecido
+    BROTLI_DISPONIVEL = False
+
+HEADER_TAMANHO_ORIGINAL = "X-Uncompressed-Size"
+HEADER_TAMANHO_COMPRIMIDO = "X-Compressed-Size"
+
+TIPOS_COMPRIMIVEIS = ("application/json", "text/", "application/javascript", "application/xml", "image/svg+xml")
+
+
+def escolher_codificacao(accept_encoding: str) -> Optional[str]:
+    """
+    Escolhe 'br' ou 'gzip' conforme Accept-Encoding (respeitando q=0)
+
+    Em empate de preferência, brotli vence quando disponível.
+
+    Args:
+        accept_encoding: Valor do cabeçalho Accept-Encoding
+
+    Returns:
+        'br', 'gzip' ou None se nenhum for aceito
+    """
+    preferencias: Dict[str, float] = {}
+    for parte in accept_encoding.lower().split(","):
+        nome, _, parametros = parte.strip().partition(";")
+        qualidade = 1.0
+        if parametros.strip().startswith("q="):
+            try:
+                qualidade = float(parametros.strip()[2:])
+            except ValueError:
+                qualidade = 0.0
+        preferencias[nome.strip()] = qualidade
+
+    curinga = preferencias.get("*", 0.0)
+    candidatas: List[Tuple[float, int, str]] = []
+    if BROTLI_DISPONIVEL:
+        candidatas.append((preferencias.get("br", curinga), 1, "br"))
+    candidatas.append((preferencias.get("gzip", curinga), 0, "gzip"))
+    qualidade, _, codificacao = max(candidatas)
+    return codificacao if qualidade > 0 else None
+
+
+def comprimir(corpo: bytes, codificacao: str, nivel_gzip: int, qualidade_brotli: int) -> bytes:
+    """Comprime o corpo com o algoritmo escolhido."""
+    if codificacao == "br":
+        return brotli.compress(corpo, quality=qualidade_brotli)
+    return gzip.compress(corpo, compresslevel=nivel_gzip, mtime=0)
+
+
+class CompressaoMiddleware:
+    """Comprime respostas grandes com brotli ou gzip conforme o cliente aceitar."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        tamanho_minimo: int = 1024,
+        tamanho_minimo_thread: int = 64 * 1024,
+        tamanho_maximo: int = 8 * 1024 * 1024,
+        nivel_gzip: int = 6,
+        qualidade_brotli: int = 4
+    ):
+        """
+        Args:
+            app: Aplicação ASGI
+            tamanho_minimo: Corpos menores que isso (bytes) não são comprimidos
+            tamanho_minimo_thread: A partir desse tamanho a compressão roda em thread
+            tamanho_maximo: Maior Content-Length remontado a partir de várias partes
+            nivel_gzip: Nível do gzip (1-9)
+            qualidade_brotli: Qualidade do brotli (0-11; 4-5 é o ponto usual para conteúdo dinâmico)
+        """
+        self.app = app
+        self.tamanho_minimo = tamanho_minimo
+        self.tamanho_minimo_thread = tamanho_minimo_thread
+        self.tamanho_maximo = tamanho_maximo
+        self.nivel_gzip = nivel_gzip
+        self.qualidade_brotli = qualidade_brotli
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        codificacao = escolher_codificacao(Headers(scope=scope).get("accept-encoding", ""))
+        if codificacao is None:
+            await self.app(scope, receive, send)
+            return
+
+        inicio: Optional[Message] = None
+        repassar = False
+        partes: List[bytes] = []
+
+        async def enviar(mensagem: Message) -> None:
+            nonlocal inicio, repassar
+            if mensagem["type"] == "http.response.start":
+                # Os cabeçalhos só são enviados depois de decidir pela compressão
+                inicio = mensagem
+                return
+            if mensagem["type"] != "http.response.body" or repassar:
+                await send(mensagem)
+                return
+
+            headers = MutableHeaders(raw=inicio["headers"])
+            if mensagem.get("more_body", False):
+                if not partes and not self._remontavel(headers):
+                    repassar = True
+                    await send(inicio)
+                    await send(mensagem)
+                    return
+                partes.append(mensagem.get("body", b""))
+                return
+
+            corpo = b"".join(partes) + mensagem.get("body", b"")
+            if not self._comprimivel(headers, len(corpo)):
+                await send(inicio)
+                await send({"type": "http.response.body", "body": corpo})
+                return
+
+            if len(corpo) >= self.tamanho_minimo_thread:
+                comprimido = await anyio.to_thread.run_sync(
+                    comprimir, corpo, codificacao, self.nivel_gzip, self.qualidade_brotli
+                )
+            else:
+                comprimido = comprimir(corpo, codificacao, self.nivel_gzip, self.qualidade_brotli)
+
+            headers["Content-Encoding"] = codificacao
+            headers["Content-Length"] = str(len(comprimido))
+            headers[HEADER_TAMANHO_ORIGINAL] = str(len(corpo))
+            headers[HEADER_TAMANHO_COMPRIMIDO] = str(len(comprimido))
+            headers.add_vary_header("Accept-Encoding")
+            await send(inicio)
+            await send({"type": "http.response.body", "body": comprimido})
+
+        await self.app(scope, receive, enviar)
+
+    def _remontavel(self, headers: MutableHeaders) -> bool:
+        """Corpo em partes com Content-Length conhecido, comprimível e até tamanho_maximo."""
+        tamanho = headers.get("content-length", "")
+        return tamanho.isdigit() and int(tamanho) <= self.tamanho_maximo and self._comprimivel(headers, int(tamanho))
+
+    def _comprimivel(self, headers: MutableHeaders, tamanho: int) -> bool:
+        """Resposta de tipo textual, ainda não codificada e acima do tamanho mínimo."""
+        if tamanho < self.tamanho_minimo or "content-encoding" in headers:
+            return False
+        tipo = headers.get("content-type", "")
+        return tipo.startswith(TIPOS_COMPRIMIVEIS)
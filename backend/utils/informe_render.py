@@ -0,0 +1,156 @@
+"""
+Renderização dos informes de rendimentos (XLSX/PDF)
+
+Este módulo é executado dentro dos processos do pool de renderização,
+por isso não importa configuração nem modelos do banco: recebe apenas
+dicionários já agregados e grava os arquivos no diretório informado.
+"""
+import os
+from typing import Dict, List, Any
+
+from openpyxl import Workbook
+from openpyxl.styles import Font, Alignment
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    PDF_DISPONIVEL = True
+except ImportError:  # reportlab é opcional
+    PDF_DISPONIVEL = False
+
+NOMES_MESES = [
+    "Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
+    "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"
+]
+
+
+def nome_arquivo_informe(ano: int, proprietario_id: int, formato: str) -> str:
+    """Nome padronizado do arquivo de informe de um proprietário."""
+    return f"informe_{ano}_{proprietario_id}.{formato}"
+
+
+def _gravar_atomico(caminho: str, escrever) -> None:
+    """Grava em arquivo temporário e renomeia, evitando arquivos parciais."""
+    temporario = f"{caminho}.tmp"
+    escrever(temporario)
+    os.replace(temporario, caminho)
+
+
+def _renderizar_xlsx(informe: Dict[str, Any], caminho: str) -> None:
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Informe"
+
+    negrito = Font(bold=True)
+    ws.append([f"Informe de Rendimentos - Ano-calendário {informe['ano']}"])
+    ws["A1"].font = Font(bold=True, size=14)
+    ws.append(["Proprietário", informe["nome_proprietario"]])
+    ws.append(["Documento", informe.get("documento") or ""])
+    ws.append([])
+
+    ws.append(["Mês", "Valor líquido", "Taxa de administração", "DARF pago"])
+    for celula in ws[ws.max_row]:
+        celula.font = negrito
+        celula.alignment = Alignment(horizontal="center")
+
+    for item in informe["meses"]:
+        ws.append([
+            NOMES_MESES[item["mes"] - 1],
+            item["valor_liquido"],
+            item["taxa_administracao"],
+            item["valor_darf"],
+        ])
+
+    totais = informe["totais"]
+    ws.append([
+        "Total",
+        totais["valor_liquido"],
+        totais["taxa_administracao"],
+        totais["valor_darf"],
+    ])
+    for celula in ws[ws.max_row]:
+        celula.font = negrito
+
+    for linha in ws.iter_rows(min_row=6, min_col=2, max_col=4):
+        for celula in linha:
+            celula.number_format = "#,##0.00"
+    ws.column_dimensions["A"].width = 16
+    for coluna in ("B", "C", "D"):
+        ws.column_dimensions[coluna].width = 22
+
+    _gravar_atomico(caminho, lambda destino: wb.save(destino))
+
+
+def _renderizar_pdf(informe: Dict[str, Any], caminho: str) -> None:
+    def escrever(destino: str) -> None:
+        pdf = canvas.Canvas(destino, pagesize=A4)
+        largura, altura = A4
+        y = altura - 60
+        pdf.setFont("Helvetica-Bold", 14)
+        pdf.drawString(50, y, f"Informe de Rendimentos - Ano-calendário {informe['ano']}")
+        y -= 25
+        pdf.setFont("Helvetica", 10)
+        pdf.drawString(50, y, f"Proprietário: {informe['nome_proprietario']}")
+        y -= 15
+        pdf.drawString(50, y, f"Documento: {informe.get('documento') or ''}")
+        y -= 30
+
+        colunas = [50, 170, 300, 440]
+        pdf.setFont("Helvetica-Bold", 10)
+        for x, titulo in zip(colunas, ["Mês", "Valor líquido", "Taxa adm.", "DARF pago"]):
+            pdf.drawString(x, y, titulo)
+        y -= 18
+
+        pdf.setFont("Helvetica", 10)
+        linhas = [
+            (NOMES_MESES[item["mes"] - 1], item["valor_liquido"], item["taxa_administracao"], item["valor_darf"])
+            for item in informe["meses"]
+        ]
+        totais = informe["totais"]
+        linhas.append(("Total", totais["valor_liquido"], totais["taxa_administracao"], totais["valor_darf"]))
+        for rotulo, liquido, taxa, darf in linhas:
+            if rotulo == "Total":
+                pdf.setFont("Helvetica-Bold", 10)
+            pdf.drawString(colunas[0], y, rotulo)
+            for x, valor in zip(colunas[1:], (liquido, taxa, darf)):
+                pdf.drawRightString(x + 90, y, f"{valor:,.2f}")
+            y -= 16
+        pdf.showPage()
+        pdf.save()
+
+    _gravar_atomico(caminho, escrever)
+
+
+def renderizar_informe(informe: Dict[str, Any], diretorio: str, formatos: List[str]) -> Dict[str, Any]:
+    """
+    Renderiza o informe de um proprietário nos formatos solicitados
+
+    Args:
+        informe: Informe agregado (ver InformeRendimentosService.agregar_ano)
+        diretorio: Diretório de destino dos arquivos
+        formatos: Lista de formatos ('xlsx', 'pdf')
+
+    Returns:
+        Dicionário com proprietario_id, arquivos gerados e avisos
+    """
+    arquivos = []
+    avisos = []
+    for formato in formatos:
+        caminho = os.path.join(diretorio, nome_arquivo_informe(informe["ano"], informe["proprietario_id"], formato))
+        if formato == "xlsx":
+            _renderizar_xlsx(informe, caminho)
+        elif formato == "pdf":
+            if not PDF_DISPONIVEL:
+                avisos.append("PDF indisponível: instale o pacote reportlab")
+                continue
+            _renderizar_pdf(informe, caminho)
+        else:
+            avisos.append(f"Formato não suportado: {formato}")
+            continue
+        arquivos.append(os.path.basename(caminho))
+
+    return {
+        "proprietario_id": informe["proprietario_id"],
+        "arquivos": arquivos,
+        "avisos": avisos,
+    }
@@ -0,0 +1,96 @@
+"""
+Leitura das planilhas de uma pasta Excel fora do event loop
+
+Pastas grandes com várias planilhas são lidas em paralelo, uma planilha por
+tarefa, num pool de processos único por worker, criado no primeiro uso. As
+demais são lidas em sequência numa thread: para arquivos pequenos o custo de
+enviar os DataFrames entre processos supera o ganho.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def ler_planilha(file_path: str, sheet_name: str) -> pd.DataFrame:
+    """Lê uma planilha da pasta Excel."""
+    return pd.read_excel(file_path, sheet_name=sheet_name)
+
+
+def ler_planilhas_sequencial(file_path: str, sheet_names: List[str]) -> Dict[str, pd.DataFrame]:
+    """Lê as planilhas uma após a outra no processo atual."""
+    return {nome: ler_planilha(file_path, nome) for nome in sheet_names}
+
+
+def _pool_leitura() -> ProcessPoolExecutor:
+    """Pool compartilhado, criado no primeiro uso com IMPORT_MAX_WORKERS processos."""
+    global _pool
+    # Importado aqui: os processos do pool importam este módulo e não precisam da configuração
+    from config import IMPORT_MAX_WORKERS
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=max(IMPORT_MAX_WORKERS, 1), mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def _descartar_pool(pool: ProcessPoolExecutor) -> None:
+    """Remove um pool quebrado; o próximo uso cria outro."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def usar_pool(file_path: str, sheet_names: List[str]) -> bool:
+    """Indica se a pasta justifica a leitura paralela (várias planilhas e arquivo grande)."""
+    from config import IMPORT_MAX_WORKERS, IMPORT_PARALLEL_MIN_KB
+    return (
+        IMPORT_MAX_WORKERS > 1
+        and len(sheet_names) > 1
+        and os.path.getsize(file_path) >= IMPORT_PARALLEL_MIN_KB * 1024
+    )
+
+
+async def ler_planilhas_excel(
+    file_path: str,
+    sheet_names: List[str],
+    paralelo: Optional[bool] = None
+) -> Dict[str, pd.DataFrame]:
+    """
+    Lê as planilhas sem bloquear o event loop
+
+    Args:
+        file_path: Caminho da pasta Excel
+        sheet_names: Planilhas a ler, na ordem da pasta
+        paralelo: Força (ou impede) o uso do pool; padrão: usar_pool()
+
+    Returns:
+        Dicionário planilha -> DataFrame, na mesma ordem de sheet_names
+    """
+    loop = asyncio.get_running_loop()
+    if paralelo is None:
+        paralelo = usar_pool(file_path, sheet_names)
+    if not paralelo:
+        return await loop.run_in_executor(None, ler_planilhas_sequencial, file_path, sheet_names)
+
+    pool = _pool_leitura()
+    try:
+        dataframes = await asyncio.gather(*(
+            loop.run_in_executor(pool, ler_planilha, file_path, nome) for nome in sheet_names
+        ))
+    except BrokenProcessPool as e:
+        print(f"❌ Pool de leitura indisponível ({e}); lendo planilhas sequencialmente")
+        _descartar_pool(pool)
+        return await loop.run_in_executor(None, ler_planilhas_sequencial, file_path, sheet_names)
+    return dict(zip(sheet_names, dataframes))
@@ -0,0 +1,192 @@
+"""
+Rate limiting compartilhado entre workers
+
+O armazenamento em memória padrão do slowapi conta por processo: com N workers
+do uvicorn, cada limite vale N vezes. Aqui os contadores ficam em um arquivo
+SQLite (por padrão em /dev/shm, que é memória compartilhada) acessado por todos
+os workers do host, ou em um servidor compatível com Redis (redis://, via
+`limits`; Valkey/KeyDB ou um substituto local servem).
+
+A estratégia padrão é a janela deslizante por contadores: duas linhas por
+chave (janela atual e anterior), lidas e incrementadas em uma única transação,
+custo O(1) por requisição.
+"""
+import random
+import sqlite3
+import threading
+import time
+from math import floor
+from typing import Optional, Tuple
+from urllib.parse import urlparse
+
+from limits.errors import ConfigurationError
+from limits.storage import SlidingWindowCounterSupport, Storage
+from limits.storage.base import TimestampedSlidingWindow
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+from config import RATE_LIMIT_STORAGE_URI, RATE_LIMIT_STRATEGY
+
+# Uma em cada N escritas remove as chaves expiradas (custo amortizado O(1))
+PROBABILIDADE_LIMPEZA = 1 / 1000
+
+
+class ArmazenamentoSQLite(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """
+    Storage do `limits` sobre um arquivo SQLite compartilhado pelos processos
+
+    Registra o esquema sqlite:///caminho/do/arquivo.db. Cada thread mantém sua
+    conexão; o arquivo usa WAL e synchronous=OFF, pois os contadores são
+    descartáveis (uma queda do host só zera os limites).
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, timeout: float = 5.0, **options):
+        caminho = urlparse(uri).path
+        if not caminho or caminho == "/":
+            raise ConfigurationError(f"Informe o arquivo do SQLite: {uri}")
+        self.caminho = caminho
+        self.timeout = float(timeout)
+        self._local = threading.local()
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        with self._conexao() as conexao:
+            conexao.execute(
+                "CREATE TABLE IF NOT EXISTS contadores ("
+                " chave TEXT PRIMARY KEY, contador INTEGER NOT NULL, expira REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _conexao(self) -> sqlite3.Connection:
+        """Conexão da thread atual (criada na primeira chamada)."""
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            # isolation_level=None: as transações são controladas explicitamente
+            conexao = sqlite3.connect(self.caminho, timeout=self.timeout, isolation_level=None)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=OFF")
+            self._local.conexao = conexao
+        return conexao
+
+    @staticmethod
+    def _contador(conexao: sqlite3.Connection, chave: str, agora: float) -> int:
+        linha = conexao.execute(
+            "SELECT contador FROM contadores WHERE chave = ? AND expira > ?", (chave, agora)
+        ).fetchone()
+        return linha[0] if linha else 0
+
+    @staticmethod
+    def _incrementar(conexao: sqlite3.Connection, chave: str, expiracao: int, quantidade: int, agora: float) -> int:
+        """Incrementa a chave; se ausente ou expirada, recomeça com a nova expiração."""
+        return conexao.execute(
+            "INSERT INTO contadores (chave, contador, expira) VALUES (?1, ?2, ?3)"
+            " ON CONFLICT(chave) DO UPDATE SET"
+            "  contador = CASE WHEN expira > ?4 THEN contador + ?2 ELSE ?2 END,"
+            "  expira = CASE WHEN expira > ?4 THEN expira ELSE ?3 END"
+            " RETURNING contador",
+            (chave, quantidade, agora + expiracao, agora)
+        ).fetchone()[0]
+
+    def _talvez_limpar(self, conexao: sqlite3.Connection, agora: float) -> None:
+        if random.random() < PROBABILIDADE_LIMPEZA:
+            conexao.execute("DELETE FROM contadores WHERE expira <= ?", (agora,))
+
+    # Interface básica (estratégias fixed-window)
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        conexao = self._conexao()
+        agora = time.time()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            contador = self._incrementar(conexao, key, expiry, amount, agora)
+            self._talvez_limpar(conexao, agora)
+            conexao.execute("COMMIT")
+        except BaseException:
+            conexao.execute("ROLLBACK")
+            raise
+        return contador
+
+    def get(self, key: str) -> int:
+        return self._contador(self._conexao(), key, time.time())
+
+    def get_expiry(self, key: str) -> float:
+        linha = self._conexao().execute(
+            "SELECT expira FROM contadores WHERE chave = ? AND expira > ?", (key, time.time())
+        ).fetchone()
+        return linha[0] if linha else time.time()
+
+    def check(self) -> bool:
+        try:
+            self._conexao().execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> Optional[int]:
+        return self._conexao().execute("DELETE FROM contadores").rowcount
+
+    def clear(self, key: str) -> None:
+        self._conexao().execute("DELETE FROM contadores WHERE chave = ?", (key,))
+
+    # Janela deslizante por contadores
+
+    @staticmethod
+    def _janela(contador_anterior: int, contador_atual: int, expiry: int, agora: float) -> Tuple[int, float, int, float]:
+        """(contador anterior, TTL anterior, contador atual, TTL atual), como no MemoryStorage."""
+        ttl_anterior = (1 - (((agora - expiry) / expiry) % 1)) * expiry if contador_anterior else 0.0
+        ttl_atual = (1 - ((agora / expiry) % 1)) * expiry + expiry
+        return contador_anterior, ttl_anterior, contador_atual, ttl_atual
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        conexao = self._conexao()
+        agora = time.time()
+        chave_anterior, chave_atual = self.sliding_window_keys(key, expiry, agora)
+        # Leitura e incremento na mesma transação de escrita: sem corrida entre workers
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            anterior, ttl_anterior, atual, _ = self._janela(
+                self._contador(conexao, chave_anterior, agora),
+                self._contador(conexao, chave_atual, agora),
+                expiry, agora
+            )
+            permitido = floor(anterior * ttl_anterior / expiry + atual) + amount <= limit
+            if permitido:
+                self._incrementar(conexao, chave_atual, 2 * expiry, amount, agora)
+                self._talvez_limpar(conexao, agora)
+            conexao.execute("COMMIT")
+        except BaseException:
+            conexao.execute("ROLLBACK")
+            raise
+        return permitido
+
+    def get_sliding_window(self, key: str, expiry: int) -> Tuple[int, float, int, float]:
+        conexao = self._conexao()
+        agora = time.time()
+        chave_anterior, chave_atual = self.sliding_window_keys(key, expiry, agora)
+        return self._janela(
+            self._contador(conexao, chave_anterior, agora),
+            self._contador(conexao, chave_atual, agora),
+            expiry, agora
+        )
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        chave_anterior, chave_atual = self.sliding_window_keys(key, expiry, time.time())
+        self._conexao().execute(
+            "DELETE FROM contadores WHERE chave IN (?, ?)", (chave_anterior, chave_atual)
+        )
+
+
+# Limiter único da aplicação (main.py e os routers decoram com a mesma instância).
+# Se o storage ficar indisponível, os limites passam a ser contados em memória.
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy=RATE_LIMIT_STRATEGY,
+    in_memory_fallback_enabled=True,
+)
@@ -0,0 +1,117 @@
+"""
+Hash de senhas (bcrypt) fora do event loop
+
+bcrypt leva dezenas a centenas de milissegundos por operação; chamado direto
+de um endpoint async, bloqueia todas as requisições do worker. Aqui hash e
+verificação rodam em um pool de threads dedicado e limitado (o bcrypt libera o
+GIL), com uma fila de tamanho máximo: acima dela a operação é recusada em vez
+de acumular esperas.
+
+O custo (rounds) vem de BCRYPT_ROUNDS; hashes gravados com outro custo são
+refeitos de forma transparente no próximo login bem-sucedido.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from config import BCRYPT_ROUNDS, PASSWORD_HASH_MAX_QUEUE, PASSWORD_HASH_WORKERS
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class FilaHashCheia(Exception):
+    """Há operações de hash demais aguardando no pool."""
+
+
+class PoolHashSenhas:
+    """Executor limitado para bcrypt, com métricas de profundidade da fila."""
+
+    def __init__(self, workers: int, max_fila: int):
+        """
+        Args:
+            workers: Threads do pool (operações bcrypt simultâneas)
+            max_fila: Operações aguardando além das em execução antes de recusar
+        """
+        self.workers = workers
+        self.max_fila = max_fila
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pendentes = 0
+        self._em_execucao = 0
+        self._concluidas = 0
+        self._recusadas = 0
+        self._tempo_total = 0.0
+        self._maior_fila = 0
+
+    def _executar(self, funcao: Callable, *args) -> Any:
+        with self._lock:
+            self._em_execucao += 1
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args)
+        finally:
+            with self._lock:
+                self._em_execucao -= 1
+                self._concluidas += 1
+                self._tempo_total += time.perf_counter() - inicio
+
+    async def executar(self, funcao: Callable, *args) -> Any:
+        """
+        Executa `funcao(*args)` no pool sem bloquear o event loop
+
+        Raises:
+            FilaHashCheia: Se já houver workers + max_fila operações pendentes
+        """
+        with self._lock:
+            if self._pendentes >= self.workers + self.max_fila:
+                self._recusadas += 1
+                raise FilaHashCheia("Muitas verificações de senha em andamento")
+            self._pendentes += 1
+            self._maior_fila = max(self._maior_fila, self._pendentes - self.workers)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._executar, funcao, *args)
+        finally:
+            with self._lock:
+                self._pendentes -= 1
+
+    def metricas(self) -> Dict[str, Any]:
+        """Estado do pool: em execução, na fila, recusas e tempo médio por operação."""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "em_execucao": self._em_execucao,
+                "na_fila": max(self._pendentes - self._em_execucao, 0),
+                "max_fila": self.max_fila,
+                "maior_fila": self._maior_fila,
+                "concluidas": self._concluidas,
+                "recusadas": self._recusadas,
+                "tempo_medio_ms": round(self._tempo_total / self._concluidas * 1000, 2) if self._concluidas else None,
+                "bcrypt_rounds": BCRYPT_ROUNDS,
+            }
+
+
+pool_senhas = PoolHashSenhas(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
+
+
+async def gerar_hash_senha(senha: str) -> str:
+    """Hash bcrypt da senha com o custo configurado, calculado no pool."""
+    return await pool_senhas.executar(pwd_context.hash, senha)
+
+
+async def verificar_senha(senha: str, hash_senha: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifica a senha no pool
+
+    Args:
+        senha: Senha em texto informada
+        hash_senha: Hash gravado
+
+    Returns:
+        (válida, novo_hash); novo_hash só vem preenchido quando a senha é
+        válida e o hash gravado usa outro custo, devendo ser substituído
+    """
+    return await pool_senhas.executar(pwd_context.verify_and_update, senha, hash_senha)
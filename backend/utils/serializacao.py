@@ -0,0 +1,81 @@
+"""
+Serialização rápida para endpoints de listagem
+
+As listagens selecionam só as colunas necessárias como tuplas (sem hidratar
+entidades ORM nem chamar to_dict por linha) e são serializadas com orjson,
+sem passar pela validação do response_model.
+"""
+import json
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import Float, String, cast, func
+from sqlalchemy.orm import Session
+
+try:
+    import orjson
+    ORJSON_DISPONIVEL = True
+except ImportError:  # orjson é opcional; sem ele usa o json da biblioteca padrão
+    ORJSON_DISPONIVEL = False
+
+
+def _serializar_padrao(valor: Any) -> Any:
+    """Tipos que o orjson/json não serializam nativamente."""
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, UUID):
+        return str(valor)
+    if hasattr(valor, "isoformat"):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+class RespostaJSONRapida(JSONResponse):
+    """JSONResponse serializada com orjson (datas, UUID e arrays NumPy nativos)."""
+
+    def render(self, content: Any) -> bytes:
+        if ORJSON_DISPONIVEL:
+            return orjson.dumps(content, default=_serializar_padrao, option=orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(
+            content, default=_serializar_padrao, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+def como_float(coluna, nome: Optional[str] = None, padrao: Optional[float] = None):
+    """
+    Coluna NUMERIC convertida para ponto flutuante no próprio banco
+
+    O driver devolve float em vez de Decimal, que o orjson não serializa.
+
+    Args:
+        coluna: Coluna ou expressão numérica
+        nome: Rótulo no resultado (padrão: nome da coluna)
+        padrao: Valor no lugar de NULL (opcional)
+    """
+    expressao = cast(coluna, Float)
+    if padrao is not None:
+        expressao = func.coalesce(expressao, padrao)
+    return expressao.label(nome or coluna.key)
+
+
+def como_texto(coluna, nome: Optional[str] = None):
+    """Coluna convertida para texto no banco (UUIDs, por exemplo)."""
+    return cast(coluna, String).label(nome or coluna.key)
+
+
+def projetar(db: Session, consulta) -> List[Dict[str, Any]]:
+    """
+    Executa uma consulta de colunas e devolve as linhas como dicionários
+
+    Args:
+        db: Sessão do banco de dados
+        consulta: select() de colunas rotuladas
+
+    Returns:
+        Lista de dicionários com os rótulos das colunas como chaves
+    """
+    resultado = db.execute(consulta)
+    chaves = tuple(resultado.keys())
+    return [dict(zip(chaves, linha)) for linha in resultado]
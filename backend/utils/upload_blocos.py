@@ -0,0 +1,133 @@
+"""
+Upload em blocos: gravação em disco com limite de tamanho e SHA-256 no caminho
+
+O arquivo é copiado do UploadFile (que o Starlette mantém em memória só até
+1MB, o restante em disco) para o destino em blocos de tamanho fixo. O limite
+é verificado a cada bloco e o hash é calculado durante a cópia, sem nunca ter
+o arquivo inteiro em memória.
+
+LimiteUploadMiddleware recusa com 413, antes de ler o corpo, requisições cujo
+Content-Length já excede o limite, e conta os bytes recebidos das demais
+(chunked, sem Content-Length) para interromper a leitura assim que o limite
+é ultrapassado.
+"""
+import hashlib
+import os
+from typing import Iterable, Tuple
+
+import anyio
+from fastapi import UploadFile
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Folga para os cabeçalhos e delimitadores do multipart
+FOLGA_MULTIPART = 64 * 1024
+
+
+class ArquivoMuitoGrande(Exception):
+    """O upload excedeu o tamanho máximo permitido."""
+
+
+async def salvar_em_blocos(
+    arquivo: UploadFile,
+    destino: str,
+    limite_bytes: int,
+    tamanho_bloco: int = 1024 * 1024
+) -> Tuple[int, str]:
+    """
+    Grava o upload em disco bloco a bloco
+
+    A gravação é interrompida no primeiro bloco que ultrapassa o limite e o
+    arquivo parcial é removido.
+
+    Args:
+        arquivo: Arquivo recebido
+        destino: Caminho do arquivo a gravar
+        limite_bytes: Tamanho máximo aceito
+        tamanho_bloco: Bytes lidos e gravados por vez
+
+    Returns:
+        (tamanho em bytes, SHA-256 hexadecimal do conteúdo)
+
+    Raises:
+        ArquivoMuitoGrande: Se o conteúdo exceder limite_bytes
+    """
+    sha256 = hashlib.sha256()
+    tamanho = 0
+    try:
+        with open(destino, "wb") as saida:
+            while bloco := await arquivo.read(tamanho_bloco):
+                tamanho += len(bloco)
+                if tamanho > limite_bytes:
+                    raise ArquivoMuitoGrande(f"Arquivo excede {limite_bytes} bytes")
+                sha256.update(bloco)
+                await anyio.to_thread.run_sync(saida.write, bloco)
+    except BaseException:
+        if os.path.exists(destino):
+            os.remove(destino)
+        raise
+    return tamanho, sha256.hexdigest()
+
+
+class LimiteUploadMiddleware:
+    """Recusa com 413 uploads acima do limite, pelo Content-Length ou pelos bytes recebidos."""
+
+    def __init__(self, app: ASGIApp, limite_bytes: int, prefixos: Iterable[str] = ("/api/upload",)):
+        """
+        Args:
+            app: Aplicação ASGI
+            limite_bytes: Tamanho máximo do arquivo (a folga do multipart é somada)
+            prefixos: Caminhos sujeitos ao limite
+        """
+        self.app = app
+        self.limite_bytes = limite_bytes
+        self.prefixos = tuple(prefixos)
+
+    def _resposta_413(self) -> JSONResponse:
+        limite_mb = self.limite_bytes // (1024 * 1024)
+        return JSONResponse(
+            {"detail": f"Archivo demasiado grande (máx {limite_mb}MB)"},
+            status_code=413, headers={"Connection": "close"}
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not (scope["type"] == "http" and scope["method"] == "POST" and scope["path"].startswith(self.prefixos)):
+            await self.app(scope, receive, send)
+            return
+
+        maximo = self.limite_bytes + FOLGA_MULTIPART
+        tamanho = dict(scope["headers"]).get(b"content-length")
+        if tamanho and tamanho.isdigit() and int(tamanho) > maximo:
+            await self._resposta_413()(scope, receive, send)
+            return
+
+        # Sem Content-Length (ou com um valor falso) o corpo é contado ao chegar;
+        # ao passar do limite a aplicação passa a ver a conexão como encerrada e
+        # o que ela tentar responder depois do 413 é descartado
+        estado = {"recebidos": 0, "iniciada": False, "recusada": False}
+
+        async def send_limitado(mensagem: Message) -> None:
+            if estado["recusada"]:
+                return
+            if mensagem["type"] == "http.response.start":
+                estado["iniciada"] = True
+            await send(mensagem)
+
+        async def receive_limitado() -> Message:
+            if estado["recusada"]:
+                return {"type": "http.disconnect"}
+            mensagem = await receive()
+            if mensagem["type"] == "http.request":
+                estado["recebidos"] += len(mensagem.get("body", b""))
+                if estado["recebidos"] > maximo:
+                    if not estado["iniciada"]:
+                        await self._resposta_413()(scope, receive, send)
+                    estado["recusada"] = True
+                    return {"type": "http.disconnect"}
+            return mensagem
+
+        try:
+            await self.app(scope, receive_limitado, send_limitado)
+        except Exception:
+            if not estado["recusada"]:
+                raise
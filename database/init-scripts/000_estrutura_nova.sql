@@ -113,7 +113,11 @@ CREATE TABLE IF NOT EXISTS log_importacoes (
     registros_erro INTEGER DEFAULT 0,
     detalhes_erro TEXT,
     estado VARCHAR(50) DEFAULT 'INICIADO',
-    tempo_processamento INTERVAL
+    tempo_processamento INTERVAL,
+    nome_planilha VARCHAR(255),
+    tipo_dados VARCHAR(50),
+    hash_conteudo VARCHAR(64),
+    periodo VARCHAR(20)
 );
 
 -- Tabela de histórico de participações
@@ -129,6 +133,21 @@ CREATE TABLE IF NOT EXISTS historico_participacoes (
     proprietario_id INTEGER NOT NULL REFERENCES proprietarios(id)
 );
 
+-- Versões de participações (uma linha por data_registro; a chave primária impede versões concorrentes iguais)
+CREATE TABLE IF NOT EXISTS versoes_participacoes (
+    data_registro TIMESTAMP PRIMARY KEY,
+    usuario_id INTEGER REFERENCES usuarios(id) ON DELETE SET NULL,
+    criado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Ponteiro para a versão vigente das participações (linha única, id = 1)
+CREATE TABLE IF NOT EXISTS versao_atual_participacoes (
+    id INTEGER PRIMARY KEY DEFAULT 1,
+    data_registro TIMESTAMP NOT NULL REFERENCES versoes_participacoes(data_registro),
+    atualizado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT versao_atual_participacoes_linha_unica CHECK (id = 1)
+);
+
 -- ÍNDICES OPTIMIZADOS
 CREATE INDEX IF NOT EXISTS idx_proprietarios_nome ON proprietarios(nome);
 CREATE INDEX IF NOT EXISTS idx_proprietarios_documento ON proprietarios(documento);
@@ -144,6 +163,13 @@ CREATE INDEX IF NOT EXISTS idx_historico_participacoes_data ON historico_partici
 CREATE INDEX IF NOT EXISTS idx_alias_alias ON alias(alias);
 CREATE INDEX IF NOT EXISTS idx_transferencias_alias_id ON transferencias(alias_id);
 CREATE INDEX IF NOT EXISTS idx_transferencias_data_criacao ON transferencias(data_criacao);
+CREATE INDEX IF NOT EXISTS idx_log_importacoes_hash ON log_importacoes(hash_conteudo);
+CREATE INDEX IF NOT EXISTS idx_alugueis_periodo_proprietario ON alugueis(ano, mes, proprietario_id) INCLUDE (imovel_id, valor_liquido_proprietario, taxa_administracao_proprietario);
+CREATE INDEX IF NOT EXISTS idx_alugueis_periodo_imovel ON alugueis(ano, mes, imovel_id) INCLUDE (proprietario_id, valor_liquido_proprietario, taxa_administracao_total);
+CREATE INDEX IF NOT EXISTS idx_alugueis_proprietario_periodo ON alugueis(proprietario_id, ano, mes) INCLUDE (valor_liquido_proprietario);
+CREATE INDEX IF NOT EXISTS idx_participacoes_data_registro ON participacoes(data_registro DESC) INCLUDE (imovel_id, proprietario_id, porcentagem);
+CREATE INDEX IF NOT EXISTS idx_participacoes_ativas_imovel ON participacoes(imovel_id, proprietario_id) INCLUDE (porcentagem) WHERE ativo = TRUE;
+CREATE INDEX IF NOT EXISTS idx_historico_participacoes_versao_cobertura ON historico_participacoes(versao_id) INCLUDE (imovel_id, proprietario_id, porcentagem);
 
 -- COMENTÁRIOS
 COMMENT ON TABLE alias IS 'Tabela para alias (grupos de proprietários) - antes extras';
@@ -201,6 +227,72 @@ CREATE OR REPLACE TRIGGER trigger_calcular_taxa_proprietario_update
     FOR EACH ROW
     EXECUTE FUNCTION calcular_taxa_proprietario_automatico();
 
+-- CATÁLOGO DE PERÍODOS (mantido pelos triggers abaixo)
+CREATE TABLE IF NOT EXISTS periodos_alugueis (
+    ano INTEGER NOT NULL,
+    mes INTEGER NOT NULL,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    total_valor_liquido NUMERIC(14,2) NOT NULL DEFAULT 0,
+    total_taxa_proprietario NUMERIC(14,2) NOT NULL DEFAULT 0,
+    atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (ano, mes)
+);
+
+CREATE OR REPLACE FUNCTION atualizar_periodos_alugueis()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Linhas removidas ou com valores antigos saem do catálogo
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO periodos_alugueis AS p (ano, mes, quantidade, total_valor_liquido, total_taxa_proprietario, atualizado_em)
+        SELECT ano, mes, -COUNT(*), -COALESCE(SUM(valor_liquido_proprietario), 0), -COALESCE(SUM(taxa_administracao_proprietario), 0), CURRENT_TIMESTAMP
+        FROM alugueis_antigos
+        GROUP BY ano, mes
+        ORDER BY ano, mes
+        ON CONFLICT (ano, mes) DO UPDATE SET
+            quantidade = p.quantidade + EXCLUDED.quantidade,
+            total_valor_liquido = p.total_valor_liquido + EXCLUDED.total_valor_liquido,
+            total_taxa_proprietario = p.total_taxa_proprietario + EXCLUDED.total_taxa_proprietario,
+            atualizado_em = EXCLUDED.atualizado_em;
+    END IF;
+
+    -- Linhas inseridas ou com valores novos entram no catálogo
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO periodos_alugueis AS p (ano, mes, quantidade, total_valor_liquido, total_taxa_proprietario, atualizado_em)
+        SELECT ano, mes, COUNT(*), COALESCE(SUM(valor_liquido_proprietario), 0), COALESCE(SUM(taxa_administracao_proprietario), 0), CURRENT_TIMESTAMP
+        FROM alugueis_novos
+        GROUP BY ano, mes
+        ORDER BY ano, mes
+        ON CONFLICT (ano, mes) DO UPDATE SET
+            quantidade = p.quantidade + EXCLUDED.quantidade,
+            total_valor_liquido = p.total_valor_liquido + EXCLUDED.total_valor_liquido,
+            total_taxa_proprietario = p.total_taxa_proprietario + EXCLUDED.total_taxa_proprietario,
+            atualizado_em = EXCLUDED.atualizado_em;
+    END IF;
+
+    DELETE FROM periodos_alugueis WHERE quantidade <= 0;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Tabelas de transição exigem um trigger por evento
+CREATE OR REPLACE TRIGGER trigger_periodos_alugueis_insert
+    AFTER INSERT ON alugueis
+    REFERENCING NEW TABLE AS alugueis_novos
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION atualizar_periodos_alugueis();
+
+CREATE OR REPLACE TRIGGER trigger_periodos_alugueis_update
+    AFTER UPDATE ON alugueis
+    REFERENCING OLD TABLE AS alugueis_antigos NEW TABLE AS alugueis_novos
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION atualizar_periodos_alugueis();
+
+CREATE OR REPLACE TRIGGER trigger_periodos_alugueis_delete
+    AFTER DELETE ON alugueis
+    REFERENCING OLD TABLE AS alugueis_antigos
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION atualizar_periodos_alugueis();
+
 -- MENSAJE DE ÉXITO
 DO $$
 BEGIN
@@ -273,7 +365,11 @@ CREATE TABLE IF NOT EXISTS log_importacoes (
     registros_erro INTEGER DEFAULT 0,
     detalhes_erro TEXT,
     estado VARCHAR(50) DEFAULT 'INICIADO',
-    tempo_processamento INTERVAL
+    tempo_processamento INTERVAL,
+    nome_planilha VARCHAR(255),
+    tipo_dados VARCHAR(50),
+    hash_conteudo VARCHAR(64),
+    periodo VARCHAR(20)
 );
 
 -- Tabela de alias (grupos de proprietários)
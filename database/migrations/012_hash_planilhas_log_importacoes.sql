@@ -0,0 +1,12 @@
+-- Migração 012: Registrar hash de conteúdo das planilhas importadas
+-- Data: 19 de outubro de 2026
+-- Descrição: Adiciona ao log de importações a planilha, o tipo de dados, o hash do conteúdo
+--            normalizado e o período coberto, permitindo pular planilhas já importadas
+
+ALTER TABLE log_importacoes ADD COLUMN IF NOT EXISTS nome_planilha VARCHAR(255);
+ALTER TABLE log_importacoes ADD COLUMN IF NOT EXISTS tipo_dados VARCHAR(50);
+ALTER TABLE log_importacoes ADD COLUMN IF NOT EXISTS hash_conteudo VARCHAR(64);
+ALTER TABLE log_importacoes ADD COLUMN IF NOT EXISTS periodo VARCHAR(20);
+
+-- Índice para a busca por hash feita a cada processamento de arquivo
+CREATE INDEX IF NOT EXISTS idx_log_importacoes_hash ON log_importacoes(hash_conteudo);
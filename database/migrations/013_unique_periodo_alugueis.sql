@@ -0,0 +1,35 @@
+-- Migração 013: Garantir unicidade de aluguel por imóvel, proprietário e período
+-- Data: 19 de outubro de 2026
+-- Descrição: Remove aluguéis duplicados (mantendo o registro mais recente) e cria a
+--            restrição única (imovel_id, proprietario_id, mes, ano) usada pelo upsert em lote.
+--            Bancos criados pelo script inicial já possuem uma restrição equivalente;
+--            nesse caso nada é alterado. A migração pode ser executada mais de uma vez.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_class t ON t.oid = i.indrelid
+        WHERE t.relname = 'alugueis'
+          AND i.indisunique
+          AND (
+              SELECT array_agg(a.attname::text ORDER BY a.attname)
+              FROM pg_attribute a
+              WHERE a.attrelid = t.oid AND a.attnum = ANY(i.indkey)
+          ) = ARRAY['ano', 'imovel_id', 'mes', 'proprietario_id']
+    ) THEN
+        -- Manter apenas o registro mais recente de cada período
+        DELETE FROM alugueis a
+        USING alugueis b
+        WHERE a.imovel_id = b.imovel_id
+          AND a.proprietario_id = b.proprietario_id
+          AND a.mes = b.mes
+          AND a.ano = b.ano
+          AND a.id < b.id;
+
+        ALTER TABLE alugueis
+        ADD CONSTRAINT uq_aluguel_simples_periodo
+        UNIQUE (imovel_id, proprietario_id, mes, ano);
+    END IF;
+END $$;
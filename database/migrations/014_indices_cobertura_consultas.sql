@@ -0,0 +1,43 @@
+-- Migração 014: Índices compostos e de cobertura para as consultas mais frequentes
+-- Data: 19 de outubro de 2026
+-- Descrição: Cobre os caminhos de acesso de relatórios, dashboard, carnê-leão e
+--            participações com índices compostos, parciais e INCLUDE (index-only scan).
+--            Criados com CONCURRENTLY para não bloquear escritas: executar fora de
+--            transação (psql -f / psql < arquivo). Verificados por
+--            backend/tests/test_plano_consultas.py (requer TEST_POSTGRES_URL).
+
+-- Aluguéis por período e proprietário, somando valores (relatórios, carnê-leão, informes)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_alugueis_periodo_proprietario
+    ON alugueis (ano, mes, proprietario_id)
+    INCLUDE (imovel_id, valor_liquido_proprietario, taxa_administracao_proprietario);
+
+-- Aluguéis por período e imóvel (totais por imóvel, matriz de distribuição)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_alugueis_periodo_imovel
+    ON alugueis (ano, mes, imovel_id)
+    INCLUDE (proprietario_id, valor_liquido_proprietario, taxa_administracao_total);
+
+-- Extrato de um proprietário ao longo do tempo
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_alugueis_proprietario_periodo
+    ON alugueis (proprietario_id, ano, mes)
+    INCLUDE (valor_liquido_proprietario);
+
+-- Versão atual de participações: ORDER BY data_registro DESC LIMIT 1 e igualdade na data
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_participacoes_data_registro
+    ON participacoes (data_registro DESC)
+    INCLUDE (imovel_id, proprietario_id, porcentagem);
+
+-- Participações ativas por imóvel (importação e nova versão)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_participacoes_ativas_imovel
+    ON participacoes (imovel_id, proprietario_id)
+    INCLUDE (porcentagem)
+    WHERE ativo = TRUE;
+
+-- Histórico de participações por versão
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_historico_participacoes_versao_cobertura
+    ON historico_participacoes (versao_id)
+    INCLUDE (imovel_id, proprietario_id, porcentagem);
+
+-- DARFs filtrados por EXTRACT(year/month FROM data)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_darfs_ano_mes
+    ON darfs ((EXTRACT(year FROM data)), (EXTRACT(month FROM data)))
+    INCLUDE (proprietario_id, valor_darf);
@@ -0,0 +1,86 @@
+-- Migração 015: Catálogo de períodos de aluguéis mantido por trigger
+-- Data: 19 de outubro de 2026
+-- Descrição: Cria a tabela periodos_alugueis (ano, mes, quantidade e totais) usada pelos
+--            endpoints de anos disponíveis, último período, totais mensais e dashboard,
+--            que deixam de varrer a tabela alugueis. Os triggers são por comando e usam
+--            tabelas de transição, então um upsert em lote atualiza o catálogo com um único
+--            INSERT ... ON CONFLICT por comando. A carga inicial é feita com alugueis
+--            bloqueada para escrita, para que nenhuma alteração fique fora do catálogo.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS periodos_alugueis (
+    ano INTEGER NOT NULL,
+    mes INTEGER NOT NULL,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    total_valor_liquido NUMERIC(14,2) NOT NULL DEFAULT 0,
+    total_taxa_proprietario NUMERIC(14,2) NOT NULL DEFAULT 0,
+    atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (ano, mes)
+);
+
+CREATE OR REPLACE FUNCTION atualizar_periodos_alugueis()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Linhas removidas ou com valores antigos saem do catálogo
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO periodos_alugueis AS p (ano, mes, quantidade, total_valor_liquido, total_taxa_proprietario, atualizado_em)
+        SELECT ano, mes, -COUNT(*), -COALESCE(SUM(valor_liquido_proprietario), 0), -COALESCE(SUM(taxa_administracao_proprietario), 0), CURRENT_TIMESTAMP
+        FROM alugueis_antigos
+        GROUP BY ano, mes
+        ORDER BY ano, mes
+        ON CONFLICT (ano, mes) DO UPDATE SET
+            quantidade = p.quantidade + EXCLUDED.quantidade,
+            total_valor_liquido = p.total_valor_liquido + EXCLUDED.total_valor_liquido,
+            total_taxa_proprietario = p.total_taxa_proprietario + EXCLUDED.total_taxa_proprietario,
+            atualizado_em = EXCLUDED.atualizado_em;
+    END IF;
+
+    -- Linhas inseridas ou com valores novos entram no catálogo
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO periodos_alugueis AS p (ano, mes, quantidade, total_valor_liquido, total_taxa_proprietario, atualizado_em)
+        SELECT ano, mes, COUNT(*), COALESCE(SUM(valor_liquido_proprietario), 0), COALESCE(SUM(taxa_administracao_proprietario), 0), CURRENT_TIMESTAMP
+        FROM alugueis_novos
+        GROUP BY ano, mes
+        ORDER BY ano, mes
+        ON CONFLICT (ano, mes) DO UPDATE SET
+            quantidade = p.quantidade + EXCLUDED.quantidade,
+            total_valor_liquido = p.total_valor_liquido + EXCLUDED.total_valor_liquido,
+            total_taxa_proprietario = p.total_taxa_proprietario + EXCLUDED.total_taxa_proprietario,
+            atualizado_em = EXCLUDED.atualizado_em;
+    END IF;
+
+    DELETE FROM periodos_alugueis WHERE quantidade <= 0;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Tabelas de transição exigem um trigger por evento
+LOCK TABLE alugueis IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE OR REPLACE TRIGGER trigger_periodos_alugueis_insert
+    AFTER INSERT ON alugueis
+    REFERENCING NEW TABLE AS alugueis_novos
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION atualizar_periodos_alugueis();
+
+CREATE OR REPLACE TRIGGER trigger_periodos_alugueis_update
+    AFTER UPDATE ON alugueis
+    REFERENCING OLD TABLE AS alugueis_antigos NEW TABLE AS alugueis_novos
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION atualizar_periodos_alugueis();
+
+CREATE OR REPLACE TRIGGER trigger_periodos_alugueis_delete
+    AFTER DELETE ON alugueis
+    REFERENCING OLD TABLE AS alugueis_antigos
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION atualizar_periodos_alugueis();
+
+-- Carga inicial (substitui o conteúdo para que a migração possa ser reexecutada)
+DELETE FROM periodos_alugueis;
+INSERT INTO periodos_alugueis (ano, mes, quantidade, total_valor_liquido, total_taxa_proprietario)
+SELECT ano, mes, COUNT(*), COALESCE(SUM(valor_liquido_proprietario), 0), COALESCE(SUM(taxa_administracao_proprietario), 0)
+FROM alugueis
+GROUP BY ano, mes;
+
+COMMIT;
@@ -0,0 +1,24 @@
+-- Migração 016: Chave única das versões de participações
+-- Data: 19 de outubro de 2026
+-- Descrição: Cada versão do conjunto de participações é identificada pelo seu
+--            data_registro. A tabela versoes_participacoes registra uma linha por
+--            versão; a chave primária garante que duas gravações concorrentes não
+--            compartilhem o mesmo data_registro (antes a aplicação procurava um
+--            horário livre consultando participacoes em laço). As versões já
+--            existentes são registradas na carga inicial.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS versoes_participacoes (
+    data_registro TIMESTAMP PRIMARY KEY,
+    usuario_id INTEGER REFERENCES usuarios(id) ON DELETE SET NULL,
+    criado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO versoes_participacoes (data_registro, criado_em)
+SELECT data_registro, MIN(data_registro)
+FROM participacoes
+GROUP BY data_registro
+ON CONFLICT (data_registro) DO NOTHING;
+
+COMMIT;
@@ -0,0 +1,27 @@
+-- Migração 017: Ponteiro para a versão vigente das participações
+-- Data: 19 de outubro de 2026
+-- Descrição: A versão vigente era localizada a cada leitura por uma subconsulta que
+--            ordena participacoes por data_registro (ORDER BY ... DESC LIMIT 1). A tabela
+--            versao_atual_participacoes guarda em uma única linha o data_registro
+--            vigente, atualizado na mesma transação que grava cada nova versão; a
+--            leitura do conjunto ativo passa a ser uma busca por igualdade no índice
+--            idx_participacoes_data_registro (migração 014). Depende da migração 016.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS versao_atual_participacoes (
+    id INTEGER PRIMARY KEY DEFAULT 1,
+    data_registro TIMESTAMP NOT NULL REFERENCES versoes_participacoes(data_registro),
+    atualizado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT versao_atual_participacoes_linha_unica CHECK (id = 1)
+);
+
+INSERT INTO versao_atual_participacoes (id, data_registro)
+SELECT 1, MAX(data_registro) FROM versoes_participacoes
+HAVING MAX(data_registro) IS NOT NULL
+ON CONFLICT (id) DO UPDATE SET
+    data_registro = EXCLUDED.data_registro,
+    atualizado_em = CURRENT_TIMESTAMP
+WHERE versao_atual_participacoes.data_registro < EXCLUDED.data_registro;
+
+COMMIT;
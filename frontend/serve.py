@@ -1,29 +1,186 @@
 #!/usr/bin/env python3
 """
-Servidor de desarrollo para la aplicación unificada
+Servidor estático para la aplicación unificada
+
+Dos modos:
+
+    desarrollo  (por defecto) lee los archivos del disco en cada petición, sin
+                caché y con cabeceras CORS, como antes
+    produccion  opción de despliegue cuando no hay nginx: al iniciar carga los
+                archivos en memoria con sus variantes precomprimidas (.gz y, si
+                el módulo brotli está instalado, .br), ETag fuerte por variante,
+                Cache-Control inmutable para archivos con hash en el nombre,
+                peticiones Range y log de acceso estructurado (JSON por línea)
+
+Ambos modos atienden cada conexión en su propio hilo (ThreadingHTTPServer), así
+una carga lenta no bloquea las demás.
+
+Uso:
+    python3 serve.py
+    python3 serve.py --modo produccion --puerto 3001
 """
 
+import argparse
+import gzip
+import hashlib
 import http.server
-import socketserver
+import json
+import logging
+import mimetypes
 import os
+import re
 import sys
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+try:
+    import brotli
+    BROTLI_DISPONIBLE = True
+except ImportError:  # brotli es opcional; sin él solo hay variantes .gz
+    BROTLI_DISPONIBLE = False
 
 # Configuración
 PORT = 3001
 DIRECTORY = Path(__file__).parent
 
+# Archivos que no se publican
+EXCLUIDOS = re.compile(r"(^|/)\.|\.(py|pyc|sh)$|(^|/)__pycache__/")
+# Nombres con hash de contenido (app.3f9a1c2b.js): nunca cambian, caché de un año
+CON_HASH = re.compile(r"\.[0-9a-f]{8,}\.[a-z0-9]+$")
+TIPOS_COMPRIMIBLES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/xml")
+TAMANO_MINIMO_COMPRESION = 1024
+
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+# Sin hash (incluido el ?v= fijo de index.html) el navegador revalida con el ETag
+CACHE_REVALIDAR = "no-cache"
+
+CABECERAS_SEGURIDAD = {
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "SAMEORIGIN",
+    "Referrer-Policy": "no-referrer-when-downgrade",
+}
+
+log_acceso = logging.getLogger("serve.acceso")
+
+
+@dataclass
+class Recurso:
+    """Archivo cargado en memoria con sus variantes comprimidas."""
+    contenido: bytes
+    tipo: str
+    etag: str
+    modificado: float
+    variantes: Dict[str, bytes] = field(default_factory=dict)  # codificación -> cuerpo
+
+    def etag_de(self, codificacion: Optional[str]) -> str:
+        """ETag fuerte de cada representación (cada variante tiene el suyo)."""
+        return f'"{self.etag}-{codificacion}"' if codificacion else f'"{self.etag}"'
+
+
+def _tipo_mime(ruta: str) -> str:
+    if ruta.endswith(".js"):
+        return "application/javascript; charset=utf-8"
+    tipo = mimetypes.guess_type(ruta)[0] or "application/octet-stream"
+    if tipo.startswith("text/") or tipo in ("application/json", "image/svg+xml"):
+        tipo += "; charset=utf-8"
+    return tipo
+
+
+def cargar_catalogo(directorio: Path) -> Dict[str, Recurso]:
+    """
+    Carga los archivos publicables y construye sus variantes precomprimidas
+
+    Una variante solo se guarda si es al menos un 10% menor que el original.
+    """
+    catalogo: Dict[str, Recurso] = {}
+    for ruta in sorted(directorio.rglob("*")):
+        relativa = ruta.relative_to(directorio).as_posix()
+        if not ruta.is_file() or EXCLUIDOS.search(relativa):
+            continue
+        contenido = ruta.read_bytes()
+        recurso = Recurso(
+            contenido=contenido,
+            tipo=_tipo_mime(relativa),
+            etag=hashlib.sha256(contenido).hexdigest()[:20],
+            modificado=ruta.stat().st_mtime,
+        )
+        if len(contenido) >= TAMANO_MINIMO_COMPRESION and recurso.tipo.startswith(TIPOS_COMPRIMIBLES):
+            candidatas = {"gzip": gzip.compress(contenido, compresslevel=9, mtime=0)}
+            if BROTLI_DISPONIBLE:
+                candidatas["br"] = brotli.compress(contenido, quality=11)
+            recurso.variantes = {
+                codificacion: cuerpo for codificacion, cuerpo in candidatas.items()
+                if len(cuerpo) < len(contenido) * 0.9
+            }
+        catalogo[relativa] = recurso
+    return catalogo
+
+
+def elegir_codificacion(accept_encoding: str, disponibles) -> Optional[str]:
+    """Mejor variante disponible aceptada por el cliente (br antes que gzip en empate)."""
+    aceptadas: Dict[str, float] = {}
+    for parte in accept_encoding.lower().split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        calidad = 1.0
+        if parametros.strip().startswith("q="):
+            try:
+                calidad = float(parametros.strip()[2:])
+            except ValueError:
+                calidad = 0.0
+        aceptadas[nombre.strip()] = calidad
+    comodin = aceptadas.get("*", 0.0)
+    opciones = [
+        (aceptadas.get(codificacion, comodin), codificacion == "br", codificacion)
+        for codificacion in disponibles
+    ]
+    opciones = [opcion for opcion in opciones if opcion[0] > 0]
+    return max(opciones)[2] if opciones else None
+
+
+def rango_solicitado(cabecera: str, tamano: int) -> Optional[Tuple[int, int]]:
+    """
+    Interpreta un Range de un único intervalo de bytes
+
+    Returns:
+        (inicio, fin) inclusivos; None si la cabecera no aplica (se sirve el
+        archivo completo, p. ej. múltiples intervalos)
+
+    Raises:
+        ValueError: Si el intervalo no es satisfacible (416)
+    """
+    coincidencia = re.fullmatch(r"bytes=(\d*)-(\d*)", cabecera.strip())
+    if not coincidencia or coincidencia.group(1) == coincidencia.group(2) == "":
+        return None
+    inicio_txt, fin_txt = coincidencia.groups()
+    if inicio_txt == "":
+        sufijo = int(fin_txt)
+        if sufijo == 0:
+            raise ValueError("Rango vacío")
+        return max(tamano - sufijo, 0), tamano - 1
+    inicio = int(inicio_txt)
+    fin = min(int(fin_txt), tamano - 1) if fin_txt else tamano - 1
+    if inicio >= tamano or fin < inicio:
+        raise ValueError("Rango fuera del archivo")
+    return inicio, fin
+
+
 class UnifiedHandler(http.server.SimpleHTTPRequestHandler):
+    """Modo desarrollo: archivos leídos del disco, sin caché y con CORS."""
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=DIRECTORY, **kwargs)
-    
+
     def end_headers(self):
         # Añadir headers CORS para desarrollo
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+        self.send_header('Cache-Control', 'no-store')
         super().end_headers()
-    
+
     def do_OPTIONS(self):
         self.send_response(200)
         self.end_headers()
@@ -31,24 +188,156 @@ class UnifiedHandler(http.server.SimpleHTTPRequestHandler):
     def log_message(self, format, *args):
         print(f"📱 {format % args}")
 
-def main():
+
+class StaticHandler(http.server.BaseHTTPRequestHandler):
+    """Modo producción: sirve el catálogo en memoria."""
+
+    catalogo: Dict[str, Recurso] = {}
+    protocol_version = "HTTP/1.1"
+    server_version = "AlugueisStatic/1.0"
+
+    def do_HEAD(self):
+        self._servir(con_cuerpo=False)
+
+    def do_GET(self):
+        self._servir(con_cuerpo=True)
+
+    def _resolver(self, ruta: str) -> Tuple[Optional[str], Optional[Recurso]]:
+        """Ruta pedida -> recurso; rutas sin extensión caen en index.html (SPA)."""
+        relativa = unquote(urlsplit(ruta).path).lstrip("/")
+        if relativa == "" or relativa.endswith("/"):
+            relativa += "index.html"
+        if relativa == "favicon.ico":
+            relativa = "favicon.svg"
+        if relativa in self.catalogo:
+            return relativa, self.catalogo[relativa]
+        if "." not in relativa.rsplit("/", 1)[-1]:
+            return "index.html", self.catalogo.get("index.html")
+        return None, None
+
+    def _servir(self, con_cuerpo: bool):
+        self._inicio = time.perf_counter()
+        self._codificacion = None
+        relativa, recurso = self._resolver(self.path)
+        if recurso is None:
+            self._responder(404, b"Not Found", {"Content-Type": "text/plain; charset=utf-8"}, con_cuerpo)
+            return
+
+        cabeceras = {
+            "Content-Type": recurso.tipo,
+            "Cache-Control": CACHE_INMUTABLE if CON_HASH.search(relativa) else CACHE_REVALIDAR,
+            "Last-Modified": self.date_time_string(recurso.modificado),
+            "Accept-Ranges": "bytes",
+        }
+        if recurso.variantes:
+            cabeceras["Vary"] = "Accept-Encoding"
+
+        # Range se aplica sobre la representación sin comprimir
+        rango = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if rango and (not if_range or if_range.strip() == recurso.etag_de(None)):
+            try:
+                intervalo = rango_solicitado(rango, len(recurso.contenido))
+            except ValueError:
+                cabeceras["Content-Range"] = f"bytes */{len(recurso.contenido)}"
+                self._responder(416, b"", cabeceras, con_cuerpo)
+                return
+            if intervalo:
+                inicio, fin = intervalo
+                cabeceras["ETag"] = recurso.etag_de(None)
+                cabeceras["Content-Range"] = f"bytes {inicio}-{fin}/{len(recurso.contenido)}"
+                self._responder(206, recurso.contenido[inicio:fin + 1], cabeceras, con_cuerpo)
+                return
+
+        self._codificacion = elegir_codificacion(self.headers.get("Accept-Encoding", ""), recurso.variantes)
+        etag = recurso.etag_de(self._codificacion)
+        cabeceras["ETag"] = etag
+        if self._codificacion:
+            cabeceras["Content-Encoding"] = self._codificacion
+
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match:
+            etiquetas = {etiqueta.strip().removeprefix("W/") for etiqueta in if_none_match.split(",")}
+            if "*" in etiquetas or etag in etiquetas:
+                del cabeceras["Content-Type"]
+                self._responder(304, b"", cabeceras, con_cuerpo=False)
+                return
+
+        cuerpo = recurso.variantes[self._codificacion] if self._codificacion else recurso.contenido
+        self._responder(200, cuerpo, cabeceras, con_cuerpo)
+
+    def _responder(self, estado: int, cuerpo: bytes, cabeceras: Dict[str, str], con_cuerpo: bool):
+        self.send_response(estado)
+        for nombre, valor in {**CABECERAS_SEGURIDAD, **cabeceras}.items():
+            self.send_header(nombre, valor)
+        if estado != 304:
+            self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        enviados = 0
+        if con_cuerpo and estado != 304:
+            self.wfile.write(cuerpo)
+            enviados = len(cuerpo)
+        self._registrar_acceso(estado, enviados)
+
+    def _registrar_acceso(self, estado: int, enviados: int):
+        """Una línea JSON por petición, escrita después de enviar el cuerpo."""
+        log_acceso.info(json.dumps({
+            "ts": self.log_date_time_string(),
+            "cliente": self.address_string(),
+            "metodo": self.command,
+            "ruta": self.path,
+            "estado": estado,
+            "bytes": enviados,
+            "codificacion": self._codificacion,
+            "duracion_ms": round((time.perf_counter() - self._inicio) * 1000, 2),
+            "user_agent": self.headers.get("User-Agent"),
+        }, ensure_ascii=False))
+
+    def log_request(self, code="-", size="-"):
+        # send_response registraría antes del cuerpo; el acceso va por _registrar_acceso
+        pass
+
+    def log_message(self, format, *args):
+        # Errores del protocolo (petición inválida, método no soportado)
+        log_acceso.warning(json.dumps({"ts": self.log_date_time_string(), "mensaje": format % args}, ensure_ascii=False))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor estático de la aplicación unificada")
+    parser.add_argument("--modo", choices=("desarrollo", "produccion"), default=os.getenv("SERVE_MODE", "desarrollo"))
+    parser.add_argument("--host", default="")
+    parser.add_argument("--puerto", type=int, default=int(os.getenv("SERVE_PORT", PORT)))
+    args = parser.parse_args(argv)
+
+    if args.modo == "produccion":
+        logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+        StaticHandler.catalogo = cargar_catalogo(DIRECTORY)
+        handler = StaticHandler
+        total = sum(len(r.contenido) for r in StaticHandler.catalogo.values())
+        variantes = sum(len(r.variantes) for r in StaticHandler.catalogo.values())
+        print(f"📦 {len(StaticHandler.catalogo)} archivos ({total / 1024:.0f} KiB) y {variantes} variantes precomprimidas"
+              f"{'' if BROTLI_DISPONIBLE else ' (solo gzip: módulo brotli no instalado)'}")
+    else:
+        handler = UnifiedHandler
+
     try:
         os.chdir(DIRECTORY)
-        
-        with socketserver.TCPServer(("", PORT), UnifiedHandler) as httpd:
-            print(f"🚀 Servidor unificado iniciado en: http://localhost:{PORT}")
+
+        with http.server.ThreadingHTTPServer((args.host, args.puerto), handler) as httpd:
+            httpd.daemon_threads = True
+            print(f"🚀 Servidor unificado ({args.modo}) iniciado en: http://localhost:{args.puerto}")
             print(f"📁 Sirviendo desde: {DIRECTORY}")
             print("📱 Aplicación responsiva - prueba en móvil, tablet y desktop")
             print("🔄 Presiona Ctrl+C para detener")
-            
+
             try:
                 httpd.serve_forever()
             except KeyboardInterrupt:
                 print("\n📱 Servidor detenido")
-                
+
     except OSError as e:
-        if e.errno == 48:  # Address already in use
-            print(f"❌ Puerto {PORT} ya está en uso. Prueba con otro puerto.")
+        if e.errno in (48, 98):  # Address already in use (macOS, Linux)
+            print(f"❌ Puerto {args.puerto} ya está en uso. Prueba con otro puerto.")
             sys.exit(1)
         else:
             raise
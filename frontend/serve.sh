@@ -20,8 +20,8 @@ echo "🌐 Servidor: http://192.168.0.7:3000"
 echo "⚡ Presiona Ctrl+C para detener el servidor"
 echo ""
 
-# Iniciar servidor HTTP com no-cache
-python3 serve.py
+# Iniciar servidor HTTP (SERVE_MODE=produccion para caché y precompresión)
+python3 serve.py --modo "${SERVE_MODE:-desarrollo}"
 
 echo ""
 echo "🛑 Servidor detenido"